@@ -42,6 +42,7 @@ class Allplayall(tournaments.Tournament):
         result = Competition.control_file_globals(self)
         result.update({
             'Competitor' : Competitor_config,
+            'Time_controls' : tournaments.Time_controls,
             })
         return result
 
@@ -94,6 +95,9 @@ class Allplayall(tournaments.Tournament):
             if setting.name not in ('handicap', 'handicap_style')
             ] + [
             Setting('rounds', allow_none(interpret_int), default=None),
+            Setting('time_controls',
+                    allow_none(tournaments.interpret_time_controls),
+                    default=None),
             ]
         try:
             matchup_parameters = load_settings(matchup_settings, config)
@@ -249,6 +253,7 @@ class Allplayall(tournaments.Tournament):
         self.write_screen_report(out)
         p('')
         self.write_matchup_reports(out)
+        self.write_move_time_reports(out)
         p('')
         self.write_player_descriptions(out)
         p('')
@@ -1,78 +1,261 @@
 """Go board representation."""
 
-from itertools import chain
+import random
+from array import array
 
 from gomill.common import *
 
-class _Group(object):
-    """Represent a solidly-connected group.
+numpy = None
+
+# Contents of a point in a board's point array
+EMPTY, BLACK, WHITE, BORDER = 0, 1, 2, 3
+
+_codes = {'b' : BLACK, 'w' : WHITE}
+_colours = (None, 'b', 'w', None)
+
+# Bitmask of the colours reached by an empty point's neighbour, indexed by
+# the neighbour's contents
+_reach_bits = (0, 1, 2, 0)
+
+class _Geometry(object):
+    """Precomputed information about a board size.
 
     Public attributes:
-      colour
-      points
-      is_surrounded
+      side         -- board size
+      width        -- distance between vertically adjacent point numbers
+      board_points -- list of coordinates of all points on the board
+      points       -- list of point numbers of all points on the board
+      neighbours   -- list point number -> tuple of point numbers
+      coordinates  -- list point number -> (row, col), or None
+      empty        -- array representing an empty board
+      zobrist      -- list point number -> tuple of Zobrist keys, or None
+
+    Boards are represented as a single array of bytes, indexed by 'point
+    number'. The points on the board are surrounded by BORDER points, so that
+    every point on the board has four neighbours in the array.
+
+    neighbours, coordinates and zobrist have entries for all on-board points
+    (the neighbours may include BORDER points).
+
+    The zobrist tuples are indexed by point contents, giving a 64-bit key for
+    BLACK and WHITE and 0 for EMPTY. The keys come from a generator seeded with
+    the board size, so hashes are the same in every process.
 
-    Points are coordinate pairs (row, col).
+    Don't instantiate directly; use _get_geometry().
 
     """
+    def __init__(self, side):
+        self.side = side
+        self.width = width = side + 1
+        size = (side + 2) * width + 1
+        self.board_points = [(_row, _col) for _row in range(side)
+                             for _col in range(side)]
+        self.points = [(row+1)*width + col for (row, col) in self.board_points]
+        self.neighbours = [None] * size
+        self.coordinates = [None] * size
+        self.zobrist = [None] * size
+        self.empty = array('b', [BORDER] * size)
+        rnd = random.Random(side)
+        for point, coords in zip(self.points, self.board_points):
+            self.neighbours[point] = (point-width, point+width,
+                                      point-1, point+1)
+            self.coordinates[point] = coords
+            self.zobrist[point] = (0, rnd.getrandbits(64), rnd.getrandbits(64))
+            self.empty[point] = EMPTY
+
+    def point_number(self, row, col):
+        """Return the point number for the specified coordinates.
+
+        Raises IndexError if the coordinates are out of range.
 
-class _Region(object):
-    """Represent an empty region.
+        """
+        if not (0 <= row < self.side and 0 <= col < self.side):
+            raise IndexError
+        return (row+1)*self.width + col
+
+_geometries = {}
+
+def _get_geometry(side):
+    """Return the _Geometry for the specified board size.
+
+    Geometries are shared between all boards of the same size.
+
+    """
+    try:
+        return _geometries[side]
+    except KeyError:
+        geometry = _Geometry(side)
+        _geometries[side] = geometry
+        return geometry
+
+
+def _initialise_numpy():
+    global numpy
+    if numpy is not None:
+        return
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+def numpy_available():
+    """Say whether the NumPy batch scorer can be used."""
+    _initialise_numpy()
+    return numpy is not None
+
+
+def _find_root(parent, point):
+    """Find the representative of a point's set in a union-find forest.
+
+    Halves the path as it goes.
+
+    """
+    while parent[point] != point:
+        parent[point] = point = parent[parent[point]]
+    return point
+
+
+class _Group(object):
+    """Represent a solidly-connected group.
 
     Public attributes:
+      colour
       points
-      neighbouring_colours
+      is_surrounded
 
-    Points are coordinate pairs (row, col).
+    colour is BLACK or WHITE; points are point numbers.
 
     """
-    def __init__(self):
-        self.points = set()
-        self.neighbouring_colours = set()
 
 class Board(object):
     """A legal Go position.
 
-    Supports playing stones with captures, and area scoring.
+    Supports playing stones with captures, undoing moves, checking move
+    legality, and area scoring.
 
     Public attributes:
       side         -- board size (int >= 2)
       board_points -- list of coordinates of all points on the board
 
+    board_points is shared between all boards of the same size; treat it as
+    read-only.
+
     """
     def __init__(self, side):
         self.side = side
         if side < 2:
             raise ValueError
-        self.board_points = [(_row, _col) for _row in range(side)
-                             for _col in range(side)]
-        self.board = []
-        for row in range(side):
-            self.board.append([None] * side)
+        self._geometry = _get_geometry(side)
+        self.board_points = self._geometry.board_points
+        self.board = self._geometry.empty[:]
         self._is_empty = True
+        self._hash = 0
+        self._undo_log = []
+
+    def __reduce__(self):
+        return (_unpack_board, (self.__class__, self.to_bytes()))
+
+    def __setstate__(self, state):
+        # For boards pickled by Gomill 0.7 and earlier, which pickled the
+        # instance dictionary, with the position as a list of lists of
+        # colours.
+        self.__init__(state['side'])
+        codes = {None : EMPTY, 'b' : BLACK, 'w' : WHITE}
+        self._load_packed_contents(
+            [codes[colour] for row in state['board'] for colour in row])
 
     def copy(self):
-        """Return an independent copy of this Board."""
+        """Return an independent copy of this Board.
+
+        The copy has no moves to undo.
+
+        """
         b = Board(self.side)
-        b.board = [self.board[i][:] for i in xrange(self.side)]
+        b.board = self.board[:]
         b._is_empty = self._is_empty
+        b._hash = self._hash
         return b
 
-    def _make_group(self, row, col, colour):
+    def to_bytes(self, ko_point=None):
+        """Return a compact encoding of the position.
+
+        ko_point -- (row, col) forbidden by the simple ko rule, or None
+
+        Returns a string of 3 + ceil(side*side/4) bytes: the board size, the
+        ko point, and the contents of each point packed into 2 bits (in
+        board_points order).
+
+        The result is suitable for use as a dictionary key: boards of the same
+        size with the same stones (and ko point) give the same string.
+
+        Raises IndexError if ko_point is out of range.
+
+        """
+        if ko_point is None:
+            ko = 0
+        else:
+            self._geometry.point_number(*ko_point)
+            row, col = ko_point
+            ko = row * self.side + col + 1
+        board = self.board
+        codes = [board[point] for point in self._geometry.points]
+        codes.extend([EMPTY] * (-len(codes) % 4))
+        packed = [chr(self.side), chr(ko >> 8), chr(ko & 0xff)]
+        for i in xrange(0, len(codes), 4):
+            packed.append(chr(codes[i] | codes[i+1] << 2 |
+                              codes[i+2] << 4 | codes[i+3] << 6))
+        return "".join(packed)
+
+    @classmethod
+    def from_bytes(cls, s):
+        """Make a board from the encoding returned by to_bytes().
+
+        Returns a pair (board, ko_point); the board's class is the class this
+        is called on.
+
+        Raises ValueError if the string isn't a valid encoding.
+
+        """
+        board, ko_point, length = _decode_board(cls, s, 0)
+        if length != len(s):
+            raise ValueError("invalid packed board")
+        return board, ko_point
+
+    def _load_packed_contents(self, codes):
+        """Set the position from a sequence of codes in board_points order.
+
+        Doesn't remove surrounded groups.
+
+        """
+        board = self.board
+        self._is_empty = True
+        for point, code in zip(self._geometry.points, codes):
+            board[point] = code
+            if code != EMPTY:
+                self._is_empty = False
+        self._recalculate_hash()
+
+    def _recalculate_hash(self):
+        board = self.board
+        zobrist = self._geometry.zobrist
+        h = 0
+        for point in self._geometry.points:
+            h ^= zobrist[point][board[point]]
+        self._hash = h
+
+    def _make_group(self, point, colour):
+        board = self.board
+        neighbours = self._geometry.neighbours
         points = set()
         is_surrounded = True
         to_handle = set()
-        to_handle.add((row, col))
+        to_handle.add(point)
         while to_handle:
             point = to_handle.pop()
             points.add(point)
-            r, c = point
-            for neighbour in [(r-1, c), (r+1, c), (r, c-1), (r, c+1)]:
-                (r1, c1) = neighbour
-                if not ((0 <= r1 < self.side) and (0 <= c1 < self.side)):
-                    continue
-                neigh_colour = self.board[r1][c1]
-                if neigh_colour is None:
+            for neighbour in neighbours[point]:
+                neigh_colour = board[neighbour]
+                if neigh_colour == EMPTY:
                     is_surrounded = False
                 elif neigh_colour == colour:
                     if neighbour not in points:
@@ -83,46 +266,22 @@ class Board(object):
         group.is_surrounded = is_surrounded
         return group
 
-    def _make_empty_region(self, row, col):
-        points = set()
-        neighbouring_colours = set()
-        to_handle = set()
-        to_handle.add((row, col))
-        while to_handle:
-            point = to_handle.pop()
-            points.add(point)
-            r, c = point
-            for neighbour in [(r-1, c), (r+1, c), (r, c-1), (r, c+1)]:
-                (r1, c1) = neighbour
-                if not ((0 <= r1 < self.side) and (0 <= c1 < self.side)):
-                    continue
-                neigh_colour = self.board[r1][c1]
-                if neigh_colour is None:
-                    if neighbour not in points:
-                        to_handle.add(neighbour)
-                else:
-                    neighbouring_colours.add(neigh_colour)
-        region = _Region()
-        region.points = points
-        region.neighbouring_colours = neighbouring_colours
-        return region
-
     def _find_surrounded_groups(self):
         """Find solidly-connected groups with 0 liberties.
 
         Returns a list of _Groups.
 
         """
+        board = self.board
         surrounded = []
         handled = set()
-        for (row, col) in self.board_points:
-            colour = self.board[row][col]
-            if colour is None:
+        for point in self._geometry.points:
+            colour = board[point]
+            if colour == EMPTY:
                 continue
-            point = (row, col)
             if point in handled:
                 continue
-            group = self._make_group(row, col, colour)
+            group = self._make_group(point, colour)
             if group.is_surrounded:
                 surrounded.append(group)
             handled.update(group.points)
@@ -132,6 +291,20 @@ class Board(object):
         """Say whether the board is empty."""
         return self._is_empty
 
+    def zobrist_hash(self):
+        """Return a hash of the position.
+
+        Returns a nonnegative integer less than 2**64.
+
+        Positions on boards of the same size have the same hash if they have
+        the same stones (in any Board implementation, and in any process).
+        Positions which are different are very unlikely to have the same hash.
+
+        The hash is maintained incrementally, so this is cheap to call.
+
+        """
+        return self._hash
+
     def get(self, row, col):
         """Return the state of the specified point.
 
@@ -140,13 +313,156 @@ class Board(object):
         Raises IndexError if the coordinates are out of range.
 
         """
-        if row < 0 or col < 0:
-            raise IndexError
-        return self.board[row][col]
+        return _colours[self.board[self._geometry.point_number(row, col)]]
+
+    def _count_liberties(self, point, limit):
+        """Count the liberties of the group containing the specified point.
+
+        Stops counting when it reaches 'limit'.
+
+        """
+        board = self.board
+        neighbours = self._geometry.neighbours
+        colour = board[point]
+        liberties = set()
+        seen = set([point])
+        to_handle = [point]
+        while to_handle:
+            for neighbour in neighbours[to_handle.pop()]:
+                neigh_colour = board[neighbour]
+                if neigh_colour == EMPTY:
+                    liberties.add(neighbour)
+                    if len(liberties) >= limit:
+                        return limit
+                elif neigh_colour == colour and neighbour not in seen:
+                    seen.add(neighbour)
+                    to_handle.append(neighbour)
+        return len(liberties)
+
+    def _liberty_counts(self):
+        """Find the number of liberties of every group.
+
+        Returns a list point number -> number of liberties of the group
+        containing that point (0 for empty and border points).
+
+        """
+        board = self.board
+        neighbours = self._geometry.neighbours
+        counts = [0] * len(board)
+        for point in self._geometry.points:
+            colour = board[point]
+            if colour == EMPTY or counts[point]:
+                continue
+            group = [point]
+            seen = set(group)
+            liberties = set()
+            i = 0
+            while i < len(group):
+                for neighbour in neighbours[group[i]]:
+                    neigh_colour = board[neighbour]
+                    if neigh_colour == EMPTY:
+                        liberties.add(neighbour)
+                    elif neigh_colour == colour and neighbour not in seen:
+                        seen.add(neighbour)
+                        group.append(neighbour)
+                i += 1
+            count = len(liberties)
+            for p in group:
+                counts[p] = count
+        return counts
+
+    def _is_legal_point(self, point, code, liberties_of):
+        """Check whether playing at an empty point is a self-capture.
+
+        liberties_of -- function point number -> number of liberties of that
+                        point's group (need not count beyond 2)
+
+        Returns True if the move is not a self-capture.
+
+        """
+        board = self.board
+        for neighbour in self._geometry.neighbours[point]:
+            neigh_colour = board[neighbour]
+            if neigh_colour == EMPTY:
+                return True
+            if neigh_colour == BORDER:
+                continue
+            if neigh_colour == code:
+                # Connecting to a group with another liberty
+                if liberties_of(neighbour) > 1:
+                    return True
+            elif liberties_of(neighbour) == 1:
+                # Capturing a group in atari
+                return True
+        return False
+
+    def is_legal(self, row, col, colour, ko_point=None):
+        """Say whether a move is legal.
 
-    def play(self, row, col, colour):
+        ko_point -- (row, col) forbidden by the simple ko rule, or None
+
+        Returns False if the point is occupied, is the ko point, or if the
+        move would be a self-capture. Doesn't consider superko.
+
+        Only examines the point's neighbours and the groups they belong to;
+        doesn't change the board.
+
+        Raises IndexError if the coordinates are out of range.
+
+        """
+        point = self._geometry.point_number(row, col)
+        if self.board[point] != EMPTY or (row, col) == ko_point:
+            return False
+        return self._is_legal_point(
+            point, _codes[colour],
+            lambda p: self._count_liberties(p, 2))
+
+    def legal_move_mask(self, colour, ko_point=None):
+        """Say which moves are legal, for all points at once.
+
+        ko_point -- (row, col) forbidden by the simple ko rule, or None
+
+        Returns an array of bytes, in the same order as board_points: 1 for a
+        legal move and 0 for an illegal one (as for is_legal()).
+
+        This finds the liberties of each group only once, so it's much faster
+        than calling is_legal() for every point.
+
+        """
+        board = self.board
+        code = _codes[colour]
+        liberty_counts = self._liberty_counts()
+        liberties_of = liberty_counts.__getitem__
+        is_legal_point = self._is_legal_point
+        if ko_point is None:
+            ko = None
+        else:
+            ko = self._geometry.point_number(*ko_point)
+        mask = array('b', [0]) * len(self.board_points)
+        for i, point in enumerate(self._geometry.points):
+            if (board[point] == EMPTY and point != ko and
+                is_legal_point(point, code, liberties_of)):
+                mask[i] = 1
+        return mask
+
+    def legal_moves(self, colour, ko_point=None):
+        """List the legal moves.
+
+        ko_point -- (row, col) forbidden by the simple ko rule, or None
+
+        Returns a list of pairs (row, col), in the same order as board_points.
+        Doesn't include pass.
+
+        """
+        return [coords for (coords, is_legal)
+                in zip(self.board_points, self.legal_move_mask(colour, ko_point))
+                if is_legal]
+
+    def play(self, row, col, colour, record_undo=False):
         """Play a move on the board.
 
+        record_undo -- bool (default False)
+
         Raises IndexError if the coordinates are out of range.
 
         Raises ValueError if the specified point isn't empty.
@@ -156,16 +472,22 @@ class Board(object):
 
         Returns the point forbidden by simple ko, or None
 
+        If record_undo is true, the move can be taken back using undo().
+
         """
-        if row < 0 or col < 0:
-            raise IndexError
-        opponent = opponent_of(colour)
-        if self.board[row][col] is not None:
+        point = self._geometry.point_number(row, col)
+        opponent = _codes[opponent_of(colour)]
+        if self.board[point] != EMPTY:
             raise ValueError
-        self.board[row][col] = colour
+        code = _codes[colour]
+        zobrist = self._geometry.zobrist
+        was_empty = self._is_empty
+        self.board[point] = code
+        self._hash ^= zobrist[point][code]
         self._is_empty = False
         surrounded = self._find_surrounded_groups()
         simple_ko_point = None
+        to_capture = ()
         if surrounded:
             if len(surrounded) == 1:
                 to_capture = surrounded
@@ -176,14 +498,57 @@ class Board(object):
                               if group.colour == opponent]
                 if len(to_capture) == 1 and len(to_capture[0].points) == 1:
                     self_capture = [group for group in surrounded
-                                    if group.colour == colour]
+                                    if group.colour != opponent]
                     if len(self_capture[0].points) == 1:
-                        (simple_ko_point,) = to_capture[0].points
+                        (ko,) = to_capture[0].points
+                        simple_ko_point = self._geometry.coordinates[ko]
             for group in to_capture:
-                for r, c in group.points:
-                    self.board[r][c] = None
+                for p in group.points:
+                    self._hash ^= zobrist[p][group.colour]
+                    self.board[p] = EMPTY
+        if record_undo:
+            captured = []
+            captured_code = EMPTY
+            for group in to_capture:
+                captured.extend(group.points)
+                captured_code = group.colour
+            self._undo_log.append(
+                (point, code, captured_code, captured, was_empty))
         return simple_ko_point
 
+    def undo(self):
+        """Take back the most recent move played with record_undo set.
+
+        Restores the placed point and any captured stones. This takes time
+        proportional to the number of stones the move captured.
+
+        Raises ValueError if there is no such move (moves played before the
+        most recent apply_setup() can't be undone).
+
+        """
+        try:
+            point, code, captured_code, captured, was_empty = \
+                self._undo_log.pop()
+        except IndexError:
+            raise ValueError("no move to undo")
+        board = self.board
+        zobrist = self._geometry.zobrist
+        # A self-capture puts the played stone back here; it's removed below
+        for p in captured:
+            board[p] = captured_code
+            self._hash ^= zobrist[p][captured_code]
+        board[point] = EMPTY
+        self._hash ^= zobrist[point][code]
+        self._is_empty = was_empty
+
+    def can_undo(self):
+        """Say whether undo() has a move to take back."""
+        return bool(self._undo_log)
+
+    def count_undoable_moves(self):
+        """Return the number of moves undo() could take back."""
+        return len(self._undo_log)
+
     def apply_setup(self, black_points, white_points, empty_points):
         """Add setup stones or removals to the position.
 
@@ -201,25 +566,30 @@ class Board(object):
 
         Raises IndexError if any coordinates are out of range.
 
+        This forgets any moves recorded for undo().
+
         """
-        for (row, col) in chain(black_points, white_points, empty_points):
-            if row < 0 or col < 0 or row >= self.side or col >= self.side:
-                raise IndexError
-        for (row, col) in black_points:
-            self.board[row][col] = 'b'
-        for (row, col) in white_points:
-            self.board[row][col] = 'w'
-        for (row, col) in empty_points:
-            self.board[row][col] = None
+        point_number = self._geometry.point_number
+        black_points = [point_number(row, col) for (row, col) in black_points]
+        white_points = [point_number(row, col) for (row, col) in white_points]
+        empty_points = [point_number(row, col) for (row, col) in empty_points]
+        for point in black_points:
+            self.board[point] = BLACK
+        for point in white_points:
+            self.board[point] = WHITE
+        for point in empty_points:
+            self.board[point] = EMPTY
         captured = self._find_surrounded_groups()
         for group in captured:
-            for row, col in group.points:
-                self.board[row][col] = None
+            for point in group.points:
+                self.board[point] = EMPTY
         self._is_empty = True
-        for (row, col) in self.board_points:
-            if self.board[row][col] is not None:
+        for point in self._geometry.points:
+            if self.board[point] != EMPTY:
                 self._is_empty = False
                 break
+        self._recalculate_hash()
+        self._undo_log = []
         return not(captured)
 
     def list_occupied_points(self):
@@ -228,11 +598,13 @@ class Board(object):
         Returns a list of pairs (colour, (row, col))
 
         """
+        board = self.board
+        coordinates = self._geometry.coordinates
         result = []
-        for (row, col) in self.board_points:
-            colour = self.board[row][col]
-            if colour is not None:
-                result.append((colour, (row, col)))
+        for point in self._geometry.points:
+            colour = board[point]
+            if colour != EMPTY:
+                result.append((_colours[colour], coordinates[point]))
         return result
 
     def area_score(self):
@@ -245,21 +617,374 @@ class Board(object):
         Doesn't take komi into account.
 
         """
-        scores = {'b' : 0, 'w' : 0}
-        handled = set()
-        for (row, col) in self.board_points:
-            colour = self.board[row][col]
-            if colour is not None:
-                scores[colour] += 1
+        board = self.board
+        width = self._geometry.width
+        points = self._geometry.points
+        # Label the empty regions using union-find: each empty point is
+        # joined to its left and upper neighbours, which have already been
+        # visited.
+        parent = range(len(board))
+        scores = [0, 0, 0]
+        for point in points:
+            colour = board[point]
+            scores[colour] += 1
+            if colour != EMPTY:
                 continue
-            point = (row, col)
-            if point in handled:
+            if board[point-1] == EMPTY:
+                parent[point] = _find_root(parent, point-1)
+            if board[point-width] == EMPTY:
+                root = _find_root(parent, point-width)
+                own_root = _find_root(parent, point)
+                if root != own_root:
+                    parent[own_root] = root
+        # For each region, count its points and record which colours it
+        # reaches (1 for black, 2 for white, 3 for both).
+        sizes = {}
+        reaches = {}
+        for point in points:
+            if board[point] != EMPTY:
+                continue
+            root = _find_root(parent, point)
+            sizes[root] = sizes.get(root, 0) + 1
+            reaches[root] = (reaches.get(root, 0) |
+                             _reach_bits[board[point-width]] |
+                             _reach_bits[board[point+width]] |
+                             _reach_bits[board[point-1]] |
+                             _reach_bits[board[point+1]])
+        for root, size in sizes.iteritems():
+            reach = reaches[root]
+            if reach & 1:
+                scores[BLACK] += size
+            if reach & 2:
+                scores[WHITE] += size
+        return scores[BLACK] - scores[WHITE]
+
+
+class _Chain(object):
+    """Represent a solidly-connected group on an Incremental_board.
+
+    Public attributes:
+      colour
+      points    -- set of point numbers
+      liberties -- set of point numbers
+
+    colour is BLACK or WHITE.
+
+    """
+    def __init__(self, colour):
+        self.colour = colour
+        self.points = set()
+        self.liberties = set()
+
+class Incremental_board(Board):
+    """Variant of Board which keeps track of groups and their liberties.
+
+    This supports the same interface as Board, and gives the same results.
+
+    It maintains group membership and liberties as moves are played, so
+    play() and is_legal() only need to examine the neighbours of the point
+    being played (rather than the whole board).
+
+    apply_setup() and copy() are no faster than Board's. undo() has to
+    rebuild the groups, so it takes time proportional to the board area.
+
+    """
+    def __init__(self, side):
+        Board.__init__(self, side)
+        # list point number -> _Chain, or None for empty and border points
+        self._chains = [None] * len(self.board)
+
+    def _load_packed_contents(self, codes):
+        Board._load_packed_contents(self, codes)
+        self._rebuild_chains()
+
+    def _rebuild_chains(self):
+        board = self.board
+        neighbours = self._geometry.neighbours
+        chains = self._chains = [None] * len(board)
+        for point in self._geometry.points:
+            colour = board[point]
+            if colour == EMPTY or chains[point] is not None:
+                continue
+            group = self._make_group(point, colour)
+            chain = _Chain(colour)
+            chain.points = group.points
+            for p in group.points:
+                chains[p] = chain
+                for neighbour in neighbours[p]:
+                    if board[neighbour] == EMPTY:
+                        chain.liberties.add(neighbour)
+        self._is_empty = not any(chains)
+
+    def _remove_chain(self, chain):
+        board = self.board
+        chains = self._chains
+        neighbours = self._geometry.neighbours
+        zobrist = self._geometry.zobrist
+        colour = chain.colour
+        for point in chain.points:
+            self._hash ^= zobrist[point][colour]
+            board[point] = EMPTY
+            chains[point] = None
+        for point in chain.points:
+            for neighbour in neighbours[point]:
+                neighbour_chain = chains[neighbour]
+                if neighbour_chain is not None:
+                    neighbour_chain.liberties.add(point)
+
+    def copy(self):
+        """Return an independent copy of this Board."""
+        b = Incremental_board(self.side)
+        b.board = self.board[:]
+        b._is_empty = self._is_empty
+        b._hash = self._hash
+        new_chains = {}
+        chains = b._chains
+        for point, chain in enumerate(self._chains):
+            if chain is None:
+                continue
+            new_chain = new_chains.get(id(chain))
+            if new_chain is None:
+                new_chain = _Chain(chain.colour)
+                new_chain.points = chain.points.copy()
+                new_chain.liberties = chain.liberties.copy()
+                new_chains[id(chain)] = new_chain
+            chains[point] = new_chain
+        return b
+
+    def play(self, row, col, colour, record_undo=False):
+        """Play a move on the board.
+
+        See Board.play() for details.
+
+        """
+        point = self._geometry.point_number(row, col)
+        board = self.board
+        if board[point] != EMPTY:
+            raise ValueError
+        try:
+            code = _codes[colour]
+        except KeyError:
+            raise ValueError
+        was_empty = self._is_empty
+        chains = self._chains
+        board[point] = code
+        self._hash ^= self._geometry.zobrist[point][code]
+        self._is_empty = False
+        chain = _Chain(code)
+        chain.points.add(point)
+        chains[point] = chain
+        opponent_chains = []
+        for neighbour in self._geometry.neighbours[point]:
+            neighbour_chain = chains[neighbour]
+            if neighbour_chain is None:
+                if board[neighbour] == EMPTY:
+                    chain.liberties.add(neighbour)
+            elif neighbour_chain is chain:
                 continue
-            region = self._make_empty_region(row, col)
-            region_size = len(region.points)
-            for colour in ('b', 'w'):
-                if colour in region.neighbouring_colours:
-                    scores[colour] += region_size
-            handled.update(region.points)
-        return scores['b'] - scores['w']
+            elif neighbour_chain.colour == code:
+                # Merge the smaller chain into the larger
+                if len(neighbour_chain.points) < len(chain.points):
+                    chain, neighbour_chain = neighbour_chain, chain
+                neighbour_chain.points.update(chain.points)
+                neighbour_chain.liberties.update(chain.liberties)
+                for p in chain.points:
+                    chains[p] = neighbour_chain
+                chain = neighbour_chain
+            else:
+                neighbour_chain.liberties.discard(point)
+                if neighbour_chain not in opponent_chains:
+                    opponent_chains.append(neighbour_chain)
+        chain.liberties.discard(point)
+
+        to_capture = [c for c in opponent_chains if not c.liberties]
+        simple_ko_point = None
+        if to_capture:
+            if (len(to_capture) == 1 and len(to_capture[0].points) == 1 and
+                len(chain.points) == 1 and not chain.liberties):
+                (ko,) = to_capture[0].points
+                simple_ko_point = self._geometry.coordinates[ko]
+            for captured in to_capture:
+                self._remove_chain(captured)
+        elif not chain.liberties:
+            self._remove_chain(chain)
+            if len(chain.points) == self.side*self.side:
+                self._is_empty = True
+            to_capture = [chain]
+        if record_undo:
+            captured = []
+            captured_code = EMPTY
+            for c in to_capture:
+                captured.extend(c.points)
+                captured_code = c.colour
+            self._undo_log.append(
+                (point, code, captured_code, captured, was_empty))
+        return simple_ko_point
+
+    def _count_liberties(self, point, limit):
+        return len(self._chains[point].liberties)
+
+    def _liberty_counts(self):
+        counts = [0] * len(self.board)
+        for point, chain in enumerate(self._chains):
+            if chain is not None:
+                counts[point] = len(chain.liberties)
+        return counts
+
+    def undo(self):
+        """Take back the most recent move played with record_undo set.
+
+        See Board.undo() for details.
+
+        """
+        Board.undo(self)
+        self._rebuild_chains()
+
+    def apply_setup(self, black_points, white_points, empty_points):
+        """Add setup stones or removals to the position.
+
+        See Board.apply_setup() for details.
+
+        """
+        result = Board.apply_setup(self, black_points, white_points,
+                                   empty_points)
+        self._rebuild_chains()
+        return result
+
+
+# Map a packed byte -> the four point codes it contains
+_unpacked_bytes = [(b & 3, (b >> 2) & 3, (b >> 4) & 3, b >> 6)
+                   for b in range(256)]
+
+def _decode_board(board_class, s, start):
+    """Decode a packed board starting at the specified index in a string.
+
+    Returns a tuple (board, ko_point, end index).
 
+    Raises ValueError if the string doesn't contain a valid encoding there.
+
+    """
+    try:
+        side = ord(s[start])
+        ko = ord(s[start+1]) << 8 | ord(s[start+2])
+    except IndexError:
+        raise ValueError("invalid packed board")
+    if side < 2:
+        raise ValueError("invalid packed board")
+    point_count = side * side
+    end = start + 3 + (point_count + 3) // 4
+    if end > len(s) or ko > point_count:
+        raise ValueError("invalid packed board")
+    codes = []
+    for c in s[start+3:end]:
+        codes.extend(_unpacked_bytes[ord(c)])
+    del codes[point_count:]
+    if BORDER in codes:
+        raise ValueError("invalid packed board")
+    board = board_class(side)
+    board._load_packed_contents(codes)
+    if ko == 0:
+        ko_point = None
+    else:
+        ko_point = divmod(ko - 1, side)
+    return board, ko_point, end
+
+def _unpack_board(board_class, s):
+    return board_class.from_bytes(s)[0]
+
+def pack_boards(boards, ko_points=None):
+    """Encode many positions as a single string.
+
+    boards    -- sequence of Boards (which needn't be the same size)
+    ko_points -- sequence of (row, col) or None, the same length as boards
+                 (default all None)
+
+    Returns the concatenation of the boards' to_bytes() encodings.
+
+    """
+    if ko_points is None:
+        return "".join(board.to_bytes() for board in boards)
+    return "".join(board.to_bytes(ko_point)
+                   for board, ko_point in zip(boards, ko_points))
+
+def unpack_boards(s, board_class=Board):
+    """Decode a string returned by pack_boards().
+
+    board_class -- Board class to use for the result (default Board)
+
+    Returns a list of pairs (board, ko_point).
+
+    Raises ValueError if the string isn't a valid encoding.
+
+    """
+    result = []
+    start = 0
+    while start < len(s):
+        board, ko_point, start = _decode_board(board_class, s, start)
+        result.append((board, ko_point))
+    return result
+
+
+def _numpy_area_scores(geometry, boards):
+    """Implementation of area_scores() using NumPy.
+
+    boards must all use the specified geometry.
+
+    The colours reached by each empty point are found by spreading outward
+    from the stones through empty points, for all the boards at once.
+
+    """
+    width = geometry.width
+    contents = numpy.array(
+        [numpy.frombuffer(board.board, dtype=numpy.int8) for board in boards])
+    empty = (contents == EMPTY)
+    def spread(mask):
+        result = numpy.zeros_like(mask)
+        result[:, 1:] |= mask[:, :-1]
+        result[:, :-1] |= mask[:, 1:]
+        result[:, width:] |= mask[:, :-width]
+        result[:, :-width] |= mask[:, width:]
+        return result
+    scores = numpy.zeros(len(boards), dtype=numpy.int64)
+    for colour, sign in ((BLACK, 1), (WHITE, -1)):
+        stones = (contents == colour)
+        reached = empty & spread(stones)
+        while True:
+            extended = reached | (empty & spread(reached))
+            if numpy.array_equal(extended, reached):
+                break
+            reached = extended
+        scores += sign * (stones.sum(axis=1) + reached.sum(axis=1))
+    return [int(score) for score in scores]
+
+def area_scores(boards, use_numpy=None):
+    """Calculate the area scores of many positions.
+
+    boards    -- sequence of Boards (which needn't be the same size)
+    use_numpy -- bool or None
+
+    Returns a list of ints, the same as [board.area_score() for board in
+    boards].
+
+    If use_numpy is None, uses NumPy if it is available. If use_numpy is True,
+    raises StandardError if NumPy isn't available.
+
+    """
+    boards = list(boards)
+    if use_numpy is None:
+        use_numpy = numpy_available()
+    elif use_numpy:
+        if not numpy_available():
+            raise StandardError("numpy not available")
+    if not use_numpy:
+        return [board.area_score() for board in boards]
+    by_side = {}
+    for i, board in enumerate(boards):
+        by_side.setdefault(board.side, []).append(i)
+    result = [None] * len(boards)
+    for side, indices in by_side.iteritems():
+        scores = _numpy_area_scores(
+            _get_geometry(side), [boards[i] for i in indices])
+        for i, score in zip(indices, scores):
+            result[i] = score
+    return result
@@ -137,6 +137,8 @@ class Cem_tuner(Competition):
         Setting('number_of_generations', interpret_positive_int),
         Setting('elite_proportion', interpret_float),
         Setting('step_size', interpret_float),
+        Setting('early_start_proportion', allow_none(interpret_float),
+                default=None),
         ])
 
     special_settings = [
@@ -188,6 +190,10 @@ class Cem_tuner(Competition):
             raise ControlFileError("elite_proportion out of range (0.0 to 1.0)")
         if not 0.0 < self.step_size < 1.0:
             raise ControlFileError("step_size out of range (0.0 to 1.0)")
+        if (self.early_start_proportion is not None and
+            not 0.0 < self.early_start_proportion < 1.0):
+            raise ControlFileError(
+                "early_start_proportion out of range (0.0 to 1.0)")
 
         try:
             specials = load_settings(self.special_settings, config)
@@ -239,15 +245,35 @@ class Cem_tuner(Competition):
     #
     # These are all reset for each new generation.
     #
+    # If early_start_proportion is set, the next generation may be started
+    # before the current one has finished:
+    #  *early_distribution      -- Distribution the next generation's samples
+    #                              were taken from (None if not started)
+    #  *early_sample_parameters -- as sample_parameters, for next generation
+    #  *early_wins              -- as wins, for next generation
+    #   early_candidates        -- as candidates, for next generation
+    #  *early_scheduler         -- as scheduler, for next generation
+    #
+    # When the current generation finishes, these replace the attributes above
+    # (but 'distribution' is calculated from the full results as usual).
+    #
     #   seen_successful_game -- bool (per-run state)
 
     def set_clean_status(self):
         self.generation = 0
         self.distribution = self.initial_distribution
         self.reset_for_new_generation()
+        self._clear_early_generation()
+
+    def _clear_early_generation(self):
+        self.early_distribution = None
+        self.early_sample_parameters = None
+        self.early_wins = None
+        self.early_candidates = None
+        self.early_scheduler = None
 
-    def _set_scheduler_groups(self):
-        self.scheduler.set_groups(
+    def _set_scheduler_groups(self, scheduler):
+        scheduler.set_groups(
             (i, self.batch_size) for i in xrange(self.samples_per_generation)
             )
 
@@ -255,33 +281,95 @@ class Cem_tuner(Competition):
     status_format_version = 0
 
     def get_status(self):
-        return {
+        result = {
             'generation'         : self.generation,
             'distribution'       : self.distribution.parameters,
             'sample_parameters'  : self.sample_parameters,
             'wins'               : self.wins,
             'scheduler'          : self.scheduler,
             }
+        if self.early_distribution is not None:
+            result['early_generation'] = (
+                self.early_distribution.parameters,
+                self.early_sample_parameters,
+                self.early_wins,
+                self.early_scheduler,
+                )
+        return result
 
     def set_status(self, status):
         self.generation = status['generation']
         self.distribution = Distribution(status['distribution'])
         self.sample_parameters = status['sample_parameters']
         self.wins = status['wins']
-        self.prepare_candidates()
+        self.candidates = self.make_candidates(
+            self.generation, self.sample_parameters)
         self.scheduler = status['scheduler']
         # Might as well notice if they changed the batch_size
-        self._set_scheduler_groups()
+        self._set_scheduler_groups(self.scheduler)
         self.scheduler.rollback()
+        self._clear_early_generation()
+        if 'early_generation' in status:
+            (early_distribution_parameters,
+             self.early_sample_parameters,
+             self.early_wins,
+             self.early_scheduler) = status['early_generation']
+            self.early_distribution = Distribution(
+                early_distribution_parameters)
+            self.early_candidates = self.make_candidates(
+                self.generation + 1, self.early_sample_parameters)
+            self._set_scheduler_groups(self.early_scheduler)
+            self.early_scheduler.rollback()
 
     def reset_for_new_generation(self):
         get_sample = self.distribution.get_sample
         self.sample_parameters = [get_sample()
                                   for _ in xrange(self.samples_per_generation)]
         self.wins = [0] * self.samples_per_generation
-        self.prepare_candidates()
+        self.candidates = self.make_candidates(
+            self.generation, self.sample_parameters)
         self.scheduler = competition_schedulers.Group_scheduler()
-        self._set_scheduler_groups()
+        self._set_scheduler_groups(self.scheduler)
+
+    def start_early_generation(self):
+        """Start the next generation before the current one has finished.
+
+        The next generation's samples are taken from a provisional
+        distribution, calculated from the current generation's results so far
+        (ranking the candidates by win rate).
+
+        Writes the provisional distribution to the history log.
+
+        """
+        sorter = []
+        for candidate_number, wins in enumerate(self.wins):
+            played = self.scheduler.count_fixed(candidate_number)
+            if played:
+                win_rate = wins / played
+            else:
+                win_rate = -1.0
+            sorter.append((win_rate, candidate_number))
+        sorter.sort(reverse=True)
+        self.early_distribution = self.calculate_new_distribution(sorter)
+        get_sample = self.early_distribution.get_sample
+        self.early_sample_parameters = [
+            get_sample() for _ in xrange(self.samples_per_generation)]
+        self.early_wins = [0] * self.samples_per_generation
+        self.early_candidates = self.make_candidates(
+            self.generation + 1, self.early_sample_parameters)
+        self.early_scheduler = competition_schedulers.Group_scheduler()
+        self._set_scheduler_groups(self.early_scheduler)
+        self.log_history("Generation %s started early" % (self.generation + 1))
+        self.log_history("Provisional distribution\n%s" %
+                         self.format_distribution(self.early_distribution))
+        self.log_history("")
+
+    def _promote_early_generation(self):
+        self.sample_parameters = self.early_sample_parameters
+        self.wins = self.early_wins
+        self.candidates = self.early_candidates
+        self.scheduler = self.early_scheduler
+        self._clear_early_generation()
 
     def transform_parameters(self, optimiser_parameters):
         l = []
@@ -338,24 +426,41 @@ class Cem_tuner(Competition):
                 (e, self.format_engine_parameters(engine_parameters)))
         return candidate
 
-    def prepare_candidates(self):
-        """Set up the candidates array.
+    def make_candidates(self, generation, sample_parameters):
+        """Make the candidates for a generation.
 
         This is run for each new generation, and when reloading state.
 
-        Requires generation and sample_parameters to be already set.
-
-        Initialises self.candidates.
+        Returns a list of Players (indexed by candidate number).
 
         """
-        self.candidates = []
+        candidates = []
         for candidate_number, optimiser_params in \
-                enumerate(self.sample_parameters):
+                enumerate(sample_parameters):
             candidate_code = self.make_candidate_code(
-                self.generation, candidate_number)
+                generation, candidate_number)
             engine_parameters = self.transform_parameters(optimiser_params)
-            self.candidates.append(
+            candidates.append(
                 self.make_candidate(candidate_code, engine_parameters))
+        return candidates
+
+    def get_elite_count(self):
+        return max(1,
+            int(self.elite_proportion * self.samples_per_generation + 0.5))
+
+    def calculate_new_distribution(self, ordered_samples):
+        """Calculate the distribution for the next generation.
+
+        ordered_samples -- list of pairs (score, candidate number), best first
+
+        Returns a Distribution.
+
+        """
+        elite_samples = [self.sample_parameters[index]
+                         for (score, index)
+                         in ordered_samples[:self.get_elite_count()]]
+        return update_distribution(
+            self.distribution, elite_samples, self.step_size)
 
     def finish_generation(self):
         """Process a generation's results and calculate the new distribution.
@@ -368,17 +473,13 @@ class Cem_tuner(Competition):
         sorter = [(wins, candidate_number)
                   for (candidate_number, wins) in enumerate(self.wins)]
         sorter.sort(reverse=True)
-        elite_count = max(1,
-            int(self.elite_proportion * self.samples_per_generation + 0.5))
         self.log_history("Generation %s" % self.generation)
         self.log_history("Distribution\n%s" %
                          self.format_distribution(self.distribution))
-        self.log_history(self.format_generation_results(sorter, elite_count))
+        self.log_history(self.format_generation_results(
+            sorter, self.get_elite_count()))
         self.log_history("")
-        elite_samples = [self.sample_parameters[index]
-                         for (wins, index) in sorter[:elite_count]]
-        self.distribution = update_distribution(
-            self.distribution, elite_samples, self.step_size)
+        self.distribution = self.calculate_new_distribution(sorter)
 
     def get_player_checks(self):
         engine_parameters = self.transform_parameters(
@@ -394,14 +495,25 @@ class Cem_tuner(Competition):
         return result
 
     def get_game(self):
-        if self.scheduler.nothing_issued_yet():
-            self.log_event("\nstarting generation %d" % self.generation)
+        job = self._get_game_from_generation(
+            self.generation, self.scheduler,
+            self.candidates, self.sample_parameters)
+        if job is NoGameAvailable and self.early_distribution is not None:
+            job = self._get_game_from_generation(
+                self.generation + 1, self.early_scheduler,
+                self.early_candidates, self.early_sample_parameters)
+        return job
 
-        candidate_number, round_id = self.scheduler.issue()
+    def _get_game_from_generation(self, generation, scheduler,
+                                  candidates, sample_parameters):
+        if scheduler.nothing_issued_yet():
+            self.log_event("\nstarting generation %d" % generation)
+
+        candidate_number, round_id = scheduler.issue()
         if candidate_number is None:
             return NoGameAvailable
 
-        candidate = self.candidates[candidate_number]
+        candidate = candidates[candidate_number]
 
         job = game_jobs.Game_job()
         job.game_id = "%sr%d" % (candidate.code, round_id)
@@ -411,35 +523,57 @@ class Cem_tuner(Competition):
         job.board_size = self.board_size
         job.komi = self.komi
         job.move_limit = self.move_limit
+        job.superko_rule = self.superko_rule
         job.handicap = self.handicap
         job.handicap_is_free = (self.handicap_style == 'free')
         job.use_internal_scorer = (self.scorer == 'internal')
         job.internal_scorer_handicap_compensation = \
             self.internal_scorer_handicap_compensation
+        job.internal_scorer_dead_stones = self.internal_scorer_dead_stones
+        job.internal_scorer_min_life_area = self.internal_scorer_min_life_area
         job.sgf_event = self.competition_code
         job.sgf_note = ("Candidate parameters: %s" %
                         self.format_optimiser_parameters(
-                            self.sample_parameters[candidate_number]))
+                            sample_parameters[candidate_number]))
         return job
 
     def process_game_result(self, response):
         self.seen_successful_game = True
         candidate_number, candidate_code, round_id = response.game_data
-        self.scheduler.fix(candidate_number, round_id)
+        # The candidate code tells us which generation the game was for
+        if candidate_code == self.candidates[candidate_number].code:
+            scheduler, wins = self.scheduler, self.wins
+        else:
+            scheduler, wins = self.early_scheduler, self.early_wins
+        scheduler.fix(candidate_number, round_id)
         gr = response.game_result
         assert candidate_code in (gr.player_b, gr.player_w)
 
         # Counting jigo or no-result as half a point for the candidate
         if gr.winning_player == candidate_code:
-            self.wins[candidate_number] += 1
+            wins[candidate_number] += 1
         elif gr.winning_player is None:
-            self.wins[candidate_number] += 0.5
+            wins[candidate_number] += 0.5
 
-        if self.scheduler.all_fixed():
+        # The early generation might already be complete when the current one
+        # finishes.
+        while self.scheduler.all_fixed():
             self.finish_generation()
             self.generation += 1
-            if self.generation != self.number_of_generations:
+            if self.generation == self.number_of_generations:
+                return
+            if self.early_distribution is None:
                 self.reset_for_new_generation()
+            else:
+                self._promote_early_generation()
+
+        if (self.early_start_proportion is not None and
+            self.early_distribution is None and
+            self.generation + 1 < self.number_of_generations and
+            self.scheduler.count_fixed() >= (
+                self.early_start_proportion *
+                self.samples_per_generation * self.batch_size)):
+            self.start_early_generation()
 
     def process_game_error(self, job, previous_error_count):
         ## If the very first game to return a response gives an error, halt.
@@ -500,6 +634,12 @@ class Cem_tuner(Competition):
         else:
             print >>out, "distribution for generation %d:" % self.generation
         print >>out, self.format_distribution(self.distribution)
+        if self.early_distribution is not None:
+            print >>out
+            print >>out, "generation %d started early" % (self.generation + 1)
+            print >>out, "wins from early samples:\n%s" % self.early_wins
+            print >>out, "provisional distribution:"
+            print >>out, self.format_distribution(self.early_distribution)
 
     def write_short_report(self, out):
         self.write_static_description(out)
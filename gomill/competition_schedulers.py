@@ -10,6 +10,8 @@ All scheduler classes are suitable for pickling.
 
 """
 
+from math import sqrt
+
 class Simple_scheduler(object):
     """Schedule a single sequence of games.
 
@@ -73,14 +75,101 @@ class Simple_scheduler(object):
         self.outstanding = set()
         #self._check_consistent()
 
+    def replay_fix(self, token):
+        """Note that a game's result has been stored, even if not issued.
+
+        This is for replaying results which were stored after the scheduler's
+        state was saved. Any lower tokens which have never been issued are
+        made available for reissue.
+
+        Raises ValueError if the token has already been fixed.
+
+        """
+        if token in self.outstanding:
+            self.outstanding.remove(token)
+        elif token in self.to_reissue:
+            self.to_reissue.remove(token)
+        elif token >= self.next_new:
+            self.to_reissue.update(xrange(self.next_new, token))
+            self.next_new = token + 1
+        else:
+            raise ValueError("token already fixed")
+        self.issued = self.next_new - len(self.to_reissue)
+        self.fixed = self.issued - len(self.outstanding)
+        #self._check_consistent()
+
+
+class Fewest_issued_policy(object):
+    """Scheduling policy: choose the group with the fewest issued games.
+
+    Ties are broken by choosing the smallest group code.
+
+    This is the default policy for Group_scheduler.
+
+    """
+    def choose(self, available):
+        """Choose the group to issue a game from.
+
+        available -- nonempty list of pairs (issue count, group code)
+                     (groups which haven't reached their limit)
+
+        Returns a group code from 'available'.
+
+        """
+        _, group_code = min(available)
+        return group_code
+
+class Uncertainty_policy(object):
+    """Scheduling policy: choose the group whose result is least certain.
+
+    Instantiate with
+      get_results -- function group code -> pair (score, games)
+
+    get_results should return the number of games from the group with a known
+    result, and the number of those won by one side (counting jigos as half a
+    win).
+
+    This chooses the group with the widest confidence interval on its win
+    rate. The width is estimated as the posterior standard deviation from a
+    uniform prior, treating issued games whose results aren't known yet as
+    if they had already narrowed the interval (so that games in progress
+    don't all go to the same group). Ties are broken as for
+    Fewest_issued_policy.
+
+    """
+    def __init__(self, get_results):
+        self.get_results = get_results
+
+    def get_uncertainty(self, group_code, issue_count):
+        """Return the estimated width of a group's confidence interval.
+
+        issue_count -- number of games issued from the group
+
+        """
+        score, games = self.get_results(group_code)
+        p = (score + 1.0) / (games + 2.0)
+        return sqrt(p * (1.0 - p) / (issue_count + 3.0))
+
+    def choose(self, available):
+        """Choose the group to issue a game from.
+
+        See Fewest_issued_policy.choose().
+
+        """
+        _, _, group_code = min(
+            (-self.get_uncertainty(group_code, issue_count),
+             issue_count, group_code)
+            for (issue_count, group_code) in available)
+        return group_code
+
 
 class Group_scheduler(object):
     """Schedule multiple lists of games in parallel.
 
     This schedules for a number of _groups_, each of which may have a limit on
-    the number of games to play. It schedules from the group (of those which
-    haven't reached their limit) with the fewest issued games, with smallest
-    group code breaking ties.
+    the number of games to play. A scheduling policy chooses which group
+    (of those which haven't reached their limit) to issue each game from. By
+    default this is Fewest_issued_policy.
 
     group codes might be ints or short strings
     (any sortable, pickleable and hashable object should do).
@@ -88,16 +177,32 @@ class Group_scheduler(object):
     The issued tokens are pairs (group code, game number), with game numbers
     counting up from 0 independently for each group code.
 
+    The policy isn't pickled: an unpickled Group_scheduler uses the default
+    policy until set_policy() is called.
+
     """
-    def __init__(self):
+    def __init__(self, policy=None):
         self.allocators = {}
         self.limits = {}
+        self.set_policy(policy)
 
     def __getstate__(self):
         return (self.allocators, self.limits)
 
     def __setstate__(self, state):
         (self.allocators, self.limits) = state
+        self.set_policy(None)
+
+    def set_policy(self, policy):
+        """Set the scheduling policy.
+
+        policy -- object with a choose() method like Fewest_issued_policy's,
+                  or None for the default policy.
+
+        """
+        if policy is None:
+            policy = Fewest_issued_policy()
+        self.policy = policy
 
     def set_groups(self, group_specs):
         """Set the groups to be scheduled.
@@ -139,13 +244,21 @@ class Group_scheduler(object):
             ]
         if not available:
             return None, None
-        _, group_code = min(available)
+        group_code = self.policy.choose(available)
         return group_code, self.allocators[group_code].issue()
 
     def fix(self, group_code, game_number):
         """Note that a game's result has been reliably stored."""
         self.allocators[group_code].fix(game_number)
 
+    def replay_fix(self, group_code, game_number):
+        """Note that a game's result has been stored, even if not issued.
+
+        See Simple_scheduler.replay_fix().
+
+        """
+        self.allocators[group_code].replay_fix(game_number)
+
     def rollback(self):
         """Make issued-but-not-fixed tokens available again."""
         for allocator in self.allocators.itervalues():
@@ -156,6 +269,17 @@ class Group_scheduler(object):
         return all(allocator.issued == 0
                    for allocator in self.allocators.itervalues())
 
+    def count_fixed(self, group_code=None):
+        """Return the number of fixed tokens.
+
+        If group_code is specified, counts only tokens from that group.
+
+        """
+        if group_code is not None:
+            return self.allocators[group_code].fixed
+        return sum(allocator.fixed
+                   for allocator in self.allocators.itervalues())
+
     def all_fixed(self):
         """Check whether all groups have reached their limits.
 
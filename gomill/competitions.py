@@ -50,6 +50,9 @@ _player_settings = [
     Setting('startup_gtp_commands', allow_none(interpret_sequence),
             defaultmaker=list),
     Setting('discard_stderr', interpret_bool, default=False),
+    Setting('reuse_process', interpret_bool, default=False),
+    Setting('max_games_per_process', allow_none(interpret_positive_int),
+            default=None),
     ]
 
 class Player_config(Quiet_config):
@@ -66,6 +69,8 @@ class Competition(object):
     This is an abstract base class.
 
     """
+    # Set to True in subclasses which implement replay_game_result().
+    supports_status_journal = False
 
     def __init__(self, competition_code):
         self.competition_code = competition_code
@@ -284,6 +289,9 @@ class Competition(object):
         if config['discard_stderr']:
             player.discard_stderr = True
 
+        player.reuse_process = config['reuse_process']
+        player.max_games_per_process = config['max_games_per_process']
+
         return player
 
 
@@ -353,6 +361,23 @@ class Competition(object):
         """
         raise NotImplementedError
 
+    def replay_game_result(self, response):
+        """Reapply a game result recorded in the ringmaster's status journal.
+
+        response -- game_jobs.Game_job_result
+
+        This is called after set_status(), for results which were received
+        after that status was saved. It must have the same effect on the
+        persistent state as process_game_result().
+
+        Only competitions which set supports_status_journal need to implement
+        this. If it isn't supported, the ringmaster saves the full status
+        after every game.
+
+        """
+        # This is called for the 'show' command, so it mustn't log anything.
+        raise NotImplementedError
+
     def process_game_error(self, job, previous_error_count):
         """Process a report that a job failed.
 
@@ -506,8 +531,15 @@ game_settings = [
     Setting('handicap', allow_none(interpret_int), default=None),
     Setting('handicap_style', interpret_enum('fixed', 'free'), default='fixed'),
     Setting('move_limit', interpret_positive_int, default=1000),
+    Setting('superko_rule',
+            allow_none(interpret_enum('positional', 'situational')),
+            default=None),
     Setting('scorer', interpret_enum('internal', 'players'), default='players'),
     Setting('internal_scorer_handicap_compensation',
             interpret_enum('no', 'full', 'short'), default='full'),
+    Setting('internal_scorer_dead_stones',
+            interpret_enum('no', 'unconditional', 'estimated'), default='no'),
+    Setting('internal_scorer_min_life_area', interpret_positive_int,
+            default=12),
     ]
 
@@ -2,6 +2,7 @@
 
 import datetime
 import os
+import threading
 
 from gomill import gtp_controller
 from gomill import gtp_games
@@ -25,6 +26,8 @@ class Player(object):
       discard_stderr       -- bool (default False)
       cwd                  -- working directory to change to (default None)
       environ              -- maplike of environment variables (default None)
+      reuse_process        -- bool (default False)
+      max_games_per_process -- int or None (default None)
 
     See gtp_controllers.Gtp_controller for an explanation of gtp_aliases.
 
@@ -36,6 +39,11 @@ class Player(object):
     environment variables; use 'environ' to add variables or replace particular
     values.
 
+    If reuse_process is true, the player's engine subprocess is kept running
+    at the end of a game, and used again for the worker's next game involving
+    the same player (see Engine_pool). If max_games_per_process is set, the
+    subprocess is closed after playing that many games.
+
     Players are suitable for pickling.
 
     """
@@ -47,6 +55,8 @@ class Player(object):
         self.discard_stderr = False
         self.cwd = None
         self.environ = None
+        self.reuse_process = False
+        self.max_games_per_process = None
 
     def make_environ(self):
         """Return environment variables to use with the player's subprocess.
@@ -74,8 +84,150 @@ class Player(object):
             result.environ = None
         else:
             result.environ = dict(self.environ)
+        result.reuse_process = self.reuse_process
+        result.max_games_per_process = self.max_games_per_process
         return result
 
+
+class _Pooled_engine(object):
+    """An engine subprocess which can be used for more than one game.
+
+    Public attributes:
+      controller   -- gtp_controller.Gtp_controller
+      spec         -- hashable description of how the engine was started
+      stderr       -- file object or None (to be closed with the engine)
+      games_played -- int
+      gtp_cpu_time -- float or None
+
+    gtp_cpu_time is the engine's cumulative gomill-cpu_time response at the
+    end of the last game it played (0.0 for a new engine; None if unknown).
+
+    """
+    def __init__(self, controller, spec, stderr):
+        self.controller = controller
+        self.spec = spec
+        self.stderr = stderr
+        self.games_played = 0
+        self.gtp_cpu_time = 0.0
+
+    def close(self):
+        """Close the engine (sending 'quit').
+
+        Errors from closing the engine are ignored.
+
+        """
+        self.controller.safe_close()
+        if self.stderr is not None:
+            try:
+                self.stderr.close()
+            except EnvironmentError:
+                pass
+
+class Engine_pool(object):
+    """Idle engine subprocesses, kept for reuse between games.
+
+    Public attributes:
+      engines              -- map player code -> list of _Pooled_engines
+      health_check_timeout -- float (seconds)
+
+    The pool can hold more than one idle engine for each player code (in
+    practice, no more than the number of engines a game can use at once).
+
+    Each worker process has its own pool (see get_engine_pool()).
+
+    """
+    health_check_timeout = 10.0
+
+    def __init__(self):
+        self.engines = {}
+
+    def _check_health(self, engine):
+        """Check that an engine is still responding to GTP commands.
+
+        Returns True if it responds (even with a failure response).
+
+        If there is no response within health_check_timeout seconds, kills the
+        engine.
+
+        """
+        controller = engine.controller
+        timer = threading.Timer(
+            self.health_check_timeout, controller.channel.terminate)
+        timer.setDaemon(True)
+        timer.start()
+        try:
+            try:
+                controller.do_command("protocol_version")
+            except BadGtpResponse:
+                pass
+            except GtpChannelError:
+                return False
+        finally:
+            timer.cancel()
+            timer.join()
+        return True
+
+    def take(self, code, spec):
+        """Remove and return an idle engine for the specified player.
+
+        code -- player code
+        spec -- description of how the engine should have been started
+
+        Returns a _Pooled_engine, or None if there is no suitable engine.
+
+        Checks that the engine is still responding to GTP commands. Closes
+        (and discards) engines which don't respond, or which were started with
+        a different spec.
+
+        """
+        engines = self.engines.get(code)
+        while engines:
+            engine = engines.pop()
+            if not engines:
+                del self.engines[code]
+            if engine.spec == spec and self._check_health(engine):
+                return engine
+            engine.close()
+        return None
+
+    def put(self, code, engine):
+        """Return an idle engine to the pool."""
+        self.engines.setdefault(code, []).append(engine)
+
+    def close_all(self):
+        """Close all idle engines.
+
+        Errors from closing the engines are ignored.
+
+        """
+        for code, engines in sorted(self.engines.items()):
+            for engine in engines:
+                engine.close()
+        self.engines = {}
+
+_engine_pool = None
+
+def get_engine_pool():
+    """Return the Engine_pool for the current process.
+
+    The first time this is called in a process, it creates the pool and
+    arranges for the engines to be closed when the job manager's worker
+    finishes.
+
+    """
+    global _engine_pool
+    if _engine_pool is None:
+        _engine_pool = Engine_pool()
+        job_manager.register_worker_cleanup(_close_engine_pool)
+    return _engine_pool
+
+def _close_engine_pool():
+    global _engine_pool
+    pool = _engine_pool
+    _engine_pool = None
+    pool.close_all()
+
+
 class Game_job_result(object):
     """Information returned after a worker process plays a game.
 
@@ -86,10 +238,14 @@ class Game_job_result(object):
       warnings              -- list of strings
       log_entries           -- list of strings
       engine_descriptions   -- map player code -> Engine_description
+      sgf_content           -- 8-bit string or None (default None)
+
+    sgf_content is set only if the Game_job had return_sgf set.
 
     Game_job_results are suitable for pickling.
 
     """
+    sgf_content = None
 
 class Game_job(object):
     """A game to be played in a worker process.
@@ -112,17 +268,24 @@ class Game_job(object):
       game_data           -- arbitrary pickleable data
       handicap            -- int
       handicap_is_free    -- bool (default False)
+      superko_rule        -- 'positional' or 'situational'
+      time_controls       -- gtp_games.Time_controls
       use_internal_scorer -- bool (default True)
       internal_scorer_handicap_compensation -- 'no' , 'short', or 'full'
                              (default 'no')
+      internal_scorer_dead_stones -- 'no', 'unconditional', or 'estimated'
+                             (default 'no')
+      internal_scorer_min_life_area -- int (default 12)
       sgf_filename        -- filename for the SGF file
       sgf_dirname         -- directory pathname for the SGF file
       void_sgf_dirname    -- directory pathname for the SGF file for void games
       sgf_game_name       -- string to show as SGF Game Name (default game_id)
       sgf_event           -- string to show as SGF EVent
       sgf_note            -- multiline string to put into SGF root comment
+      sgf_move_times      -- bool (default False)
       gtp_log_pathname    -- pathname to use for the GTP log
       stderr_pathname     -- pathname to send players' stderr to
+      return_sgf          -- bool (default False)
 
     The game_id will be returned in the job result, so you can tell which game
     you're getting the result for. It also appears in the SGF file as a comment
@@ -137,6 +300,13 @@ class Game_job(object):
     If sgf_dirname and sgf_filename are set, an SGF file will be written after
     the game is over.
 
+    If sgf_move_times is True, the SGF file records the time each move took
+    (see Gtp_game.make_sgf()).
+
+    If return_sgf is True and sgf_filename is set, the SGF file isn't written;
+    instead its contents are returned in the job result (this is for workers
+    which don't share a filesystem with the job's creator).
+
     If void_sgf_dirname and sgf_filename are set, an SGF file will be written
     for any void games (games which were aborted due to unhandled errors) which
     have at least one move. The leaf directory will be created if necessary.
@@ -156,17 +326,23 @@ class Game_job(object):
     def __init__(self):
         self.handicap = None
         self.handicap_is_free = False
+        self.superko_rule = None
+        self.time_controls = None
         self.sgf_filename = None
         self.sgf_dirname = None
         self.void_sgf_dirname = None
         self.sgf_game_name = None
         self.sgf_event = None
         self.sgf_note = None
+        self.sgf_move_times = False
         self.use_internal_scorer = True
         self.internal_scorer_handicap_compensation = 'no'
+        self.internal_scorer_dead_stones = 'no'
+        self.internal_scorer_min_life_area = 12
         self.game_data = None
         self.gtp_log_pathname = None
         self.stderr_pathname = None
+        self.return_sgf = False
 
     # The code here has to be happy to run in a separate process.
 
@@ -182,6 +358,7 @@ class Game_job(object):
         """
         self._worker_id = worker_id
         self._files_to_close = []
+        self._pooled_engines = {}
         try:
             return self._run()
         finally:
@@ -200,23 +377,48 @@ class Game_job(object):
             stderr_pathname = os.devnull
         else:
             stderr_pathname = self.stderr_pathname
-        if stderr_pathname is not None:
-            stderr = open(stderr_pathname, "a")
-            self._files_to_close.append(stderr)
-        else:
-            stderr = None
         if not self.use_internal_scorer and player.is_reliable_scorer:
             game.allow_scorer(colour)
         if player.allow_claim:
             game.set_claim_allowed(colour)
         env = player.make_environ()
-        env['GOMILL_GAME_ID'] = self.game_id
         if self._worker_id is not None:
             env['GOMILL_SLOT'] = str(self._worker_id)
+        if player.reuse_process:
+            # Untimed games send no time_settings, so an engine which has
+            # played a timed game can't be reused for an untimed one (or the
+            # other way round). Timed games always send fresh time_settings.
+            spec = (tuple(player.cmd_args), player.cwd,
+                    tuple(sorted(env.items())), stderr_pathname,
+                    tuple(sorted(player.gtp_aliases.items())),
+                    tuple((command, tuple(arguments))
+                          for command, arguments
+                          in player.startup_gtp_commands),
+                    self.time_controls is not None)
+            engine = get_engine_pool().take(player.code, spec)
+            if engine is not None:
+                self._pooled_engines[colour] = engine
+                game_controller.set_player_controller(
+                    colour, engine.controller, check_protocol_version=False)
+                if gtp_log_file is not None:
+                    engine.controller.channel.enable_logging(
+                        gtp_log_file, prefix="%s: " % colour)
+                return
+        env['GOMILL_GAME_ID'] = self.game_id
+        if stderr_pathname is not None:
+            stderr = open(stderr_pathname, "a")
+        else:
+            stderr = None
+        if player.reuse_process:
+            self._pooled_engines[colour] = _Pooled_engine(None, spec, stderr)
+        elif stderr is not None:
+            self._files_to_close.append(stderr)
         game_controller.set_player_subprocess(
             colour, player.cmd_args,
             env=env, cwd=player.cwd, stderr=stderr)
         controller = game_controller.get_controller(colour)
+        if player.reuse_process:
+            self._pooled_engines[colour].controller = controller
         controller.set_gtp_aliases(player.gtp_aliases)
         if gtp_log_file is not None:
             controller.channel.enable_logging(
@@ -224,6 +426,55 @@ class Game_job(object):
         for command, arguments in player.startup_gtp_commands:
             game_controller.send_command(colour, command, *arguments)
 
+    def _release_pooled_engines(self, game_controller, game):
+        """Return reusable engines to the pool at the end of a game.
+
+        Adjusts the game result's cpu times for reusable engines (which report
+        cumulative cpu time).
+
+        Returns the set of colours whose players have reusable engines.
+
+        Engines which have had channel errors, or have reached
+        max_games_per_process, are left for close_players().
+
+        """
+        result = set()
+        for colour, engine in sorted(self._pooled_engines.items()):
+            player = {'b' : self.player_b, 'w' : self.player_w}[colour]
+            result.add(colour)
+            cpu_time = game.result.cpu_times[player.code]
+            if colour in game.cpu_time_errors:
+                cpu_time = None
+            if cpu_time is not None and engine.gtp_cpu_time is not None:
+                game.result.cpu_times[player.code] = (
+                    cpu_time - engine.gtp_cpu_time)
+            else:
+                game.result.cpu_times[player.code] = None
+            engine.gtp_cpu_time = cpu_time
+            engine.games_played += 1
+            if engine.controller.channel_is_bad:
+                continue
+            if (player.max_games_per_process is not None and
+                engine.games_played >= player.max_games_per_process):
+                continue
+            game_controller.detach_player(colour)
+            engine.controller.channel.enable_logging(None)
+            get_engine_pool().put(player.code, engine)
+            del self._pooled_engines[colour]
+        return result
+
+    def _close_pooled_engines(self):
+        """Arrange for files belonging to reusable engines to be closed.
+
+        This is for engines which aren't being returned to the pool. The
+        engines themselves are closed by close_players().
+
+        """
+        for engine in self._pooled_engines.values():
+            if engine.stderr is not None:
+                self._files_to_close.append(engine.stderr)
+        self._pooled_engines = {}
+
     def _run(self):
         warnings = []
         log_entries = []
@@ -236,7 +487,13 @@ class Game_job(object):
         except ValueError, e:
             raise job_manager.JobFailed("error creating game: %s" % e)
         if self.use_internal_scorer:
-            game.use_internal_scorer(self.internal_scorer_handicap_compensation)
+            game.use_internal_scorer(self.internal_scorer_handicap_compensation,
+                                     self.internal_scorer_dead_stones,
+                                     self.internal_scorer_min_life_area)
+        if self.superko_rule is not None:
+            game.set_superko_rule(self.superko_rule)
+        if self.time_controls is not None:
+            game.set_time_controls(self.time_controls)
 
         if self.gtp_log_pathname is not None:
             gtp_log_file = open(self.gtp_log_pathname, "w")
@@ -258,6 +515,7 @@ class Game_job(object):
             game.run()
         except (GtpChannelError, BadGtpResponse), e:
             game_controller.close_players()
+            self._close_pooled_engines()
             msg = "aborting game due to error:\n%s" % e
             self._record_void_game(game_controller, game, msg)
             late_error_messages = game_controller.describe_late_errors()
@@ -266,16 +524,19 @@ class Game_job(object):
             raise job_manager.JobFailed(msg)
         if game.result.is_forfeit:
             warnings.append(game.result.detail)
+        reused_colours = self._release_pooled_engines(game_controller, game)
         game_controller.close_players()
+        self._close_pooled_engines()
         ru_cpu_times = game_controller.get_resource_usage_cpu_times()
-        for colour in game.cpu_time_errors:
+        for colour in game.cpu_time_errors | reused_colours:
             del ru_cpu_times[colour]
         game.result.soft_update_cpu_times(ru_cpu_times)
         late_error_messages = game_controller.describe_late_errors()
         if late_error_messages:
             log_entries.append(late_error_messages)
-        self._record_game(game_controller, game)
+        sgf_content = self._record_game(game_controller, game)
         response = Game_job_result()
+        response.sgf_content = sgf_content
         response.game_id = self.game_id
         response.game_result = game.result
         response.warnings = warnings
@@ -312,7 +573,7 @@ class Game_job(object):
         b_player = self.player_b.code
         w_player = self.player_w.code
         notes = []
-        sgf_game = game.make_sgf()
+        sgf_game = game.make_sgf(include_move_times=self.sgf_move_times)
         root = sgf_game.get_root()
         last_node = sgf_game.get_last_node()
         if self.sgf_game_name is not None:
@@ -357,12 +618,21 @@ class Game_job(object):
         return sgf_game
 
     def _record_game(self, game_controller, game):
-        """Record the game in the standard sgf directory."""
-        if self.sgf_dirname is None or self.sgf_filename is None:
-            return
+        """Record the game in the standard sgf directory.
+
+        If return_sgf is set, returns the sgf file contents instead.
+
+        """
+        if self.sgf_filename is None:
+            return None
+        if self.return_sgf:
+            return self._make_sgf(game_controller, game).serialise()
+        if self.sgf_dirname is None:
+            return None
         pathname = os.path.join(self.sgf_dirname, self.sgf_filename)
         sgf_game = self._make_sgf(game_controller, game)
         self._write_sgf(pathname, sgf_game.serialise())
+        return None
 
     def _record_void_game(self, game_controller, game, game_end_message):
         """Record the game in the void sgf directory if it had any moves.
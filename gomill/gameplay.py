@@ -10,6 +10,7 @@ from gomill.utils import *
 from gomill.common import *
 from gomill import boards
 from gomill import handicap_layout
+from gomill import life_and_death
 from gomill import sgf
 
 
@@ -23,7 +24,7 @@ class Game(object):
        board        -- the Board to play on (doesn't have to be empty)
        first_player -- colour (default 'b')
 
-    This enforces a simple ko rule, but no superko rule.
+    This enforces a simple ko rule, and optionally a superko rule.
     It accepts self-capture moves.
     Two consecutive passes end the game.
 
@@ -32,6 +33,7 @@ class Game(object):
       board            -- the Board
       is_over          -- bool
       move_limit       -- int or None
+      superko_rule     -- 'positional', 'situational', or None
       move_count       -- int
 
     Meaningful before the game is over:
@@ -43,22 +45,29 @@ class Game(object):
       seen_resignation -- bool
       seen_claim       -- bool
       seen_forfeit     -- bool
+      seen_time_loss   -- bool
       hit_move_limit   -- bool
       winner           -- colour or None
       forfeit_reason   -- string or None
+      time_loss_reason -- string or None
 
     When is_over is true, exactly one of the other boolean attributes is true.
-    winner is set for seen_resignation, seen_claim, and seen_forfeit, but not
-    for passed_out or hit_move_limit.
+    winner is set for seen_resignation, seen_claim, seen_forfeit, and
+    seen_time_loss, but not for passed_out or hit_move_limit.
 
     move_count is the number of moves already played. Passes are included;
     illegal moves are not.
 
+    If a move is forfeited because it breaks the superko rule, the board is
+    left showing the position after that move.
+
     """
     def __init__(self, board, first_player="b"):
         self.board = board
 
         self.move_limit = None
+        self.superko_rule = None
+        self._superko_history = None
         self.next_player = first_player
 
         self.move_count = 0
@@ -70,9 +79,11 @@ class Game(object):
         self.seen_resignation = False
         self.seen_claim = False
         self.seen_forfeit = False
+        self.seen_time_loss = False
         self.hit_move_limit = False
         self.winner = None
         self.forfeit_reason = None
+        self.time_loss_reason = None
 
         self.game_over_callback = None
 
@@ -86,6 +97,37 @@ class Game(object):
         """
         self.move_limit = move_limit
 
+    def set_superko_rule(self, superko_rule):
+        """Set or clear the superko rule.
+
+        superko_rule -- 'positional', 'situational', or None
+
+        If this isn't called, the superko rule is None (only simple ko is
+        enforced).
+
+        Under the positional rule, a move may not recreate any earlier position
+        in the game (including the starting position). Under the situational
+        rule, a move may not recreate an earlier position with the same player
+        to move.
+
+        Call this before recording any moves.
+
+        """
+        if superko_rule not in (None, 'positional', 'situational'):
+            raise ValueError("unknown superko rule: %s" % superko_rule)
+        self.superko_rule = superko_rule
+        if superko_rule is None:
+            self._superko_history = None
+        else:
+            self._superko_history = set(
+                [self._get_superko_key(self.next_player)])
+
+    def _get_superko_key(self, player_to_move):
+        if self.superko_rule == 'situational':
+            return (self.board.zobrist_hash(), player_to_move)
+        else:
+            return self.board.zobrist_hash()
+
     def set_game_over_callback(self, fn):
         """Specify a function to be called when the game is over.
 
@@ -142,6 +184,20 @@ class Game(object):
         self.forfeit_reason = reason
         self._set_over()
 
+    def record_time_loss_by(self, loser, reason):
+        """Record that a player has lost on time.
+
+        loser  -- colour
+        reason -- string: human-readable explanation
+
+        """
+        if self.is_over:
+            raise GameStateError("game is already over")
+        self.winner = opponent_of(loser)
+        self.seen_time_loss = True
+        self.time_loss_reason = reason
+        self._set_over()
+
     def record_move(self, colour, move):
         """Record that a move or pass has been played.
 
@@ -156,7 +212,8 @@ class Game(object):
         ended.
 
         This method causes the game to end if the move is a second consecutive
-        pass, if the move is illegal, or the move limit is reached.
+        pass, if the move is illegal (including moves forbidden by any superko
+        rule), or the move limit is reached.
 
         The move limit is considered reached if move_limit is set, move_count
         >= move_limit after the move is played, and the game has not been
@@ -182,9 +239,21 @@ class Game(object):
                     colour, "attempted move to occupied point %s" %
                     format_vertex(move))
                 return
+            if self._superko_history is not None:
+                key = self._get_superko_key(opponent_of(colour))
+                if key in self._superko_history:
+                    self.record_forfeit_by(
+                        colour, "attempted move to %s, which repeats an "
+                        "earlier position (%s superko)" %
+                        (format_vertex(move), self.superko_rule))
+                    return
+                self._superko_history.add(key)
         else:
             self.pass_count += 1
             self.simple_ko_point = None
+            if self._superko_history is not None:
+                self._superko_history.add(
+                    self._get_superko_key(opponent_of(colour)))
 
         self.move_count += 1
         self.next_player = opponent_of(colour)
@@ -277,21 +346,28 @@ class Game_score(object):
             return None
 
     @classmethod
-    def from_position(cls, board, komi, handicap_compensation='no', handicap=0):
+    def from_position(cls, board, komi, handicap_compensation='no', handicap=0,
+                      dead_stones='no', min_life_area=12):
         """Instantiate based on a board's area score.
 
         board                 -- boards.Board
         komi                  -- int or float
         handicap_compensation -- 'no' (default), 'short', or 'full'.
         handicap              -- int (default 0)
+        dead_stones           -- 'no' (default), 'unconditional', or
+                                 'estimated'
+        min_life_area         -- int (default 12)
 
-        Assumes all stones are alive.
+        If dead_stones is 'no', assumes all stones are alive. Otherwise
+        removes the stones which life_and_death.find_dead_stones() finds
+        (using dead_stones as the method, and min_life_area) before scoring.
 
         See adjust_score() for details of handicap compensation.
 
         """
         winner, margin = adjust_score(
-            board.area_score(), komi, handicap_compensation, handicap)
+            life_and_death.area_score(board, dead_stones, min_life_area),
+            komi, handicap_compensation, handicap)
         return cls(winner, margin)
 
 
@@ -406,6 +482,9 @@ class Result(object):
             result.sgf_result += "F"
             result.is_forfeit = True
             result.detail = game.forfeit_reason
+        elif game.seen_time_loss:
+            result.sgf_result += "T"
+            result.detail = game.time_loss_reason
         else:
             raise AssertionError
         return result
@@ -488,6 +567,22 @@ class Backend(object):
         """
         raise NotImplementedError
 
+    def request_move(self, colour):
+        """Start asking a player for its move, without waiting for it.
+
+        colour -- player to ask
+
+        Returns an object for the caller of Game_runner.run_stepwise() to wait
+        on, or None.
+
+        This is called only by Game_runner.run_stepwise(), immediately before
+        the corresponding get_move() call.
+
+        There is a default implementation, which does nothing and returns None.
+
+        """
+        return None
+
     def get_move(self, colour):
         """Ask a player for its move.
 
@@ -500,6 +595,8 @@ class Backend(object):
           "forfeit" -- player forfeits; 'detail' is a string explanation
           "resign"  -- player resigns; 'detail' is None
           "claim"   -- player claims the win; 'detail' is None
+          "timeout" -- player has lost on time; 'detail' is a string
+                       explanation
 
         """
         raise NotImplementedError
@@ -566,17 +663,18 @@ class Game_runner(object):
       runner = Game_runner(...)
       runner.set_move_callback(...) [optional]
       runner.set_result_class(...) [optional]
+      runner.set_superko_rule(...) [optional]
       runner.prepare()
       runner.set_handicap(...) [optional]
-      runner.run()
+      runner.run() or runner.run_stepwise()
       runner.make_sgf()
 
     Public attributes, useful after run() has been called:
       result -- Result, or None
 
-    Game_runner enforces a simple ko rule, but no superko rule. It accepts
-    self-capture moves. Two consecutive passes end the game and trigger
-    scoring.
+    Game_runner enforces a simple ko rule, and a superko rule if one is set
+    using set_superko_rule(). It accepts self-capture moves. Two consecutive
+    passes end the game and trigger scoring.
 
     If move_limit is not None, the game ends (with result 'Void') when that
     number of moves (including passes) has been played.
@@ -591,6 +689,7 @@ class Game_runner(object):
         self.board_size = board_size
         self.komi = float(komi)
         self.move_limit = move_limit
+        self.superko_rule = None
         self.after_move_callback = None
         self.result_class = Result
         self.additional_sgf_props = []
@@ -633,6 +732,19 @@ class Game_runner(object):
         """
         self.result_class = cls
 
+    def set_superko_rule(self, superko_rule):
+        """Specify a superko rule to enforce.
+
+        superko_rule -- 'positional', 'situational', or None
+
+        See Game.set_superko_rule() for details. A move which breaks the rule
+        is treated like any other illegal move (the player forfeits the game).
+
+        """
+        if superko_rule not in (None, 'positional', 'situational'):
+            raise ValueError("unknown superko rule: %s" % superko_rule)
+        self.superko_rule = superko_rule
+
     def prepare(self):
         """Perform any initialisation needed by the backend.
 
@@ -690,6 +802,7 @@ class Game_runner(object):
             first_player = 'b'
         game = Game(board, first_player)
         game.set_move_limit(self.move_limit)
+        game.set_superko_rule(self.superko_rule)
         game.set_game_over_callback(self.backend.end_game)
         return game
 
@@ -703,6 +816,8 @@ class Game_runner(object):
             game.record_resignation_by(colour)
         elif action == 'claim':
             game.record_claim_by(colour)
+        elif action == 'timeout':
+            game.record_time_loss_by(colour, detail)
         elif action == 'move':
             move = detail
         else:
@@ -775,6 +890,32 @@ class Game_runner(object):
             self._do_move(game)
         self._set_result(game)
 
+    def run_stepwise(self):
+        """Variant of run() which gives up control while waiting for moves.
+
+        This is a generator. Before each move, it calls the backend's
+        request_move() method; if that returns anything other than None, it
+        yields that value. The caller should resume the generator when the
+        move is available.
+
+        This allows a single thread to run many games at once (see
+        gtp_multiplexing.run_tasks()).
+
+        Behaves in the same way as run() otherwise (including propagating
+        exceptions from the backend's request_move() method).
+
+        """
+        if self._state not in (1, 2):
+            raise GameRunnerStateError
+        game = self._make_game()
+        self._state = 3
+        while not game.is_over:
+            waitable = self.backend.request_move(game.next_player)
+            if waitable is not None:
+                yield waitable
+            self._do_move(game)
+        self._set_result(game)
+
     def get_moves(self):
         """Retrieve a list of the moves played.
 
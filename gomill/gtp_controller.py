@@ -192,6 +192,22 @@ class Gtp_channel(object):
         """
         pass
 
+    def terminate(self):
+        """Forcibly stop the engine, if possible.
+
+        Returns True if the channel supports this, otherwise False.
+
+        This is safe to call from a different thread while another thread is
+        waiting for a response; that thread should then see an error (typically
+        GtpChannelClosed).
+
+        The channel still needs to be closed afterwards.
+
+        There is a default implementation, which does nothing and returns False.
+
+        """
+        return False
+
     def send_command_impl(self, command, arguments):
         raise NotImplementedError
 
@@ -410,6 +426,7 @@ class Subprocess_gtp_channel(Linebased_gtp_channel):
         self.subprocess = p
         self.command_pipe = p.stdin
         self.response_pipe = p.stdout
+        self.is_reaped = False
 
     def send_command_line(self, command):
         try:
@@ -454,6 +471,7 @@ class Subprocess_gtp_channel(Linebased_gtp_channel):
             # Even if there were errors closing the pipes, it's most likely that
             # the subprocesses has exited.
             pid, exit_status, rusage = os.wait4(self.subprocess.pid, 0)
+            self.is_reaped = True
             self.exit_status = exit_status
             self.resource_usage = rusage
         except EnvironmentError, e:
@@ -461,6 +479,21 @@ class Subprocess_gtp_channel(Linebased_gtp_channel):
         if errors:
             raise GtpTransportError("\n".join(errors))
 
+    def terminate(self):
+        """Kill the subprocess (with SIGKILL).
+
+        Does nothing if the channel has already been closed.
+
+        """
+        # Once the subprocess has been waited for, its pid may be reused.
+        if not self.is_reaped:
+            try:
+                os.kill(self.subprocess.pid, signal.SIGKILL)
+            except EnvironmentError:
+                # Most likely it has already exited
+                pass
+        return True
+
 
 class Gtp_controller(object):
     """Implementation of the controller side of the GTP protocol.
@@ -489,6 +522,7 @@ class Gtp_controller(object):
         self.errors_seen = []
         self.channel_is_closed = False
         self.channel_is_bad = False
+        self._pending_command = None
 
     def do_command(self, command, *arguments):
         """Send a command to the engine and return the response.
@@ -536,9 +570,26 @@ class Gtp_controller(object):
         BadGtpResponse.gtp_command) will refer to the underlying command, not
         the alias.
 
+        """
+        self.start_command(command, *arguments)
+        return self.finish_command()
+
+    def start_command(self, command, *arguments):
+        """Send a command to the engine, without waiting for the response.
+
+        This is the first half of do_command(); use finish_command() to
+        retrieve the response.
+
+        Only one command may be outstanding at a time.
+
+        May raise GtpChannelError (with the same message as do_command()) if
+        there is an error sending the command.
+
         """
         if self.channel_is_closed:
             raise StandardError("channel is closed")
+        if self._pending_command is not None:
+            raise StandardError("command already outstanding")
 
         def fix_argument(argument):
             if isinstance(argument, unicode):
@@ -552,40 +603,59 @@ class Gtp_controller(object):
         is_first_command = self.is_first_command
         self.is_first_command = False
 
-        def format_command():
-            desc = "%s" % (" ".join([translated_command] + fixed_arguments))
-            if is_first_command:
-                return "first command (%s)" % desc
-            else:
-                return "'%s'" % desc
+        desc = "%s" % (" ".join([translated_command] + fixed_arguments))
+        if is_first_command:
+            formatted_command = "first command (%s)" % desc
+        else:
+            formatted_command = "'%s'" % desc
 
         try:
-            is_sending = True
             self.channel.send_command(translated_command, fixed_arguments)
-            is_sending = False
+        except GtpChannelError, e:
+            self._describe_channel_error(
+                e, "%s sending %s to %s:\n%s", formatted_command)
+            raise
+        self._pending_command = (
+            translated_command, fixed_arguments, formatted_command)
+
+    def finish_command(self):
+        """Wait for the response to the command sent by start_command().
+
+        Returns the result text from the engine, or raises BadGtpResponse or
+        GtpChannelError, as for do_command().
+
+        """
+        if self._pending_command is None:
+            raise StandardError("no command outstanding")
+        translated_command, fixed_arguments, formatted_command = \
+            self._pending_command
+        self._pending_command = None
+        try:
             is_failure, response = self.channel.get_response()
         except GtpChannelError, e:
-            self.channel_is_bad = True
-            if isinstance(e, GtpTransportError):
-                error_label = "transport error"
-            elif isinstance(e, GtpProtocolError):
-                error_label = "GTP protocol error"
-            else:
-                error_label = "error"
-            if is_sending:
-                msg = "%s sending %s to %s:\n%s"
-            else:
-                msg = "%s reading response to %s from %s:\n%s"
-            e.args = (msg % (error_label, format_command(), self.name, e),)
+            self._describe_channel_error(
+                e, "%s reading response to %s from %s:\n%s",
+                formatted_command)
             raise
         if is_failure:
             raise BadGtpResponse(
                 "failure response from %s to %s:\n%s" %
-                (format_command(), self.name, response),
+                (formatted_command, self.name, response),
                 gtp_command=translated_command, gtp_arguments=fixed_arguments,
                 gtp_error_message=response)
         return response
 
+    def _describe_channel_error(self, e, msg, formatted_command):
+        """Mark the channel as bad, and add context to a GtpChannelError."""
+        self.channel_is_bad = True
+        if isinstance(e, GtpTransportError):
+            error_label = "transport error"
+        elif isinstance(e, GtpProtocolError):
+            error_label = "GTP protocol error"
+        else:
+            error_label = "error"
+        e.args = (msg % (error_label, formatted_command, self.name, e),)
+
     def _known_command(self, command, do_command):
         """Common implementation for known_command and safe_known_command."""
         result = self.known_commands.get(command)
@@ -723,13 +793,14 @@ class Gtp_controller(object):
         engine to exit. Nonzero exit status is not reported as an error.
 
 
-        This will send 'quit' to the engine if the channel is not marked as bad.
-        Any failure response will be set aside.
+        This will send 'quit' to the engine if the channel is not marked as bad
+        (and no command sent by start_command() is outstanding). Any failure
+        response will be set aside.
 
         """
         if self.channel_is_closed:
             return
-        if not self.channel_is_bad:
+        if not self.channel_is_bad and self._pending_command is None:
             try:
                 self.safe_do_command("quit")
             except BadGtpResponse, e:
@@ -898,6 +969,7 @@ class Game_controller(object):
       gc.set_player_subprocess('w', ...) or set_player_controller('w', ...)
       Any combination of:
         gc.send_command(...)
+        gc.start_command(...) and gc.finish_command(...)
         gc.maybe_send_command(...)
         gc.known_command(...)
         higher-level helpers
@@ -1038,6 +1110,33 @@ class Game_controller(object):
         else:
             return controller.do_command(command, *arguments)
 
+    def start_command(self, colour, command, *arguments):
+        """Send a GTP command to one of the players, without waiting.
+
+        This is the first half of send_command(); use finish_command() to
+        retrieve the response.
+
+        This isn't permitted in cautious mode.
+
+        May propagate GtpChannelError.
+
+        """
+        if self.in_cautious_mode:
+            raise StandardError("start_command() used in cautious mode")
+        self.controllers[colour].start_command(command, *arguments)
+
+    def finish_command(self, colour):
+        """Retrieve the response to a command sent by start_command().
+
+        Returns the response as a string.
+
+        Raises BadGtpResponse if the engine returns a failure response.
+
+        May propagate GtpChannelError.
+
+        """
+        return self.controllers[colour].finish_command()
+
     def maybe_send_command(self, colour, command, *arguments):
         """Send the specified GTP command, if supported.
 
@@ -1077,6 +1176,20 @@ class Game_controller(object):
         else:
             return controller.known_command(command)
 
+    def terminate_player(self, colour):
+        """Forcibly stop a player's engine, if possible.
+
+        Returns True if the player's channel supports this (see
+        Gtp_channel.terminate()), otherwise False.
+
+        This is safe to call from a different thread while another thread is
+        waiting for a response from the engine.
+
+        Raises KeyError if the player has not been set.
+
+        """
+        return self.controllers[colour].channel.terminate()
+
     def close_players(self):
         """Close both controllers (if they're open).
 
@@ -1090,6 +1203,26 @@ class Game_controller(object):
             controller.safe_close()
             self.late_errors += controller.retrieve_error_messages()
 
+    def detach_player(self, colour):
+        """Stop managing a player's controller, without closing it.
+
+        Returns the Gtp_controller.
+
+        This is intended for callers which reuse engines between games. After
+        this, close_players() won't close the controller, and
+        get_resource_usage_cpu_times() won't report a time for the player.
+
+        Any error messages which the controller has set aside are moved to the
+        late errors (see describe_late_errors()).
+
+        Raises KeyError if the player has not been set.
+
+        """
+        controller = self.controllers.pop(colour)
+        self.late_errors += controller.retrieve_error_messages()
+        del controller.errors_seen[:]
+        return controller
+
     def describe_late_errors(self):
         """Retrieve the late error messages.
 
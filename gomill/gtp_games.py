@@ -1,10 +1,15 @@
 """Run games between two GTP engines."""
 
+import math
+import threading
+import time
+from array import array
+
 from gomill.utils import *
 from gomill.common import *
 from gomill import gameplay
 from gomill import gtp_controller
-from gomill.gtp_controller import BadGtpResponse
+from gomill.gtp_controller import BadGtpResponse, GtpChannelError
 
 class Game_result(gameplay.Result):
     """Description of a game result.
@@ -17,6 +22,7 @@ class Game_result(gameplay.Result):
       winning_player -- player code or None
       losing_player  -- player code or None
       cpu_times      -- map player code -> float (representing seconds) or None
+      move_times     -- map player code -> Move_times, or None
 
     Call set_players() before using these.
 
@@ -24,12 +30,15 @@ class Game_result(gameplay.Result):
 
     cpu_times are user time + system time.
 
+    move_times is None if per-move timings weren't recorded.
+
     Game_results are suitable for pickling.
 
     """
     def __init__(self):
         gameplay.Result.__init__(self)
         self.game_id = None
+        self.move_times = None
 
     def set_players(self, players):
         """Specify the player-code map.
@@ -53,7 +62,7 @@ class Game_result(gameplay.Result):
         return self.players.get(opponent_of(self.winning_colour))
 
     def __getstate__(self):
-        return (
+        state = (
             self.player_b,
             self.player_w,
             self.winning_colour,
@@ -63,8 +72,18 @@ class Game_result(gameplay.Result):
             self.game_id,
             self.cpu_times,
             )
+        if self.move_times is None:
+            return state
+        return state + (self.move_times,)
 
     def __setstate__(self, state):
+        # move_times is left out of the state if it wasn't recorded (and
+        # results from earlier versions don't have it).
+        if len(state) == 9:
+            self.move_times = state[8]
+            state = state[:8]
+        else:
+            self.move_times = None
         (self.player_b,
          self.player_w,
          self.winning_colour,
@@ -113,6 +132,237 @@ class Game_result(gameplay.Result):
     def __repr__(self):
         return "<Game_result: %s>" % self.describe()
 
+class Move_times(object):
+    """Wall-clock timings for one player's moves in a game.
+
+    Public attributes:
+      genmove_times -- array of floats (seconds)
+      play_times    -- array of floats (seconds)
+
+    genmove_times has an entry for each genmove command sent to the player
+    which received a response (including resignations and forfeits), in
+    order. play_times has an entry for each play command sent to the player
+    (that is, for each of its opponent's moves) which received a response.
+
+    The times are the round-trip times seen by the controller, so they
+    include communication overhead as well as the engine's thinking time.
+
+    Move_times are suitable for pickling (the times are stored as
+    single-precision floats).
+
+    """
+    def __init__(self):
+        self.genmove_times = array('f')
+        self.play_times = array('f')
+
+    def __getstate__(self):
+        return (self.genmove_times.tostring(), self.play_times.tostring())
+
+    def __setstate__(self, state):
+        genmove_s, play_s = state
+        self.genmove_times = array('f', genmove_s)
+        self.play_times = array('f', play_s)
+
+    def __repr__(self):
+        return "<Move_times: %d genmove, %d play>" % (
+            len(self.genmove_times), len(self.play_times))
+
+
+class Time_controls(object):
+    """Description of a game's time limits.
+
+    Instantiate with
+      main_time    -- number (seconds)
+      period_time  -- number (seconds; default 0)
+      period_moves -- int or None (default None)
+      periods      -- int or None (default None)
+      kill_margin  -- number or None (seconds; default 10)
+
+    Instantiation raises ValueError if the parameters are unreasonable.
+
+    Public attributes:
+      style        -- 'absolute', 'canadian', or 'byoyomi'
+      main_time    -- float
+      period_time  -- float
+      period_moves -- int or None
+      periods      -- int or None
+      kill_margin  -- float or None
+
+    Each player has main_time seconds for the whole game. After that, the
+    overtime depends on the style:
+      absolute -- no overtime (period_time must be 0)
+      canadian -- period_moves moves must be played in each period of
+                  period_time seconds
+      byoyomi  -- there are 'periods' periods of period_time seconds; a period
+                  is used up by each move which takes longer than the period
+
+    Set period_moves for Canadian overtime or periods for byo-yomi (not both).
+
+    Only the time taken to respond to genmove commands is charged to the
+    player's clock.
+
+    GTP describes times in whole seconds: main_time and period_time are
+    rounded up when they're sent in time_settings, and the time remaining is
+    rounded down when it's sent in time_left.
+
+    If kill_margin isn't None, an engine which hasn't responded to genmove
+    kill_margin seconds after its time ran out is killed (if the channel
+    supports it), so that a hung engine can't stall the game.
+
+    """
+    def __init__(self, main_time, period_time=0, period_moves=None,
+                 periods=None, kill_margin=10):
+        self.main_time = float(main_time)
+        self.period_time = float(period_time)
+        if period_moves is not None:
+            period_moves = int(period_moves)
+        if periods is not None:
+            periods = int(periods)
+        self.period_moves = period_moves
+        self.periods = periods
+        if kill_margin is not None:
+            kill_margin = float(kill_margin)
+        self.kill_margin = kill_margin
+        if self.main_time < 0 or self.period_time < 0:
+            raise ValueError("negative time")
+        if kill_margin is not None and kill_margin < 0:
+            raise ValueError("negative kill_margin")
+        if period_moves is not None and periods is not None:
+            raise ValueError("both period_moves and periods specified")
+        if period_moves is not None:
+            self.style = 'canadian'
+            if period_moves < 1:
+                raise ValueError("period_moves must be at least 1")
+        elif periods is not None:
+            self.style = 'byoyomi'
+            if periods < 1:
+                raise ValueError("periods must be at least 1")
+        else:
+            self.style = 'absolute'
+            if self.period_time != 0:
+                raise ValueError(
+                    "period_time specified without period_moves or periods")
+        if self.style != 'absolute' and self.period_time == 0:
+            raise ValueError("period_time must be positive for overtime")
+        if self.style == 'absolute' and self.main_time == 0:
+            raise ValueError("no time allowed")
+
+    def describe_overtime(self):
+        """Return a short text description of the overtime.
+
+        Returns a string in the usual form for the SGF OT property, or None
+        if there is no overtime.
+
+        """
+        if self.style == 'canadian':
+            return "%d/%s Canadian" % (
+                self.period_moves, format_float(self.period_time))
+        elif self.style == 'byoyomi':
+            return "%dx%s byo-yomi" % (
+                self.periods, format_float(self.period_time))
+        return None
+
+    def describe(self):
+        """Return a short text description of the time limits."""
+        s = "%ss" % format_float(self.main_time)
+        overtime = self.describe_overtime()
+        if overtime is not None:
+            s += " + %s" % overtime
+        return s
+
+
+class Game_clock(object):
+    """Track one player's remaining time.
+
+    Instantiate with a Time_controls.
+
+    Public attributes for reading:
+      is_out_of_time -- bool
+      in_overtime    -- bool
+
+    """
+    def __init__(self, time_controls):
+        self.time_controls = time_controls
+        self.main_left = time_controls.main_time
+        self.period_left = None
+        self.moves_left = None
+        self.periods_left = None
+        self.in_overtime = False
+        self.is_out_of_time = False
+
+    def get_time_left(self):
+        """Describe the remaining time in the form used by GTP time_left.
+
+        Returns a pair (seconds, stones)
+
+        stones is 0 during main time. In overtime, it's the number of moves
+        remaining in the current period for Canadian overtime, or the number
+        of periods remaining for byo-yomi (as for KGS).
+
+        """
+        if not self.in_overtime:
+            return self.main_left, 0
+        if self.time_controls.style == 'canadian':
+            return self.period_left, self.moves_left
+        else:
+            return self.time_controls.period_time, self.periods_left
+
+    def get_move_allowance(self):
+        """Return the longest time the next move could take without loss."""
+        tc = self.time_controls
+        if tc.style == 'absolute':
+            return self.main_left
+        if not self.in_overtime:
+            if tc.style == 'canadian':
+                return self.main_left + tc.period_time
+            else:
+                return self.main_left + tc.periods * tc.period_time
+        if tc.style == 'canadian':
+            return self.period_left
+        else:
+            return self.periods_left * tc.period_time
+
+    def record_move_time(self, elapsed):
+        """Charge the time taken for a move to the clock.
+
+        elapsed -- float (seconds)
+
+        Returns False (and sets is_out_of_time) if the player has run out of
+        time, otherwise True.
+
+        """
+        tc = self.time_controls
+        if not self.in_overtime:
+            if elapsed <= self.main_left:
+                self.main_left -= elapsed
+                return True
+            elapsed -= self.main_left
+            self.main_left = 0.0
+            if tc.style == 'absolute':
+                self.is_out_of_time = True
+                return False
+            self.in_overtime = True
+            self.period_left = tc.period_time
+            self.moves_left = tc.period_moves
+            self.periods_left = tc.periods
+        if tc.style == 'canadian':
+            if elapsed > self.period_left:
+                self.is_out_of_time = True
+                return False
+            self.period_left -= elapsed
+            self.moves_left -= 1
+            if self.moves_left == 0:
+                self.period_left = tc.period_time
+                self.moves_left = tc.period_moves
+        else:
+            periods_used = int(elapsed // tc.period_time)
+            if periods_used >= self.periods_left:
+                self.is_out_of_time = True
+                return False
+            self.periods_left -= periods_used
+        return True
+
+
 class Gtp_game_score(gameplay.Game_score):
     """Description of the scoring of a passed-out game.
 
@@ -187,17 +437,102 @@ class _Gtp_backend(gameplay.Backend):
         self.allowed_scorers = []
         self.internal_scorer = False
         self.handicap_compensation = "no"
+        self.dead_stones = "no"
+        self.min_life_area = 12
         self.handicap = None
+        self.pending_move = None
+        self.move_times = {'b' : Move_times(), 'w' : Move_times()}
+        self.time_controls = None
+        self.clocks = None
+        self.uses_kgs_time_settings = {'b' : False, 'w' : False}
+        self.watchdog = None
+        self.watchdog_fired = False
 
     def start_new_game(self, board_size, komi):
-        """Reset the engines' GTP game state (board size, contents, komi)."""
+        """Reset the engines' GTP game state (board size, contents, komi).
+
+        Also sends the time settings, if there are time controls.
+
+        """
         assert board_size == self.board_size
         assert komi == self.komi
+        self.move_times = {'b' : Move_times(), 'w' : Move_times()}
         self.gc.set_cautious_mode(False)
         for colour in "b", "w":
             self.gc.send_command(colour, "boardsize", str(board_size))
             self.gc.send_command(colour, "clear_board")
             self.gc.send_command(colour, "komi", str(komi))
+        if self.time_controls is None:
+            self.clocks = None
+        else:
+            self.clocks = {'b' : Game_clock(self.time_controls),
+                           'w' : Game_clock(self.time_controls)}
+            for colour in "b", "w":
+                self._send_time_settings(colour)
+
+    def _send_time_settings(self, colour):
+        # Failure responses are ignored: the clock is enforced regardless.
+        tc = self.time_controls
+        # GTP times are whole seconds. Round up, so that (for example) a
+        # fractional main time isn't announced as 0.
+        main_time = str(int(math.ceil(tc.main_time)))
+        period_time = str(int(math.ceil(tc.period_time)))
+        self.uses_kgs_time_settings[colour] = False
+        if tc.style == 'byoyomi':
+            if self.gc.known_command(colour, "kgs-time_settings"):
+                self.gc.maybe_send_command(
+                    colour, "kgs-time_settings", "byoyomi",
+                    main_time, period_time, str(tc.periods))
+                self.uses_kgs_time_settings[colour] = True
+                return
+            # Plain GTP has no byo-yomi; one-move Canadian periods are the
+            # nearest equivalent.
+            stones = "1"
+        elif tc.style == 'canadian':
+            stones = str(tc.period_moves)
+        else:
+            stones = "0"
+        self.gc.maybe_send_command(
+            colour, "time_settings", main_time, period_time, stones)
+
+    def _send_time_left(self, colour):
+        if self.clocks is None:
+            return
+        seconds, stones = self.clocks[colour].get_time_left()
+        if (stones != 0 and self.time_controls.style == 'byoyomi' and
+            not self.uses_kgs_time_settings[colour]):
+            # The engine was told about one-move Canadian periods, so it
+            # should see one move left, not the number of periods.
+            stones = 1
+        self.gc.maybe_send_command(
+            colour, "time_left", colour, str(int(seconds)), str(stones))
+
+    def _start_watchdog(self, colour):
+        """Arrange to kill the player's engine if it runs out of time."""
+        self.watchdog_fired = False
+        if self.clocks is None or self.time_controls.kill_margin is None:
+            return
+        timeout = (self.clocks[colour].get_move_allowance() +
+                   self.time_controls.kill_margin)
+        self.watchdog = threading.Timer(timeout, self._kill_player, (colour,))
+        self.watchdog.setDaemon(True)
+        self.watchdog.start()
+
+    def _kill_player(self, colour):
+        # Runs in the watchdog thread
+        self.watchdog_fired = self.gc.terminate_player(colour)
+
+    def _stop_watchdog(self):
+        """Cancel the watchdog, if any.
+
+        Returns True if it has killed an engine.
+
+        """
+        if self.watchdog is not None:
+            self.watchdog.cancel()
+            self.watchdog.join()
+            self.watchdog = None
+        return self.watchdog_fired
 
     def end_game(self):
         self.gc.set_cautious_mode(True)
@@ -236,18 +571,57 @@ class _Gtp_backend(gameplay.Backend):
                 "bad response from fixed_handicap command "
                 "to %s: %s" % (self.gc.players[colour], vertices))
 
-    def get_move(self, colour):
+    def _get_genmove_command(self, colour):
         if (self.claim_allowed[colour] and
             self.gc.known_command(colour, "gomill-genmove_ex")):
-            genmove_command = ["gomill-genmove_ex", colour, "claim"]
-            may_claim = True
+            return ["gomill-genmove_ex", colour, "claim"], True
         else:
-            genmove_command = ["genmove", colour]
-            may_claim = False
+            return ["genmove", colour], False
+
+    def request_move(self, colour):
+        genmove_command, may_claim = self._get_genmove_command(colour)
+        self._send_time_left(colour)
+        started = time.time()
+        self._start_watchdog(colour)
+        try:
+            self.gc.start_command(colour, *genmove_command)
+        except GtpChannelError:
+            self._stop_watchdog()
+            raise
+        self.pending_move = (colour, may_claim, started)
+        return self.gc.get_controller(colour).channel
+
+    def get_move(self, colour):
         try:
-            raw_move = self.gc.send_command(colour, *genmove_command)
+            if self.pending_move is not None:
+                pending_colour, may_claim, started = self.pending_move
+                self.pending_move = None
+                assert pending_colour == colour
+                raw_move = self.gc.finish_command(colour)
+            else:
+                genmove_command, may_claim = self._get_genmove_command(colour)
+                self._send_time_left(colour)
+                started = time.time()
+                self._start_watchdog(colour)
+                raw_move = self.gc.send_command(colour, *genmove_command)
         except BadGtpResponse, e:
+            self._stop_watchdog()
+            # gtp_command is None for low-level errors in cautious mode
+            if e.gtp_command is not None:
+                self.move_times[colour].genmove_times.append(
+                    time.time() - started)
             return 'forfeit', str(e)
+        except GtpChannelError:
+            if not self._stop_watchdog():
+                raise
+            return 'timeout', ("out of time: engine killed after %.1f seconds"
+                               % (time.time() - started))
+        self._stop_watchdog()
+        elapsed = time.time() - started
+        self.move_times[colour].genmove_times.append(elapsed)
+        if (self.clocks is not None and
+            not self.clocks[colour].record_move_time(elapsed)):
+            return 'timeout', "out of time"
         move_s = raw_move.lower()
         if move_s == "resign":
             return 'resign', None
@@ -268,8 +642,10 @@ class _Gtp_backend(gameplay.Backend):
 
     def notify_move(self, colour, move):
         vertex = format_vertex(move)
+        started = time.time()
         try:
             self.gc.send_command(colour, "play", opponent_of(colour), vertex)
+            self.move_times[colour].play_times.append(time.time() - started)
         except BadGtpResponse, e:
             if e.gtp_error_message == "illegal move":
                 return 'reject', ("%s claims move %s is illegal"
@@ -328,7 +704,8 @@ class _Gtp_backend(gameplay.Backend):
     def score_game(self, board):
         if self.internal_scorer:
             game_score = Gtp_game_score.from_position(
-                board, self.komi, self.handicap_compensation, self.handicap)
+                board, self.komi, self.handicap_compensation, self.handicap,
+                self.dead_stones, self.min_life_area)
         else:
             game_score = self._score_game_gtp()
         return game_score
@@ -349,10 +726,12 @@ class Gtp_game(object):
         game.set_game_id(...)
         game.use_internal_scorer() or game.allow_scorer(...)
         game.set_claim_allowed(...)
+        game.set_superko_rule(...)
+        game.set_time_controls(...)
         game.set_move_callback(...)
       game.prepare()
       game.set_handicap(...) [optional]
-      game.run()
+      game.run() or game.run_stepwise()
       Any combination of:
         game.get_moves()
         game.describe_scoring()
@@ -406,20 +785,30 @@ class Gtp_game(object):
         """
         self.game_id = str(game_id)
 
-    def use_internal_scorer(self, handicap_compensation='no'):
+    def use_internal_scorer(self, handicap_compensation='no',
+                            dead_stones='no', min_life_area=12):
         """Set the scoring method to internal.
 
         handicap_compensation -- 'no' (default), 'short', or 'full'.
+        dead_stones           -- 'no' (default), 'unconditional', or
+                                 'estimated'
+        min_life_area         -- int (default 12)
 
-        The internal scorer uses area score, assuming all stones alive.
-        See gameplay.score_game() for details.
+        The internal scorer uses area score. If dead_stones is 'no' it assumes
+        all stones are alive; otherwise it first removes the stones found by
+        life_and_death.find_dead_stones(). See Game_score.from_position() for
+        details.
 
         """
         self.backend.internal_scorer = True
         if handicap_compensation not in ('no', 'short', 'full'):
             raise ValueError("bad handicap_compensation value: %s" %
                              handicap_compensation)
+        if dead_stones not in ('no', 'unconditional', 'estimated'):
+            raise ValueError("bad dead_stones value: %s" % dead_stones)
         self.backend.handicap_compensation = handicap_compensation
+        self.backend.dead_stones = dead_stones
+        self.backend.min_life_area = min_life_area
 
     def allow_scorer(self, colour):
         """Allow the specified player to score the game.
@@ -440,6 +829,36 @@ class Gtp_game(object):
         """
         self.backend.claim_allowed[colour] = bool(b)
 
+    def set_superko_rule(self, superko_rule):
+        """Specify a superko rule to enforce.
+
+        superko_rule -- 'positional', 'situational', or None
+
+        A player which makes a move forbidden by the rule forfeits the game.
+
+        See gameplay.Game.set_superko_rule() for details.
+
+        """
+        self.game_runner.set_superko_rule(superko_rule)
+
+    def set_time_controls(self, time_controls):
+        """Specify time limits to enforce.
+
+        time_controls -- Time_controls or None
+
+        The engines are told the limits using the GTP time_settings command
+        (or kgs-time_settings for byo-yomi, if the engine supports it), and
+        their remaining time using time_left before each genmove. Failure
+        responses to these commands are ignored.
+
+        A player which runs out of time loses the game (the SGF result is
+        like 'B+T').
+
+        See Time_controls for details, including how hung engines are killed.
+
+        """
+        self.backend.time_controls = time_controls
+
     def set_move_callback(self, fn):
         """Specify a callback function to be called after every move.
 
@@ -505,12 +924,34 @@ class Gtp_game(object):
 
         """
         self.game_runner.run()
+        self._set_result()
+
+    def run_stepwise(self):
+        """Variant of run() which gives up control while engines are thinking.
+
+        This is a generator. After sending each genmove command, it yields the
+        Gtp_channel which will carry the response. The caller should resume
+        the generator when the response can be read without waiting.
+
+        gtp_multiplexing.run_tasks() can run many such generators at once.
+
+        Otherwise behaves in the same way as run().
+
+        """
+        for channel in self.game_runner.run_stepwise():
+            yield channel
+        self._set_result()
+
+    def _set_result(self):
         self.result = self.game_runner.result
         self.result.set_players(self.game_controller.players)
         self.result.game_id = self.game_id
         cpu_times, self.cpu_time_errors = \
             self.game_controller.get_gtp_cpu_times()
         self.result.soft_update_cpu_times(cpu_times)
+        self.result.move_times = dict(
+            (self.game_controller.players[colour], move_times)
+            for colour, move_times in self.backend.move_times.iteritems())
 
     def get_moves(self):
         """Retrieve a list of the moves played.
@@ -550,20 +991,49 @@ class Gtp_game(object):
         """
         return describe_scoring(self.result, self.get_game_score())
 
-    def make_sgf(self):
+    def get_move_times(self):
+        """Retrieve per-move wall-clock timings.
+
+        Returns a dict colour -> Move_times.
+
+        This is available even if the game didn't complete.
+
+        """
+        return self.backend.move_times
+
+    def make_sgf(self, include_move_times=False):
         """Return an SGF description of the game.
 
+        include_move_times -- bool (default False)
+
         Returns an Sgf_game object.
 
         This adds the following to the result of Game_runner.make_sgf:
           PB PW
           GN     (if the game_id is set)
+          TM OT  (if there are time controls)
+          MT     (on each move node, if include_move_times is true)
+
+        MT is a private property giving the time the player took to respond to
+        the genmove command for that move, in seconds.
 
         It also adds the following to the last node's comment:
           describe_scoring() output
 
         """
         sgf_game = self.game_runner.make_sgf()
+        if include_move_times:
+            # The nth move by each colour was the response to its nth genmove
+            move_counts = {'b' : 0, 'w' : 0}
+            for node in sgf_game.get_main_sequence()[1:]:
+                colour, _ = node.get_move()
+                if colour is None:
+                    continue
+                genmove_times = self.backend.move_times[colour].genmove_times
+                i = move_counts[colour]
+                move_counts[colour] += 1
+                if i < len(genmove_times):
+                    node.set('MT', "%.3f" % genmove_times[i])
         root = sgf_game.get_root()
         for colour, prop in (('b', 'PB'), ('w', 'PW')):
             ed = self.game_controller.engine_descriptions[colour]
@@ -571,6 +1041,12 @@ class Gtp_game(object):
                            self.game_controller.players[colour])
         if self.game_id:
             root.set('GN', self.game_id)
+        time_controls = self.backend.time_controls
+        if time_controls is not None:
+            root.set('TM', time_controls.main_time)
+            overtime = time_controls.describe_overtime()
+            if overtime is not None:
+                root.set('OT', overtime)
         last_node = sgf_game.get_last_node()
         if self.result is not None:
             last_node.add_comment_text(self.describe_scoring())
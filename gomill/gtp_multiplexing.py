@@ -0,0 +1,196 @@
+"""Run many GTP games at once from a single process.
+
+This uses non-blocking pipes and select(), so each game doesn't need its own
+process or thread.
+
+"""
+
+import collections
+import errno
+import fcntl
+import os
+import re
+import select
+
+from gomill import gtp_controller
+from gomill.gtp_controller import (
+    GtpChannelError, GtpTransportError, Gtp_controller)
+
+_non_whitespace_re = re.compile(r"\S")
+
+class Nonblocking_subprocess_gtp_channel(
+    gtp_controller.Subprocess_gtp_channel):
+    """Variant of Subprocess_gtp_channel which can wait without blocking.
+
+    Instantiate as for Subprocess_gtp_channel.
+
+    This reads the engine's responses into a buffer. Use fileno() and
+    read_available() with select() to fill the buffer, and response_is_ready()
+    to find out when get_response() can be called without blocking.
+
+    It's still fine to call get_response() at any time; it will block until a
+    complete response is available.
+
+    """
+    def __init__(self, command, stderr=None, cwd=None, env=None):
+        gtp_controller.Subprocess_gtp_channel.__init__(
+            self, command, stderr=stderr, cwd=cwd, env=env)
+        self.response_fd = self.response_pipe.fileno()
+        flags = fcntl.fcntl(self.response_fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.response_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.buffer = ""
+        self.seen_eof = False
+        self.read_error = None
+
+    def fileno(self):
+        """Return the file descriptor to select() on."""
+        return self.response_fd
+
+    def read_available(self):
+        """Read whatever the engine has sent, without blocking.
+
+        Doesn't raise exceptions; errors are reported by get_response().
+
+        """
+        if self.seen_eof:
+            return
+        try:
+            data = os.read(self.response_fd, 65536)
+        except EnvironmentError, e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return
+            self.read_error = str(e)
+            self.seen_eof = True
+            return
+        if data:
+            self.buffer += data
+        else:
+            self.seen_eof = True
+
+    def response_is_ready(self):
+        """Check whether get_response() can be called without blocking."""
+        if self.seen_eof:
+            return True
+        if not self.buffer:
+            return False
+        if (self.is_first_response and
+            self.buffer[0] not in (' ', '\t', '\r', '\n', '#', '=', '?')):
+            # get_response() will report a protocol error
+            return True
+        # A response ends with an empty line.
+        s = gtp_controller._remove_response_controls_re.sub("", self.buffer)
+        m = _non_whitespace_re.search(s)
+        if m is None:
+            return False
+        return s.find("\n\n", m.start()) != -1
+
+    def _wait_for_data(self):
+        try:
+            select.select([self.response_fd], [], [])
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise GtpTransportError(str(e))
+        self.read_available()
+
+    def get_response_line(self):
+        while True:
+            i = self.buffer.find("\n")
+            if i != -1:
+                line = self.buffer[:i+1]
+                self.buffer = self.buffer[i+1:]
+                return line
+            if self.read_error is not None:
+                raise GtpTransportError(self.read_error)
+            if self.seen_eof:
+                line = self.buffer
+                self.buffer = ""
+                return line
+            self._wait_for_data()
+
+    def get_response_byte(self):
+        while True:
+            if self.buffer:
+                byte = self.buffer[0]
+                self.buffer = self.buffer[1:]
+                return byte
+            if self.read_error is not None:
+                raise GtpTransportError(self.read_error)
+            if self.seen_eof:
+                return ""
+            self._wait_for_data()
+
+
+def set_player_subprocess(game_controller, colour, command,
+                          check_protocol_version=True, **kwargs):
+    """Variant of Game_controller.set_player_subprocess().
+
+    This uses a Nonblocking_subprocess_gtp_channel, so that the player can
+    take part in games run by run_tasks().
+
+    """
+    player_code = game_controller.players[colour]
+    try:
+        channel = Nonblocking_subprocess_gtp_channel(command, **kwargs)
+    except GtpChannelError, e:
+        raise GtpChannelError(
+            "error starting subprocess for player %s:\n%s" %
+            (player_code, e))
+    controller = Gtp_controller(channel, "player %s" % player_code)
+    game_controller.set_player_controller(
+        colour, controller, check_protocol_version)
+
+
+def run_tasks(tasks):
+    """Run generator-based tasks concurrently, in a single thread.
+
+    tasks -- iterable of generators (eg, from Gtp_game.run_stepwise())
+
+    Each task may yield Nonblocking_subprocess_gtp_channels; the task is
+    resumed when the channel has a complete response available. If a task
+    yields an object without a fileno() method (eg, a channel to an in-process
+    engine), it is resumed without waiting.
+
+    Returns when all the tasks have finished.
+
+    Propagates any exception raised by a task; the remaining tasks are closed
+    (so the caller should normally catch exceptions inside each task).
+
+    Uses select(), so can't manage more than about 1000 channels at once.
+
+    """
+    ready = collections.deque(tasks)
+    waiting = {}
+    try:
+        while ready or waiting:
+            for i in xrange(len(ready)):
+                task = ready.popleft()
+                try:
+                    waitable = task.next()
+                except StopIteration:
+                    continue
+                if (not hasattr(waitable, 'fileno') or
+                    waitable.response_is_ready()):
+                    ready.append(task)
+                else:
+                    waiting[waitable.fileno()] = (waitable, task)
+            if not waiting:
+                continue
+            # If some tasks are ready, just poll.
+            timeout = 0 if ready else None
+            try:
+                readable, _, _ = select.select(waiting.keys(), [], [], timeout)
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd in readable:
+                channel, task = waiting[fd]
+                channel.read_available()
+                if channel.response_is_ready():
+                    del waiting[fd]
+                    ready.append(task)
+    finally:
+        for task in ready:
+            task.close()
+        for channel, task in waiting.values():
+            task.close()
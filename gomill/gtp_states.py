@@ -136,6 +136,25 @@ class Move_generator_result(object):
         self.cookie = None
 
 
+class _Undo_record(object):
+    """Information needed to take back a move in the move history.
+
+    Public attributes:
+      played_on_board    -- bool (false for a pass)
+      previous_ko        -- pair (simple_ko_point, simple_ko_player)
+      added_superko_keys -- list of keys added to the superko history
+
+    The board itself records the stones to restore (see Board.undo()).
+
+    """
+    __slots__ = ('played_on_board', 'previous_ko', 'added_superko_keys')
+
+    def __init__(self, played_on_board, previous_ko, added_superko_keys):
+        self.played_on_board = played_on_board
+        self.previous_ko = previous_ko
+        self.added_superko_keys = added_superko_keys
+
+
 class Gtp_state(object):
     """Manage the stateful part of the GTP engine protocol.
 
@@ -151,6 +170,7 @@ class Gtp_state(object):
       move history
       komi
       simple ko ban
+      superko history (if a superko rule is set)
 
 
     Instantiate with a _move generator function_ and a list of acceptable board
@@ -161,7 +181,12 @@ class Gtp_state(object):
     Move_generator_result. It must not modify data passed in the game_state.
 
     If the move generator returns an occupied point, Gtp_state will report a GTP
-    error. Gtp_state does not enforce any ko rule. It permits self-captures.
+    error. Gtp_state does not enforce the simple ko rule. It permits
+    self-captures.
+
+    If a superko rule is set using set_superko_rule(), Gtp_state rejects 'play'
+    commands which break it as illegal moves, and reports a GTP error if the
+    move generator returns a move which breaks it.
 
     """
 
@@ -173,6 +198,7 @@ class Gtp_state(object):
             'w' : (None, None),
             }
         self.move_generator = move_generator
+        self.superko_rule = None
         if acceptable_sizes is None:
             self.acceptable_sizes = set((19,))
             self.board_size = 19
@@ -191,17 +217,139 @@ class Gtp_state(object):
         self.history_base = boards.Board(self.board_size)
         # list of History_move objects
         self.move_history = []
+        # set of superko keys for the positions in the move history
+        self.superko_history = set()
+        # list of _Undo_records, parallel to move_history
+        self._undo_records = []
+
+    def set_superko_rule(self, superko_rule):
+        """Set or clear the superko rule.
+
+        superko_rule -- 'positional', 'situational', or None
+
+        See gameplay.Game.set_superko_rule() for the meaning of the rules. The
+        history base counts as an earlier position.
+
+        """
+        if superko_rule not in (None, 'positional', 'situational'):
+            raise ValueError("unknown superko rule: %s" % superko_rule)
+        self.superko_rule = superko_rule
+        self._replay_moves(self.move_history)
+
+    def _get_superko_key(self, board, player_to_move):
+        if self.superko_rule == 'situational':
+            return (board.zobrist_hash(), player_to_move)
+        else:
+            return board.zobrist_hash()
+
+    def _record_superko_position(self, colour):
+        """Add the current position to the superko history.
+
+        colour -- the player who has just moved (or passed)
+
+        Returns False if the position breaks the superko rule.
+
+        Sets self._added_superko_keys to a list of the keys which were added
+        to the superko history.
+
+        """
+        self._added_superko_keys = added = []
+        if self.superko_rule is None:
+            return True
+        if not self.move_history:
+            key = self._get_superko_key(self.history_base, colour)
+            if key not in self.superko_history:
+                self.superko_history.add(key)
+                added.append(key)
+        key = self._get_superko_key(self.board, opponent_of(colour))
+        if key in self.superko_history:
+            return False
+        self.superko_history.add(key)
+        added.append(key)
+        return True
+
+    def _append_history_move(self, history_move, played_on_board):
+        """Add a move to the move history, recording how to undo it.
+
+        played_on_board -- bool: the move was played with record_undo set
+
+        Call this after playing the move (or pass) and updating the ko and
+        superko state; pass the previous ko state in self._previous_ko.
+
+        """
+        self._undo_records.append(_Undo_record(
+            played_on_board, self._previous_ko, self._added_superko_keys))
+        self.move_history.append(history_move)
+
+    def _play_move(self, colour, move):
+        """Play a move and update the ko state.
+
+        Doesn't update the move history.
+
+        Raises ValueError, leaving the board unchanged, if the move is illegal.
+
+        """
+        row, col = move
+        self._previous_ko = (self.simple_ko_point, self.simple_ko_player)
+        simple_ko_point = self.board.play(row, col, colour, record_undo=True)
+        if not self._record_superko_position(colour):
+            self.board.undo()
+            self.superko_history.difference_update(self._added_superko_keys)
+            raise ValueError
+        self.simple_ko_point = simple_ko_point
+        self.simple_ko_player = opponent_of(colour)
+
+    def _play_pass(self, colour):
+        """Record a pass in the ko state.
+
+        Doesn't update the move history.
+
+        """
+        self._previous_ko = (self.simple_ko_point, self.simple_ko_player)
+        self.simple_ko_point = None
+        self._record_superko_position(colour)
+
+    def _undo_moves(self, count):
+        """Take back the last 'count' moves from the move history.
+
+        Returns False, without changing anything, if the board can't be
+        updated incrementally (for example, if the board was changed
+        directly); the caller should replay the history instead.
+
+        """
+        records = self._undo_records
+        if len(records) != len(self.move_history):
+            return False
+        # Every move in the history should have exactly one entry in the
+        # board's undo log.
+        played_count = sum(1 for record in records if record.played_on_board)
+        if played_count != self.board.count_undoable_moves():
+            return False
+        for i in xrange(count):
+            record = records.pop()
+            self.move_history.pop()
+            if record.played_on_board:
+                self.board.undo()
+            self.simple_ko_point, self.simple_ko_player = record.previous_ko
+            self.superko_history.difference_update(record.added_superko_keys)
+        return True
 
     def set_history_base(self, board):
         """Change the history base to a new position.
 
         Takes ownership of 'board'.
 
-        Clears the move history.
+        Clears the move history, and sets the current position to the new
+        history base.
 
         """
         self.history_base = board
+        self.board = board.copy()
+        self.simple_ko_point = None
+        self.simple_ko_player = None
         self.move_history = []
+        self.superko_history = set()
+        self._undo_records = []
 
     def reset_to_moves(self, history_moves):
         """Reset to history base and play the specified moves.
@@ -213,21 +361,56 @@ class Gtp_state(object):
 
         Raises ValueError if there is an invalid move in the list.
 
+        If 'history_moves' is a prefix of the current move history (and the
+        history base hasn't changed since it was set up), this takes back the
+        extra moves rather than replaying the whole history.
+
         """
+        n = len(history_moves)
+        if (n <= len(self.move_history) and
+            all(new.colour == old.colour and new.move == old.move
+                for (new, old) in zip(history_moves, self.move_history)) and
+            self._undo_moves(len(self.move_history) - n)):
+            self.move_history = history_moves
+            return
+        self._replay_moves(history_moves)
+
+    def _replay_moves(self, history_moves):
+        """Implementation of reset_to_moves() which always replays."""
         self.board = self.history_base.copy()
         simple_ko_point = None
         simple_ko_player = None
+        superko_history = set()
+        undo_records = []
+        if self.superko_rule is not None and history_moves:
+            superko_history.add(self._get_superko_key(
+                self.history_base, history_moves[0].colour))
         for history_move in history_moves:
+            previous_ko = (simple_ko_point, simple_ko_player)
             if history_move.is_pass():
-                self.simple_ko_point = None
-                continue
-            row, col = history_move.move
-            # Propagates ValueError if the move is bad
-            simple_ko_point = self.board.play(row, col, history_move.colour)
-            simple_ko_player = opponent_of(history_move.colour)
+                simple_ko_point = None
+            else:
+                row, col = history_move.move
+                # Propagates ValueError if the move is bad
+                simple_ko_point = self.board.play(
+                    row, col, history_move.colour, record_undo=True)
+                simple_ko_player = opponent_of(history_move.colour)
+            added_superko_keys = []
+            if self.superko_rule is not None:
+                if not undo_records:
+                    added_superko_keys.extend(superko_history)
+                key = self._get_superko_key(
+                    self.board, opponent_of(history_move.colour))
+                if key not in superko_history:
+                    superko_history.add(key)
+                    added_superko_keys.append(key)
+            undo_records.append(_Undo_record(
+                not history_move.is_pass(), previous_ko, added_superko_keys))
         self.simple_ko_point = simple_ko_point
         self.simple_ko_player = simple_ko_player
+        self.superko_history = superko_history
         self.move_history = history_moves
+        self._undo_records = undo_records
 
     def set_komi(self, f):
         max_komi = 625.0
@@ -347,16 +530,14 @@ class Gtp_state(object):
         colour = gtp_engine.interpret_colour(colour_s)
         move = gtp_engine.interpret_vertex(vertex_s, self.board_size)
         if move is None:
-            self.simple_ko_point = None
-            self.move_history.append(History_move(colour, None))
+            self._play_pass(colour)
+            self._append_history_move(History_move(colour, None), False)
             return
-        row, col = move
         try:
-            self.simple_ko_point = self.board.play(row, col, colour)
-            self.simple_ko_player = opponent_of(colour)
+            self._play_move(colour, move)
         except ValueError:
             raise GtpError("illegal move")
-        self.move_history.append(History_move(colour, move))
+        self._append_history_move(History_move(colour, move), True)
 
     def handle_showboard(self, args):
         return "\n%s\n" % ascii_boards.render_board(self.board)
@@ -389,20 +570,22 @@ class Gtp_state(object):
             return 'resign'
         if generated.pass_move:
             if not for_regression:
-                self.move_history.append(History_move(
-                    colour, None, generated.comments, generated.cookie))
+                self._play_pass(colour)
+                self._append_history_move(History_move(
+                    colour, None, generated.comments, generated.cookie),
+                    False)
             return 'pass'
         row, col = generated.move
         vertex = format_vertex((row, col))
         if not for_regression:
             try:
-                self.simple_ko_point = self.board.play(row, col, colour)
-                self.simple_ko_player = opponent_of(colour)
+                self._play_move(colour, (row, col))
             except ValueError:
                 raise GtpError("engine error: tried to play %s" % vertex)
-            self.move_history.append(
+            self._append_history_move(
                 History_move(colour, generated.move,
-                             generated.comments, generated.cookie))
+                             generated.comments, generated.cookie),
+                True)
         return vertex
 
     def handle_genmove(self, args):
@@ -423,8 +606,10 @@ class Gtp_state(object):
     def handle_undo(self, args):
         if not self.move_history:
             raise GtpError("cannot undo")
+        if self._undo_moves(1):
+            return
         try:
-            self.reset_to_moves(self.move_history[:-1])
+            self._replay_moves(self.move_history[:-1])
         except ValueError:
             raise GtpError("corrupt history")
 
@@ -1,6 +1,10 @@
 """Job system supporting multiprocessing."""
 
+import Queue
+import socket
 import sys
+import threading
+import time
 
 from gomill import compact_tracebacks
 
@@ -14,6 +18,9 @@ class JobFailed(StandardError):
 class JobSourceError(StandardError):
     """Error from a job source object."""
 
+class JobManagerError(StandardError):
+    """Error setting up a job manager."""
+
 class JobError(object):
     """Error from a job."""
     def __init__(self, job, msg):
@@ -29,53 +36,212 @@ def _initialise_multiprocessing():
     except ImportError:
         multiprocessing = None
 
+_worker_cleanup_functions = []
+
+def register_worker_cleanup(fn):
+    """Arrange for a function to be called when the current worker finishes.
+
+    fn -- function taking no parameters
+
+    This is intended for jobs which keep resources (eg, engine subprocesses)
+    alive between jobs run by the same worker.
+
+    The functions are called in the worker's process (which is the manager's
+    process for the in-process job manager). Any exceptions are set aside.
+
+    """
+    _worker_cleanup_functions.append(fn)
+
+def run_worker_cleanup():
+    """Call (and forget) the functions registered by register_worker_cleanup.
+
+    Returns a list of strings describing any exceptions.
+
+    """
+    errors = []
+    while _worker_cleanup_functions:
+        fn = _worker_cleanup_functions.pop()
+        try:
+            fn()
+        except Exception:
+            errors.append(compact_tracebacks.format_traceback(skip=1))
+    return errors
+
 class Worker_finish_signal(object):
     pass
 worker_finish_signal = Worker_finish_signal()
 
+def _run_job(job, worker_id):
+    """Run a job in a worker.
+
+    Returns the job's response, or a JobError.
+
+    """
+    try:
+        return job.run(worker_id)
+    except JobFailed, e:
+        response = JobError(job, str(e))
+        sys.exc_clear()
+        del e
+    except Exception:
+        response = JobError(
+            job, compact_tracebacks.format_traceback(skip=1))
+        sys.exc_clear()
+    return response
+
 def worker_run_jobs(job_queue, response_queue, worker_id):
+    # Each response is sent as a tuple (response, idle time, busy time), where
+    # idle time is the time spent waiting for the job.
     try:
         #pid = os.getpid()
         #sys.stderr.write("worker %d starting\n" % pid)
         while True:
+            waiting_since = time.time()
             job = job_queue.get()
+            started = time.time()
             #sys.stderr.write("worker %d: %s\n" % (pid, repr(job)))
             if isinstance(job, Worker_finish_signal):
                 break
-            try:
-                response = job.run(worker_id)
-            except JobFailed, e:
-                response = JobError(job, str(e))
-                sys.exc_clear()
-                del e
-            except Exception:
-                response = JobError(
-                    job, compact_tracebacks.format_traceback(skip=1))
-                sys.exc_clear()
-            response_queue.put(response)
+            response = _run_job(job, worker_id)
+            response_queue.put(
+                (response, started - waiting_since, time.time() - started))
         #sys.stderr.write("worker %d finishing\n" % pid)
+        for msg in run_worker_cleanup():
+            sys.stderr.write("error in worker cleanup:\n%s\n" % msg)
         response_queue.cancel_join_thread()
     # Unfortunately, there will be places in the child that this doesn't cover.
     # But it will avoid the ugly traceback in most cases.
     except KeyboardInterrupt:
         sys.exit(3)
 
+class Job_manager_stats(object):
+    """Instrumentation from Multiprocessing_job_manager and
+    Network_job_manager.
+
+    Public attributes:
+      batches              -- int
+      responses            -- int
+      largest_batch        -- int
+      manager_time         -- float (seconds)
+      longest_manager_time -- float (seconds)
+      worker_busy_time     -- float (seconds)
+      worker_idle_time     -- float (seconds)
+
+    A batch is the set of responses which the manager collects each time it
+    waits for the workers.
+
+    manager_time is the time from receiving a batch to finishing putting the
+    replacement jobs on the job queue, summed over all batches. This is the
+    latency seen by a worker which is waiting for a job.
+
+    worker_busy_time and worker_idle_time are summed over all workers.
+    worker_idle_time is the time the workers spent waiting for jobs.
+
+    """
+    def __init__(self):
+        self.batches = 0
+        self.responses = 0
+        self.largest_batch = 0
+        self.manager_time = 0.0
+        self.longest_manager_time = 0.0
+        self.worker_busy_time = 0.0
+        self.worker_idle_time = 0.0
+
+    def record_batch(self, batch):
+        """Record a batch of (response, idle time, busy time) tuples."""
+        self.batches += 1
+        self.responses += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for _, idle_time, busy_time in batch:
+            self.worker_idle_time += idle_time
+            self.worker_busy_time += busy_time
+
+    def record_manager_time(self, t):
+        self.manager_time += t
+        self.longest_manager_time = max(self.longest_manager_time, t)
+
+    def describe(self):
+        """Return a text description of the statistics."""
+        if not self.batches:
+            return "job manager: no responses"
+        total = self.worker_busy_time + self.worker_idle_time
+        if total > 0:
+            idle_s = "%.1f%%" % (100 * self.worker_idle_time / total)
+        else:
+            idle_s = "--"
+        return ("job manager: %d responses in %d batches (largest %d)\n"
+                "manager latency: mean %.1fms, max %.1fms\n"
+                "worker idle time: %s" % (
+                    self.responses, self.batches, self.largest_batch,
+                    1000 * self.manager_time / self.batches,
+                    1000 * self.longest_manager_time, idle_s))
+
+
 class Job_manager(object):
+    """Run jobs from a job source.
+
+    The job source must provide the following methods:
+      get_job()                          -- returns a job or NoJobAvailable
+      process_response(response)
+      process_error_response(job, message)
+      end_batch()
+
+    A job is an object with a run(worker_id) method, which returns a response.
+
+    The job manager calls end_batch() after processing each batch of
+    responses (and starting jobs to replace them), so that the job source can
+    do work like saving state once per batch rather than once per job.
+
+    Network_job_manager also needs a process_lost_job(job) method.
+
+    Exceptions from the job source are reported as JobSourceError, unless
+    they're of a class passed to pass_exception().
+
+    """
     def __init__(self):
         self.passed_exceptions = []
+        self.stats = None
 
     def pass_exception(self, cls):
         self.passed_exceptions.append(cls)
 
+    def _call_job_source(self, fn, *args):
+        try:
+            return fn(*args)
+        except Exception, e:
+            for cls in self.passed_exceptions:
+                if isinstance(e, cls):
+                    raise
+            raise JobSourceError(
+                "error from %s()\n%s" %
+                (fn.__name__, compact_tracebacks.format_traceback(skip=1)))
+
 class Multiprocessing_job_manager(Job_manager):
-    def __init__(self, number_of_workers):
+    """Job manager which runs each job in a worker process.
+
+    Instantiate with
+      number_of_workers -- int
+      queue_depth       -- int (default 0)
+
+    The manager keeps up to queue_depth jobs waiting on the job queue in
+    addition to those which the workers are running, so that a worker which
+    finishes a job doesn't have to wait for the manager to provide the next
+    one.
+
+    After run_jobs(), the stats attribute is a Job_manager_stats.
+
+    """
+    def __init__(self, number_of_workers, queue_depth=0):
         Job_manager.__init__(self)
         _initialise_multiprocessing()
         if multiprocessing is None:
             raise StandardError("multiprocessing not available")
         if not 1 <= number_of_workers < 1024:
             raise ValueError
+        if queue_depth < 0:
+            raise ValueError
         self.number_of_workers = number_of_workers
+        self.queue_depth = queue_depth
 
     def start_workers(self):
         self.job_queue = multiprocessing.Queue()
@@ -89,51 +255,51 @@ class Multiprocessing_job_manager(Job_manager):
         for worker in self.workers:
             worker.start()
 
+    def _get_batch(self):
+        """Wait for at least one response, and collect any others available.
+
+        Returns a list of tuples (response, idle time, busy time).
+
+        """
+        batch = [self.response_queue.get()]
+        while True:
+            try:
+                batch.append(self.response_queue.get_nowait())
+            except Queue.Empty:
+                break
+        return batch
+
     def run_jobs(self, job_source):
+        self.stats = stats = Job_manager_stats()
+        max_active_jobs = self.number_of_workers + self.queue_depth
         active_jobs = 0
+        batch_received = None
         while True:
-            if active_jobs < self.number_of_workers:
-                try:
-                    job = job_source.get_job()
-                except Exception, e:
-                    for cls in self.passed_exceptions:
-                        if isinstance(e, cls):
-                            raise
-                    raise JobSourceError(
-                        "error from get_job()\n%s" %
-                        compact_tracebacks.format_traceback(skip=1))
-                if job is not NoJobAvailable:
-                    #sys.stderr.write("MGR: sending %s\n" % repr(job))
-                    self.job_queue.put(job)
-                    active_jobs += 1
-                    continue
+            while active_jobs < max_active_jobs:
+                job = self._call_job_source(job_source.get_job)
+                if job is NoJobAvailable:
+                    break
+                #sys.stderr.write("MGR: sending %s\n" % repr(job))
+                self.job_queue.put(job)
+                active_jobs += 1
+            if batch_received is not None:
+                stats.record_manager_time(time.time() - batch_received)
+            self._call_job_source(job_source.end_batch)
             if active_jobs == 0:
                 break
 
-            response = self.response_queue.get()
-            if isinstance(response, JobError):
-                try:
-                    job_source.process_error_response(
-                        response.job, response.msg)
-                except Exception, e:
-                    for cls in self.passed_exceptions:
-                        if isinstance(e, cls):
-                            raise
-                    raise JobSourceError(
-                        "error from process_error_response()\n%s" %
-                        compact_tracebacks.format_traceback(skip=1))
-            else:
-                try:
-                    job_source.process_response(response)
-                except Exception, e:
-                    for cls in self.passed_exceptions:
-                        if isinstance(e, cls):
-                            raise
-                    raise JobSourceError(
-                        "error from process_response()\n%s" %
-                        compact_tracebacks.format_traceback(skip=1))
-            active_jobs -= 1
-            #sys.stderr.write("MGR: received response %s\n" % repr(response))
+            batch = self._get_batch()
+            batch_received = time.time()
+            stats.record_batch(batch)
+            for response, _, _ in batch:
+                #sys.stderr.write("MGR: received response %s\n" % repr(response))
+                active_jobs -= 1
+                if isinstance(response, JobError):
+                    self._call_job_source(job_source.process_error_response,
+                                          response.job, response.msg)
+                else:
+                    self._call_job_source(job_source.process_response,
+                                          response)
 
     def finish(self):
         for _ in range(self.number_of_workers):
@@ -143,21 +309,296 @@ class Multiprocessing_job_manager(Job_manager):
         self.job_queue = None
         self.response_queue = None
 
+class _Network_worker(object):
+    """Manager-side record of a worker connected over the network.
+
+    Public attributes:
+      worker_id  -- int
+      connection -- multiprocessing.connection Connection
+      address    -- the worker's address (as reported by the Listener)
+      job        -- the job the worker is running, or None
+
+    """
+    def __init__(self, worker_id, connection, address):
+        self.worker_id = worker_id
+        self.connection = connection
+        self.address = address
+        self.job = None
+
+class Network_job_manager(Job_manager):
+    """Job manager which sends jobs to workers connected over the network.
+
+    Instantiate with
+      address -- pair (hostname, port)
+      authkey -- string
+
+    Workers connect using run_network_worker(), with the same authkey. They
+    can connect (and disconnect) at any time. Each worker runs one job at a
+    time; its worker id is the smallest integer not used by another connected
+    worker.
+
+    Jobs and responses are sent as pickles, so the authkey is needed to keep
+    unauthorised clients out (see multiprocessing.connection).
+
+    If a worker disconnects while it's running a job, the job manager calls
+    the job source's process_lost_job() method with the job (this method is
+    needed only for this job manager).
+
+    After start_workers(), the address attribute is the address which the
+    manager is listening on (this is useful if you asked for port 0).
+
+    After run_jobs(), the stats attribute is a Job_manager_stats.
+
+    """
+    def __init__(self, address, authkey):
+        Job_manager.__init__(self)
+        _initialise_multiprocessing()
+        if multiprocessing is None:
+            raise StandardError("multiprocessing not available")
+        self.address = address
+        self.authkey = authkey
+        self.listener = None
+        self.closing = False
+        # Events from the other threads:
+        #  ('connect', Connection, address)
+        #  ('response', _Network_worker, message)
+        #  ('disconnect', _Network_worker, None)
+        self.events = Queue.Queue()
+        # map worker id -> _Network_worker
+        self.workers = {}
+        # list of _Network_workers
+        self.idle_workers = []
+
+    def start_workers(self):
+        from multiprocessing import connection
+        try:
+            self.listener = connection.Listener(
+                self.address, authkey=self.authkey)
+        except EnvironmentError, e:
+            raise JobManagerError("can't listen on %s:%s:\n%s" %
+                                  (self.address[0], self.address[1], e))
+        self.address = self.listener.address
+        self.accept_thread = threading.Thread(target=self._accept_connections)
+        self.accept_thread.daemon = True
+        self.accept_thread.start()
+
+    def _accept_connections(self):
+        # Runs in its own thread
+        while True:
+            try:
+                connection = self.listener.accept()
+            except (EnvironmentError, EOFError,
+                    multiprocessing.AuthenticationError):
+                # Includes failed authentication
+                if self.closing:
+                    return
+                continue
+            if self.closing:
+                connection.close()
+                return
+            self.events.put(
+                ('connect', connection, self.listener.last_accepted))
+
+    def _read_messages(self, worker):
+        # Runs in its own thread for each worker
+        while True:
+            try:
+                message = worker.connection.recv()
+            except Exception:
+                self.events.put(('disconnect', worker, None))
+                return
+            self.events.put(('response', worker, message))
+
+    def _get_events(self):
+        """Wait for at least one event, and collect any others available."""
+        # Queue.get() without a timeout can't be interrupted by Ctrl-C
+        while True:
+            try:
+                events = [self.events.get(True, 0.5)]
+                break
+            except Queue.Empty:
+                pass
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except Queue.Empty:
+                break
+        return events
+
+    def _add_worker(self, connection, address):
+        worker_id = 0
+        while worker_id in self.workers:
+            worker_id += 1
+        try:
+            connection.send(worker_id)
+        except (EnvironmentError, EOFError):
+            connection.close()
+            return
+        worker = _Network_worker(worker_id, connection, address)
+        self.workers[worker_id] = worker
+        self.idle_workers.append(worker)
+        thread = threading.Thread(target=self._read_messages, args=(worker,))
+        thread.daemon = True
+        thread.start()
+
+    def _drop_worker(self, worker):
+        """Forget a worker which has disconnected.
+
+        Returns the job the worker was running, or None.
+
+        """
+        if self.workers.get(worker.worker_id) is not worker:
+            # Already dropped
+            return None
+        del self.workers[worker.worker_id]
+        if worker in self.idle_workers:
+            self.idle_workers.remove(worker)
+        try:
+            worker.connection.close()
+        except EnvironmentError:
+            pass
+        job = worker.job
+        worker.job = None
+        return job
+
+    def run_jobs(self, job_source):
+        self.stats = stats = Job_manager_stats()
+        active_jobs = 0
+        # Job from the job source which hasn't been sent to a worker
+        pending_job = None
+        batch_received = None
+        while True:
+            while True:
+                if pending_job is None:
+                    if active_jobs and not self.idle_workers:
+                        break
+                    job = self._call_job_source(job_source.get_job)
+                    if job is NoJobAvailable:
+                        break
+                    pending_job = job
+                if not self.idle_workers:
+                    break
+                worker = self.idle_workers.pop(0)
+                try:
+                    worker.connection.send(pending_job)
+                except (EnvironmentError, EOFError):
+                    self._drop_worker(worker)
+                    continue
+                worker.job = pending_job
+                pending_job = None
+                active_jobs += 1
+            if batch_received is not None:
+                stats.record_manager_time(time.time() - batch_received)
+                batch_received = None
+            self._call_job_source(job_source.end_batch)
+            if pending_job is None and active_jobs == 0:
+                break
+
+            events = self._get_events()
+            batch_received = time.time()
+            batch = []
+            for event, arg1, arg2 in events:
+                if event == 'connect':
+                    self._add_worker(arg1, arg2)
+                elif event == 'response':
+                    worker, message = arg1, arg2
+                    if (self.workers.get(worker.worker_id) is not worker or
+                        worker.job is None):
+                        continue
+                    worker.job = None
+                    self.idle_workers.append(worker)
+                    active_jobs -= 1
+                    batch.append(message)
+                    response = message[0]
+                    if isinstance(response, JobError):
+                        self._call_job_source(
+                            job_source.process_error_response,
+                            response.job, response.msg)
+                    else:
+                        self._call_job_source(
+                            job_source.process_response, response)
+                elif event == 'disconnect':
+                    job = self._drop_worker(arg1)
+                    if job is not None:
+                        active_jobs -= 1
+                        self._call_job_source(
+                            job_source.process_lost_job, job)
+            if batch:
+                stats.record_batch(batch)
+
+    def finish(self):
+        self.closing = True
+        for worker in self.workers.values():
+            try:
+                worker.connection.send(worker_finish_signal)
+            except (EnvironmentError, EOFError):
+                pass
+            self._drop_worker(worker)
+        # Wake up the thread waiting in accept()
+        try:
+            socket.create_connection(self.address).close()
+        except EnvironmentError:
+            pass
+        self.accept_thread.join(5)
+        self.listener.close()
+
+def run_network_worker(address, authkey, prepare_job=None):
+    """Run jobs from a Network_job_manager.
+
+    address     -- pair (hostname, port)
+    authkey     -- string
+    prepare_job -- function taking a job, or None
+
+    If prepare_job is specified, it's called with each job before the job is
+    run.
+
+    Returns the number of jobs run, when the job manager says there are no
+    more jobs, or if the connection is lost.
+
+    Raises EnvironmentError if it can't connect, or
+    multiprocessing.AuthenticationError if the authkey is wrong.
+
+    """
+    from multiprocessing import connection
+    conn = connection.Client(address, authkey=authkey)
+    jobs_run = 0
+    try:
+        try:
+            worker_id = conn.recv()
+            while True:
+                waiting_since = time.time()
+                job = conn.recv()
+                started = time.time()
+                if isinstance(job, Worker_finish_signal):
+                    break
+                if prepare_job is not None:
+                    prepare_job(job)
+                response = _run_job(job, worker_id)
+                conn.send(
+                    (response, started - waiting_since, time.time() - started))
+                jobs_run += 1
+        except (EnvironmentError, EOFError):
+            pass
+    finally:
+        conn.close()
+        for msg in run_worker_cleanup():
+            sys.stderr.write("error in worker cleanup:\n%s\n" % msg)
+    return jobs_run
+
+
 class In_process_job_manager(Job_manager):
+    """Job manager which runs jobs one at a time in the current process.
+
+    Each batch is a single job.
+
+    """
     def start_workers(self):
         pass
 
     def run_jobs(self, job_source):
         while True:
-            try:
-                job = job_source.get_job()
-            except Exception, e:
-                for cls in self.passed_exceptions:
-                    if isinstance(e, cls):
-                        raise
-                raise JobSourceError(
-                    "error from get_job()\n%s" %
-                    compact_tracebacks.format_traceback(skip=1))
+            job = self._call_job_source(job_source.get_job)
+            self._call_job_source(job_source.end_batch)
             if job is NoJobAvailable:
                 break
             try:
@@ -167,41 +608,47 @@ class In_process_job_manager(Job_manager):
                     msg = str(e)
                 else:
                     msg = compact_tracebacks.format_traceback(skip=1)
-                try:
-                    job_source.process_error_response(job, msg)
-                except Exception, e:
-                    for cls in self.passed_exceptions:
-                        if isinstance(e, cls):
-                            raise
-                    raise JobSourceError(
-                        "error from process_error_response()\n%s" %
-                        compact_tracebacks.format_traceback(skip=1))
+                self._call_job_source(
+                    job_source.process_error_response, job, msg)
             else:
-                try:
-                    job_source.process_response(response)
-                except Exception, e:
-                    for cls in self.passed_exceptions:
-                        if isinstance(e, cls):
-                            raise
-                    raise JobSourceError(
-                        "error from process_response()\n%s" %
-                        compact_tracebacks.format_traceback(skip=1))
+                self._call_job_source(job_source.process_response, response)
 
     def finish(self):
-        pass
+        for msg in run_worker_cleanup():
+            print >>sys.stderr, "error in worker cleanup:\n%s" % msg
 
 def run_jobs(job_source, max_workers=None, allow_mp=True,
-             passed_exceptions=None):
-    if allow_mp:
-        _initialise_multiprocessing()
-        if multiprocessing is None:
-            allow_mp = False
-    if allow_mp:
-        if max_workers is None:
-            max_workers = multiprocessing.cpu_count()
-        job_manager = Multiprocessing_job_manager(max_workers)
+             passed_exceptions=None, queue_depth=0,
+             listen_address=None, authkey=None):
+    """Run jobs from a job source until it has no more.
+
+    job_source        -- job source (see Job_manager)
+    max_workers       -- number of worker processes (default: number of CPUs)
+    allow_mp          -- bool (if false, runs jobs in the current process)
+    passed_exceptions -- exception classes to propagate from the job source
+    queue_depth       -- see Multiprocessing_job_manager
+    listen_address    -- pair (hostname, port), or None
+    authkey           -- string (required if listen_address is set)
+
+    If listen_address is set, jobs are run by network workers (see
+    Network_job_manager), and max_workers and allow_mp are ignored.
+
+    Returns a Job_manager_stats, or None if jobs were run in-process.
+
+    """
+    if listen_address is not None:
+        job_manager = Network_job_manager(listen_address, authkey)
     else:
-        job_manager = In_process_job_manager()
+        if allow_mp:
+            _initialise_multiprocessing()
+            if multiprocessing is None:
+                allow_mp = False
+        if allow_mp:
+            if max_workers is None:
+                max_workers = multiprocessing.cpu_count()
+            job_manager = Multiprocessing_job_manager(max_workers, queue_depth)
+        else:
+            job_manager = In_process_job_manager()
     if passed_exceptions:
         for cls in passed_exceptions:
             job_manager.pass_exception(cls)
@@ -215,4 +662,5 @@ def run_jobs(job_source, max_workers=None, allow_mp=True,
             print >>sys.stderr, "Error closing down workers:\n%s" % e2
         raise
     job_manager.finish()
+    return job_manager.stats
 
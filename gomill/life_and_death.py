@@ -0,0 +1,288 @@
+"""Find dead stones in finished games, for area scoring.
+
+This provides two methods:
+
+  'unconditional' -- only stones which are certainly dead: those inside
+                     territory which Benson's algorithm shows is safe for the
+                     other player.
+
+  'estimated'     -- also stones which look dead: see estimate_dead_stones().
+
+"""
+
+from gomill.common import *
+
+
+def _neighbours(side, row, col):
+    result = []
+    if row > 0:
+        result.append((row-1, col))
+    if row < side-1:
+        result.append((row+1, col))
+    if col > 0:
+        result.append((row, col-1))
+    if col < side-1:
+        result.append((row, col+1))
+    return result
+
+def _find_components(board, include):
+    """Find the connected components of a set of points.
+
+    include -- function (row, col) -> bool
+
+    Returns a list of sets of points.
+
+    """
+    side = board.side
+    seen = set()
+    components = []
+    for point in board.board_points:
+        if point in seen or not include(*point):
+            continue
+        component = set([point])
+        to_handle = [point]
+        while to_handle:
+            row, col = to_handle.pop()
+            for neighbour in _neighbours(side, row, col):
+                if neighbour not in component and include(*neighbour):
+                    component.add(neighbour)
+                    to_handle.append(neighbour)
+        seen.update(component)
+        components.append(component)
+    return components
+
+
+def _find_distances(board, colour):
+    """Find how far each empty point is from the specified colour's stones.
+
+    Returns a dict point -> int, with an entry for each empty point which can
+    be reached from one of the colour's stones through empty points.
+
+    """
+    side = board.side
+    distances = {}
+    to_handle = [point for point in board.board_points
+                 if board.get(*point) == colour]
+    distance = 0
+    while to_handle:
+        distance += 1
+        next_to_handle = []
+        for (row, col) in to_handle:
+            for neighbour in _neighbours(side, row, col):
+                if (board.get(*neighbour) is None and
+                    neighbour not in distances):
+                    distances[neighbour] = distance
+                    next_to_handle.append(neighbour)
+        to_handle = next_to_handle
+    return distances
+
+
+def find_unconditional_life(board):
+    """Apply Benson's algorithm to find unconditionally alive stones.
+
+    board -- boards.Board
+
+    Returns a pair (alive, territory)
+      alive     -- set of points holding stones which can't be captured, even
+                   if their owner passes every turn
+      territory -- dict point -> colour
+
+    territory contains the points in regions which are surrounded by one
+    player's unconditionally alive stones, and in which every empty point is
+    next to one of those stones. The other player can't make living stones in
+    such a region, so any of its stones there are dead.
+
+    """
+    side = board.side
+    alive = set()
+    territory = {}
+    for colour in 'b', 'w':
+        blocks = _find_components(
+            board, lambda row, col: board.get(row, col) == colour)
+        block_of = {}
+        liberties = []
+        for i, block in enumerate(blocks):
+            block_liberties = set()
+            for (row, col) in block:
+                block_of[row, col] = i
+                for neighbour in _neighbours(side, row, col):
+                    if board.get(*neighbour) is None:
+                        block_liberties.add(neighbour)
+            liberties.append(block_liberties)
+        # Regions enclosed by this colour's blocks
+        regions = _find_components(
+            board, lambda row, col: board.get(row, col) != colour)
+        region_blocks = []
+        vital_to = []
+        for region in regions:
+            bordering = set()
+            for (row, col) in region:
+                for neighbour in _neighbours(side, row, col):
+                    i = block_of.get(neighbour)
+                    if i is not None:
+                        bordering.add(i)
+            empties = [point for point in region
+                       if board.get(*point) is None]
+            region_blocks.append(bordering)
+            vital_to.append(set(
+                i for i in bordering if liberties[i].issuperset(empties)))
+
+        live_blocks = set(range(len(blocks)))
+        live_regions = set(range(len(regions)))
+        while True:
+            vital_counts = dict.fromkeys(live_blocks, 0)
+            for r in live_regions:
+                for i in vital_to[r] & live_blocks:
+                    vital_counts[i] += 1
+            dead_blocks = set(i for i in live_blocks if vital_counts[i] < 2)
+            if not dead_blocks:
+                break
+            live_blocks -= dead_blocks
+            live_regions = set(r for r in live_regions
+                               if region_blocks[r] <= live_blocks)
+
+        alive_points = set()
+        for i in live_blocks:
+            alive_points.update(blocks[i])
+        alive.update(alive_points)
+        for r in live_regions:
+            region = regions[r]
+            is_safe = True
+            for (row, col) in region:
+                if board.get(row, col) is not None:
+                    continue
+                if not any(neighbour in alive_points for neighbour
+                           in _neighbours(side, row, col)):
+                    is_safe = False
+                    break
+            if is_safe:
+                for point in region:
+                    territory[point] = colour
+    return alive, territory
+
+
+def estimate_dead_stones(board, min_life_area=12):
+    """Guess which stones are dead.
+
+    board         -- boards.Board
+    min_life_area -- int (default 12)
+
+    Returns a set of points.
+
+    Includes all the stones which find_unconditional_life() shows are dead.
+
+    Otherwise, stones are considered in 'areas': connected regions made of
+    one player's stones and empty points. An eye is a connected set of empty
+    points in the area which isn't next to any of the other player's stones.
+    The area's living space is its stones together with its empty points
+    which are nearer (counting steps through empty points) to the player's
+    stones than to the other player's.
+
+    An area (which doesn't contain any unconditionally alive stones) is weak
+    if it has fewer than two eyes, no eye of three or more points, and less
+    than min_life_area points of living space. The stones in a weak area are
+    dead if none of the other player's stones next to the area are in a weak
+    area (so both sides of a seki are left alive).
+
+    Measuring living space rather than the whole area means that a few stones
+    inside a large territory can be found dead.
+
+    """
+    alive, territory = find_unconditional_life(board)
+    dead = set(point for (point, colour) in territory.iteritems()
+               if board.get(*point) not in (None, colour))
+    side = board.side
+    distances = {
+        'b' : _find_distances(board, 'b'),
+        'w' : _find_distances(board, 'w'),
+        }
+    areas = {}
+    area_of = {}
+    weak_areas = set()
+    for colour in 'b', 'w':
+        opponent = opponent_of(colour)
+        areas[colour] = _find_components(
+            board, lambda row, col: board.get(row, col) != opponent)
+        for i, area in enumerate(areas[colour]):
+            stones = [point for point in area if board.get(*point) == colour]
+            if not stones:
+                continue
+            for point in stones:
+                area_of[point] = (colour, i)
+            if alive.intersection(stones):
+                continue
+            own_distances = distances[colour]
+            opponent_distances = distances[opponent]
+            space = len(stones)
+            for point in area:
+                distance = own_distances.get(point)
+                if distance is None:
+                    continue
+                opponent_distance = opponent_distances.get(point)
+                if opponent_distance is None or distance < opponent_distance:
+                    space += 1
+            if space >= min_life_area:
+                continue
+            eyes = [eye for eye in _find_components(
+                        board, lambda row, col: ((row, col) in area and
+                                                 board.get(row, col) is None))
+                    if not any(board.get(*neighbour) == opponent
+                               for point in eye
+                               for neighbour in _neighbours(side, *point))]
+            if len(eyes) < 2 and not any(len(eye) >= 3 for eye in eyes):
+                weak_areas.add((colour, i))
+    for colour, i in weak_areas:
+        area = areas[colour][i]
+        opponent = opponent_of(colour)
+        is_dead = True
+        for (row, col) in area:
+            for neighbour in _neighbours(side, row, col):
+                if (board.get(*neighbour) == opponent and
+                    area_of[neighbour] in weak_areas):
+                    is_dead = False
+                    break
+            if not is_dead:
+                break
+        if is_dead:
+            dead.update(point for point in area
+                        if board.get(*point) == colour)
+    return dead
+
+
+def find_dead_stones(board, method, min_life_area=12):
+    """Find dead stones using the specified method.
+
+    method        -- 'no', 'unconditional', or 'estimated'
+    min_life_area -- int (default 12; see estimate_dead_stones())
+
+    Returns a set of points. The 'no' method always returns an empty set.
+
+    """
+    if method == 'no':
+        return set()
+    elif method == 'unconditional':
+        alive, territory = find_unconditional_life(board)
+        return set(point for (point, colour) in territory.iteritems()
+                   if board.get(*point) not in (None, colour))
+    elif method == 'estimated':
+        return estimate_dead_stones(board, min_life_area)
+    else:
+        raise ValueError("unknown dead stones method: %s" % method)
+
+def area_score(board, method, min_life_area=12):
+    """Calculate the area score of a position, after removing dead stones.
+
+    method        -- 'no', 'unconditional', or 'estimated'
+    min_life_area -- int (default 12)
+
+    See find_dead_stones() for the parameters.
+
+    Returns black score minus white score, as for Board.area_score().
+
+    """
+    dead = find_dead_stones(board, method, min_life_area)
+    if not dead:
+        return board.area_score()
+    board = board.copy()
+    board.apply_setup([], [], dead)
+    return board.area_score()
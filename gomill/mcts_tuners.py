@@ -21,11 +21,14 @@ class Node(object):
     """A MCTS node.
 
     Public attributes:
-      children     -- list of Nodes, or None for unexpanded
+      children       -- list of Nodes, or None for unexpanded
       wins
       visits
-      value        -- wins / visits
-      rsqrt_visits -- 1 / sqrt(visits)
+      virtual_visits -- lost visits from simulations which are in progress
+      value          -- wins / (visits + virtual_visits)
+      rsqrt_visits   -- 1 / sqrt(visits + virtual_visits)
+
+    virtual_visits isn't included in the pickled state.
 
     """
     def count_tree_size(self):
@@ -35,20 +38,23 @@ class Node(object):
 
     def recalculate(self):
         """Update value and rsqrt_visits from changed wins and visits."""
-        self.value = self.wins / self.visits
-        self.rsqrt_visits = sqrt(1/self.visits)
+        visits = self.visits + self.virtual_visits
+        self.value = self.wins / visits
+        self.rsqrt_visits = sqrt(1/visits)
 
     def __getstate__(self):
         return (self.children, self.wins, self.visits)
 
     def __setstate__(self, state):
         self.children, self.wins, self.visits = state
+        self.virtual_visits = 0
         self.recalculate()
 
     __slots__ = (
         'children',
         'wins',
         'visits',
+        'virtual_visits',
         'value',
         'rsqrt_visits',
         )
@@ -67,6 +73,7 @@ class Tree(object):
       initial_visits   -- visit count for newly-created nodes
       initial_wins     -- win count for newly-created nodes
       exploration_coefficient -- constant for UCT formula (float)
+      virtual_loss     -- lost visits to add for each simulation in progress
 
     Public attributes:
       root             -- Node
@@ -91,7 +98,7 @@ class Tree(object):
     def __init__(self, splits, max_depth,
                  exploration_coefficient,
                  initial_visits, initial_wins,
-                 parameter_formatter):
+                 parameter_formatter, virtual_loss=0):
         self.splits = splits
         self.dimensions = len(splits)
         self.branching_factor = reduce(operator.mul, splits)
@@ -99,6 +106,7 @@ class Tree(object):
         self.exploration_coefficient = exploration_coefficient
         self.initial_visits = initial_visits
         self.initial_wins = initial_wins
+        self.virtual_loss = virtual_loss
         self._initial_value = initial_wins / initial_visits
         self._initial_rsqrt_visits = 1/sqrt(initial_visits)
         self.format_parameters = parameter_formatter
@@ -124,6 +132,7 @@ class Tree(object):
         self.root.children = None
         self.root.wins = self.initial_wins
         self.root.visits = self.initial_visits
+        self.root.virtual_visits = 0
         self.root.value = self.initial_wins / self.initial_visits
         self.root.rsqrt_visits = self._initial_rsqrt_visits
         self.expand(self.root)
@@ -152,6 +161,7 @@ class Tree(object):
             child.children = None
             child.wins = self.initial_wins
             child.visits = self.initial_visits
+            child.virtual_visits = 0
             child.value = self._initial_value
             child.rsqrt_visits = self._initial_rsqrt_visits
             node.children.append(child)
@@ -293,9 +303,14 @@ class Simulation(object):
     Use the methods in the following order:
       run()
       get_parameters()
-      update_stats(b)
+      update_stats(b) or abandon()
       describe()
 
+    If the tree's virtual_loss is nonzero, run() adds that many lost visits to
+    the nodes in the simulation's node sequence, so that other simulations
+    started before this one finishes tend to choose different nodes.
+    update_stats() and abandon() remove them again.
+
     """
     def __init__(self, tree):
         self.tree = tree
@@ -305,6 +320,8 @@ class Simulation(object):
         self.choice_path = []
         # bool
         self.candidate_won = None
+        # number of virtual visits this simulation has added to each node
+        self.virtual_loss = 0
 
     def _choose_action(self, node):
         """Choose the best action from the specified node.
@@ -313,7 +330,7 @@ class Simulation(object):
 
         """
         uct_numerator = (self.tree.exploration_coefficient *
-                         sqrt(log(node.visits)))
+                         sqrt(log(node.visits + node.virtual_visits)))
         def urgency((i, child)):
             return child.value + uct_numerator * child.rsqrt_visits
         start = random.randrange(len(node.children))
@@ -344,6 +361,25 @@ class Simulation(object):
             choice, child = self._choose_action(node)
             self.node_path.append(child)
             self.choice_path.append(choice)
+        self._add_virtual_visits(self.tree.virtual_loss)
+
+    def _add_virtual_visits(self, n):
+        if n == 0:
+            return
+        self.virtual_loss += n
+        for node in self.node_path:
+            node.virtual_visits += n
+            node.recalculate()
+        self.tree.root.virtual_visits += n
+        self.tree.root.recalculate()
+
+    def abandon(self):
+        """Forget about the simulation without updating the statistics.
+
+        This removes any virtual loss added by run().
+
+        """
+        self._add_virtual_visits(-self.virtual_loss)
 
     def get_parameters(self):
         """Retrieve the parameters corresponding to the simulation's leaf node.
@@ -360,6 +396,7 @@ class Simulation(object):
         simulation's node sequence.
 
         """
+        self._add_virtual_visits(-self.virtual_loss)
         self.candidate_won = candidate_won
         for node in self.node_path:
             node.visits += 1
@@ -555,6 +592,7 @@ class Mcts_tuner(Competition):
         Setting('exploration_coefficient', interpret_float),
         Setting('initial_visits', interpret_positive_int),
         Setting('initial_wins', interpret_positive_int),
+        Setting('virtual_loss', interpret_nonnegative_int, default=0),
         ]
 
     def parameter_spec_from_config(self, parameter_config):
@@ -763,11 +801,14 @@ class Mcts_tuner(Competition):
         job.board_size = self.board_size
         job.komi = self.komi
         job.move_limit = self.move_limit
+        job.superko_rule = self.superko_rule
         job.handicap = self.handicap
         job.handicap_is_free = (self.handicap_style == 'free')
         job.use_internal_scorer = (self.scorer == 'internal')
         job.internal_scorer_handicap_compensation = \
             self.internal_scorer_handicap_compensation
+        job.internal_scorer_dead_stones = self.internal_scorer_dead_stones
+        job.internal_scorer_min_life_area = self.internal_scorer_min_life_area
         job.sgf_event = self.competition_code
         job.sgf_note = ("Candidate parameters: %s" %
                         self.format_engine_parameters(engine_parameters))
@@ -798,7 +839,8 @@ class Mcts_tuner(Competition):
         stop_competition = False
         retry_game = False
         game_number = job.game_data
-        del self.outstanding_simulations[game_number]
+        simulation = self.outstanding_simulations.pop(game_number)
+        simulation.abandon()
         self.scheduler.fix(game_number)
         if self.halt_on_next_failure:
             stop_competition = True
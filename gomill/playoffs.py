@@ -3,6 +3,7 @@
 from gomill import game_jobs
 from gomill import competitions
 from gomill import tournaments
+from gomill import tournament_results
 from gomill.competitions import (Competition, ControlFileError)
 from gomill.settings import *
 
@@ -16,6 +17,9 @@ class Matchup_config(Quiet_config):
         ('id', 'name') +
         tuple(setting.name for setting in tournaments.matchup_settings))
 
+class SPRT(Config_proxy):
+    underlying = tournament_results.Sprt
+
 
 class Playoff(tournaments.Tournament):
     """A Tournament with explicitly listed matchups.
@@ -29,6 +33,8 @@ class Playoff(tournaments.Tournament):
         result = Competition.control_file_globals(self)
         result.update({
             'Matchup' : Matchup_config,
+            'SPRT'    : SPRT,
+            'Time_controls' : tournaments.Time_controls,
             })
         return result
 
@@ -171,6 +177,7 @@ class Playoff(tournaments.Tournament):
         p('')
         self.write_screen_report(out)
         self.write_ghost_matchup_reports(out)
+        self.write_move_time_reports(out)
         p('')
         self.write_player_descriptions(out)
         p('')
@@ -0,0 +1,315 @@
+"""Play many random games at once, using NumPy.
+
+This is intended for generating large numbers of quick synthetic games (for
+example, to benchmark controllers or exercise the job manager).
+
+"""
+
+from gomill import __version__
+from gomill import boards
+from gomill import gameplay
+from gomill import sgf
+from gomill import sgf_moves
+from gomill.boards import EMPTY, BLACK, WHITE, BORDER
+
+numpy = None
+
+_colour_names = {BLACK : 'b', WHITE : 'w'}
+
+def _initialise_numpy():
+    global numpy
+    if numpy is not None:
+        return
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+def numpy_available():
+    """Say whether Playout_batch can be used."""
+    _initialise_numpy()
+    return numpy is not None
+
+
+def _neighbour_values(a, offset, fill):
+    """Return an array giving each point's neighbour's value in 'a'.
+
+    a      -- 2-dimensional array: board index, point number
+    offset -- difference between the neighbour's point number and the point's
+    fill   -- value to use where the neighbour would be off the array
+
+    """
+    result = numpy.empty_like(a)
+    if offset > 0:
+        result[:, :-offset] = a[:, offset:]
+        result[:, -offset:] = fill
+    else:
+        result[:, -offset:] = a[:, :offset]
+        result[:, :-offset] = fill
+    return result
+
+
+class Playout_batch(object):
+    """A batch of random games, played in lock-step.
+
+    Instantiate with
+      side      -- board size
+      count     -- number of games
+      seed      -- seed for the random number generator (int or None)
+      max_moves -- int (default three times the number of points)
+
+    Public attributes (treat as read-only):
+      side
+      count
+      move_number -- number of moves (including passes) played in each game
+                     which is still in progress
+
+    Each game starts from an empty board, with Black to play. Every turn, each
+    player chooses uniformly among the legal moves (as defined by
+    Board.is_legal(), with the simple ko rule) which don't fill one of its own
+    single-point eyes (an empty point all of whose neighbours are its own
+    stones). A player passes if there is no such move. A game ends after two
+    consecutive passes or when it reaches max_moves.
+
+    Captures follow the same rules as boards.Board.
+
+    The boards are stored as a single NumPy array, in the same representation
+    as boards.Board uses, and each move is played on all the boards at once.
+
+    Raises StandardError if NumPy isn't available.
+
+    """
+    def __init__(self, side, count, seed=None, max_moves=None):
+        if not numpy_available():
+            raise StandardError("numpy not available")
+        if count < 1:
+            raise ValueError
+        geometry = boards._get_geometry(side)
+        self.side = side
+        self.count = count
+        if max_moves is None:
+            max_moves = side * side * 3
+        self.max_moves = max_moves
+        self._geometry = geometry
+        self._offsets = (-geometry.width, geometry.width, -1, 1)
+        empty = numpy.frombuffer(geometry.empty, dtype=numpy.int8)
+        self._contents = numpy.tile(empty, (count, 1))
+        # Each stone is labelled with the point number of the first point in
+        # its group; other points are labelled with their own point number.
+        self._labels = numpy.tile(
+            numpy.arange(len(empty), dtype=numpy.int32), (count, 1))
+        self._random = numpy.random.RandomState(seed)
+        self._ko_points = numpy.zeros(count, dtype=numpy.intp)
+        self._ko_points.fill(-1)
+        self._consecutive_passes = numpy.zeros(count, dtype=numpy.intp)
+        self._in_progress = numpy.ones(count, dtype=bool)
+        self._moves = [[] for _ in xrange(count)]
+        self._next_code = BLACK
+        self.move_number = 0
+
+    def _count_liberties(self, contents, labels):
+        """Find the number of liberties of each stone's group.
+
+        contents -- array of board contents: board index, point number
+        labels   -- array of the same shape: group labels
+
+        Returns an array of the same shape as the board contents (with
+        meaningless values for points which don't hold stones).
+
+        """
+        count, point_count = contents.shape
+        is_empty = (contents == EMPTY)
+        is_stone = (contents == BLACK) | (contents == WHITE)
+        # A liberty is counted once for each distinct neighbouring group.
+        # Points which don't hold stones have key -1.
+        keys = (numpy.arange(count, dtype=numpy.int32)[:, numpy.newaxis]
+                * point_count + labels)
+        stone_keys = keys.copy()
+        stone_keys[~is_stone] = -1
+        neighbour_keys = []
+        counts = numpy.zeros(count * point_count, dtype=numpy.int32)
+        for offset in self._offsets:
+            neighbour_key = _neighbour_values(stone_keys, offset, -1)
+            is_new = is_empty & (neighbour_key != -1)
+            for earlier in neighbour_keys:
+                is_new &= (neighbour_key != earlier)
+            neighbour_keys.append(neighbour_key)
+            counts += numpy.bincount(neighbour_key[is_new],
+                                     minlength=count * point_count)
+        return counts[keys]
+
+    def step(self):
+        """Play one move (or pass) in each game which is still in progress.
+
+        Returns False if all the games had already finished.
+
+        """
+        # Only the games in progress take part
+        games = numpy.flatnonzero(self._in_progress)
+        if len(games) == 0:
+            return False
+        code = self._next_code
+        opponent = BLACK + WHITE - code
+        contents = self._contents[games]
+        labels = self._labels[games]
+        liberties = self._count_liberties(contents, labels)
+        ko_points = self._ko_points[games]
+
+        candidates = (contents == EMPTY)
+        is_legal = numpy.zeros_like(candidates)
+        is_eye = numpy.ones_like(candidates)
+        neighbour_contents = []
+        neighbour_liberties = []
+        for offset in self._offsets:
+            contents_n = _neighbour_values(contents, offset, BORDER)
+            liberties_n = _neighbour_values(liberties, offset, 0)
+            neighbour_contents.append(contents_n)
+            neighbour_liberties.append(liberties_n)
+            is_legal |= ((contents_n == EMPTY) |
+                         ((contents_n == code) & (liberties_n > 1)) |
+                         ((contents_n == opponent) & (liberties_n == 1)))
+            is_eye &= (contents_n == code) | (contents_n == BORDER)
+        candidates &= is_legal & ~is_eye
+        has_ko = (ko_points >= 0)
+        candidates[has_ko, ko_points[has_ko]] = False
+
+        scores = self._random.random_sample(candidates.shape)
+        scores[~candidates] = -1.0
+        chosen = scores.argmax(axis=1)
+        movers = numpy.flatnonzero(candidates.any(axis=1))
+        points = chosen[movers]
+
+        # Captures: opponent groups next to the move with only one liberty
+        mover_labels = labels[movers]
+        to_remove = numpy.zeros(mover_labels.shape, dtype=bool)
+        is_lone = numpy.ones(len(movers), dtype=bool)
+        is_opponent = (contents[movers] == opponent)
+        mover_indices = numpy.arange(len(movers))
+        for offset, contents_n, liberties_n in zip(
+                self._offsets, neighbour_contents, neighbour_liberties):
+            neighbour = contents_n[movers, points]
+            captures = (neighbour == opponent) & (
+                liberties_n[movers, points] == 1)
+            is_lone &= (neighbour == opponent) | (neighbour == BORDER)
+            captured_label = numpy.where(
+                captures, mover_labels[mover_indices, points + offset], -1)
+            to_remove |= is_opponent & (
+                mover_labels == captured_label[:, numpy.newaxis])
+        capture_counts = to_remove.sum(axis=1)
+        mover_contents = contents[movers]
+        mover_contents[to_remove] = EMPTY
+        mover_contents[mover_indices, points] = code
+        contents[movers] = mover_contents
+        # Removed stones go back to their own labels. The new stone joins its
+        # neighbouring groups, taking the smallest of their labels.
+        mover_labels[to_remove] = numpy.nonzero(to_remove)[1]
+        point_count = contents.shape[1]
+        new_label = points.astype(numpy.int32)
+        joined_labels = []
+        for offset, contents_n in zip(self._offsets, neighbour_contents):
+            joined_label = numpy.where(
+                contents_n[movers, points] == code,
+                mover_labels[mover_indices, points + offset], point_count)
+            joined_labels.append(joined_label)
+            new_label = numpy.minimum(new_label, joined_label)
+        for joined_label in joined_labels:
+            joined = (mover_labels == joined_label[:, numpy.newaxis])
+            mover_labels[joined] = numpy.repeat(new_label, joined.sum(axis=1))
+        mover_labels[mover_indices, points] = new_label
+        labels[movers] = mover_labels
+        self._contents[games] = contents
+        self._labels[games] = labels
+
+        ko_points.fill(-1)
+        ko_points[movers] = numpy.where(is_lone & (capture_counts == 1),
+                                        to_remove.argmax(axis=1), -1)
+        self._ko_points[games] = ko_points
+        consecutive_passes = self._consecutive_passes[games] + 1
+        consecutive_passes[movers] = 0
+        self._consecutive_passes[games] = consecutive_passes
+
+        colour = _colour_names[code]
+        coordinates = self._geometry.coordinates
+        moved = dict(zip(movers.tolist(), points.tolist()))
+        for i, game in enumerate(games.tolist()):
+            point = moved.get(i)
+            if point is None:
+                self._moves[game].append((colour, None))
+            else:
+                self._moves[game].append((colour, coordinates[point]))
+        self.move_number += 1
+        self._in_progress[games] = (consecutive_passes < 2)
+        if self.move_number >= self.max_moves:
+            self._in_progress[:] = False
+        self._next_code = opponent
+        return True
+
+    def run(self):
+        """Play all the games to the end."""
+        while self.step():
+            pass
+
+    def is_finished(self, i):
+        """Say whether the specified game has finished."""
+        return not self._in_progress[i]
+
+    def get_moves(self, i):
+        """Retrieve the moves played in the specified game.
+
+        Returns a list of tuples (colour, move, comment), as for
+        Game_runner.get_moves(). The comment is always None.
+
+        """
+        return [(colour, move, None) for (colour, move) in self._moves[i]]
+
+    def get_board(self, i):
+        """Return the current position of the specified game.
+
+        Returns a boards.Board.
+
+        """
+        board = boards.Board(self.side)
+        contents = self._contents[i]
+        coordinates = self._geometry.coordinates
+        stones = {BLACK : [], WHITE : []}
+        for point in numpy.flatnonzero(
+                (contents == BLACK) | (contents == WHITE)).tolist():
+            stones[contents[point]].append(coordinates[point])
+        board.apply_setup(stones[BLACK], stones[WHITE], [])
+        return board
+
+    def get_result(self, i, komi=0.0):
+        """Return the result of the specified game, by area scoring.
+
+        Treats all stones as alive.
+
+        Returns a gameplay.Result.
+
+        """
+        score = self.get_board(i).area_score() - komi
+        if score > 0:
+            return gameplay.Result.from_score('b', score)
+        elif score < 0:
+            return gameplay.Result.from_score('w', -score)
+        else:
+            return gameplay.Result.from_score(None, 0)
+
+    def make_sgf(self, i, komi=0.0):
+        """Return an SGF description of the specified game.
+
+        Returns an Sgf_game object with the following root node properties
+        set:
+          FF GM CA
+          AP SZ KM RE
+
+        """
+        sgf_game = sgf.Sgf_game(self.side)
+        root = sgf_game.get_root()
+        root.set('KM', komi)
+        root.set('AP', ("gomill", __version__))
+        root.set('RE', self.get_result(i, komi).sgf_result)
+        for colour, move in self._moves[i]:
+            sgf_game.extend_main_sequence().set_move(colour, move)
+        if self._moves[i]:
+            sgf_moves.indicate_first_player(sgf_game)
+        return sgf_game
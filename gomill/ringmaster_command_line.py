@@ -5,6 +5,7 @@ import sys
 from optparse import OptionParser
 
 from gomill import compact_tracebacks
+from gomill import job_manager
 from gomill.ringmasters import (
     Ringmaster, RingmasterError, RingmasterInternalError)
 
@@ -28,6 +29,8 @@ def do_run(ringmaster, options):
         ringmaster.set_clean_status()
     if options.parallel is not None:
         ringmaster.set_parallel_worker_count(options.parallel)
+    if options.listen is not None:
+        ringmaster.set_listen_address(options.listen, get_worker_authkey())
     ringmaster.run(options.max_games)
     ringmaster.report()
 
@@ -46,6 +49,12 @@ def do_report(ringmaster, options):
     ringmaster.load_status()
     ringmaster.report()
 
+def do_compact(ringmaster, options):
+    if not ringmaster.status_file_exists():
+        raise RingmasterError("no status file")
+    ringmaster.load_status()
+    ringmaster.compact_status()
+
 def do_reset(ringmaster, options):
     ringmaster.delete_state_and_output()
 
@@ -56,12 +65,40 @@ def do_check(ringmaster, options):
 def do_debugstatus(ringmaster, options):
     ringmaster.print_status()
 
+def parse_address(s):
+    """Interpret a HOST:PORT string.
+
+    Returns a pair (hostname, port).
+
+    Raises ValueError if the string isn't acceptable.
+
+    """
+    host, sep, port = s.rpartition(":")
+    if not sep or not host:
+        raise ValueError
+    port = int(port)
+    if not 0 <= port < 65536:
+        raise ValueError
+    return host, port
+
+def get_worker_authkey():
+    """Return the network worker authentication key from the environment.
+
+    Raises RingmasterError if it isn't set.
+
+    """
+    authkey = os.environ.get("GOMILL_WORKER_KEY")
+    if not authkey:
+        raise RingmasterError("GOMILL_WORKER_KEY environment variable not set")
+    return authkey
+
 _actions = {
     "run" : do_run,
     "stop" : do_stop,
     "show" : do_show,
     "report" : do_report,
     "reset" : do_reset,
+    "compact" : do_compact,
     "check" : do_check,
     "debugstatus" : do_debugstatus,
     }
@@ -69,13 +106,16 @@ _actions = {
 
 def run(argv, ringmaster_class):
     usage = ("%prog [options] <control file> [command]\n\n"
-             "commands: run (default), stop, show, report, reset, check")
+             "commands: run (default), stop, show, report, reset, check, "
+             "compact")
     parser = OptionParser(usage=usage, prog="ringmaster",
                           version=ringmaster_class.public_version)
     parser.add_option("--max-games", "-g", type="int",
                       help="maximum number of games to play in this run")
     parser.add_option("--parallel", "-j", type="int",
                       help="number of worker processes")
+    parser.add_option("--listen", metavar="HOST:PORT",
+                      help="run games using network workers")
     parser.add_option("--quiet", "-q", action="store_true",
                       help="be silent except for warnings and errors")
     parser.add_option("--log-gtp", action="store_true",
@@ -85,6 +125,13 @@ def run(argv, ringmaster_class):
         parser.error("no control file specified")
     if len(args) > 2:
         parser.error("too many arguments")
+    if options.listen is not None:
+        if options.parallel is not None:
+            parser.error("--listen and --parallel are incompatible")
+        try:
+            options.listen = parse_address(options.listen)
+        except ValueError:
+            parser.error("invalid --listen address: %s" % options.listen)
     if len(args) == 1:
         command = "run"
     else:
@@ -117,6 +164,87 @@ def run(argv, ringmaster_class):
 def main():
     run(sys.argv[1:], Ringmaster)
 
+
+def _prepare_unshared_job(job):
+    # Used by network workers which don't share the ringmaster's filesystem
+    job.return_sgf = True
+    job.void_sgf_dirname = None
+    job.gtp_log_pathname = None
+    job.stderr_pathname = None
+
+def _run_worker_process(address, authkey, prepare_job):
+    """Run a network worker; returns the desired exit status."""
+    from multiprocessing import AuthenticationError
+    try:
+        job_manager.run_network_worker(address, authkey, prepare_job)
+    except EnvironmentError, e:
+        print >>sys.stderr, "ringmaster-worker: can't connect to %s:%s:\n%s" % (
+            address[0], address[1], e)
+        return 1
+    except AuthenticationError, e:
+        print >>sys.stderr, "ringmaster-worker: authentication failed: %s" % e
+        return 1
+    except KeyboardInterrupt:
+        return 3
+    return 0
+
+def _run_worker_subprocess(address, authkey, prepare_job):
+    sys.exit(_run_worker_process(address, authkey, prepare_job))
+
+def run_worker(argv):
+    usage = ("%prog [options] <host>:<port>\n\n"
+             "The GOMILL_WORKER_KEY environment variable must be set.")
+    parser = OptionParser(usage=usage, prog="ringmaster-worker",
+                          version=Ringmaster.public_version)
+    parser.add_option("--parallel", "-j", type="int", default=1,
+                      help="number of worker processes")
+    parser.add_option("--shared-files", action="store_true",
+                      help="write game records and logs directly "
+                           "(the ringmaster's files must be visible here)")
+    (options, args) = parser.parse_args(argv)
+    if len(args) == 0:
+        parser.error("no address specified")
+    if len(args) > 1:
+        parser.error("too many arguments")
+    try:
+        address = parse_address(args[0])
+    except ValueError:
+        parser.error("invalid address: %s" % args[0])
+    if options.parallel < 1:
+        parser.error("--parallel must be at least 1")
+    if options.shared_files:
+        prepare_job = None
+    else:
+        prepare_job = _prepare_unshared_job
+    try:
+        authkey = get_worker_authkey()
+        if options.parallel == 1:
+            exit_status = _run_worker_process(address, authkey, prepare_job)
+        else:
+            import multiprocessing
+            processes = [
+                multiprocessing.Process(target=_run_worker_subprocess,
+                                        args=(address, authkey, prepare_job))
+                for i in range(options.parallel)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            exit_status = max(process.exitcode for process in processes)
+    except RingmasterError, e:
+        print >>sys.stderr, "ringmaster-worker:", e
+        exit_status = 1
+    except KeyboardInterrupt:
+        exit_status = 3
+    except:
+        print >>sys.stderr, "ringmaster-worker: internal error"
+        compact_tracebacks.log_traceback()
+        exit_status = 4
+    sys.exit(exit_status)
+
+def worker_main():
+    run_worker(sys.argv[1:])
+
 if __name__ == "__main__":
     main()
 
@@ -52,6 +52,22 @@ class RingmasterError(StandardError):
 class RingmasterInternalError(StandardError):
     """Error reported by a Ringmaster which indicates a bug."""
 
+def _make_journal_result(response):
+    """Return a copy of a Game_job_result for the status journal.
+
+    The copy has only the attributes that replay_game_result() needs; the
+    warnings, log entries and SGF content are left out.
+
+    """
+    result = game_jobs.Game_job_result()
+    result.game_id = response.game_id
+    result.game_data = response.game_data
+    result.game_result = response.game_result
+    result.engine_descriptions = response.engine_descriptions
+    result.warnings = []
+    result.log_entries = []
+    return result
+
 
 class Ringmaster(object):
     """Manage a competition as described by a control file.
@@ -84,6 +100,8 @@ class Ringmaster(object):
         """
         self.display_mode = 'clearing'
         self.worker_count = None
+        self.listen_address = None
+        self.worker_authkey = None
         self.max_games_this_run = None
         self.presenter = None
         self.terminal_reader = None
@@ -92,16 +110,19 @@ class Ringmaster(object):
         # Map game_id -> int
         self.game_error_counts = {}
         self.write_gtp_logs = False
+        # Journal records for status changes which haven't been saved yet
+        self.unsaved_status_changes = []
 
         self.control_pathname = control_pathname
         self.base_directory, control_filename = os.path.split(control_pathname)
         self.competition_code, ext = os.path.splitext(control_filename)
-        if ext in (".log", ".status", ".cmd", ".hist",
+        if ext in (".log", ".status", ".journal", ".cmd", ".hist",
                    ".report", ".games", ".void", ".gtplogs"):
             raise RingmasterError("forbidden control file extension: %s" % ext)
         stem = os.path.join(self.base_directory, self.competition_code)
         self.log_pathname = stem + ".log"
         self.status_pathname = stem + ".status"
+        self.journal_pathname = stem + ".journal"
         self.command_pathname = stem + ".cmd"
         self.history_pathname = stem + ".hist"
         self.report_pathname = stem + ".report"
@@ -306,7 +327,12 @@ class Ringmaster(object):
 
     ringmaster_settings = [
         Setting('record_games', interpret_bool, True),
+        Setting('sgf_move_times', interpret_bool, False),
         Setting('stderr_to_log', interpret_bool, True),
+        Setting('status_snapshot_interval', interpret_positive_int, 1),
+        Setting('status_fsync',
+                interpret_enum('never', 'snapshots', 'always'), 'never'),
+        Setting('job_queue_depth', interpret_nonnegative_int, 0),
         ]
 
     def _initialise_from_control_file(self, config):
@@ -328,6 +354,24 @@ class Ringmaster(object):
     def set_parallel_worker_count(self, n):
         self.worker_count = n
 
+    def set_listen_address(self, address, authkey):
+        """Run games using network workers.
+
+        address -- pair (hostname, port)
+        authkey -- string
+
+        Workers started with run_network_worker() (as used by the
+        ringmaster-worker command) connect to this address, using the same
+        authkey.
+
+        """
+        self.listen_address = address
+        self.worker_authkey = authkey
+
+    def _is_parallel(self):
+        return (self.worker_count is not None or
+                self.listen_address is not None)
+
     def log(self, s):
         print >>self.logfile, s
         self.logfile.flush()
@@ -372,32 +416,156 @@ class Ringmaster(object):
         return os.path.join(self.sgf_dir_pathname,
                             self.get_sgf_filename(game_id))
 
+    def _write_sgf(self, pathname, sgf_string):
+        # For overriding in the testsuite
+        f = open(pathname, "w")
+        f.write(sgf_string)
+        f.close()
+
 
     # State attributes (*: in persistent state):
     #  * void_game_count   -- int
     #  * comp              -- from Competition.get_status()
+    #  * snapshot_id       -- int (identifies the matching journal)
+    #    journal_length    -- int (records in the journal since the snapshot)
     #    games_in_progress -- dict game_id -> Game_job
     #    games_to_replay   -- dict game_id -> Game_job
 
+    # The persistent state is a snapshot in the state file, followed by the
+    # records in the journal file, if the journal's header matches the
+    # snapshot's snapshot_id. Journal records are pairs (kind, data):
+    #   ('result', Game_job_result)
+    #   ('void', None)
+    # Game_job_results in the journal have only the attributes which
+    # Competition.replay_game_result() needs (see _make_journal_result()).
+    # Each journal entry is a decimal length on a line of its own, followed by
+    # that many bytes of pickle. The first entry is the header (the
+    # snapshot_id).
+
     def _write_status(self, value):
         """Write the pickled contents of the persistent state file."""
         f = open(self.status_pathname + ".new", "wb")
         pickle.dump(value, f, protocol=-1)
+        if self.status_fsync != 'never':
+            f.flush()
+            os.fsync(f.fileno())
         f.close()
         os.rename(self.status_pathname + ".new", self.status_pathname)
 
+    def _write_journal_entries(self, mode, values, fsync):
+        f = open(self.journal_pathname, mode)
+        for value in values:
+            s = pickle.dumps(value, protocol=-1)
+            f.write("%d\n%s" % (len(s), s))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+        f.close()
+
+    def _start_journal(self, snapshot_id):
+        """Replace the journal file with an empty journal."""
+        self._write_journal_entries(
+            "wb", [snapshot_id], self.status_fsync != 'never')
+
+    def _append_to_journal(self, records):
+        """Append a list of records to the journal file."""
+        self._write_journal_entries(
+            "ab", records, self.status_fsync == 'always')
+
+    def _remove_journal(self):
+        """Remove the journal file, if it exists."""
+        if os.path.exists(self.journal_pathname):
+            os.remove(self.journal_pathname)
+
+    def _load_journal(self):
+        """Return the unpickled contents of the journal file.
+
+        Returns a pair (snapshot_id, list of records), or None if there is no
+        journal file.
+
+        An incomplete final entry is ignored.
+
+        """
+        try:
+            f = open(self.journal_pathname, "rb")
+        except EnvironmentError, e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        with f:
+            values = []
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    break
+                length = int(line)
+                s = f.read(length)
+                if len(s) < length:
+                    break
+                values.append(pickle.loads(s))
+        if not values:
+            return None
+        return values[0], values[1:]
+
+    def _uses_journal(self):
+        return (self.status_snapshot_interval > 1 and
+                self.competition.supports_status_journal)
+
     def write_status(self):
-        """Write the persistent state file."""
+        """Write the persistent state file.
+
+        This writes a complete snapshot of the state (and starts a new journal,
+        if the journal is in use).
+
+        """
+        self.snapshot_id += 1
         competition_status = self.competition.get_status()
         status = {
             'void_game_count' : self.void_game_count,
             'comp_vn'         : self.competition.status_format_version,
             'comp'            : competition_status,
+            'snapshot_id'     : self.snapshot_id,
             }
         try:
             self._write_status((self.status_format_version, status))
+            if self._uses_journal():
+                self._start_journal(self.snapshot_id)
         except EnvironmentError, e:
             raise RingmasterError("error writing persistent state:\n%s" % e)
+        self.journal_length = 0
+        self.unsaved_status_changes = []
+
+    def _record_status_change(self, record):
+        """Note that the persistent state has changed after a game.
+
+        record -- journal record describing the change
+
+        The change isn't saved until _save_status_changes() is called.
+
+        """
+        self.unsaved_status_changes.append(record)
+
+    def _save_status_changes(self):
+        """Save the changes noted by _record_status_change().
+
+        This appends to the journal, or writes a new snapshot if
+        status_snapshot_interval changes have been journalled.
+
+        """
+        records = self.unsaved_status_changes
+        if not records:
+            return
+        if (not self._uses_journal() or
+            self.journal_length + len(records) >=
+            self.status_snapshot_interval):
+            self.write_status()
+            return
+        try:
+            self._append_to_journal(records)
+        except EnvironmentError, e:
+            raise RingmasterError("error writing persistent state:\n%s" % e)
+        self.journal_length += len(records)
+        self.unsaved_status_changes = []
 
     def _load_status(self):
         """Return the unpickled contents of the persistent state file."""
@@ -415,6 +583,8 @@ class Ringmaster(object):
             self.games_in_progress = {}
             self.games_to_replay = {}
             competition_status = status['comp']
+            # Status files from older versions have no snapshot_id
+            self.snapshot_id = status.get('snapshot_id', 0)
         except pickle.UnpicklingError:
             raise RingmasterError("corrupt status file")
         except EnvironmentError, e:
@@ -424,8 +594,28 @@ class Ringmaster(object):
         except Exception, e:
             # Probably an exception from __setstate__ somewhere
             raise RingmasterError("incompatible status file")
+        try:
+            journal = self._load_journal()
+        except EnvironmentError, e:
+            raise RingmasterError("error loading journal file:\n%s" % e)
+        except Exception, e:
+            raise RingmasterError("corrupt journal file")
+        if journal is not None and journal[0] == self.snapshot_id:
+            journal_records = journal[1]
+        else:
+            # Missing, or left over from before the snapshot was written
+            journal_records = []
+        self.journal_length = len(journal_records)
         try:
             self.competition.set_status(competition_status)
+            for kind, data in journal_records:
+                if kind == 'result':
+                    self.competition.replay_game_result(data)
+                elif kind == 'void':
+                    self.void_game_count += 1
+                else:
+                    raise CompetitionError(
+                        "unknown journal record: %s" % kind)
         except CompetitionError, e:
             raise RingmasterError("error loading competition state: %s" % e)
         except KeyError, e:
@@ -439,6 +629,8 @@ class Ringmaster(object):
     def set_clean_status(self):
         """Reset persistent state to the initial values."""
         self.void_game_count = 0
+        self.snapshot_id = 0
+        self.journal_length = 0
         self.games_in_progress = {}
         self.games_to_replay = {}
         try:
@@ -447,6 +639,29 @@ class Ringmaster(object):
             raise RingmasterError(e)
         self.status_is_loaded = True
 
+    def compact_status(self):
+        """Write a new snapshot of the persistent state, emptying the journal.
+
+        The status must already be loaded.
+
+        Raises RingmasterError if the competition is running.
+
+        """
+        if not self.status_is_loaded:
+            raise RingmasterError("status is not loaded")
+        self._open_files()
+        try:
+            self.write_status()
+            if not self._uses_journal():
+                try:
+                    self._remove_journal()
+                except EnvironmentError, e:
+                    raise RingmasterError(
+                        "error removing journal file:\n%s" % e)
+            self.log("status compacted")
+        finally:
+            self._close_files()
+
     def status_file_exists(self):
         """Check whether the persistent state file exists."""
         return os.path.exists(self.status_pathname)
@@ -457,6 +672,11 @@ class Ringmaster(object):
         status_format_version, status = self._load_status()
         print >>self.stdout, "status_format_version:", status_format_version
         pprint(status, self.stdout)
+        journal = self._load_journal()
+        if journal is not None:
+            snapshot_id, records = journal
+            print >>self.stdout, "journal for snapshot %s:" % snapshot_id
+            pprint(records, self.stdout)
 
     def write_command(self, command):
         """Write a command to the command file.
@@ -526,13 +746,13 @@ class Ringmaster(object):
             self.say('status', s)
         self.presenter.clear('status')
         if self.stopping:
-            if self.worker_count is None or not self.games_in_progress:
+            if not self._is_parallel() or not self.games_in_progress:
                 p("halting: %s" % self.stopping_reason)
             else:
                 p("waiting for workers to finish: %s" %
                   self.stopping_reason)
         if self.games_in_progress:
-            if self.worker_count is None:
+            if not self._is_parallel():
                 gms = "game"
             else:
                 gms = "%d games" % len(self.games_in_progress)
@@ -564,6 +784,7 @@ class Ringmaster(object):
         if self.record_games:
             job.sgf_filename = self.get_sgf_filename(job.game_id)
             job.sgf_dirname = self.sgf_dir_pathname
+            job.sgf_move_times = self.sgf_move_times
             job.void_sgf_dirname = self.void_dir_pathname
         if self.write_gtp_logs:
             job.gtp_log_pathname = os.path.join(
@@ -573,9 +794,17 @@ class Ringmaster(object):
 
     def get_job(self):
         """Job supply function for the job manager."""
-        job = self._get_job()
+        return self._get_job()
+
+    def end_batch(self):
+        """Batch completion function for the job manager.
+
+        Saves the persistent state and redraws the display, once for each
+        batch of responses rather than once for each game.
+
+        """
+        self._save_status_changes()
         self._update_display()
-        return job
 
     def _get_job(self):
         """Main implementation of get_job()."""
@@ -633,9 +862,15 @@ class Ringmaster(object):
             self.warn(warning)
         for log_entry in response.log_entries:
             self.log(log_entry)
+        if response.sgf_content is not None:
+            pathname = self.get_sgf_pathname(response.game_id)
+            try:
+                self._write_sgf(pathname, response.sgf_content)
+            except EnvironmentError, e:
+                self.warn("error writing %s:\n%s" % (pathname, e))
         result_description = self.competition.process_game_result(response)
         del self.games_in_progress[response.game_id]
-        self.write_status()
+        self._record_status_change(('result', _make_journal_result(response)))
         if result_description is None:
             result_description = response.game_result.describe()
         self.say('results', "game %s: %s" % (
@@ -657,12 +892,24 @@ class Ringmaster(object):
             del self.games_in_progress[job.game_id]
             if previous_error_count != 0:
                 del self.game_error_counts[job.game_id]
-        self.write_status()
+        self._record_status_change(('void', None))
         if stop_competition and not self.stopping:
             # No need to log: _halt competition will do so
             self.say('warnings', "halting run due to void games")
             self._halt_competition("too many void games")
 
+    def process_lost_job(self, job):
+        """Lost job function for the job manager.
+
+        This is used when a network worker disconnects in the middle of a
+        game. The game will be replayed; it isn't counted as a void game.
+
+        """
+        self.warn("game %s -- worker disconnected; game will be replayed" %
+                  job.game_id)
+        self.games_to_replay[job.game_id] = \
+            self.games_in_progress.pop(job.game_id)
+
     def run(self, max_games=None):
         """Run the competition.
 
@@ -684,7 +931,19 @@ class Ringmaster(object):
                 pass
             self.log(msg)
 
+        def save_status_changes():
+            # Results which have been processed but not yet saved would
+            # otherwise be lost.
+            try:
+                self._save_status_changes()
+            except RingmasterError, e:
+                self.log(str(e))
+
         self._open_files()
+        if self._uses_journal():
+            # Make sure the journal matches the current snapshot (and doesn't
+            # have an incomplete entry at the end).
+            self.write_status()
         self.competition.set_event_logger(self.log)
         self.competition.set_history_logger(self.log_history)
 
@@ -693,33 +952,45 @@ class Ringmaster(object):
 
         allow_mp = (self.worker_count is not None)
         self.log("run started at %s with max_games %s" % (now(), max_games))
-        if allow_mp:
+        if self.listen_address is not None:
+            self.log("listening for workers on %s:%s" % self.listen_address)
+        elif allow_mp:
             self.log("using %d worker processes" % self.worker_count)
         self.max_games_this_run = max_games
         self._update_display()
         try:
-            job_manager.run_jobs(
+            job_manager_stats = job_manager.run_jobs(
                 job_source=self,
                 allow_mp=allow_mp, max_workers=self.worker_count,
                 passed_exceptions=[RingmasterError, CompetitionError,
-                                   RingmasterInternalError])
+                                   RingmasterInternalError],
+                queue_depth=self.job_queue_depth,
+                listen_address=self.listen_address,
+                authkey=self.worker_authkey)
         except KeyboardInterrupt:
             self.log("run interrupted at %s" % now())
             log_games_in_progress()
+            save_status_changes()
             raise
-        except (RingmasterError, CompetitionError), e:
+        except (RingmasterError, CompetitionError,
+                job_manager.JobManagerError), e:
             self.log("run finished with error at %s\n%s" % (now(), e))
             log_games_in_progress()
+            save_status_changes()
             raise RingmasterError(e)
         except (job_manager.JobSourceError, RingmasterInternalError), e:
             self.log("run finished with internal error at %s\n%s" % (now(), e))
             log_games_in_progress()
+            save_status_changes()
             raise RingmasterInternalError(e)
         except:
             self.log("run finished with internal error at %s" % now())
             self.log(compact_tracebacks.format_traceback())
             log_games_in_progress()
+            save_status_changes()
             raise
+        if job_manager_stats is not None:
+            self.log(job_manager_stats.describe())
         self.log("run finished at %s" % now())
         self._close_files()
 
@@ -732,6 +1003,7 @@ class Ringmaster(object):
         for pathname in [
             self.log_pathname,
             self.status_pathname,
+            self.journal_pathname,
             self.command_pathname,
             self.history_pathname,
             self.report_pathname,
@@ -6,7 +6,8 @@ import shlex
 __all__ = ['Setting', 'allow_none', 'load_settings',
            'Config_proxy', 'Quiet_config',
            'interpret_any', 'interpret_bool',
-           'interpret_int', 'interpret_positive_int', 'interpret_float',
+           'interpret_int', 'interpret_positive_int',
+           'interpret_nonnegative_int', 'interpret_float',
            'interpret_8bit_string', 'interpret_identifier',
            'interpret_as_utf8', 'interpret_as_utf8_stripped',
            'interpret_colour', 'interpret_enum', 'interpret_callable',
@@ -37,6 +38,13 @@ def interpret_positive_int(i):
         raise ValueError("must be positive integer")
     return i
 
+def interpret_nonnegative_int(i):
+    if not isinstance(i, int) or isinstance(i, long):
+        raise ValueError("invalid integer")
+    if i < 0:
+        raise ValueError("must not be negative")
+    return i
+
 def interpret_float(f):
     if isinstance(f, float):
         return f
@@ -22,11 +22,22 @@ class Node(object):
 
     Changing the SZ property isn't allowed.
 
+    Interpreted property values are cached, so calling get() repeatedly for
+    the same property only interprets the raw values once. The cache is
+    invalidated when the property is changed using this class's methods (but
+    not if the raw property map is modified directly, or if the presenter's
+    property types are changed). Set the cache_values attribute to False (on
+    the class or on an individual node) to disable the cache.
+
     """
+    cache_values = True
+
     def __init__(self, property_map, presenter):
         # Map identifier (PropIdent) -> nonempty list of raw values
         self._property_map = property_map
         self._presenter = presenter
+        # Map identifier -> pair (raw value list, interpreted value), or None
+        self._value_cache = None
 
     def get_size(self):
         """Return the board size used to interpret property values."""
@@ -106,6 +117,8 @@ class Node(object):
         if identifier == "SZ" and values != [str(self._presenter.size)]:
             raise ValueError("changing size is not permitted")
         self._property_map[identifier] = values
+        if self._value_cache is not None:
+            self._value_cache.pop(identifier, None)
 
     def unset(self, identifier):
         """Remove the specified property.
@@ -116,6 +129,8 @@ class Node(object):
         if identifier == "SZ" and self._presenter.size != 19:
             raise ValueError("changing size is not permitted")
         del self._property_map[identifier]
+        if self._value_cache is not None:
+            self._value_cache.pop(identifier, None)
 
 
     def set_raw_list(self, identifier, values):
@@ -173,9 +188,26 @@ class Node(object):
 
         See sgf_properties.Presenter.interpret() for details.
 
+        If the value is a list or set, the caller may modify it without
+        affecting the cached value.
+
         """
-        return self._presenter.interpret(
-            identifier, self._property_map[identifier])
+        raw_values = self._property_map[identifier]
+        if not self.cache_values:
+            return self._presenter.interpret(identifier, raw_values)
+        cache = self._value_cache
+        if cache is None:
+            cache = self._value_cache = {}
+        try:
+            cached_raw_values, value = cache[identifier]
+        except KeyError:
+            cached_raw_values = None
+        if cached_raw_values is not raw_values:
+            value = self._presenter.interpret(identifier, raw_values)
+            cache[identifier] = (raw_values, value)
+        if isinstance(value, (list, set)):
+            return type(value)(value)
+        return value
 
     def set(self, identifier, value):
         """Set the value of the specified property.
@@ -804,3 +836,36 @@ class Sgf_game(object):
             date = datetime.date.today()
         self.root.set('DT', date.strftime("%Y-%m-%d"))
 
+
+
+def iter_sgf_games(f, override_encoding=None, chunk_size=65536):
+    """Read Sgf_games one at a time from a file containing a collection.
+
+    f                 -- file-like object with a read() method
+    override_encoding -- encoding name, eg "UTF-8" (optional)
+    chunk_size        -- int: number of bytes to read at a time
+
+    Returns an iterator of pairs (Collection_game, Sgf_game or None)
+
+    See sgf_grammar.iter_sgf_collection() for details of the Collection_game
+    and how the file is read.
+
+    The Sgf_game is None if the game couldn't be parsed, or if
+    Sgf_game.from_coarse_game_tree() rejected it; in either case the
+    Collection_game's error attribute describes the problem.
+
+    See Sgf_game.from_coarse_game_tree() for details of size and encoding
+    handling.
+
+    """
+    for collection_game in sgf_grammar.iter_sgf_collection(f, chunk_size):
+        if collection_game.error is not None:
+            yield collection_game, None
+            continue
+        try:
+            sgf_game = Sgf_game.from_coarse_game_tree(
+                collection_game.game_tree, override_encoding)
+        except ValueError, e:
+            collection_game.error = str(e)
+            sgf_game = None
+        yield collection_game, sgf_game
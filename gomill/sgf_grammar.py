@@ -27,6 +27,9 @@ _propident_re = re.compile(r"\A[A-Z]{1,8}\Z")
 _propvalue_re = re.compile(r"\A [^\\\]]* (?: \\. [^\\\]]* )* \Z",
                            re.VERBOSE | re.DOTALL)
 _find_start_re = re.compile(r"\(\s*;")
+_partial_start_re = re.compile(r"\(\s*\Z")
+_game_special_re = re.compile(r"[\[()]")
+_value_special_re = re.compile(r"[\\\]]")
 _tokenise_re = re.compile(r"""
 \s*
 (?:
@@ -37,6 +40,19 @@ _tokenise_re = re.compile(r"""
     (?P<D> [;()] )                                # delimiter
 )
 """, re.VERBOSE | re.DOTALL)
+_parse_re = re.compile(r"""
+\s*
+(?:
+    (?P<D> [;()] )                                # delimiter
+    |
+    (?P<I> [A-Z]{1,8} )                           # PropIdent
+    (?P<VS> (?: \s* \[ [^\\\]]* (?: \\. [^\\\]]* )* \] )* )   # its PropValues
+    |
+    \[ (?P<V> [^\\\]]* (?: \\. [^\\\]]* )* ) \]   # stray PropValue
+)
+""", re.VERBOSE | re.DOTALL)
+_value_re = re.compile(r"\[ ( [^\\\]]* (?: \\. [^\\\]]* )* ) \]",
+                       re.VERBOSE | re.DOTALL)
 
 
 def is_valid_property_identifier(s):
@@ -131,68 +147,78 @@ class Coarse_game_tree(object):
         self.children = [] # may be empty
 
 def _parse_sgf_game(s, start_position):
-    """Common implementation for parse_sgf_game and parse_sgf_games."""
-    tokens, end_position = tokenise(s, start_position)
-    if not tokens:
+    """Common implementation for parse_sgf_game and parse_sgf_games.
+
+    This matches the input directly, rather than using tokenise(), but it
+    accepts the same input and reports the same errors as tokenising first
+    and then parsing the token list would.
+
+    Returns a pair (Coarse_game_tree, end position), or (None, None) if it
+    doesn't find the start of a game.
+
+    """
+    m = _find_start_re.search(s, start_position)
+    if not m:
         return None, None
+    match = _parse_re.match
+    i = m.start()
     stack = []
     game_tree = None
     sequence = None
     properties = None
-    index = 0
-    try:
-        while True:
-            token_type, token = tokens[index]
-            index += 1
-            if token_type == 'V':
-                raise ValueError("unexpected value")
-            if token_type == 'D':
-                if token == ';':
-                    if sequence is None:
-                        raise ValueError("unexpected node")
-                    properties = {}
-                    sequence.append(properties)
-                else:
-                    if sequence is not None:
-                        if not sequence:
-                            raise ValueError("empty sequence")
-                        game_tree.sequence = sequence
-                        sequence = None
-                    if token == '(':
-                        stack.append(game_tree)
-                        game_tree = Coarse_game_tree()
-                        sequence = []
-                    else:
-                        # token == ')'
-                        variation = game_tree
-                        game_tree = stack.pop()
-                        if game_tree is None:
-                            break
-                        game_tree.children.append(variation)
-                    properties = None
+    while True:
+        m = match(s, i)
+        if not m:
+            raise ValueError("unexpected end of SGF data")
+        i = m.end()
+        group = m.lastgroup
+        if group == 'VS':
+            # The token list would have run out before these errors were
+            # noticed, so check there's something more to tokenise.
+            values_s = m.group('VS')
+            if not values_s:
+                if not match(s, i):
+                    raise ValueError("unexpected end of SGF data")
+                raise ValueError("property with no values")
+            if properties is None:
+                if not match(s, i):
+                    raise ValueError("unexpected end of SGF data")
+                raise ValueError("property value outside a node")
+            prop_ident = m.group('I')
+            prop_values = _value_re.findall(values_s)
+            if prop_ident in properties:
+                properties[prop_ident] += prop_values
             else:
-                # token_type == 'I'
-                prop_ident = token
-                prop_values = []
-                while True:
-                    token_type, token = tokens[index]
-                    if token_type != 'V':
+                properties[prop_ident] = prop_values
+        elif group == 'D':
+            token = m.group('D')
+            if token == ';':
+                if sequence is None:
+                    raise ValueError("unexpected node")
+                properties = {}
+                sequence.append(properties)
+            else:
+                if sequence is not None:
+                    if not sequence:
+                        raise ValueError("empty sequence")
+                    game_tree.sequence = sequence
+                    sequence = None
+                if token == '(':
+                    stack.append(game_tree)
+                    game_tree = Coarse_game_tree()
+                    sequence = []
+                else:
+                    # token == ')'
+                    variation = game_tree
+                    game_tree = stack.pop()
+                    if game_tree is None:
                         break
-                    index += 1
-                    prop_values.append(token)
-                if not prop_values:
-                    raise ValueError("property with no values")
-                try:
-                    if prop_ident in properties:
-                        properties[prop_ident] += prop_values
-                    else:
-                        properties[prop_ident] = prop_values
-                except TypeError:
-                    raise ValueError("property value outside a node")
-    except IndexError:
-        raise ValueError("unexpected end of SGF data")
-    assert index == len(tokens)
-    return variation, end_position
+                    game_tree.children.append(variation)
+                properties = None
+        else:
+            # group == 'V'
+            raise ValueError("unexpected value")
+    return variation, i
 
 def parse_sgf_game(s):
     """Read a single SGF game from a string, returning the parse tree.
@@ -252,6 +278,127 @@ def parse_sgf_collection(s):
     return result
 
 
+class Collection_game(object):
+    """A game found by iter_sgf_collection().
+
+    Public attributes:
+      index     -- int: the game's position in the collection (from 0)
+      offset    -- int: byte offset of the start of the game's data
+      end       -- int: byte offset of the end of the game's data
+      game_tree -- Coarse_game_tree, or None
+      error     -- string describing why the game couldn't be used, or None
+
+    If error is None, game_tree is not None.
+
+    """
+    def __init__(self, index, offset, end):
+        self.index = index
+        self.offset = offset
+        self.end = end
+        self.game_tree = None
+        self.error = None
+
+def iter_sgf_collection(f, chunk_size=65536):
+    """Read an SGF game collection from a file, one game at a time.
+
+    f          -- file-like object with a read() method (eg a file or mmap)
+    chunk_size -- int: number of bytes to read at a time
+
+    Returns an iterator of Collection_games.
+
+    Unlike parse_sgf_collection(), this only keeps one game's data in memory
+    at once (plus a chunk of unprocessed data), so it's suitable for files
+    that are too large to read in one go.
+
+    Identifies the start of each game in the same way as parse_sgf_game(). The
+    end of the game is found by counting parentheses (ignoring those in
+    property values), so a game which can't be parsed doesn't prevent the
+    following games from being read: its Collection_game has error set, and
+    iteration continues from the end of its data.
+
+    If the data ends part way through a game, the last Collection_game has
+    error set.
+
+    Doesn't report an error if no games are found.
+
+    """
+    buf = ""
+    base = 0        # file offset of buf[0]
+    pos = 0         # index in buf of the start of the unprocessed data
+    at_eof = False
+    index = 0
+    while True:
+        m = _find_start_re.search(buf, pos)
+        if not m:
+            if at_eof:
+                return
+            # Discard junk, keeping anything that might be the start of a game
+            m = _partial_start_re.search(buf, pos)
+            if m:
+                pos = m.start()
+            else:
+                pos = len(buf)
+            chunk = f.read(chunk_size)
+            if not chunk:
+                at_eof = True
+            buf = buf[pos:] + chunk
+            base += pos
+            pos = 0
+            continue
+        start = m.start()
+        i = start
+        depth = 0
+        in_value = False
+        while True:
+            if in_value:
+                m = _value_special_re.search(buf, i)
+            else:
+                m = _game_special_re.search(buf, i)
+            if m and not (in_value and m.group() == "\\" and
+                          m.end() == len(buf)):
+                i = m.end()
+                c = m.group()
+                if in_value:
+                    if c == "\\":
+                        i += 1
+                    else:
+                        in_value = False
+                elif c == "[":
+                    in_value = True
+                elif c == "(":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        break
+                continue
+            # Need more data
+            if at_eof:
+                i = len(buf)
+                break
+            if m:
+                i = m.start()
+            else:
+                i = len(buf)
+            chunk = f.read(chunk_size)
+            if not chunk:
+                at_eof = True
+            buf = buf[start:] + chunk
+            base += start
+            i -= start
+            start = 0
+        game = Collection_game(index, base+start, base+i)
+        try:
+            game.game_tree, _ = _parse_sgf_game(buf[start:i], 0)
+        except ValueError, e:
+            game.error = str(e)
+        yield game
+        index += 1
+        pos = i
+        if depth != 0:
+            return
+
+
 def block_format(pieces, width=79):
     """Concatenate strings, adding newlines.
 
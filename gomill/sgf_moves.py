@@ -1,6 +1,7 @@
 """Higher-level processing of moves and positions from SGF games."""
 
 from gomill import boards
+from gomill import sgf_grammar
 from gomill import sgf_properties
 
 
@@ -57,6 +58,111 @@ def get_setup_and_moves(sgf_game, board=None):
             moves.append((colour, sgf_properties.interpret_go_point(raw, size)))
     return board, moves
 
+class Main_line(object):
+    """Information from the 'leftmost' variation of an SGF game.
+
+    Public attributes:
+      size     -- int
+      komi     -- float
+      handicap -- int or None
+      setup    -- tuple (black_points, white_points, empty_points)
+      moves    -- list of pairs (colour, move)
+
+    See get_main_line() for details.
+
+    """
+
+def _get_single_value(properties, identifier):
+    values = properties[identifier]
+    if len(values) > 1:
+        raise ValueError("multiple values")
+    return values[0]
+
+def _get_point_set(properties, identifier, presenter):
+    try:
+        values = properties[identifier]
+    except KeyError:
+        return set()
+    if values == [""]:
+        values = []
+    return sgf_properties.interpret_point_list(values, presenter)
+
+def get_main_line(coarse_game):
+    """Extract the setup and moves from a Coarse_game_tree.
+
+    coarse_game -- sgf_grammar.Coarse_game_tree
+
+    Returns a Main_line.
+
+    This is a fast alternative to creating an Sgf_game and using
+    get_setup_and_moves(), for programs which load large numbers of games. It
+    reads the property maps directly, rather than building Tree_nodes.
+
+    size, komi, and handicap are as returned by Sgf_game.get_size(),
+    get_komi(), and get_handicap(). setup is as returned by
+    Tree_node.get_setup_stones() for the root node. moves is as returned by
+    get_setup_and_moves().
+
+    Raises ValueError in the same circumstances as those functions, except
+    that it doesn't check that the setup position is legal, or that the CA
+    property names a known encoding.
+
+    """
+    root = coarse_game.sequence[0]
+    try:
+        size_s = root['SZ'][0]
+    except KeyError:
+        size = 19
+    else:
+        try:
+            size = int(size_s)
+        except ValueError:
+            raise ValueError("bad SZ property: %s" % size_s)
+    if not 1 <= size <= 26:
+        raise ValueError("size out of range: %s" % size)
+    result = Main_line()
+    result.size = size
+    if 'KM' in root:
+        result.komi = sgf_properties.interpret_real(
+            _get_single_value(root, 'KM'))
+    else:
+        result.komi = 0.0
+    if 'HA' in root:
+        handicap = sgf_properties.interpret_number(
+            _get_single_value(root, 'HA'))
+        if handicap == 0:
+            handicap = None
+        elif handicap == 1:
+            raise ValueError
+    else:
+        handicap = None
+    result.handicap = handicap
+    # Only point lists are interpreted, so the encoding doesn't matter
+    presenter = sgf_properties.Presenter(size, "UTF-8")
+    ab = _get_point_set(root, 'AB', presenter)
+    aw = _get_point_set(root, 'AW', presenter)
+    ae = _get_point_set(root, 'AE', presenter)
+    result.setup = ab, aw, ae
+    nodes = sgf_grammar.main_sequence_iter(coarse_game)
+    if ab or aw:
+        if 'B' in root or 'W' in root:
+            raise ValueError("mixed setup and moves in root node")
+        nodes.next()
+    interpret_go_point = sgf_properties.interpret_go_point
+    moves = []
+    for properties in nodes:
+        if 'AB' in properties or 'AW' in properties or 'AE' in properties:
+            raise ValueError("setup properties after the root node")
+        values = properties.get('B')
+        if values is not None:
+            moves.append(('b', interpret_go_point(values[0], size)))
+            continue
+        values = properties.get('W')
+        if values is not None:
+            moves.append(('w', interpret_go_point(values[0], size)))
+    result.moves = moves
+    return result
+
 def set_initial_position(sgf_game, board):
     """Add setup stones to an Sgf_game reflecting a board position.
 
@@ -2,7 +2,11 @@
 
 from __future__ import division
 
+from array import array
+from math import exp, lgamma, log
+
 from gomill import ascii_tables
+from gomill import gtp_games
 from gomill.utils import format_float, format_percent
 from gomill.common import colour_name
 
@@ -20,8 +24,12 @@ class Matchup_description(object):
       handicap        -- int or None
       handicap_style  -- 'fixed' or 'free'
       move_limit      -- int
+      superko_rule    -- 'positional', 'situational', or None
       scorer          -- 'internal' or 'players'
       number_of_games -- int or None
+      sprt            -- Sprt or None
+      stop_on_confidence -- float or None
+      time_controls   -- gtp_games.Time_controls or None
 
     If alternating is False, player_1 plays black and player_2 plays white;
     otherwise they alternate.
@@ -33,7 +41,8 @@ class Matchup_description(object):
         """Return a text description of game settings.
 
         This covers the most important game settings which can't be observed
-        in the results table (board size, handicap, and komi).
+        in the results table (board size, handicap, komi, and any time
+        controls).
 
         """
         s = "board size: %s   " % self.board_size
@@ -41,6 +50,8 @@ class Matchup_description(object):
             s += "handicap: %s (%s)   " % (
                 self.handicap, self.handicap_style)
         s += "komi: %s" % self.komi
+        if self.time_controls is not None:
+            s += "   time: %s" % self.time_controls.describe()
         return s
 
 
@@ -52,9 +63,12 @@ class Tournament_results(object):
     settings. Each matchup has an id, which is a short string.
 
     """
-    def __init__(self, matchup_list, results):
+    def __init__(self, matchup_list, results, stopped_matchups=None):
         self.matchup_list = matchup_list
         self.results = results
+        if stopped_matchups is None:
+            stopped_matchups = {}
+        self.stopped_matchups = stopped_matchups
         self.matchups = dict((m.id, m) for m in matchup_list)
 
     def get_matchup_ids(self):
@@ -81,7 +95,7 @@ class Tournament_results(object):
         The Game_results all have game_id set.
 
         """
-        return self.results[matchup_id][:]
+        return list(self.results[matchup_id])
 
     def get_matchup_stats(self, matchup_id):
         """Return statistics for the specified matchup.
@@ -94,14 +108,427 @@ class Tournament_results(object):
                            matchup.player_1, matchup.player_2)
         ms.calculate_colour_breakdown()
         ms.calculate_time_stats()
+        ms.calculate_stopping_stats(matchup.sprt, matchup.stop_on_confidence)
+        if matchup_id in self.stopped_matchups:
+            ms.stop_reason = self.stopped_matchups[matchup_id]
         return ms
 
 
+def elo_to_score(elo):
+    """Return the expected score for a player the given Elo points stronger."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+class Sprt(object):
+    """Parameters for a sequential probability ratio test.
+
+    Instantiate with
+      elo0  -- float
+      elo1  -- float
+      alpha -- float (default 0.05)
+      beta  -- float (default 0.05)
+
+    The test is between the hypotheses that player_1 is elo0 Elo points
+    stronger than player_2 and that it is elo1 points stronger. alpha and
+    beta are the acceptable probabilities of accepting elo1 when elo0 is true
+    and vice versa.
+
+    Each game counts as a Bernoulli trial, with jigos counting as half a win
+    and half a loss.
+
+    Instantiation raises ValueError if the parameters are unreasonable.
+
+    """
+    def __init__(self, elo0, elo1, alpha=0.05, beta=0.05):
+        self.elo0 = float(elo0)
+        self.elo1 = float(elo1)
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        if self.elo0 == self.elo1:
+            raise ValueError("elo0 and elo1 are the same")
+        if not (0.0 < self.alpha < 1.0 and 0.0 < self.beta < 1.0):
+            raise ValueError("alpha and beta must be between 0.0 and 1.0")
+        if self.alpha + self.beta >= 1.0:
+            raise ValueError("alpha + beta must be less than 1.0")
+        s0 = elo_to_score(self.elo0)
+        s1 = elo_to_score(self.elo1)
+        self._win_llr = log(s1 / s0)
+        self._loss_llr = log((1 - s1) / (1 - s0))
+        self.lower_bound = log(self.beta / (1 - self.alpha))
+        self.upper_bound = log((1 - self.beta) / self.alpha)
+
+    def describe(self):
+        """Return a short text description of the parameters."""
+        return "elo0 %s, elo1 %s, alpha %s, beta %s" % (
+            format_float(self.elo0), format_float(self.elo1),
+            self.alpha, self.beta)
+
+    def get_llr(self, score_1, score_2):
+        """Return the log-likelihood ratio for the given results.
+
+        score_1 -- float (player_1's wins, counting jigos as half a win)
+        score_2 -- float (player_2's wins, counting jigos as half a win)
+
+        """
+        return score_1 * self._win_llr + score_2 * self._loss_llr
+
+    def get_decision(self, llr):
+        """Return the test's result for the specified log-likelihood ratio.
+
+        Returns 'elo0', 'elo1', or None if the test hasn't finished.
+
+        """
+        if llr >= self.upper_bound:
+            return 'elo1'
+        if llr <= self.lower_bound:
+            return 'elo0'
+        return None
+
+def _incomplete_beta_fraction(x, a, b):
+    # Continued fraction for the regularised incomplete beta function
+    # (modified Lentz's method).
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    if abs(d) < tiny:
+        d = tiny
+    d = 1.0 / d
+    h = d
+    for m in xrange(1, 1000):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((a + m2 - 1) * (a + m2))
+        for coefficient in (aa, -(a + m) * (a + b + m) * x /
+                                ((a + m2) * (a + m2 + 1))):
+            d = 1.0 + coefficient * d
+            if abs(d) < tiny:
+                d = tiny
+            c = 1.0 + coefficient / c
+            if abs(c) < tiny:
+                c = tiny
+            d = 1.0 / d
+            delta = c * d
+            h *= delta
+        if abs(delta - 1.0) < 1e-12:
+            break
+    return h
+
+def regularised_incomplete_beta(x, a, b):
+    """Return the regularised incomplete beta function I_x(a, b).
+
+    This is the cumulative distribution function of the beta distribution
+    with parameters a and b.
+
+    a and b must be positive; x must be in the range 0.0 to 1.0.
+
+    """
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = exp(lgamma(a + b) - lgamma(a) - lgamma(b) +
+                a * log(x) + b * log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _incomplete_beta_fraction(x, a, b) / a
+    return 1.0 - front * _incomplete_beta_fraction(1.0 - x, b, a) / b
+
+
+class Time_histogram(object):
+    """Compact summary of a collection of times.
+
+    Times are counted in logarithmically-spaced buckets, each 10% wider than
+    the last, so percentiles can be estimated (to within about 5%) without
+    keeping the individual times. The count, mean, and maximum are exact.
+
+    Public attributes (treat as read-only):
+      count -- int
+      total -- float
+      max   -- float or None
+
+    Time_histograms are suitable for pickling.
+
+    """
+    _base = 1e-4
+    _ratio = 1.1
+    _bucket_count = 224
+
+    def __init__(self):
+        self._counts = array('l', [0] * self._bucket_count)
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def _get_bucket(self, t):
+        if t < self._base:
+            return 0
+        return min(int(log(t / self._base) / log(self._ratio)) + 1,
+                   self._bucket_count - 1)
+
+    def add(self, t):
+        """Record a time.
+
+        t -- float (seconds)
+
+        """
+        self._counts[self._get_bucket(t)] += 1
+        self.count += 1
+        self.total += t
+        if self.max is None or t > self.max:
+            self.max = t
+
+    def add_times(self, times):
+        """Record a sequence of times."""
+        for t in times:
+            self.add(t)
+
+    def get_mean(self):
+        """Return the mean time, or None if there are no times."""
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def get_percentile(self, percent):
+        """Return an estimate of the specified percentile.
+
+        percent -- float from 0 to 100
+
+        Returns None if there are no times.
+
+        The result is never greater than the maximum time.
+
+        """
+        if not self.count:
+            return None
+        if percent >= 100:
+            return self.max
+        rank = max(1, percent * self.count / 100)
+        seen = 0
+        for bucket, n in enumerate(self._counts):
+            seen += n
+            if seen >= rank:
+                break
+        if bucket == 0:
+            estimate = self._base / 2
+        else:
+            estimate = self._base * self._ratio ** (bucket - 0.5)
+        return min(estimate, self.max)
+
+    def __getstate__(self):
+        return (self._counts.tostring(), self.count, self.total, self.max)
+
+    def __setstate__(self, state):
+        counts_s, self.count, self.total, self.max = state
+        self._counts = array('l', counts_s)
+
+    def __repr__(self):
+        return "<Time_histogram: %d times>" % self.count
+
+
+_NAN = float("nan")
+
+# Outcome codes (in Matchup_results._outcomes)
+_UNKNOWN, _BLACK_WINS, _WHITE_WINS, _JIGO = range(4)
+
+class Matchup_results(object):
+    """Compact store for the game results from a single matchup.
+
+    Instantiate with an optional sequence of gtp_games.Game_results.
+
+    The results are kept in parallel arrays (one entry per game) rather than as
+    Game_result objects, together with running totals which are updated as
+    each result is added. This means Matchup_stats can be calculated without
+    looking at the individual games.
+
+    This behaves like a list of Game_results, supporting len(), iteration,
+    indexing, and append(). The Game_result objects are recreated each time
+    they're retrieved (so don't modify them expecting the change to stick).
+
+    Per-move timings (Game_result.move_times) are only kept as a
+    Time_histogram for each player, so the retrieved Game_results have
+    move_times None.
+
+    All results must be for games between the same two players.
+
+    Public attributes (treat as read-only):
+      player_codes -- pair of player codes (or None if there are no results)
+
+    Matchup_results are suitable for pickling.
+
+    """
+    def __init__(self, game_results=()):
+        self.player_codes = None
+        # Per-game columns
+        # index into player_codes of the player who took Black
+        self._black = array('b')
+        self._outcomes = array('b')
+        self._forfeits = array('b')
+        # cpu times for each of player_codes; nan means unknown
+        self._cpu_times = (array('d'), array('d'))
+        self._sgf_results = []
+        self._game_ids = []
+        # map index -> detail string (most results have no detail)
+        self._details = {}
+        # Time_histograms for each of player_codes
+        self._genmove_times = (Time_histogram(), Time_histogram())
+        self._play_times = (Time_histogram(), Time_histogram())
+        self._set_totals()
+        for game_result in game_results:
+            self.append(game_result)
+
+    def _set_totals(self):
+        # _outcome_counts[i][outcome] -- games with player i taking black
+        self._outcome_counts = [[0] * 4, [0] * 4]
+        # _forfeit_counts[i] -- games lost by forfeit by player i
+        self._forfeit_counts = [0, 0]
+        self._cpu_totals = [0.0, 0.0]
+        self._cpu_counts = [0, 0]
+
+    def _add_to_totals(self, i):
+        black = self._black[i]
+        outcome = self._outcomes[i]
+        self._outcome_counts[black][outcome] += 1
+        if self._forfeits[i]:
+            if outcome == _BLACK_WINS:
+                self._forfeit_counts[1 - black] += 1
+            else:
+                self._forfeit_counts[black] += 1
+        for p in (0, 1):
+            t = self._cpu_times[p][i]
+            if t == t:
+                self._cpu_totals[p] += t
+                self._cpu_counts[p] += 1
+
+    def append(self, game_result):
+        """Add a result.
+
+        game_result -- gtp_games.Game_result
+
+        Raises ValueError if the result's players don't match the existing
+        results.
+
+        """
+        player_b = game_result.player_b
+        player_w = game_result.player_w
+        if self.player_codes is None:
+            self.player_codes = (player_b, player_w)
+        if player_b == self.player_codes[0]:
+            black = 0
+        else:
+            black = 1
+        if (player_b, player_w) != (self.player_codes[black],
+                                    self.player_codes[1 - black]):
+            raise ValueError("result is for different players")
+        if game_result.is_jigo:
+            outcome = _JIGO
+        elif game_result.winning_colour == 'b':
+            outcome = _BLACK_WINS
+        elif game_result.winning_colour == 'w':
+            outcome = _WHITE_WINS
+        else:
+            outcome = _UNKNOWN
+        self._black.append(black)
+        self._outcomes.append(outcome)
+        self._forfeits.append(bool(game_result.is_forfeit))
+        for p, player_code in enumerate(self.player_codes):
+            t = game_result.cpu_times.get(player_code)
+            if t is None:
+                t = _NAN
+            self._cpu_times[p].append(t)
+        if game_result.move_times is not None:
+            for p, player_code in enumerate(self.player_codes):
+                move_times = game_result.move_times.get(player_code)
+                if move_times is not None:
+                    self._genmove_times[p].add_times(move_times.genmove_times)
+                    self._play_times[p].add_times(move_times.play_times)
+        self._sgf_results.append(intern(game_result.sgf_result))
+        if game_result.detail is not None:
+            self._details[len(self._game_ids)] = game_result.detail
+        self._game_ids.append(game_result.game_id)
+        self._add_to_totals(len(self._game_ids) - 1)
+
+    def __len__(self):
+        return len(self._game_ids)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._game_ids)
+        if not 0 <= i < len(self._game_ids):
+            raise IndexError("result index out of range")
+        black = self._black[i]
+        player_b = self.player_codes[black]
+        player_w = self.player_codes[1 - black]
+        winning_colour = {_BLACK_WINS : 'b', _WHITE_WINS : 'w'}.get(
+            self._outcomes[i])
+        cpu_times = {}
+        for p, player_code in enumerate(self.player_codes):
+            t = self._cpu_times[p][i]
+            cpu_times[player_code] = (t if t == t else None)
+        game_result = gtp_games.Game_result()
+        game_result.__setstate__((
+            player_b,
+            player_w,
+            winning_colour,
+            self._sgf_results[i],
+            self._details.get(i),
+            bool(self._forfeits[i]),
+            self._game_ids[i],
+            cpu_times,
+            ))
+        return game_result
+
+    def __iter__(self):
+        for i in xrange(len(self._game_ids)):
+            yield self[i]
+
+    def __repr__(self):
+        return "<Matchup_results: %s %d games>" % (
+            self.player_codes, len(self._game_ids))
+
+    def __getstate__(self):
+        return (
+            self.player_codes,
+            self._black.tostring(),
+            self._outcomes.tostring(),
+            self._forfeits.tostring(),
+            self._cpu_times[0].tostring(),
+            self._cpu_times[1].tostring(),
+            self._sgf_results,
+            self._game_ids,
+            self._details,
+            self._genmove_times,
+            self._play_times,
+            )
+
+    def __setstate__(self, state):
+        (self.player_codes,
+         black_s,
+         outcomes_s,
+         forfeits_s,
+         cpu_times_0_s,
+         cpu_times_1_s,
+         sgf_results,
+         self._game_ids,
+         self._details,
+         ) = state[:9]
+        if len(state) > 9:
+            self._genmove_times, self._play_times = state[9:]
+        else:
+            self._genmove_times = (Time_histogram(), Time_histogram())
+            self._play_times = (Time_histogram(), Time_histogram())
+        self._black = array('b', black_s)
+        self._outcomes = array('b', outcomes_s)
+        self._forfeits = array('b', forfeits_s)
+        self._cpu_times = (array('d', cpu_times_0_s),
+                           array('d', cpu_times_1_s))
+        self._sgf_results = [intern(s) for s in sgf_results]
+        self._set_totals()
+        for i in xrange(len(self._game_ids)):
+            self._add_to_totals(i)
+
+
 class Matchup_stats(object):
     """Result statistics for games between a pair of players.
 
     Instantiate with
-      results  -- list of gtp_games.Game_results
+      results  -- Matchup_results, or list of gtp_games.Game_results
       player_1 -- player code
       player_2 -- player code
     The game results should all be for games between player_1 and player_2.
@@ -118,24 +545,39 @@ class Matchup_stats(object):
 
     scores are multiples of 0.5 (as there may be jigos).
 
+    The statistics are taken from the Matchup_results' running totals, so the
+    cost doesn't depend on the number of games.
+
     """
     def __init__(self, results, player_1, player_2):
+        if not isinstance(results, Matchup_results):
+            results = Matchup_results(results)
         self._results = results
         self.player_1 = player_1
         self.player_2 = player_2
 
+        # i1, i2 are indexes into results.player_codes
+        if results.player_codes is not None and \
+           results.player_codes[0] == player_2:
+            i1, i2 = 1, 0
+        else:
+            i1, i2 = 0, 1
+        self._i1 = i1
+        self._i2 = i2
+        counts = results._outcome_counts
+        self._counts_1b = counts_1b = counts[i1]
+        self._counts_2b = counts_2b = counts[i2]
+
         self.total = len(results)
 
-        js = self._jigo_score = 0.5 * sum(r.is_jigo for r in results)
-        self.unknown = sum(r.is_unknown for r in results)
+        js = self._jigo_score = 0.5 * (counts_1b[_JIGO] + counts_2b[_JIGO])
+        self.unknown = counts_1b[_UNKNOWN] + counts_2b[_UNKNOWN]
 
-        self.wins_1 = sum(r.winning_player == player_1 for r in results) + js
-        self.wins_2 = sum(r.winning_player == player_2 for r in results) + js
+        self.wins_1 = counts_1b[_BLACK_WINS] + counts_2b[_WHITE_WINS] + js
+        self.wins_2 = counts_2b[_BLACK_WINS] + counts_1b[_WHITE_WINS] + js
 
-        self.forfeits_1 = sum(r.winning_player == player_2 and r.is_forfeit
-                              for r in results)
-        self.forfeits_2 = sum(r.winning_player == player_1 and r.is_forfeit
-                              for r in results)
+        self.forfeits_1 = results._forfeit_counts[i1]
+        self.forfeits_2 = results._forfeit_counts[i2]
 
     def calculate_colour_breakdown(self):
         """Calculate futher statistics, broken down by colour played.
@@ -159,15 +601,14 @@ class Matchup_stats(object):
             colour_2 -- 'b' or 'w'
 
         """
-        results = self._results
-        player_1 = self.player_1
-        player_2 = self.player_2
+        counts_1b = self._counts_1b
+        counts_2b = self._counts_2b
         js = self._jigo_score
 
-        self.played_1b = sum(r.player_b == player_1 for r in results)
-        self.played_1w = sum(r.player_w == player_1 for r in results)
-        self.played_2b = sum(r.player_b == player_2 for r in results)
-        self.played_y2 = sum(r.player_w == player_2 for r in results)
+        self.played_1b = sum(counts_1b)
+        self.played_1w = sum(counts_2b)
+        self.played_2b = sum(counts_2b)
+        self.played_y2 = sum(counts_1b)
 
         if self.played_1w == 0 and self.played_2b == 0:
             self.alternating = False
@@ -179,42 +620,107 @@ class Matchup_stats(object):
             self.colour_2 = 'b'
         else:
             self.alternating = True
-            self.wins_b = sum(r.winning_colour == 'b' for r in results) + js
-            self.wins_w = sum(r.winning_colour == 'w' for r in results) + js
-            self.wins_1b = sum(
-                r.winning_player == player_1 and r.winning_colour == 'b'
-                for r in results) + js
-            self.wins_1w = sum(
-                r.winning_player == player_1 and r.winning_colour == 'w'
-                for r in results) + js
-            self.wins_2b = sum(
-                r.winning_player == player_2 and r.winning_colour == 'b'
-                for r in results) + js
-            self.wins_2w = sum(
-                r.winning_player == player_2 and r.winning_colour == 'w'
-                for r in results) + js
+            self.wins_b = (counts_1b[_BLACK_WINS] +
+                           counts_2b[_BLACK_WINS] + js)
+            self.wins_w = (counts_1b[_WHITE_WINS] +
+                           counts_2b[_WHITE_WINS] + js)
+            self.wins_1b = counts_1b[_BLACK_WINS] + js
+            self.wins_1w = counts_2b[_WHITE_WINS] + js
+            self.wins_2b = counts_2b[_BLACK_WINS] + js
+            self.wins_2w = counts_1b[_WHITE_WINS] + js
 
     def calculate_time_stats(self):
-        """Calculate CPU time statistics.
+        """Calculate CPU time and move time statistics.
 
-        average_time_1 -- float or None
-        average_time_2 -- float or None
+        average_time_1  -- float or None
+        average_time_2  -- float or None
+        genmove_times_1 -- Time_histogram or None
+        genmove_times_2 -- Time_histogram or None
+        play_times_1    -- Time_histogram or None
+        play_times_2    -- Time_histogram or None
+
+        genmove_times_n describes how long the player took to respond to each
+        genmove command; play_times_n describes the round-trip time for each
+        play command. These are None if no times were recorded. Treat them as
+        read-only.
 
         """
-        player_1 = self.player_1
-        player_2 = self.player_2
-        times_1 = [r.cpu_times[player_1] for r in self._results]
-        known_times_1 = [t for t in times_1 if t is not None]
-        times_2 = [r.cpu_times[player_2] for r in self._results]
-        known_times_2 = [t for t in times_2 if t is not None]
-        if known_times_1:
-            self.average_time_1 = sum(known_times_1) / len(known_times_1)
+        results = self._results
+        count_1 = results._cpu_counts[self._i1]
+        count_2 = results._cpu_counts[self._i2]
+        if count_1:
+            self.average_time_1 = results._cpu_totals[self._i1] / count_1
         else:
             self.average_time_1 = None
-        if known_times_2:
-            self.average_time_2 = sum(known_times_2) / len(known_times_2)
+        if count_2:
+            self.average_time_2 = results._cpu_totals[self._i2] / count_2
         else:
             self.average_time_2 = None
+        def nonempty(histogram):
+            if histogram.count:
+                return histogram
+            return None
+        self.genmove_times_1 = nonempty(results._genmove_times[self._i1])
+        self.genmove_times_2 = nonempty(results._genmove_times[self._i2])
+        self.play_times_1 = nonempty(results._play_times[self._i1])
+        self.play_times_2 = nonempty(results._play_times[self._i2])
+
+    def calculate_stopping_stats(self, sprt, stop_on_confidence):
+        """Calculate statistics for the early-stopping rules.
+
+        sprt               -- Sprt or None
+        stop_on_confidence -- float or None
+
+        Sets the following additional attributes:
+
+        sprt                   -- as passed in
+        sprt_llr               -- float or None
+        sprt_decision          -- 'elo0', 'elo1', or None
+        stop_on_confidence     -- as passed in
+        probability_1_stronger -- float or None
+        stop_reason            -- string or None
+
+        sprt_llr and sprt_decision are None if sprt is None.
+
+        probability_1_stronger is the posterior probability that player_1's
+        expected score against player_2 is more than 0.5 (from a uniform prior,
+        counting jigos as half a win). It is None if stop_on_confidence is
+        None.
+
+        stop_reason describes why the matchup should stop, or is None if the
+        results don't satisfy either rule. (Tournament_results and the
+        tournament's reports replace this with the reason recorded when the
+        matchup was stopped, if any.)
+
+        Unknown results are ignored.
+
+        """
+        score_1 = self.wins_1
+        score_2 = self.wins_2
+        self.sprt = sprt
+        self.stop_on_confidence = stop_on_confidence
+        self.stop_reason = None
+        if sprt is None:
+            self.sprt_llr = None
+            self.sprt_decision = None
+        else:
+            self.sprt_llr = sprt.get_llr(score_1, score_2)
+            self.sprt_decision = sprt.get_decision(self.sprt_llr)
+            if self.sprt_decision is not None:
+                self.stop_reason = "SPRT accepted %s" % self.sprt_decision
+        if stop_on_confidence is None:
+            self.probability_1_stronger = None
+        else:
+            p = 1.0 - regularised_incomplete_beta(
+                0.5, score_1 + 1, score_2 + 1)
+            self.probability_1_stronger = p
+            if self.stop_reason is None:
+                if p >= stop_on_confidence:
+                    self.stop_reason = "%s is stronger with %s confidence" % (
+                        self.player_1, format_percent(p, 1))
+                elif 1.0 - p >= stop_on_confidence:
+                    self.stop_reason = "%s is stronger with %s confidence" % (
+                        self.player_2, format_percent(1.0 - p, 1))
 
 
 def make_matchup_stats_table(ms):
@@ -307,4 +813,44 @@ def write_matchup_summary(out, matchup, ms):
 
     p(matchup.describe_details())
     p("\n".join(make_matchup_stats_table(ms).render()))
+    if ms.sprt is not None:
+        p("SPRT (%s): LLR %.2f (%.2f, %.2f)" % (
+            ms.sprt.describe(), ms.sprt_llr,
+            ms.sprt.lower_bound, ms.sprt.upper_bound))
+    if ms.probability_1_stronger is not None:
+        p("probability %s is stronger: %s" % (
+            ms.player_1, format_percent(ms.probability_1_stronger, 1)))
+    if ms.stop_reason is not None:
+        p("stopped: %s" % ms.stop_reason)
+
+def make_move_times_table(ms):
+    """Produce an ascii table showing per-move timing statistics.
+
+    ms -- Matchup_stats (with time statistics set)
+
+    returns an ascii_tables.Table, or None if no move times were recorded
+
+    The times are wall-clock seconds for each genmove command.
 
+    """
+    rows = [(player, histogram)
+            for (player, histogram) in [(ms.player_1, ms.genmove_times_1),
+                                        (ms.player_2, ms.genmove_times_2)]
+            if histogram is not None]
+    if not rows:
+        return None
+    t = ascii_tables.Table(row_count=len(rows))
+    t.add_heading("") # player name
+    i = t.add_column(align='left', right_padding=3)
+    t.set_column_values(i, [player for (player, _) in rows])
+    for heading, fn in [
+        ("moves", lambda h: "%d" % h.count),
+        ("mean", lambda h: "%.2f" % h.get_mean()),
+        ("p50", lambda h: "%.2f" % h.get_percentile(50)),
+        ("p95", lambda h: "%.2f" % h.get_percentile(95)),
+        ("max", lambda h: "%.2f" % h.max),
+        ]:
+        t.add_heading(heading)
+        i = t.add_column(align='right', right_padding=2)
+        t.set_column_values(i, [fn(h) for (_, h) in rows])
+    return t
@@ -3,6 +3,7 @@
 from collections import defaultdict
 
 from gomill import game_jobs
+from gomill import gtp_games
 from gomill import competition_schedulers
 from gomill import tournament_results
 from gomill import competitions
@@ -11,13 +12,38 @@ from gomill.competitions import (
 from gomill.settings import *
 from gomill.utils import format_percent
 
+def interpret_sprt(v):
+    if not isinstance(v, tournament_results.Sprt):
+        raise ValueError("invalid SPRT specification")
+    return v
+
+def interpret_time_controls(v):
+    if not isinstance(v, gtp_games.Time_controls):
+        raise ValueError("invalid time controls specification")
+    return v
+
+def interpret_confidence(f):
+    f = interpret_float(f)
+    if not 0.5 < f < 1.0:
+        raise ValueError("must be between 0.5 and 1.0")
+    return f
+
 # These all appear as Matchup_description attributes
 matchup_settings = competitions.game_settings + [
     Setting('alternating', interpret_bool, default=False),
     Setting('number_of_games', allow_none(interpret_int), default=None),
+    Setting('sprt', allow_none(interpret_sprt), default=None),
+    Setting('stop_on_confidence', allow_none(interpret_confidence),
+            default=None),
+    Setting('time_controls', allow_none(interpret_time_controls),
+            default=None),
     ]
 
 
+class Time_controls(Config_proxy):
+    underlying = gtp_games.Time_controls
+
+
 class Matchup(tournament_results.Matchup_description):
     """Internal description of a matchup from the configuration file.
 
@@ -91,6 +117,8 @@ class Ghost_matchup(object):
         self.player_2 = player_2
         self.name = "%s v %s" % (player_1, player_2)
         self.number_of_games = None
+        self.sprt = None
+        self.stop_on_confidence = None
 
     def describe_details(self):
         return "?? (missing from control file)"
@@ -105,6 +133,12 @@ class Tournament(Competition):
         self.working_matchups = set()
         self.probationary_matchups = set()
 
+    global_settings = Competition.global_settings + [
+        Setting('scheduling_policy',
+                interpret_enum('balanced', 'uncertainty'),
+                default='balanced'),
+        ]
+
     def make_matchup(self, matchup_id, player_1, player_2, parameters,
                      name=None):
         """Make a Matchup from the various parameters.
@@ -122,10 +156,12 @@ class Tournament(Competition):
 
 
     # State attributes (*: in persistent state):
-    #  *results               -- map matchup id -> list of Game_results
+    #  *results               -- map matchup id -> Matchup_results
     #  *scheduler             -- Group_scheduler (group codes are matchup ids)
     #  *engine_names          -- map player code -> string
     #  *engine_descriptions   -- map player code -> string
+    #  *stopped_matchups      -- map matchup id -> stop reason (string)
+    #       (matchups whose early-stopping rule has concluded)
     #   working_matchups      -- set of matchup ids
     #       (matchups which have successfully completed a game in this run)
     #   probationary_matchups -- set of matchup ids
@@ -151,8 +187,7 @@ class Tournament(Competition):
             results = self.results[matchup.id]
             if not results:
                 continue
-            result = results[0]
-            seen_players = sorted(result.players.itervalues())
+            seen_players = sorted(results.player_codes)
             expected_players = sorted((matchup.player_1, matchup.player_2))
             if seen_players != expected_players:
                 raise CompetitionError(
@@ -169,24 +204,77 @@ class Tournament(Competition):
         for matchup_id, results in self.results.iteritems():
             if matchup_id in live:
                 continue
-            result = results[0]
             # player_1 and player_2 might not be the right way round, but it
             # doesn't matter.
+            player_1, player_2 = results.player_codes
             self.ghost_matchups[matchup_id] = Ghost_matchup(
-                matchup_id, result.player_b, result.player_w)
+                matchup_id, player_1, player_2)
 
     def _set_scheduler_groups(self):
         self.scheduler.set_groups(
-            [(m.id, m.number_of_games) for m in self.matchup_list] +
+            [(m.id, 0 if m.id in self.stopped_matchups else m.number_of_games)
+             for m in self.matchup_list] +
             [(id, 0) for id in self.ghost_matchups])
 
+    def _get_scheduling_results(self, matchup_id):
+        # For competition_schedulers.Uncertainty_policy
+        matchup = self.matchups[matchup_id]
+        results = self.results.get(matchup_id)
+        if not results:
+            return 0, 0
+        ms = tournament_results.Matchup_stats(
+            results, matchup.player_1, matchup.player_2)
+        return ms.wins_1, ms.total - ms.unknown
+
+    def _set_scheduling_policy(self):
+        if self.scheduling_policy == 'uncertainty':
+            policy = competition_schedulers.Uncertainty_policy(
+                self._get_scheduling_results)
+        else:
+            policy = None
+        self.scheduler.set_policy(policy)
+
+    def _get_stopping_stats(self, matchup):
+        ms = tournament_results.Matchup_stats(
+            self.results[matchup.id], matchup.player_1, matchup.player_2)
+        ms.calculate_stopping_stats(matchup.sprt, matchup.stop_on_confidence)
+        return ms
+
+    def _check_stopping_rule(self, matchup_id):
+        """Check whether a matchup's early-stopping rule has concluded.
+
+        Returns the stop reason (see Matchup_stats.calculate_stopping_stats),
+        or None if the matchup should continue (or has already stopped).
+
+        If the rule has concluded, records the matchup in stopped_matchups but
+        doesn't update the scheduler.
+
+        Once a matchup has stopped, it stays stopped (even if results from
+        games which were already in progress mean the rule would no longer
+        be satisfied).
+
+        """
+        if matchup_id in self.stopped_matchups:
+            return None
+        matchup = self.matchups.get(matchup_id)
+        if matchup is None:
+            return None
+        if matchup.sprt is None and matchup.stop_on_confidence is None:
+            return None
+        stop_reason = self._get_stopping_stats(matchup).stop_reason
+        if stop_reason is not None:
+            self.stopped_matchups[matchup_id] = stop_reason
+        return stop_reason
+
     def set_clean_status(self):
-        self.results = defaultdict(list)
+        self.results = defaultdict(tournament_results.Matchup_results)
         self.engine_names = {}
         self.engine_descriptions = {}
         self.scheduler = competition_schedulers.Group_scheduler()
         self.ghost_matchups = {}
+        self.stopped_matchups = {}
         self._set_scheduler_groups()
+        self._set_scheduling_policy()
 
     def get_status(self):
         return {
@@ -194,14 +282,36 @@ class Tournament(Competition):
             'scheduler' : self.scheduler,
             'engine_names' : self.engine_names,
             'engine_descriptions' : self.engine_descriptions,
+            'stopped_matchups' : self.stopped_matchups,
             }
 
     def set_status(self, status):
-        self.results = status['results']
+        self.results = defaultdict(tournament_results.Matchup_results)
+        for matchup_id, results in status['results'].iteritems():
+            if not results:
+                continue
+            if not isinstance(results, tournament_results.Matchup_results):
+                # Older state files have lists of Game_results
+                results = tournament_results.Matchup_results(results)
+            self.results[matchup_id] = results
         self._check_results()
         self._set_ghost_matchups()
+        # Forget stopped matchups whose stopping rules have been removed from
+        # the control file.
+        self.stopped_matchups = {}
+        for matchup_id, stop_reason in \
+                status.get('stopped_matchups', {}).iteritems():
+            matchup = self.matchups.get(matchup_id)
+            if matchup is None:
+                continue
+            if matchup.sprt is None and matchup.stop_on_confidence is None:
+                continue
+            self.stopped_matchups[matchup_id] = stop_reason
+        for matchup in self.matchup_list:
+            self._check_stopping_rule(matchup.id)
         self.scheduler = status['scheduler']
         self._set_scheduler_groups()
+        self._set_scheduling_policy()
         self.scheduler.rollback()
         self.engine_names = status['engine_names']
         self.engine_descriptions = status['engine_descriptions']
@@ -226,20 +336,30 @@ class Tournament(Competition):
         job.board_size = matchup.board_size
         job.komi = matchup.komi
         job.move_limit = matchup.move_limit
+        job.superko_rule = matchup.superko_rule
+        job.time_controls = matchup.time_controls
         job.handicap = matchup.handicap
         job.handicap_is_free = (matchup.handicap_style == 'free')
         job.use_internal_scorer = (matchup.scorer == 'internal')
         job.internal_scorer_handicap_compensation = \
             matchup.internal_scorer_handicap_compensation
+        job.internal_scorer_dead_stones = matchup.internal_scorer_dead_stones
+        job.internal_scorer_min_life_area = \
+            matchup.internal_scorer_min_life_area
         job.sgf_event = matchup.event_description
         return job
 
-    def process_game_result(self, response):
+    supports_status_journal = True
+
+    def _record_engine_descriptions(self, response):
         for player_code, ed in response.engine_descriptions.iteritems():
             self.engine_names[player_code] = \
                 ed.get_short_description() or "[no name available]"
             self.engine_descriptions[player_code] = \
                 ed.get_long_description() or "[no description available]"
+
+    def process_game_result(self, response):
+        self._record_engine_descriptions(response)
         matchup_id, game_number = response.game_data
         game_id = response.game_id
         self.working_matchups.add(matchup_id)
@@ -247,6 +367,29 @@ class Tournament(Competition):
         self.scheduler.fix(matchup_id, game_number)
         self.results[matchup_id].append(response.game_result)
         self.log_history("%7s %s" % (game_id, response.game_result.describe()))
+        stop_reason = self._check_stopping_rule(matchup_id)
+        if stop_reason is not None:
+            self._set_scheduler_groups()
+            self.log_history("matchup %s stopped: %s" %
+                             (matchup_id, stop_reason))
+
+    def replay_game_result(self, response):
+        self._record_engine_descriptions(response)
+        matchup_id, game_number = response.game_data
+        results = self.results[matchup_id]
+        results.append(response.game_result)
+        if len(results) == 1:
+            self._check_results()
+            if matchup_id not in self.matchups:
+                self._set_ghost_matchups()
+                self._set_scheduler_groups()
+        try:
+            self.scheduler.replay_fix(matchup_id, game_number)
+        except ValueError:
+            raise CompetitionError(
+                "game %s is recorded twice" % response.game_id)
+        if self._check_stopping_rule(matchup_id) is not None:
+            self._set_scheduler_groups()
 
     def process_game_error(self, job, previous_error_count):
         # ignoring previous_error_count, as we can consider all jobs for the
@@ -265,7 +408,7 @@ class Tournament(Competition):
     def write_matchup_report(self, out, matchup, results):
         """Write the summary block for the specified matchup to 'out'
 
-        results -- nonempty list of Game_results
+        results -- nonempty Matchup_results
 
         """
         # The control file might have changed since the results were recorded.
@@ -279,6 +422,9 @@ class Tournament(Competition):
             results, matchup.player_1, matchup.player_2)
         ms.calculate_colour_breakdown()
         ms.calculate_time_stats()
+        ms.calculate_stopping_stats(matchup.sprt, matchup.stop_on_confidence)
+        if matchup.id in self.stopped_matchups:
+            ms.stop_reason = self.stopped_matchups[matchup.id]
         tournament_results.write_matchup_summary(out, matchup, ms)
 
     def write_matchup_reports(self, out):
@@ -309,6 +455,30 @@ class Tournament(Competition):
             results = self.results[matchup_id]
             self.write_matchup_report(out, matchup, results)
 
+    def write_move_time_reports(self, out):
+        """Write per-move timing tables for all live matchups to 'out'.
+
+        (This may produce no output. Starts with a blank line otherwise.)
+
+        """
+        first = True
+        for matchup in self.matchup_list:
+            results = self.results[matchup.id]
+            if not results:
+                continue
+            ms = tournament_results.Matchup_stats(
+                results, matchup.player_1, matchup.player_2)
+            ms.calculate_time_stats()
+            table = tournament_results.make_move_times_table(ms)
+            if table is None:
+                continue
+            if first:
+                print >>out
+                print >>out, "genmove times (seconds):"
+                first = False
+            print >>out, "%s:" % matchup.name
+            print >>out, "\n".join(table.render())
+
     def write_player_descriptions(self, out):
         """Write descriptions of all players to 'out'."""
         for code, description in sorted(self.engine_descriptions.items()):
@@ -316,5 +486,5 @@ class Tournament(Competition):
 
     def get_tournament_results(self):
         return tournament_results.Tournament_results(
-            self.matchup_list, self.results)
+            self.matchup_list, self.results, self.stopped_matchups)
 
@@ -0,0 +1,129 @@
+"""Compare the speed of the boards.Board implementations.
+
+Run from the distribution directory, eg:
+  python -m gomill_benchmarks.board_benchmark
+
+This generates random games on 9x9, 13x13 and 19x19 boards, and times
+replaying their moves on each board class.
+
+It also times finding the legal moves in each position of the first few
+games: by playing each candidate move on a copy of the board, and using
+legal_move_mask().
+
+"""
+
+import random
+import sys
+import time
+from optparse import OptionParser
+
+from gomill.common import opponent_of
+from gomill import boards
+
+board_classes = [
+    boards.Board,
+    boards.Incremental_board,
+    ]
+
+def make_random_game(size, rnd):
+    """Generate a random game.
+
+    Returns a list of pairs (colour, (row, col))
+
+    The moves never fill a player's own eyes or retake a simple ko, so games
+    come to an end of their own accord.
+
+    """
+    board = boards.Board(size)
+    moves = []
+    colour = 'b'
+    ko_point = None
+    consecutive_passes = 0
+    while consecutive_passes < 2 and len(moves) < size * size * 3:
+        candidates = []
+        for (row, col) in board.board_points:
+            if board.get(row, col) is not None or (row, col) == ko_point:
+                continue
+            neighbours = [board.get(r, c) for (r, c) in
+                          ((row-1, col), (row+1, col),
+                           (row, col-1), (row, col+1))
+                          if 0 <= r < size and 0 <= c < size]
+            if all(n == colour for n in neighbours):
+                continue
+            candidates.append((row, col))
+        if candidates:
+            row, col = rnd.choice(candidates)
+            ko_point = board.play(row, col, colour)
+            moves.append((colour, (row, col)))
+            consecutive_passes = 0
+        else:
+            ko_point = None
+            consecutive_passes += 1
+        colour = opponent_of(colour)
+    return moves
+
+def replay_games(board_class, size, games):
+    for moves in games:
+        board = board_class(size)
+        for colour, (row, col) in moves:
+            board.play(row, col, colour)
+        board.area_score()
+
+def legal_moves_by_copying(board, colour):
+    result = []
+    for (row, col) in board.board_points:
+        if board.get(row, col) is not None:
+            continue
+        b = board.copy()
+        b.play(row, col, colour)
+        if b.get(row, col) is not None:
+            result.append((row, col))
+    return result
+
+def time_legal_moves(board_class, size, games, method):
+    positions = 0
+    start = time.time()
+    for moves in games:
+        board = board_class(size)
+        for colour, (row, col) in moves:
+            if method == 'copy':
+                legal_moves_by_copying(board, colour)
+            else:
+                board.legal_move_mask(colour)
+            board.play(row, col, colour)
+            positions += 1
+    return positions, time.time() - start
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("--games", type="int", default=20,
+                      help="number of games for each board size")
+    parser.add_option("--legal-games", type="int", default=1,
+                      help="number of games for timing legal moves")
+    parser.add_option("--seed", type="int", default=1)
+    (options, args) = parser.parse_args(argv)
+    if args:
+        parser.error("too many arguments")
+    rnd = random.Random(options.seed)
+    for size in (9, 13, 19):
+        games = [make_random_game(size, rnd) for _ in xrange(options.games)]
+        move_count = sum(len(moves) for moves in games)
+        print "%dx%d: %d games, %d moves" % (
+            size, size, len(games), move_count)
+        for board_class in board_classes:
+            start = time.time()
+            replay_games(board_class, size, games)
+            elapsed = time.time() - start
+            print "  %-20s %7.3fs  %8.1f moves/s" % (
+                board_class.__name__, elapsed, move_count / elapsed)
+        legal_games = games[:options.legal_games]
+        for board_class in board_classes:
+            for method in ('copy', 'mask'):
+                positions, elapsed = time_legal_moves(
+                    board_class, size, legal_games, method)
+                print "  %-20s %-5s %7.3fs  %8.1f positions/s" % (
+                    board_class.__name__, method, elapsed,
+                    positions / elapsed)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
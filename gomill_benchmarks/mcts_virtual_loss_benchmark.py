@@ -0,0 +1,95 @@
+"""Measure the effect of virtual loss on the MCTS tuner with parallel games.
+
+Run from the distribution directory, eg:
+  python -m gomill_benchmarks.mcts_virtual_loss_benchmark
+
+This runs the tuner's Tree and Simulation classes against a simulated
+candidate whose win rate depends on a single parameter, keeping a fixed
+number of games in progress (as the ringmaster does with several workers).
+Games finish in random order.
+
+For each number of workers and virtual_loss setting it reports, averaged over
+the trials:
+  games  -- games played before the tuner's best parameter is within the
+            tolerance of the optimum for the rest of the run
+  rounds -- the same, divided by the number of workers (ie, elapsed time
+            measured in game lengths)
+  error  -- distance of the best parameter from the optimum at the end
+
+"""
+
+from __future__ import division
+
+import random
+import sys
+from optparse import OptionParser
+
+from gomill import mcts_tuners
+
+OPTIMUM = 0.7
+
+def win_rate(x):
+    """Candidate's win rate for optimiser parameter x."""
+    return 0.8 - 1.5 * abs(x - OPTIMUM)
+
+def run_trial(workers, virtual_loss, games, tolerance, rnd):
+    tree = mcts_tuners.Tree(
+        splits=[8],
+        max_depth=2,
+        exploration_coefficient=0.2,
+        initial_visits=10,
+        initial_wins=5,
+        parameter_formatter=str,
+        virtual_loss=virtual_loss,
+        )
+    tree.new_root()
+    in_progress = []
+    started = 0
+    last_bad = 0
+    for played in xrange(1, games + 1):
+        while len(in_progress) < workers and started < games:
+            simulation = mcts_tuners.Simulation(tree)
+            simulation.run()
+            in_progress.append(simulation)
+            started += 1
+        simulation = in_progress.pop(rnd.randrange(len(in_progress)))
+        [x] = simulation.get_parameters()
+        simulation.update_stats(rnd.random() < win_rate(x))
+        [best] = tree.retrieve_best_parameters()
+        if abs(best - OPTIMUM) > tolerance:
+            last_bad = played
+    return last_bad, abs(best - OPTIMUM)
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("--games", type="int", default=2000,
+                      help="number of games in each trial")
+    parser.add_option("--trials", type="int", default=20)
+    parser.add_option("--tolerance", type="float", default=0.05)
+    parser.add_option("--seed", type="int", default=1)
+    (options, args) = parser.parse_args(argv)
+    if args:
+        parser.error("too many arguments")
+    print "%7s %12s %8s %8s %7s" % (
+        "workers", "virtual_loss", "games", "rounds", "error")
+    for workers in (1, 4, 16, 64):
+        for virtual_loss in (0, 1, 3):
+            if workers == 1 and virtual_loss != 0:
+                continue
+            # Simulation uses the random module for tie-breaking
+            random.seed(options.seed)
+            rnd = random.Random(options.seed)
+            total_games = 0
+            total_error = 0.0
+            for _ in xrange(options.trials):
+                games, error = run_trial(workers, virtual_loss, options.games,
+                                         options.tolerance, rnd)
+                total_games += games
+                total_error += error
+            games = total_games / options.trials
+            print "%7d %12d %8.1f %8.1f %7.3f" % (
+                workers, virtual_loss, games, games / workers,
+                total_error / options.trials)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
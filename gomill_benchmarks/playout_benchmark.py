@@ -0,0 +1,87 @@
+"""Compare batched NumPy playouts with playing random games one at a time.
+
+Run from the distribution directory, eg:
+  python -m gomill_benchmarks.playout_benchmark
+
+For each board size, this times playouts.Playout_batch against the same
+random-move policy implemented with Incremental_board.legal_moves().
+
+"""
+
+from __future__ import division
+
+import random
+import sys
+import time
+from optparse import OptionParser
+
+from gomill.common import opponent_of
+from gomill import boards
+from gomill import playouts
+
+def is_own_eye(board, row, col, colour):
+    for (r, c) in ((row-1, col), (row+1, col), (row, col-1), (row, col+1)):
+        if 0 <= r < board.side and 0 <= c < board.side:
+            if board.get(r, c) != colour:
+                return False
+    return True
+
+def play_game(size, rnd):
+    """Play a random game with the same policy as Playout_batch.
+
+    Returns the number of moves (including passes).
+
+    """
+    board = boards.Incremental_board(size)
+    colour = 'b'
+    ko_point = None
+    consecutive_passes = 0
+    move_count = 0
+    while consecutive_passes < 2 and move_count < size * size * 3:
+        candidates = [(row, col) for (row, col)
+                      in board.legal_moves(colour, ko_point)
+                      if not is_own_eye(board, row, col, colour)]
+        if candidates:
+            row, col = rnd.choice(candidates)
+            ko_point = board.play(row, col, colour)
+            consecutive_passes = 0
+        else:
+            ko_point = None
+            consecutive_passes += 1
+        move_count += 1
+        colour = opponent_of(colour)
+    return move_count
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("--games", type="int", default=200,
+                      help="number of games in each batch")
+    parser.add_option("--serial-games", type="int", default=10,
+                      help="number of games to play one at a time")
+    parser.add_option("--seed", type="int", default=1)
+    (options, args) = parser.parse_args(argv)
+    if args:
+        parser.error("too many arguments")
+    if not playouts.numpy_available():
+        parser.error("numpy not available")
+    rnd = random.Random(options.seed)
+    for size in (9, 13, 19):
+        start = time.time()
+        move_count = sum(play_game(size, rnd)
+                         for _ in xrange(options.serial_games))
+        elapsed = time.time() - start
+        print "%dx%d" % (size, size)
+        print "  %-20s %5d games %7.3fs  %8.1f moves/s" % (
+            "Incremental_board", options.serial_games, elapsed,
+            move_count / elapsed)
+        start = time.time()
+        batch = playouts.Playout_batch(size, options.games, seed=options.seed)
+        batch.run()
+        elapsed = time.time() - start
+        move_count = sum(len(batch.get_moves(i))
+                         for i in xrange(batch.count))
+        print "  %-20s %5d games %7.3fs  %8.1f moves/s" % (
+            "Playout_batch", options.games, elapsed, move_count / elapsed)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,63 @@
+"""Compare the speed of the area scoring implementations.
+
+Run from the distribution directory, eg:
+  python -m gomill_benchmarks.scoring_benchmark
+
+This generates random games on 9x9, 13x13 and 19x19 boards, and times scoring
+their final positions one at a time and using boards.area_scores().
+
+"""
+
+import random
+import sys
+import time
+from optparse import OptionParser
+
+from gomill import boards
+from gomill_benchmarks.board_benchmark import make_random_game
+
+def make_positions(size, count, rnd):
+    """Return the final positions of some random games."""
+    result = []
+    for _ in xrange(count):
+        board = boards.Board(size)
+        for colour, (row, col) in make_random_game(size, rnd):
+            board.play(row, col, colour)
+        result.append(board)
+    return result
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("--games", type="int", default=200,
+                      help="number of positions for each board size")
+    parser.add_option("--repeat", type="int", default=5,
+                      help="number of times to score each position")
+    parser.add_option("--seed", type="int", default=1)
+    (options, args) = parser.parse_args(argv)
+    if args:
+        parser.error("too many arguments")
+    rnd = random.Random(options.seed)
+    scorers = [
+        ("area_score", lambda positions:
+         [board.area_score() for board in positions]),
+        ("area_scores", lambda positions:
+         boards.area_scores(positions, use_numpy=False)),
+        ]
+    if boards.numpy_available():
+        scorers.append(
+            ("area_scores (numpy)", lambda positions:
+             boards.area_scores(positions, use_numpy=True)))
+    for size in (9, 13, 19):
+        positions = make_positions(size, options.games, rnd)
+        count = len(positions) * options.repeat
+        print "%dx%d: %d positions" % (size, size, len(positions))
+        for name, scorer in scorers:
+            start = time.time()
+            for _ in xrange(options.repeat):
+                scorer(positions)
+            elapsed = time.time() - start
+            print "  %-20s %7.3fs  %8.1f positions/s" % (
+                name, elapsed, count / elapsed)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,169 @@
+"""Compare the speed of the SGF parser with a token-list parser.
+
+Run from the distribution directory, eg:
+  python -m gomill_benchmarks.sgf_parse_benchmark [<pathname> ...]
+
+The pathnames may be SGF files (which may contain collections) or directories
+(which are searched recursively for .sgf files). If no pathnames are given,
+this uses a corpus of randomly generated game records.
+
+This times parsing every game in the corpus with sgf_grammar, and with the
+previous implementation, which builds the complete token list with
+sgf_grammar.tokenise() before parsing it.
+
+"""
+
+import os
+import random
+import sys
+import time
+from optparse import OptionParser
+
+from gomill import sgf_grammar
+from gomill import sgf_properties
+
+
+def parse_sgf_game_from_tokens(s, start_position):
+    """Previous implementation of sgf_grammar._parse_sgf_game()."""
+    tokens, end_position = sgf_grammar.tokenise(s, start_position)
+    if not tokens:
+        return None, None
+    stack = []
+    game_tree = None
+    sequence = None
+    properties = None
+    index = 0
+    try:
+        while True:
+            token_type, token = tokens[index]
+            index += 1
+            if token_type == 'V':
+                raise ValueError("unexpected value")
+            if token_type == 'D':
+                if token == ';':
+                    if sequence is None:
+                        raise ValueError("unexpected node")
+                    properties = {}
+                    sequence.append(properties)
+                else:
+                    if sequence is not None:
+                        if not sequence:
+                            raise ValueError("empty sequence")
+                        game_tree.sequence = sequence
+                        sequence = None
+                    if token == '(':
+                        stack.append(game_tree)
+                        game_tree = sgf_grammar.Coarse_game_tree()
+                        sequence = []
+                    else:
+                        # token == ')'
+                        variation = game_tree
+                        game_tree = stack.pop()
+                        if game_tree is None:
+                            break
+                        game_tree.children.append(variation)
+                    properties = None
+            else:
+                # token_type == 'I'
+                prop_ident = token
+                prop_values = []
+                while True:
+                    token_type, token = tokens[index]
+                    if token_type != 'V':
+                        break
+                    index += 1
+                    prop_values.append(token)
+                if not prop_values:
+                    raise ValueError("property with no values")
+                try:
+                    if prop_ident in properties:
+                        properties[prop_ident] += prop_values
+                    else:
+                        properties[prop_ident] = prop_values
+                except TypeError:
+                    raise ValueError("property value outside a node")
+    except IndexError:
+        raise ValueError("unexpected end of SGF data")
+    assert index == len(tokens)
+    return variation, end_position
+
+parsers = [
+    ("token list", parse_sgf_game_from_tokens),
+    ("single pass", sgf_grammar._parse_sgf_game),
+    ]
+
+
+def make_random_corpus(count, rnd):
+    """Return a list of SGF strings for randomly generated 19x19 games."""
+    result = []
+    for i in xrange(count):
+        game_tree = sgf_grammar.Coarse_game_tree()
+        game_tree.sequence.append({
+            'FF' : ["4"], 'GM' : ["1"], 'SZ' : ["19"], 'KM' : ["7.5"],
+            'PB' : ["Black player %d" % i], 'PW' : ["White player %d" % i],
+            })
+        for move_number in xrange(rnd.randrange(150, 300)):
+            move = (rnd.randrange(19), rnd.randrange(19))
+            properties = {"BW"[move_number % 2] : [
+                sgf_properties.serialise_go_point(move, 19)]}
+            if move_number % 20 == 0:
+                properties['C'] = [
+                    "Move %d [comment\\]" % (move_number + 1)]
+            game_tree.sequence.append(properties)
+        result.append(sgf_grammar.serialise_game_tree(game_tree))
+    return result
+
+def read_corpus(pathnames):
+    """Return a list of SGF strings (one per file)."""
+    result = []
+    for pathname in pathnames:
+        if os.path.isdir(pathname):
+            for dirpath, dirnames, filenames in os.walk(pathname):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(".sgf"):
+                        result += read_corpus(
+                            [os.path.join(dirpath, filename)])
+        else:
+            with open(pathname, "rb") as f:
+                result.append(f.read())
+    return result
+
+def parse_corpus(parse_fn, corpus):
+    """Parse all games in the corpus; return the number of games."""
+    game_count = 0
+    for s in corpus:
+        position = 0
+        while True:
+            try:
+                game_tree, position = parse_fn(s, position)
+            except ValueError:
+                break
+            if game_tree is None:
+                break
+            game_count += 1
+    return game_count
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options] [<pathname> ...]")
+    parser.add_option("--games", type="int", default=200,
+                      help="number of random games if no files are given")
+    parser.add_option("--repeat", type="int", default=3,
+                      help="number of times to parse the corpus")
+    parser.add_option("--seed", type="int", default=1)
+    (options, args) = parser.parse_args(argv)
+    if args:
+        corpus = read_corpus(args)
+    else:
+        corpus = make_random_corpus(options.games, random.Random(options.seed))
+    byte_count = sum(len(s) for s in corpus)
+    print "%d files, %.1f MB" % (len(corpus), byte_count / 1e6)
+    for name, parse_fn in parsers:
+        start = time.time()
+        for _ in xrange(options.repeat):
+            game_count = parse_corpus(parse_fn, corpus)
+        elapsed = (time.time() - start) / options.repeat
+        print "  %-12s %7.3fs  %8.1f games/s  %6.2f MB/s" % (
+            name, elapsed, game_count / elapsed, byte_count / elapsed / 1e6)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,6 +2,9 @@
 
 This demonstrates the parsing functions from the sgf_grammar module.
 
+The file is read a chunk at a time, so it can be larger than the available
+memory. Games which can't be parsed are reported and skipped.
+
 """
 
 import os
@@ -12,23 +15,35 @@ from gomill import sgf_grammar
 from gomill import sgf
 
 def split_sgf_collection(pathname):
-    f = open(pathname)
-    sgf_src = f.read()
-    f.close()
     dirname, basename = os.path.split(pathname)
     root, ext = os.path.splitext(basename)
-    try:
-        coarse_games = sgf_grammar.parse_sgf_collection(sgf_src)
-    except ValueError, e:
-        raise StandardError("error parsing file: %s" % e)
-    for i, coarse_game in enumerate(coarse_games):
-        sgf_game = sgf.Sgf_game.from_coarse_game_tree(coarse_game)
-        sgf_game.get_root().add_comment_text(
-            "Split from %s (game %d)" % (basename, i+1))
-        split_pathname = os.path.join(dirname, "%s_%d%s" % (root, i+1, ext))
-        with open(split_pathname, "wb") as f:
-            f.write(sgf_game.serialise())
-
+    game_count = 0
+    with open(pathname, "rb") as f:
+        for coarse_game in sgf_grammar.iter_sgf_collection(f):
+            game_count += 1
+            i = coarse_game.index
+            if coarse_game.error is not None:
+                print >>sys.stderr, (
+                    "skipping game %d (bytes %d-%d): %s" %
+                    (i+1, coarse_game.offset, coarse_game.end,
+                     coarse_game.error))
+                continue
+            try:
+                sgf_game = sgf.Sgf_game.from_coarse_game_tree(
+                    coarse_game.game_tree)
+            except ValueError, e:
+                print >>sys.stderr, (
+                    "skipping game %d (bytes %d-%d): %s" %
+                    (i+1, coarse_game.offset, coarse_game.end, e))
+                continue
+            sgf_game.get_root().add_comment_text(
+                "Split from %s (game %d)" % (basename, i+1))
+            split_pathname = os.path.join(
+                dirname, "%s_%d%s" % (root, i+1, ext))
+            with open(split_pathname, "wb") as split_file:
+                split_file.write(sgf_game.serialise())
+    if game_count == 0:
+        raise StandardError("error parsing file: no SGF data found")
 
 _description = """\
 Split a file containing an SGF game collection into multiple files.
@@ -25,6 +25,7 @@ class Game_dispatcher(object):
         self.counter = 0
         self.max = 7
         self.errors_seen = []
+        self.batch_count = 0
 
     def get_job(self):
         if self.counter >= self.max:
@@ -40,6 +41,9 @@ class Game_dispatcher(object):
         print message
         self.errors_seen.append(message)
 
+    def end_batch(self):
+        self.batch_count += 1
+
 
 def test():
     mgr = job_manager.Multiprocessing_job_manager(3)
@@ -51,7 +55,10 @@ def test():
 
 def test2():
     job_source = Game_dispatcher()
-    job_manager.run_jobs(job_source, 3, allow_mp=True)
+    stats = job_manager.run_jobs(job_source, 3, allow_mp=True, queue_depth=2)
+    print stats.describe()
+    assert stats.responses == 7
+    assert stats.batches <= job_source.batch_count
     assert job_source.errors_seen == [
         "ValueError: invalid literal for int() with base 10: 'forcefailure4'\n"
         "traceback (most recent call last):\n"
@@ -140,7 +140,7 @@ setup(name='gomill',
       author="Matthew Woodcraft",
       author_email="matthew@woodcraft.me.uk",
       packages=['gomill'],
-      scripts=['ringmaster'],
+      scripts=['ringmaster', 'ringmaster-worker'],
       cmdclass=cmdclass,
       classifiers=[
           "Development Status :: 4 - Beta",
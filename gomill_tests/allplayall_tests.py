@@ -7,6 +7,7 @@ import cPickle as pickle
 
 from gomill import competitions
 from gomill import allplayalls
+from gomill import tournaments
 from gomill.gtp_games import Game_result
 from gomill.game_jobs import Game_job, Game_job_result
 from gomill.competitions import (
@@ -90,10 +91,13 @@ def test_default_config(tc):
     tc.assertEqual(mBvC.move_limit, 1000)
     tc.assertEqual(mBvC.scorer, 'players')
     tc.assertEqual(mBvC.internal_scorer_handicap_compensation, 'full')
+    tc.assertEqual(mBvC.internal_scorer_dead_stones, 'no')
+    tc.assertEqual(mBvC.internal_scorer_min_life_area, 12)
     tc.assertEqual(mBvC.number_of_games, None)
     tc.assertIs(mBvC.alternating, True)
     tc.assertIs(mBvC.handicap, None)
     tc.assertEqual(mBvC.handicap_style, 'fixed')
+    tc.assertIsNone(mBvC.time_controls)
 
 def test_basic_config(tc):
     comp = allplayalls.Allplayall('test')
@@ -104,6 +108,8 @@ def test_basic_config(tc):
     config['move_limit'] = 200
     config['scorer'] = 'internal'
     config['internal_scorer_handicap_compensation'] = 'short'
+    config['internal_scorer_dead_stones'] = 'unconditional'
+    config['internal_scorer_min_life_area'] = 20
     config['rounds'] = 20
     comp.initialise_from_control_file(config)
     tc.assertEqual(comp.description, "default\nconfig")
@@ -116,11 +122,23 @@ def test_basic_config(tc):
     tc.assertEqual(mBvC.move_limit, 200)
     tc.assertEqual(mBvC.scorer, 'internal')
     tc.assertEqual(mBvC.internal_scorer_handicap_compensation, 'short')
+    tc.assertEqual(mBvC.internal_scorer_dead_stones, 'unconditional')
+    tc.assertEqual(mBvC.internal_scorer_min_life_area, 20)
     tc.assertEqual(mBvC.number_of_games, 20)
     tc.assertIs(mBvC.alternating, True)
     tc.assertIs(mBvC.handicap, None)
     tc.assertEqual(mBvC.handicap_style, 'fixed')
 
+def test_time_controls(tc):
+    config = default_config()
+    config['time_controls'] = tournaments.Time_controls(
+        300, 30, period_moves=10)
+    fx = Allplayall_fixture(tc, config)
+    mBvC = fx.comp.get_tournament_results().get_matchup('BvC')
+    tc.assertEqual(mBvC.time_controls.describe(), "300s + 10/30 Canadian")
+    job = fx.comp.get_game()
+    tc.assertIs(job.time_controls, mBvC.time_controls)
+
 def test_unknown_player(tc):
     comp = allplayalls.Allplayall('test')
     config = default_config()
@@ -170,6 +188,8 @@ def test_play(tc):
     tc.assertEqual(job1.move_limit, 1000)
     tc.assertIs(job1.use_internal_scorer, False)
     tc.assertEqual(job1.internal_scorer_handicap_compensation, 'full')
+    tc.assertEqual(job1.internal_scorer_dead_stones, 'no')
+    tc.assertEqual(job1.internal_scorer_min_life_area, 12)
     tc.assertEqual(job1.game_data, ('AvB', 0))
     tc.assertIsNone(job1.sgf_filename)
     tc.assertIsNone(job1.sgf_dirname)
@@ -220,7 +240,7 @@ def test_play(tc):
     fx.check_short_report(expected_grid, expected_matchups, expected_players)
 
     avb_results = fx.comp.get_tournament_results().get_matchup_results('AvB')
-    tc.assertEqual(avb_results, [response1.game_result])
+    tc.assertGameResultListEqual(avb_results, [response1.game_result])
 
 def test_play_many(tc):
     config = default_config()
@@ -255,6 +275,38 @@ def test_play_many(tc):
     tc.assertEqual(ms.wins_1, 10)
     tc.assertIs(ms.alternating, True)
 
+def test_uncertainty_scheduling(tc):
+    config = default_config()
+    config['scheduling_policy'] = 'uncertainty'
+    config['rounds'] = 30
+    fx = Allplayall_fixture(tc, config)
+    def winner(job):
+        # t1 always wins; otherwise black wins
+        if job.player_w.code == 't1':
+            return 'w'
+        return 'b'
+    for i in xrange(30):
+        job = fx.comp.get_game()
+        fx.comp.process_game_result(fake_response(job, winner(job)))
+    tr = fx.comp.get_tournament_results()
+    tc.assertEqual(tr.get_matchup_stats('AvB').wins_1,
+                   tr.get_matchup_stats('AvB').total)
+    counts = [len(tr.get_matchup_results(matchup_id))
+              for matchup_id in ['AvB', 'AvC', 'BvC']]
+    tc.assertListEqual(counts, [6, 6, 18])
+
+    comp2 = competition_test_support.check_round_trip(tc, fx.comp, config)
+    tc.assertListEqual([comp2.get_game().game_id for _ in range(3)],
+                       ['AvB_06', 'AvC_06', 'BvC_18'])
+
+def test_bad_scheduling_policy(tc):
+    config = default_config()
+    config['scheduling_policy'] = 'random'
+    comp = allplayalls.Allplayall('testcomp')
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertTrue(str(ar.exception).startswith("'scheduling_policy': "))
+
 def test_competitor_change(tc):
     fx = Allplayall_fixture(tc)
     status = pickle.loads(pickle.dumps(fx.comp.get_status()))
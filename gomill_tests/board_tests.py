@@ -7,6 +7,9 @@ ascii_boards facilities.
 
 from __future__ import with_statement
 
+import cPickle as pickle
+import random
+
 from gomill.common import format_vertex, move_from_vertex
 from gomill import ascii_boards
 from gomill import boards
@@ -22,6 +25,10 @@ def make_tests(suite):
         suite.addTest(Score_test_TestCase(*t))
     for t in board_test_data.setup_tests:
         suite.addTest(Setup_test_TestCase(*t))
+    for t in board_test_data.play_tests:
+        suite.addTest(Incremental_play_test_TestCase(*t))
+    for t in board_test_data.setup_tests:
+        suite.addTest(Incremental_setup_test_TestCase(*t))
 
 def test_attributes(tc):
     b = boards.Board(5)
@@ -151,6 +158,153 @@ def test_copy(tc):
     b1.play(2, 1, 'b')
     tc.assertEqual(b1, b2)
 
+def test_copy_is_independent(tc):
+    b1 = boards.Board(9)
+    b1.play(2, 3, 'b')
+    b2 = b1.copy()
+    b2.play(2, 4, 'w')
+    tc.assertIsNone(b1.get(2, 4))
+    tc.assertIs(b1.board_points, b2.board_points)
+
+def test_pickle(tc):
+    for board_class in (boards.Board, boards.Incremental_board):
+        b1 = board_class(9)
+        b1.play(2, 3, 'b')
+        b1.play(3, 4, 'w')
+        b2 = pickle.loads(pickle.dumps(b1, protocol=-1))
+        tc.assertIsInstance(b2, board_class)
+        tc.assertBoardEqual(b1, b2)
+        tc.assertEqual(b2.board_points, b1.board_points)
+        b1.play(3, 3, 'b')
+        b2.play(3, 3, 'b')
+        tc.assertBoardEqual(b1, b2)
+        tc.assertFalse(b2.is_empty())
+
+def test_pickle_size(tc):
+    b = boards.Board(19)
+    b.play(3, 3, 'b')
+    tc.assertTrue(len(pickle.dumps(b, protocol=-1)) < 200)
+
+# A 5x5 Board with b at (1, 2) and w at (3, 0), pickled (protocols 0 and 2)
+# by the list-of-lists Board implementation used up to Gomill 0.7
+OLD_BOARD_PICKLE_0 = (
+    'ccopy_reg\n_reconstructor\np0\n(cgomill.boards\nBoard\np1\nc__buil'
+    "tin__\nobject\np2\nNtp3\nRp4\n(dp5\nS'_is_empty'\np6\nI00\nsS'side'\np"
+    "7\nI5\nsS'board_points'\np8\n(lp9\n(I0\nI0\ntp10\na(I0\nI1\ntp11\na(I0\n"
+    'I2\ntp12\na(I0\nI3\ntp13\na(I0\nI4\ntp14\na(I1\nI0\ntp15\na(I1\nI1\ntp16\n'
+    'a(I1\nI2\ntp17\na(I1\nI3\ntp18\na(I1\nI4\ntp19\na(I2\nI0\ntp20\na(I2\nI1\n'
+    'tp21\na(I2\nI2\ntp22\na(I2\nI3\ntp23\na(I2\nI4\ntp24\na(I3\nI0\ntp25\na(I'
+    '3\nI1\ntp26\na(I3\nI2\ntp27\na(I3\nI3\ntp28\na(I3\nI4\ntp29\na(I4\nI0\ntp3'
+    "0\na(I4\nI1\ntp31\na(I4\nI2\ntp32\na(I4\nI3\ntp33\na(I4\nI4\ntp34\nasS'bo"
+    "ard'\np35\n(lp36\n(lp37\nNaNaNaNaNaa(lp38\nNaNaS'b'\np39\naNaNaa(lp"
+    "40\nNaNaNaNaNaa(lp41\nS'w'\np42\naNaNaNaNaa(lp43\nNaNaNaNaNaasb.")
+
+OLD_BOARD_PICKLE_2 = (
+    '\x80\x02cgomill.boards\nBoard\nq\x00)\x81q\x01}q\x02(U\t_is_emptyq\x03\x89U\x04sideq\x04K\x05U\x0cb'
+    'oard_pointsq\x05]q\x06(K\x00K\x00\x86q\x07K\x00K\x01\x86q\x08K\x00K\x02\x86q\tK\x00K\x03\x86q\nK\x00K\x04\x86q\x0bK\x01K\x00\x86q\x0cK'
+    '\x01K\x01\x86q\rK\x01K\x02\x86q\x0eK\x01K\x03\x86q\x0fK\x01K\x04\x86q\x10K\x02K\x00\x86q\x11K\x02K\x01\x86q\x12K\x02K\x02\x86q\x13K\x02K\x03\x86q\x14K\x02K\x04\x86'
+    'q\x15K\x03K\x00\x86q\x16K\x03K\x01\x86q\x17K\x03K\x02\x86q\x18K\x03K\x03\x86q\x19K\x03K\x04\x86q\x1aK\x04K\x00\x86q\x1bK\x04K\x01\x86q\x1cK\x04K\x02\x86q\x1dK\x04'
+    'K\x03\x86q\x1eK\x04K\x04\x86q\x1feU\x05boardq ]q!(]q"(NNNNNe]q#(NNU\x01bq$NNe]q%(NNNNNe'
+    "]q&(U\x01wq'NNNNe]q((NNNNNeeub.")
+
+def test_pickle_earlier_format(tc):
+    for s in OLD_BOARD_PICKLE_0, OLD_BOARD_PICKLE_2:
+        b = pickle.loads(s)
+        tc.assertIsInstance(b, boards.Board)
+        b2 = boards.Board(5)
+        b2.play(1, 2, 'b')
+        b2.play(3, 0, 'w')
+        tc.assertBoardEqual(b, b2)
+        tc.assertEqual(b.zobrist_hash(), b2.zobrist_hash())
+        tc.assertIs(b.board_points, b2.board_points)
+        tc.assertIs(b.is_empty(), False)
+        tc.assertIs(b.can_undo(), False)
+        b.play(1, 3, 'w')
+        tc.assertEqual(b.get(1, 3), 'w')
+
+def test_to_bytes(tc):
+    b = boards.Board(5)
+    tc.assertEqual(b.to_bytes(), "\x05\x00\x00" + "\x00" * 7)
+    b.play(0, 0, 'b')
+    b.play(0, 1, 'w')
+    b.play(4, 4, 'w')
+    tc.assertEqual(b.to_bytes(), "\x05\x00\x00\x09" + "\x00" * 5 + "\x02")
+    tc.assertEqual(b.to_bytes((1, 2)),
+                   "\x05\x00\x08\x09" + "\x00" * 5 + "\x02")
+    tc.assertEqual(len(boards.Board(19).to_bytes()), 94)
+    tc.assertRaises(IndexError, b.to_bytes, (5, 0))
+    b2, ko_point = boards.Board.from_bytes(b.to_bytes((1, 2)))
+    tc.assertBoardEqual(b2, b)
+    tc.assertEqual(ko_point, (1, 2))
+    tc.assertEqual(boards.Board.from_bytes(b.to_bytes())[1], None)
+    for s in ["", "\x05\x00\x00", "\x05\x00\x00" + "\x00" * 8,
+              "\x01\x00\x00\x00", "\x05\x00\x1a" + "\x00" * 7,
+              "\x05\x00\x00\x03" + "\x00" * 6]:
+        tc.assertRaises(ValueError, boards.Board.from_bytes, s)
+
+def test_to_bytes_random_positions(tc):
+    for b in _random_positions(random.Random(5)):
+        for board_class in (boards.Board, boards.Incremental_board):
+            b2, ko_point = board_class.from_bytes(b.to_bytes())
+            tc.assertIsInstance(b2, board_class)
+            tc.assertBoardEqual(b2, b)
+            tc.assertEqual(b2.zobrist_hash(), b.zobrist_hash())
+            tc.assertEqual(b2.is_empty(), b.is_empty())
+            tc.assertEqual(b2.area_score(), b.area_score())
+            tc.assertEqual(b2.to_bytes(), b.to_bytes())
+
+def test_pack_boards(tc):
+    positions = _random_positions(random.Random(6))
+    ko_points = [None] * len(positions)
+    ko_points[3] = (1, 1)
+    s = boards.pack_boards(positions, ko_points)
+    unpacked = boards.unpack_boards(s)
+    tc.assertEqual(len(unpacked), len(positions))
+    for b, (b2, ko_point), expected_ko in zip(positions, unpacked, ko_points):
+        tc.assertBoardEqual(b2, b)
+        tc.assertEqual(ko_point, expected_ko)
+    tc.assertEqual(boards.pack_boards([]), "")
+    tc.assertEqual(boards.unpack_boards(""), [])
+    [(b, ko_point)] = boards.unpack_boards(
+        boards.pack_boards(positions[:1]), boards.Incremental_board)
+    tc.assertIsInstance(b, boards.Incremental_board)
+    tc.assertRaises(ValueError, boards.unpack_boards, s[:-1])
+
+def test_zobrist_hash(tc):
+    for board_class in (boards.Board, boards.Incremental_board):
+        b1 = board_class(9)
+        tc.assertEqual(b1.zobrist_hash(), 0)
+        b1.play(0, 1, 'b')
+        b1.play(1, 0, 'b')
+        h = b1.zobrist_hash()
+        tc.assertNotEqual(h, 0)
+        tc.assertTrue(0 <= h < 2**64)
+        b2 = board_class(9)
+        b2.play(1, 0, 'b')
+        b2.play(0, 1, 'b')
+        tc.assertEqual(b2.zobrist_hash(), h)
+        tc.assertEqual(b2.copy().zobrist_hash(), h)
+        tc.assertEqual(
+            pickle.loads(pickle.dumps(b2, protocol=-1)).zobrist_hash(), h)
+        b3 = board_class(9)
+        b3.apply_setup([(0, 1), (1, 0)], [], [])
+        tc.assertEqual(b3.zobrist_hash(), h)
+        b5 = board_class(9)
+        b5.apply_setup([], [(0, 1), (1, 0)], [])
+        tc.assertNotEqual(b5.zobrist_hash(), h)
+        # self-capture leaves the hash unchanged
+        b1.play(0, 0, 'w')
+        tc.assertEqual(b1.zobrist_hash(), h)
+        b1.play(0, 2, 'w')
+        b1.play(1, 1, 'w')
+        b1.play(2, 0, 'w')
+        b1.play(0, 0, 'w')
+        b4 = board_class(9)
+        b4.apply_setup([], [(0, 0), (0, 2), (1, 1), (2, 0)], [])
+        tc.assertEqual(b1.zobrist_hash(), b4.zobrist_hash())
+        b1.apply_setup([], [], [(0, 0), (0, 2), (1, 1), (2, 0)])
+        tc.assertEqual(b1.zobrist_hash(), 0)
+
 def test_full_board_selfcapture(tc):
     b = boards.Board(9)
     tc.assertTrue(b.is_empty())
@@ -173,9 +327,10 @@ class Play_test_TestCase(gomill_test_support.Gomill_ParameterisedTestCase):
     """Check final position reached by playing a sequence of moves."""
     test_name = "play_test"
     parameter_names = ('moves', 'diagram', 'ko_vertex', 'score')
+    board_class = boards.Board
 
     def runTest(self):
-        b = boards.Board(9)
+        b = self.board_class(9)
         ko_point = None
         for move in self.moves:
             colour, vertex = move.split()
@@ -206,12 +361,13 @@ class Setup_test_TestCase(gomill_test_support.Gomill_ParameterisedTestCase):
     test_name = "setup_test"
     parameter_names = ('black_points', 'white_points', 'empty_points',
                        'diagram', 'is_legal')
+    board_class = boards.Board
 
     def runTest(self):
         def _interpret(moves):
             return [move_from_vertex(v, b.side) for v in moves]
 
-        b = boards.Board(9)
+        b = self.board_class(9)
         is_legal = b.apply_setup(_interpret(self.black_points),
                                  _interpret(self.white_points),
                                  _interpret(self.empty_points))
@@ -220,3 +376,286 @@ class Setup_test_TestCase(gomill_test_support.Gomill_ParameterisedTestCase):
             self.assertTrue(is_legal, "setup should be considered legal")
         else:
             self.assertFalse(is_legal, "setup should be considered illegal")
+
+
+class Incremental_play_test_TestCase(Play_test_TestCase):
+    """Variant of Play_test_TestCase using Incremental_board."""
+    test_name = "incremental_play_test"
+    board_class = boards.Incremental_board
+
+class Incremental_setup_test_TestCase(Setup_test_TestCase):
+    """Variant of Setup_test_TestCase using Incremental_board."""
+    test_name = "incremental_setup_test"
+    board_class = boards.Incremental_board
+
+def test_incremental_board_basics(tc):
+    b = boards.Incremental_board(9)
+    tc.assertTrue(b.is_empty())
+    b.play(2, 3, 'b')
+    tc.assertFalse(b.is_empty())
+    tc.assertRaises(ValueError, b.play, 2, 3, 'w')
+    tc.assertRaises(IndexError, b.play, -1, 2, 'b')
+    tc.assertRaises(IndexError, b.play, 9, 2, 'b')
+    tc.assertRaises(IndexError, b.play, 2, 9, 'b')
+    tc.assertItemsEqual(b.list_occupied_points(), [('b', (2, 3))])
+
+def test_incremental_board_copy(tc):
+    b1 = boards.Incremental_board(9)
+    b1.play(0, 1, 'b')
+    b1.play(1, 0, 'b')
+    b1.play(0, 2, 'w')
+    b1.play(1, 1, 'w')
+    b1.play(2, 0, 'w')
+    b2 = b1.copy()
+    tc.assertIsInstance(b2, boards.Incremental_board)
+    tc.assertEqual(b1, b2)
+    b2.play(0, 0, 'w')
+    tc.assertEqual(b2.get(0, 1), None)
+    tc.assertEqual(b2.get(1, 0), None)
+    tc.assertEqual(b1.get(0, 1), 'b')
+    b1.play(3, 3, 'b')
+    tc.assertIsNone(b2.get(3, 3))
+
+def test_incremental_board_full_board_selfcapture(tc):
+    b = boards.Incremental_board(9)
+    for row in range(9):
+        for col in range(9):
+            b.play(row, col, 'b')
+    tc.assertBoardEqual(b, boards.Board(9))
+    tc.assertIs(b.is_empty(), True)
+
+def test_incremental_board_random_games(tc):
+    # Check Incremental_board against Board on random (legal-ish) games
+    rnd = random.Random(1)
+    for size in (5, 9, 13):
+        for game_number in range(4):
+            b1 = boards.Board(size)
+            b2 = boards.Incremental_board(size)
+            colour = 'b'
+            ko_point = None
+            for move_number in range(size * size * 3):
+                empty = [(row, col) for (row, col) in b1.board_points
+                         if b1.get(row, col) is None and
+                         (row, col) != ko_point]
+                if not empty:
+                    break
+                row, col = rnd.choice(empty)
+                ko_point = b1.play(row, col, colour)
+                tc.assertEqual(b2.play(row, col, colour), ko_point)
+                colour = {'b' : 'w', 'w' : 'b'}[colour]
+            tc.assertBoardEqual(b1, b2)
+            tc.assertEqual(b1.zobrist_hash(), b2.zobrist_hash())
+            tc.assertEqual(b1.area_score(), b2.area_score())
+            tc.assertEqual(b1.is_empty(), b2.is_empty())
+
+def test_undo(tc):
+    for board_class in (boards.Board, boards.Incremental_board):
+        b = board_class(9)
+        tc.assertIs(b.can_undo(), False)
+        tc.assertRaisesRegexp(ValueError, "^no move to undo$", b.undo)
+        tc.assertEqual(b.count_undoable_moves(), 0)
+        b.play(0, 1, 'b', record_undo=True)
+        b.play(1, 0, 'b', record_undo=True)
+        tc.assertEqual(b.count_undoable_moves(), 2)
+        before = b.copy()
+        tc.assertIs(before.can_undo(), False)
+        tc.assertEqual(before.count_undoable_moves(), 0)
+        # self-capture
+        b.play(0, 0, 'w', record_undo=True)
+        tc.assertEqual(b.get(0, 0), None)
+        b.undo()
+        tc.assertBoardEqual(b, before)
+        tc.assertEqual(b.zobrist_hash(), before.zobrist_hash())
+        # capture of two groups
+        b.play(0, 2, 'w', record_undo=True)
+        b.play(1, 1, 'w', record_undo=True)
+        b.play(2, 0, 'w', record_undo=True)
+        b.play(0, 0, 'w', record_undo=True)
+        tc.assertEqual(b.get(0, 1), None)
+        tc.assertEqual(b.get(1, 0), None)
+        b.undo()
+        tc.assertEqual(b.get(0, 1), 'b')
+        tc.assertEqual(b.get(0, 0), None)
+        b.undo()
+        b.undo()
+        b.undo()
+        tc.assertBoardEqual(b, before)
+        tc.assertEqual(b.zobrist_hash(), before.zobrist_hash())
+        b.undo()
+        b.undo()
+        tc.assertIs(b.can_undo(), False)
+        tc.assertIs(b.is_empty(), True)
+        tc.assertEqual(b.zobrist_hash(), 0)
+        b.play(4, 4, 'b')
+        tc.assertIs(b.can_undo(), False)
+        b.play(5, 5, 'b', record_undo=True)
+        b.apply_setup([(3, 3)], [], [])
+        tc.assertIs(b.can_undo(), False)
+
+def test_undo_full_board_selfcapture(tc):
+    for board_class in (boards.Board, boards.Incremental_board):
+        b = board_class(3)
+        for row, col in b.board_points[:-1]:
+            b.play(row, col, 'b')
+        before = b.copy()
+        b.play(2, 2, 'b', record_undo=True)
+        tc.assertIs(b.is_empty(), True)
+        b.undo()
+        tc.assertIs(b.is_empty(), False)
+        tc.assertBoardEqual(b, before)
+        tc.assertEqual(b.zobrist_hash(), before.zobrist_hash())
+
+def test_undo_random_games(tc):
+    rnd = random.Random(3)
+    for board_class in (boards.Board, boards.Incremental_board):
+        for size in (5, 9):
+            b = board_class(size)
+            snapshots = []
+            colour = 'b'
+            for move_number in range(size * size * 2):
+                empty = [(row, col) for (row, col) in b.board_points
+                         if b.get(row, col) is None]
+                if not empty:
+                    break
+                snapshots.append(b.copy())
+                row, col = rnd.choice(empty)
+                b.play(row, col, colour, record_undo=True)
+                colour = {'b' : 'w', 'w' : 'b'}[colour]
+            while snapshots:
+                b.undo()
+                expected = snapshots.pop()
+                tc.assertBoardEqual(b, expected)
+                tc.assertEqual(b.zobrist_hash(), expected.zobrist_hash())
+                tc.assertEqual(b.is_empty(), expected.is_empty())
+            # The groups are still right after undo
+            b.play(0, 0, 'b')
+            b.play(0, 1, 'w')
+            b.play(1, 0, 'w')
+            tc.assertIsNone(b.get(0, 0))
+
+def _reference_is_legal(b, row, col, colour, ko_point):
+    # Legality by playing the move on a copy
+    if b.get(row, col) is not None or (row, col) == ko_point:
+        return False
+    b2 = b.copy()
+    b2.play(row, col, colour)
+    return b2.get(row, col) is not None
+
+def test_is_legal(tc):
+    for board_class in (boards.Board, boards.Incremental_board):
+        b = board_class(9)
+        # W A1 will capture B B1, leaving a ko
+        for colour, (row, col) in [('b', (1, 0)), ('b', (0, 1)),
+                                   ('w', (2, 0)), ('w', (1, 1)),
+                                   ('b', (2, 1)), ('w', (0, 2)),
+                                   ('b', (3, 0)), ('w', (2, 2))]:
+            b.play(row, col, colour)
+        tc.assertIs(b.is_legal(0, 0, 'b'), True)
+        tc.assertIs(b.is_legal(0, 0, 'w'), True)
+        ko_point = b.play(0, 0, 'w')
+        tc.assertEqual(ko_point, (0, 1))
+        tc.assertIs(b.is_legal(0, 1, 'b'), True)
+        tc.assertIs(b.is_legal(0, 1, 'b', ko_point), False)
+        tc.assertIs(b.is_legal(0, 0, 'b'), False)
+        tc.assertIs(b.is_legal(4, 4, 'b', ko_point), True)
+        tc.assertRaises(IndexError, b.is_legal, 9, 0, 'b')
+        b2 = board_class(3)
+        b2.apply_setup([(0, 1), (1, 0), (1, 1)], [], [])
+        tc.assertIs(b2.is_legal(0, 0, 'w'), False)
+        tc.assertIs(b2.is_legal(0, 0, 'b'), True)
+        tc.assertIs(b2.is_legal(2, 2, 'w'), True)
+        tc.assertEqual(b2.legal_moves('w'),
+                       [(0, 2), (1, 2), (2, 0), (2, 1), (2, 2)])
+        tc.assertEqual(list(b2.legal_move_mask('w', (2, 2))),
+                       [0, 0, 1, 0, 0, 1, 1, 1, 0])
+
+def test_legal_moves_random_games(tc):
+    rnd = random.Random(4)
+    for board_class in (boards.Board, boards.Incremental_board):
+        for size in (2, 5, 9):
+            b = board_class(size)
+            colour = 'b'
+            ko_point = None
+            for move_number in range(size * size * 3):
+                expected = [(row, col) for (row, col) in b.board_points
+                            if _reference_is_legal(b, row, col, colour,
+                                                   ko_point)]
+                tc.assertEqual(b.legal_moves(colour, ko_point), expected)
+                tc.assertEqual(
+                    [(row, col) for (row, col) in b.board_points
+                     if b.is_legal(row, col, colour, ko_point)],
+                    expected)
+                if not expected:
+                    break
+                row, col = rnd.choice(expected)
+                ko_point = b.play(row, col, colour)
+                colour = {'b' : 'w', 'w' : 'b'}[colour]
+
+def _reference_area_score(b):
+    # Straightforward flood-fill implementation of area scoring
+    score = 0
+    handled = set()
+    for point in b.board_points:
+        colour = b.get(*point)
+        if colour is not None:
+            score += {'b' : 1, 'w' : -1}[colour]
+            continue
+        if point in handled:
+            continue
+        region = set([point])
+        to_handle = [point]
+        reached = set()
+        while to_handle:
+            row, col = to_handle.pop()
+            for (r, c) in ((row-1, col), (row+1, col),
+                           (row, col-1), (row, col+1)):
+                if not (0 <= r < b.side and 0 <= c < b.side):
+                    continue
+                neighbour_colour = b.get(r, c)
+                if neighbour_colour is not None:
+                    reached.add(neighbour_colour)
+                elif (r, c) not in region:
+                    region.add((r, c))
+                    to_handle.append((r, c))
+        handled.update(region)
+        for colour in reached:
+            score += {'b' : 1, 'w' : -1}[colour] * len(region)
+    return score
+
+def _random_positions(rnd):
+    result = []
+    for size in (2, 5, 9, 13, 19):
+        for density in (0.05, 0.2, 0.5, 0.9):
+            b = boards.Board(size)
+            black_points = []
+            white_points = []
+            for point in b.board_points:
+                if rnd.random() < density:
+                    rnd.choice((black_points, white_points)).append(point)
+            b.apply_setup(black_points, white_points, [])
+            result.append(b)
+    return result
+
+def test_area_score_random_positions(tc):
+    for b in _random_positions(random.Random(2)):
+        tc.assertEqual(b.area_score(), _reference_area_score(b))
+
+def test_area_scores(tc):
+    positions = [ascii_boards.interpret_diagram(diagram, 9)
+                 for (code, diagram, score) in board_test_data.score_tests]
+    expected = [score for (code, diagram, score) in board_test_data.score_tests]
+    tc.assertEqual(boards.area_scores(positions, use_numpy=False), expected)
+    tc.assertEqual(boards.area_scores(positions), expected)
+    tc.assertEqual(boards.area_scores([]), [])
+    if boards.numpy_available():
+        tc.assertEqual(boards.area_scores(positions, use_numpy=True), expected)
+        tc.assertEqual(boards.area_scores([], use_numpy=True), [])
+
+def test_area_scores_random_positions(tc):
+    positions = _random_positions(random.Random(3))
+    random.Random(4).shuffle(positions)
+    expected = [_reference_area_score(b) for b in positions]
+    tc.assertEqual(boards.area_scores(positions, use_numpy=False), expected)
+    if not boards.numpy_available():
+        tc.skipTest("numpy not available")
+    tc.assertEqual(boards.area_scores(positions, use_numpy=True), expected)
@@ -14,6 +14,7 @@ from gomill.competitions import (
 from gomill.gtp_controller import Engine_description
 
 from gomill_tests import gomill_test_support
+from gomill_tests import competition_test_support
 
 def make_tests(suite):
     suite.addTests(gomill_test_support.make_simple_tests(globals()))
@@ -178,6 +179,8 @@ def test_play(tc):
     tc.assertEqual(job1.move_limit, 1000)
     tc.assertIs(job1.use_internal_scorer, False)
     tc.assertEqual(job1.internal_scorer_handicap_compensation, 'full')
+    tc.assertEqual(job1.internal_scorer_dead_stones, 'no')
+    tc.assertEqual(job1.internal_scorer_min_life_area, 12)
     tc.assertEqual(job1.game_data, (0, 'g0#0', 0))
     tc.assertEqual(job1.sgf_event, 'cemtest')
     tc.assertRegexpMatches(job1.sgf_note, '^Candidate parameters: axa ')
@@ -222,3 +225,111 @@ def test_play(tc):
 
     tc.assertEqual(comp.wins, [1, 0.5, 0, 0])
 
+
+def _fake_response(job, candidate_wins):
+    result = Game_result.from_score(('w', 'b')[candidate_wins], 8.5)
+    result.set_players({'b' : job.player_b.code, 'w' : 'opp'})
+    response = Game_job_result()
+    response.game_id = job.game_id
+    response.game_result = result
+    response.engine_descriptions = {}
+    response.game_data = job.game_data
+    return response
+
+def test_early_start_config(tc):
+    comp = cem_tuners.Cem_tuner('cemtest')
+    config = default_config()
+    comp.initialise_from_control_file(config)
+    tc.assertIsNone(comp.early_start_proportion)
+    config['early_start_proportion'] = 1.0
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "early_start_proportion out of range (0.0 to 1.0)")
+
+def test_early_start(tc):
+    config = default_config()
+    config['early_start_proportion'] = 0.5
+    comp = cem_tuners.Cem_tuner('cemtest')
+    comp.initialise_from_control_file(config)
+    history = []
+    comp.set_history_logger(history.append)
+    comp.set_clean_status()
+
+    jobs = [comp.get_game() for _ in xrange(12)]
+    tc.assertIs(comp.get_game(), cem_tuners.NoGameAvailable)
+    for job in jobs[:5]:
+        comp.process_game_result(_fake_response(job, job.game_data[0] == 2))
+    tc.assertIsNone(comp.early_distribution)
+    comp.process_game_result(_fake_response(jobs[5], False))
+    tc.assertIsNotNone(comp.early_distribution)
+    tc.assertEqual(history[0], "Generation 1 started early")
+    tc.assertEqual(comp.generation, 0)
+    tc.assertEqual(comp.wins, [0, 0, 1, 0])
+
+    # Next generation's games are available without waiting for the rest
+    early_jobs = [comp.get_game() for _ in xrange(12)]
+    tc.assertEqual(early_jobs[0].game_id, 'g1#0r0')
+    tc.assertEqual(early_jobs[-1].game_id, 'g1#3r2')
+    tc.assertIs(comp.get_game(), cem_tuners.NoGameAvailable)
+    for job in early_jobs[:4]:
+        comp.process_game_result(_fake_response(job, True))
+    tc.assertEqual(comp.early_wins, [1, 1, 1, 1])
+    tc.assertIn("generation 1 started early",
+                competition_test_support.get_screen_report(comp))
+
+    # State round-trips with both generations in progress
+    comp2 = cem_tuners.Cem_tuner('cemtest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(pickle.loads(pickle.dumps(comp.get_status())))
+    tc.assertEqual(comp2.early_wins, [1, 1, 1, 1])
+    tc.assertEqual(comp2.early_distribution.parameters,
+                   comp.early_distribution.parameters)
+    tc.assertEqual(comp2.early_candidates[3].code, 'g1#3')
+    tc.assertEqual(comp2.get_game().game_id, 'g0#2r1')
+
+    # Late results for generation 0 are folded in
+    # (candidate 3 ends up with the most wins, though candidate 2 was ahead
+    # when generation 1 started)
+    tc.assertEqual(jobs[11].game_id, 'g0#3r2')
+    for job in jobs[6:11]:
+        comp.process_game_result(_fake_response(job, job is jobs[7]))
+    tc.assertEqual(comp.generation, 0)
+    provisional = comp.early_distribution.parameters
+    comp.process_game_result(_fake_response(jobs[11], True))
+    tc.assertEqual(comp.generation, 1)
+    tc.assertIsNone(comp.early_distribution)
+    tc.assertEqual(comp.wins, [1, 1, 1, 1])
+    tc.assertEqual(comp.candidates[0].code, 'g1#0')
+    tc.assertNotEqual(comp.distribution.parameters, provisional)
+
+    # Generation 2 is the last, so there's no generation 3 to start early
+    for job in early_jobs[4:]:
+        comp.process_game_result(_fake_response(job, False))
+    tc.assertEqual(comp.generation, 2)
+    jobs = [comp.get_game() for _ in xrange(12)]
+    tc.assertEqual(jobs[0].game_id, 'g2#0r0')
+    for job in jobs:
+        comp.process_game_result(_fake_response(job, False))
+    tc.assertEqual(comp.generation, 3)
+    tc.assertIsNone(comp.early_distribution)
+    tc.assertIs(comp.get_game(), cem_tuners.NoGameAvailable)
+
+def test_early_generation_finishes_first(tc):
+    config = default_config()
+    config['early_start_proportion'] = 0.5
+    comp = cem_tuners.Cem_tuner('cemtest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    jobs = [comp.get_game() for _ in xrange(12)]
+    for job in jobs[1:]:
+        comp.process_game_result(_fake_response(job, False))
+    early_jobs = [comp.get_game() for _ in xrange(12)]
+    for job in early_jobs:
+        comp.process_game_result(_fake_response(job, False))
+    tc.assertEqual(comp.generation, 0)
+    comp.process_game_result(_fake_response(jobs[0], False))
+    # Both generations are finished, and generation 2 is the last
+    tc.assertEqual(comp.generation, 2)
+    tc.assertIsNone(comp.early_distribution)
+    tc.assertEqual(comp.get_game().game_id, 'g2#0r0')
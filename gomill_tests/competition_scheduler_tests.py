@@ -55,6 +55,25 @@ def test_simple(tc):
     tc.assertEqual(sc.fixed, 4)
 
 
+def test_simple_replay_fix(tc):
+    sc = competition_schedulers.Simple_scheduler()
+    tc.assertEqual([sc.issue() for _ in xrange(3)], [0, 1, 2])
+    sc.fix(0)
+    sc.rollback()
+    sc.replay_fix(2)
+    sc._check_consistent()
+    sc.replay_fix(5)
+    sc._check_consistent()
+    tc.assertEqual(sc.issued, 3)
+    tc.assertEqual(sc.fixed, 3)
+    tc.assertRaisesRegexp(ValueError, "already fixed", sc.replay_fix, 5)
+    tc.assertRaisesRegexp(ValueError, "already fixed", sc.replay_fix, 0)
+    tc.assertEqual([sc.issue() for _ in xrange(5)], [1, 3, 4, 6, 7])
+    sc.replay_fix(3)
+    sc._check_consistent()
+    tc.assertEqual(sc.fixed, 4)
+
+
 def test_grouped(tc):
     sc = competition_schedulers.Group_scheduler()
     def issue(n):
@@ -74,6 +93,9 @@ def test_grouped(tc):
     tc.assertFalse(sc.nothing_issued_yet())
 
     sc.fix('m1', 1)
+    tc.assertEqual(sc.count_fixed(), 1)
+    tc.assertEqual(sc.count_fixed('m1'), 1)
+    tc.assertEqual(sc.count_fixed('m2'), 0)
     sc.rollback()
     issued = issue(14)
     tc.assertListEqual(issued, [
@@ -96,3 +118,47 @@ def test_grouped(tc):
     for token in issued:
         sc.fix(*token)
     tc.assertTrue(sc.all_fixed())
+    tc.assertEqual(sc.count_fixed(), 15)
+
+def test_grouped_uncertainty_policy(tc):
+    results = {'m1' : (0, 0), 'm2' : (0, 0), 'm3' : (0, 0)}
+    policy = competition_schedulers.Uncertainty_policy(results.__getitem__)
+    sc = competition_schedulers.Group_scheduler(policy)
+    def issue(n):
+        return [sc.issue() for _ in xrange(n)]
+    sc.set_groups([('m1', None), ('m2', None), ('m3', 3)])
+
+    tc.assertListEqual(issue(4), [
+        ('m1', 0),
+        ('m2', 0),
+        ('m3', 0),
+        ('m1', 1),
+        ])
+    for token in [('m1', 0), ('m2', 0), ('m3', 0), ('m1', 1)]:
+        sc.fix(*token)
+    results['m1'] = (2, 2)
+    results['m2'] = (1, 1)
+    results['m3'] = (0, 1)
+    tc.assertListEqual(issue(5), [
+        ('m2', 1),
+        ('m3', 1),
+        ('m2', 2),
+        ('m3', 2),
+        ('m1', 2),
+        ])
+    sc.rollback()
+    tc.assertListEqual(issue(3), [
+        ('m2', 1),
+        ('m3', 1),
+        ('m2', 2),
+        ])
+
+    sc2 = pickle.loads(pickle.dumps(sc))
+    tc.assertIsInstance(sc2.policy, competition_schedulers.Fewest_issued_policy)
+    tc.assertListEqual([sc2.issue() for _ in xrange(3)], [
+        ('m1', 2),
+        ('m3', 2),
+        ('m1', 3),
+        ])
+    sc2.set_policy(policy)
+    tc.assertEqual(sc2.issue(), ('m2', 3))
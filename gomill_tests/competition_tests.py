@@ -1,5 +1,7 @@
 """Tests for competitions.py"""
 
+from __future__ import with_statement
+
 import os
 
 from gomill import competitions
@@ -124,6 +126,29 @@ def test_player_stderr(tc):
     tc.assertEqual(comp.players['t2'].discard_stderr, True)
     tc.assertIs(comp.players['t3'].discard_stderr, False)
 
+def test_player_reuse_process(tc):
+    comp = competitions.Competition('test')
+    config = {
+        'players' : {
+            't1' : Player_config("test"),
+            't2' : Player_config("test", reuse_process=True),
+            't3' : Player_config("test", reuse_process=True,
+                                 max_games_per_process=20),
+            }
+        }
+    comp.initialise_from_control_file(config)
+    tc.assertIs(comp.players['t1'].reuse_process, False)
+    tc.assertIsNone(comp.players['t1'].max_games_per_process)
+    tc.assertIs(comp.players['t2'].reuse_process, True)
+    tc.assertIsNone(comp.players['t2'].max_games_per_process)
+    tc.assertEqual(comp.players['t3'].max_games_per_process, 20)
+    config['players']['t4'] = Player_config("test", max_games_per_process=0)
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "player t4: 'max_games_per_process': "
+                   "must be positive integer")
+
 def test_player_startup_gtp_commands(tc):
     comp = competitions.Competition('test')
     config = {
@@ -3,10 +3,13 @@
 from __future__ import with_statement
 
 import os
+import threading
 from textwrap import dedent
 
 from gomill import gtp_controller
 from gomill import game_jobs
+from gomill import gtp_games
+from gomill import job_manager
 from gomill.job_manager import JobFailed
 
 from gomill_tests import test_framework
@@ -153,6 +156,7 @@ def test_game_job(tc):
     tc.assertEqual(channel.requested_env['GOMILL_GAME_ID'], 'gameid')
     tc.assertNotIn('GOMILL_SLOT', channel.requested_env)
     tc.assertEqual(fx.job._sgf_pathname_written, '/sgf/test.games/gjtest.sgf')
+    tc.assertIsNone(result.sgf_content)
     tc.assertIsNone(fx.job._mkdir_pathname)
     tc.assertMultiLineEqual(fx.job._get_sgf_written(), dedent("""\
     (;FF[4]AP[gomill:VER]
@@ -186,6 +190,42 @@ def test_game_job_no_sgf(tc):
     tc.assertEqual(result.game_result.sgf_result, "B+10.5")
     tc.assertIsNone(fx.job._sgf_pathname_written)
 
+def test_game_job_return_sgf(tc):
+    fx = Game_job_fixture(tc)
+    fx.job.return_sgf = True
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+    tc.assertIsNone(fx.job._sgf_pathname_written)
+    tc.assertTrue(result.sgf_content.startswith("(;FF[4]AP[gomill:"))
+    tc.assertIn("RE[B+10.5]", result.sgf_content)
+
+    fx2 = Game_job_fixture(tc)
+    fx2.job.return_sgf = True
+    fx2.job.sgf_filename = None
+    tc.assertIsNone(fx2.job.run().sgf_content)
+
+def test_game_job_sgf_move_times(tc):
+    fx = Game_job_fixture(tc)
+    fx.job.return_sgf = True
+    result = fx.job.run()
+    tc.assertNotIn("MT[", result.sgf_content)
+    tc.assertEqual(
+        len(result.game_result.move_times['one'].genmove_times), 10)
+    fx2 = Game_job_fixture(tc)
+    fx2.job.return_sgf = True
+    fx2.job.sgf_move_times = True
+    result = fx2.job.run()
+    tc.assertEqual(result.sgf_content.count("MT["), 20)
+
+def test_game_job_time_controls(tc):
+    fx = Game_job_fixture(tc)
+    fx.job.return_sgf = True
+    fx.job.time_controls = gtp_games.Time_controls(600, 30, period_moves=5)
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+    tc.assertIn("OT[5/30 Canadian]", result.sgf_content)
+    tc.assertIn("TM[600]", result.sgf_content)
+
 def test_game_job_forfeit(tc):
     fx = Game_job_fixture(tc)
     fx.force_error('w', 'genmove')
@@ -399,6 +439,33 @@ def test_game_job_handicap(tc):
     # area score 53, less 7.5 komi, less 3 handicap compensation
     tc.assertEqual(result.game_result.sgf_result, "B+42.5")
 
+def test_game_job_dead_stones(tc):
+    fx = Game_job_fixture(tc)
+    fx.job.internal_scorer_dead_stones = 'estimated'
+    result = fx.job.run()
+    # Neither player's wall of stones is dead
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+
+def test_game_job_min_life_area(tc):
+    def handle_genmove(args):
+        if moves:
+            return moves.pop(0)
+        return "pass"
+    moves = ["B5"]
+    fx = Game_job_fixture(tc)
+    fx.add_handler('w', 'genmove', handle_genmove)
+    fx.job.internal_scorer_dead_stones = 'estimated'
+    result = fx.job.run()
+    # B5 has eleven points of living space, so it's dead
+    tc.assertEqual(result.game_result.sgf_result, "B+73.5")
+    moves = ["B5"]
+    fx = Game_job_fixture(tc)
+    fx.add_handler('w', 'genmove', handle_genmove)
+    fx.job.internal_scorer_dead_stones = 'estimated'
+    fx.job.internal_scorer_min_life_area = 11
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.sgf_result, "B+36.5")
+
 def test_game_job_zero_move_game(tc):
     fx = Game_job_fixture(tc)
     fx.force_error('b', 'genmove')
@@ -624,6 +691,189 @@ def test_game_job_explain_final_move_zero_move_game(tc):
         ])
 
 
+### Engine reuse
+
+def _next_job(fx, game_id):
+    """Replace fx.job with a new job for the same players."""
+    old_job = fx.job
+    fx.job = Test_game_job()
+    for attr in ('player_b', 'player_w', 'board_size', 'komi', 'move_limit',
+                 'sgf_dirname', 'void_sgf_dirname'):
+        setattr(fx.job, attr, getattr(old_job, attr))
+    fx.job.game_id = game_id
+    fx.job.sgf_filename = "%s.sgf" % game_id
+
+def test_game_job_reuse_process(tc):
+    cpu_times = ["10", "25"]
+    def handle_cpu_time(args):
+        return cpu_times.pop(0)
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.add_handler('b', 'gomill-cpu_time', handle_cpu_time)
+    fx.job.player_b.reuse_process = True
+    result1 = fx.job.run()
+    channel_b = fx.get_channel('one')
+    channel_w = fx.get_channel('two')
+    tc.assertFalse(channel_b.is_closed)
+    tc.assertTrue(channel_w.is_closed)
+    tc.assertEqual(result1.game_result.cpu_times, {'one': 10.0, 'two': 567.2})
+    _next_job(fx, 'gameid2')
+    result2 = fx.job.run()
+    tc.assertIs(fx.get_channel('one'), channel_b)
+    tc.assertIsNot(fx.get_channel('two'), channel_w)
+    tc.assertFalse(channel_b.is_closed)
+    tc.assertEqual(result2.game_result.cpu_times, {'one': 15.0, 'two': 567.2})
+    tc.assertEqual(result2.game_result.winning_player, 'one')
+    commands = [command for command, args in channel_b.engine.commands_handled]
+    tc.assertEqual(commands.count('clear_board'), 2)
+    tc.assertEqual(commands.count('protocol_version'), 2)
+    tc.assertEqual(job_manager.run_worker_cleanup(), [])
+    tc.assertTrue(channel_b.is_closed)
+
+def test_game_job_reuse_process_no_cpu_time(tc):
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.job.player_b.reuse_process = True
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.cpu_times, {'one': None, 'two': 567.2})
+
+def test_game_job_reuse_process_max_games(tc):
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.job.player_b.reuse_process = True
+    fx.job.player_b.max_games_per_process = 2
+    fx.job.run()
+    channel1 = fx.get_channel('one')
+    _next_job(fx, 'gameid2')
+    fx.job.run()
+    tc.assertIs(fx.get_channel('one'), channel1)
+    tc.assertTrue(channel1.is_closed)
+    _next_job(fx, 'gameid3')
+    fx.job.run()
+    tc.assertIsNot(fx.get_channel('one'), channel1)
+
+def test_game_job_reuse_process_health_check_fails(tc):
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.job.player_b.reuse_process = True
+    fx.job.run()
+    channel1 = fx.get_channel('one')
+    channel1.fail_command = 'protocol_version'
+    _next_job(fx, 'gameid2')
+    result = fx.job.run()
+    tc.assertTrue(channel1.is_closed)
+    tc.assertIsNot(fx.get_channel('one'), channel1)
+    tc.assertEqual(result.game_result.winning_player, 'one')
+
+def test_game_job_reuse_process_health_check_hangs(tc):
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.job.player_b.reuse_process = True
+    fx.job.run()
+    channel1 = fx.get_channel('one')
+    terminated = threading.Event()
+    def handle_protocol_version(args):
+        terminated.wait(10)
+        return "2"
+    def terminate():
+        channel1.fail_next_response = True
+        terminated.set()
+        return True
+    channel1.engine.add_command('protocol_version', handle_protocol_version)
+    channel1.terminate = terminate
+    pool = game_jobs.get_engine_pool()
+    pool.health_check_timeout = 0.05
+    _next_job(fx, 'gameid2')
+    result = fx.job.run()
+    tc.assertTrue(terminated.is_set())
+    tc.assertTrue(channel1.is_closed)
+    tc.assertIsNot(fx.get_channel('one'), channel1)
+    tc.assertEqual(result.game_result.winning_player, 'one')
+
+def test_engine_pool_multiple_engines(tc):
+    class Fake_engine(object):
+        is_closed = False
+        def __init__(self, spec):
+            self.spec = spec
+        def close(self):
+            self.is_closed = True
+    pool = game_jobs.Engine_pool()
+    pool._check_health = lambda engine: True
+    engine1 = Fake_engine('spec')
+    engine2 = Fake_engine('spec')
+    engine3 = Fake_engine('other spec')
+    pool.put('one', engine1)
+    pool.put('one', engine2)
+    tc.assertEqual(pool.engines, {'one' : [engine1, engine2]})
+    tc.assertIs(pool.take('one', 'spec'), engine2)
+    tc.assertIs(pool.take('one', 'spec'), engine1)
+    tc.assertIsNone(pool.take('one', 'spec'))
+    tc.assertEqual(pool.engines, {})
+    pool.put('one', engine1)
+    pool.put('one', engine3)
+    tc.assertIs(pool.take('one', 'spec'), engine1)
+    tc.assertIs(engine3.is_closed, True)
+    tc.assertIs(engine1.is_closed, False)
+    pool.put('one', engine1)
+    pool.put('two', engine2)
+    pool.close_all()
+    tc.assertIs(engine1.is_closed, True)
+    tc.assertIs(engine2.is_closed, True)
+    tc.assertEqual(pool.engines, {})
+
+def test_game_job_reuse_process_changed_player(tc):
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.job.player_b.reuse_process = True
+    fx.job.run()
+    channel1 = fx.get_channel('one')
+    _next_job(fx, 'gameid2')
+    fx.job.player_b = fx.job.player_b.copy('one')
+    fx.job.player_b.startup_gtp_commands = [('known_command', ['boardsize'])]
+    fx.job.run()
+    tc.assertTrue(channel1.is_closed)
+    tc.assertIsNot(fx.get_channel('one'), channel1)
+
+def test_game_job_reuse_process_time_controls(tc):
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.add_handler('b', 'time_settings', lambda args:"")
+    fx.add_handler('b', 'time_left', lambda args:"")
+    fx.job.player_b.reuse_process = True
+    fx.job.time_controls = gtp_games.Time_controls(600, 30, period_moves=5)
+    fx.job.run()
+    channel1 = fx.get_channel('one')
+    _next_job(fx, 'gameid2')
+    fx.job.time_controls = gtp_games.Time_controls(300)
+    fx.job.run()
+    tc.assertIs(fx.get_channel('one'), channel1)
+    tc.assertEqual(
+        [args for command, args in channel1.engine.commands_handled
+         if command == 'time_settings'],
+        [['600', '30', '5'], ['300', '0', '0']])
+    _next_job(fx, 'gameid3')
+    fx.job.run()
+    tc.assertTrue(channel1.is_closed)
+    channel2 = fx.get_channel('one')
+    tc.assertIsNot(channel2, channel1)
+    tc.assertNotIn('time_settings',
+                   [command for command, args
+                    in channel2.engine.commands_handled])
+
+def test_game_job_reuse_process_after_error(tc):
+    def fail_first_genmove(channel):
+        channel.fail_command = 'genmove'
+    fx = Game_job_fixture(tc)
+    tc.addCleanup(job_manager.run_worker_cleanup)
+    fx.job.player_b.reuse_process = True
+    fx.init_player('b', fail_first_genmove)
+    with tc.assertRaises(JobFailed):
+        fx.job.run()
+    channel1 = fx.get_channel('one')
+    tc.assertTrue(channel1.is_closed)
+    tc.assertEqual(game_jobs.get_engine_pool().engines, {})
+
+
 ### check_player
 
 class Player_check_fixture(gtp_engine_fixtures.Mock_subprocess_fixture):
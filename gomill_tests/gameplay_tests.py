@@ -28,9 +28,11 @@ class Game_fixture(object):
         self.tc.assertIs(self.game.seen_resignation, False)
         self.tc.assertIs(self.game.seen_claim, False)
         self.tc.assertIs(self.game.seen_forfeit, False)
+        self.tc.assertIs(self.game.seen_time_loss, False)
         self.tc.assertIs(self.game.hit_move_limit, False)
         self.tc.assertIsNone(self.game.winner)
         self.tc.assertIsNone(self.game.forfeit_reason)
+        self.tc.assertIsNone(self.game.time_loss_reason)
 
     def check_over(self, expected_reason):
         self.tc.assertIs(self.game.is_over, True)
@@ -39,6 +41,7 @@ class Game_fixture(object):
             'seen_resignation',
             'seen_claim',
             'seen_forfeit',
+            'seen_time_loss',
             'hit_move_limit',
             ]:
             if reason == expected_reason:
@@ -53,6 +56,10 @@ class Game_fixture(object):
             self.tc.assertIsNotNone(self.game.forfeit_reason)
         else:
             self.tc.assertIsNone(self.game.forfeit_reason)
+        if expected_reason == 'seen_time_loss':
+            self.tc.assertIsNotNone(self.game.time_loss_reason)
+        else:
+            self.tc.assertIsNone(self.game.time_loss_reason)
 
     def check_legal_moves(self, moves):
         for colour, vertex in moves:
@@ -157,6 +164,49 @@ def test_game_ko_violation(tc):
         ('b', 'E5'),
         ])
 
+def test_game_superko(tc):
+    # w A1 is a self-capture which recreates the position after b B1
+    moves = [
+        ('b', 'A2'), ('w', 'E5'),
+        ('b', 'B1'), ('w', 'A1'),
+        ]
+
+    fx = Game_fixture(tc)
+    tc.assertIsNone(fx.game.superko_rule)
+    fx.check_legal_moves(moves + [('b', 'pass'), ('w', 'A1')])
+
+    fx = Game_fixture(tc)
+    fx.game.set_superko_rule('positional')
+    tc.assertEqual(fx.game.superko_rule, 'positional')
+    fx.check_legal_moves(moves[:-1])
+    fx.game.record_move('w', move_from_vertex('A1', 9))
+    fx.check_over('seen_forfeit')
+    tc.assertEqual(fx.game.winner, 'b')
+    tc.assertEqual(fx.game.forfeit_reason,
+                   "attempted move to A1, which repeats an earlier position "
+                   "(positional superko)")
+    tc.assertEqual(fx.game.move_count, 3)
+
+    fx = Game_fixture(tc)
+    fx.game.set_superko_rule('situational')
+    fx.check_legal_moves(moves + [('b', 'pass')])
+    fx.game.record_move('w', move_from_vertex('A1', 9))
+    fx.check_over('seen_forfeit')
+    tc.assertEqual(fx.game.forfeit_reason,
+                   "attempted move to A1, which repeats an earlier position "
+                   "(situational superko)")
+
+    tc.assertRaisesRegexp(ValueError, "unknown superko rule: nonsense",
+                          fx.game.set_superko_rule, 'nonsense')
+
+def test_game_superko_initial_position(tc):
+    board = boards.Board(9)
+    board.apply_setup([(0, 1), (1, 0)], [], [])
+    fx = Game_fixture(tc, board=board, first_player='w')
+    fx.game.set_superko_rule('positional')
+    fx.game.record_move('w', (0, 0))
+    fx.check_over('seen_forfeit')
+
 def test_game_move_limit(tc):
     fx = Game_fixture(tc)
     game = fx.game
@@ -204,6 +254,17 @@ def test_game_record_forfeit(tc):
     tc.assertEqual(fx.game.winner, 'w')
     tc.assertEqual(fx.game.forfeit_reason, "no good reason")
 
+def test_game_record_time_loss(tc):
+    fx = Game_fixture(tc)
+    fx.game.record_move('b', (2, 3))
+    fx.check_not_over()
+    fx.game.record_time_loss_by('w', "out of time")
+    fx.check_over('seen_time_loss')
+    tc.assertEqual(fx.game.winner, 'b')
+    tc.assertEqual(fx.game.time_loss_reason, "out of time")
+    tc.assertRaises(gameplay.GameStateError,
+                    fx.game.record_time_loss_by, 'b', "out of time")
+
 DIAGRAM2 = """\
 9  .  .  .  .  .  .  .  .  #
 8  .  .  .  .  .  .  .  .  .
@@ -320,6 +381,37 @@ def test_game_score_from_position(tc):
     tc.assertEqual(gs2.margin, 0)
     tc.assertIsNone(gs2.get_detail())
 
+DIAGRAM_DEAD_STONE = """\
+9  .  #  o  .  .  .  .  .  .
+8  #  #  o  .  .  .  .  .  .
+7  o  o  o  .  .  .  .  .  .
+6  .  .  .  .  .  .  .  .  .
+5  .  .  .  .  .  .  .  .  .
+4  .  .  .  .  .  .  .  .  .
+3  .  .  .  .  .  .  .  .  .
+2  .  .  .  .  .  .  .  .  .
+1  .  .  .  .  .  .  .  .  .
+   A  B  C  D  E  F  G  H  J
+"""
+
+def test_game_score_from_position_dead_stones(tc):
+    board = ascii_boards.interpret_diagram(DIAGRAM_DEAD_STONE, 9)
+    gs1 = gameplay.Game_score.from_position(board, komi=0.5)
+    tc.assertEqual(gs1.winner, 'w')
+    tc.assertEqual(gs1.margin, 73.5)
+    gs2 = gameplay.Game_score.from_position(
+        board, komi=0.5, dead_stones='unconditional')
+    tc.assertEqual(gs2.winner, 'w')
+    tc.assertEqual(gs2.margin, 73.5)
+    gs3 = gameplay.Game_score.from_position(
+        board, komi=0.5, dead_stones='estimated')
+    tc.assertEqual(gs3.winner, 'w')
+    tc.assertEqual(gs3.margin, 81.5)
+    gs4 = gameplay.Game_score.from_position(
+        board, komi=0.5, dead_stones='estimated', min_life_area=4)
+    tc.assertEqual(gs4.winner, 'w')
+    tc.assertEqual(gs4.margin, 73.5)
+
 
 ### Result
 
@@ -428,8 +520,9 @@ class Testing_backend(gameplay.Backend):
       size  -- int
       moves -- list of pairs (colour, vertex)
 
-    Supports special vertex values 'resign', 'claim', and 'forfeit', which
-    cause get_move() to return the appropriate action and detail.
+    Supports special vertex values 'resign', 'claim', 'forfeit', and
+    'timeout', which cause get_move() to return the appropriate action and
+    detail.
 
     get_move() returns the next move for the requested colour. You can specify
     them interleaved for readability, but it doesn't matter.
@@ -484,6 +577,8 @@ class Testing_backend(gameplay.Backend):
             return vertex, None
         if vertex == 'forfeit':
             return 'forfeit', "programmed forfeit"
+        if vertex == 'timeout':
+            return 'timeout', "programmed timeout"
         return 'move', move_from_vertex(vertex, self._size)
 
     def get_move(self, colour):
@@ -788,6 +883,28 @@ def test_game_runner_forfeit(tc):
 (;FF[4]AP[gomill:VER]CA[UTF-8]DT[***]GM[1]KM[11]RE[W+F]SZ[5];B[ce];W[de])
 """)
 
+def test_game_runner_timeout(tc):
+    fx = Game_runner_fixture(
+        tc, moves=[('b', 'C1'), ('w', 'timeout')])
+    fx.run_game()
+    tc.assertEqual(fx.backend.log, [
+        "start_new_game: size=5, komi=11.0",
+        "get_move <- b: move/C1",
+        "get_last_move_comment <- b",
+        "notify_move -> w C1",
+        "get_move <- w: timeout/'programmed timeout'",
+        "end_game",
+        'get_last_move_comment <- w',
+        ])
+    result = fx.game_runner.result
+    tc.assertEqual(result.sgf_result, 'B+T')
+    tc.assertEqual(result.detail, "programmed timeout")
+    tc.assertEqual(result.winning_colour, 'b')
+    tc.assertIs(result.is_forfeit, False)
+    tc.assertEqual(fx.sgf_string(), """\
+(;FF[4]AP[gomill:VER]CA[UTF-8]DT[***]GM[1]KM[11]RE[B+T]SZ[5];B[ce])
+""")
+
 def test_game_runner_illegal_move(tc):
     fx = Game_runner_fixture(tc, moves=[('b', 'C1'), ('w', 'D1'), ('b', 'D1')])
     fx.enable_after_move_callback()
@@ -816,6 +933,21 @@ def test_game_runner_illegal_move(tc):
         ('w', (0, 3), None),
         ])
 
+def test_game_runner_superko(tc):
+    fx = Game_runner_fixture(tc, moves=[
+        ('b', 'A2'), ('w', 'E5'),
+        ('b', 'B1'), ('w', 'A1'),
+        ])
+    fx.game_runner.set_superko_rule('positional')
+    fx.run_game()
+    result = fx.game_runner.result
+    tc.assertEqual(result.sgf_result, 'B+F')
+    tc.assertEqual(result.detail,
+                   "attempted move to A1, which repeats an earlier position "
+                   "(positional superko)")
+    tc.assertEqual(len(fx.game_runner.get_moves()), 3)
+    tc.assertRaises(ValueError, fx.game_runner.set_superko_rule, 'nonsense')
+
 def test_game_runner_move_rejected_as_illegal(tc):
     fx = Game_runner_fixture(
         tc,
@@ -10,6 +10,7 @@ from gomill_tests import test_framework
 from gomill.common import *
 from gomill import ascii_boards
 from gomill import boards
+from gomill import gtp_games
 from gomill import sgf
 
 # This makes TestResult ignore lines from this module in tracebacks
@@ -117,6 +118,17 @@ def sgf_moves_and_comments_from_string(s):
     return sgf_moves_and_comments(sgf.Sgf_game.from_string(s))
 
 
+def game_result_state(result):
+    """Return a comparable description of a Game_result.
+
+    This is the result's pickled state, without move_times.
+
+    """
+    state = result.__getstate__()
+    if result.move_times is not None:
+        state = state[:-1]
+    return state
+
 traceback_line_re = re.compile(
     r"  .*/([a-z0-9_]+)\.pyc?:[0-9]+ \(([a-z0-9_]+)\)")
 
@@ -128,9 +140,18 @@ class Gomill_testcase_mixin(object):
      assertDiagramEqual
      assertEqual and assertNotEqual for Boards
 
+    Game_result features:
+     assertGameResultEqual
+     assertGameResultListEqual
+     assertEqual for Game_results
+
     """
     def init_gomill_testcase_mixin(self):
         self.addTypeEqualityFunc(boards.Board, self.assertBoardEqual)
+        self.addTypeEqualityFunc(boards.Incremental_board,
+                                 self.assertBoardEqual)
+        self.addTypeEqualityFunc(gtp_games.Game_result,
+                                 self.assertGameResultEqual)
 
     def _format_message(self, msg, standardMsg):
         # This is the same as _formatMessage from python 2.7 unittest; copying
@@ -166,6 +187,20 @@ class Gomill_testcase_mixin(object):
         if not are_equal:
             self.fail(self._format_message(msg, desc+"\n"))
 
+    def assertGameResultEqual(self, r1, r2, msg=None):
+        """assertEqual for two Game_results.
+
+        Compares the results' pickled state (ignoring move_times).
+
+        """
+        self.assertTupleEqual(
+            game_result_state(r1), game_result_state(r2), msg)
+
+    def assertGameResultListEqual(self, l1, l2, msg=None):
+        """assertListEqual for two sequences of Game_results."""
+        self.assertListEqual(map(game_result_state, l1),
+                             map(game_result_state, l2), msg)
+
     def assertNotEqual(self, first, second, msg=None):
         if isinstance(first, boards.Board) and isinstance(second, boards.Board):
             are_equal, _ = compare_boards(first, second)
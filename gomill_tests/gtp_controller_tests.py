@@ -397,6 +397,41 @@ def test_controller_close_error(tc):
         "forced failure for close")
     tc.assertListEqual(controller.retrieve_error_messages(), [])
 
+def test_controller_start_command(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    tc.assertRaisesRegexp(StandardError, "^no command outstanding$",
+                          controller.finish_command)
+    controller.start_command("test", "ab", "cd")
+    tc.assertRaisesRegexp(StandardError, "^command already outstanding$",
+                          controller.start_command, "test")
+    tc.assertEqual(controller.finish_command(), "args: ab cd")
+    controller.start_command("error")
+    with tc.assertRaises(BadGtpResponse) as ar:
+        controller.finish_command()
+    tc.assertEqual(ar.exception.gtp_command, "error")
+    tc.assertEqual(str(ar.exception),
+                   "failure response from 'error' to player test:\n"
+                   "normal error")
+    channel.fail_next_response = True
+    controller.start_command("test")
+    with tc.assertRaises(GtpTransportError) as ar:
+        controller.finish_command()
+    tc.assertEqual(
+        str(ar.exception),
+        "transport error reading response to 'test' from player test:\n"
+        "forced failure for get_response_line")
+    tc.assertTrue(controller.channel_is_bad)
+
+def test_controller_safe_close_with_command_outstanding(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    controller.start_command("test")
+    controller.safe_close()
+    tc.assertTrue(controller.channel_is_closed)
+    tc.assertListEqual(channel.engine.commands_handled, [('test', [])])
+    tc.assertListEqual(controller.retrieve_error_messages(), [])
+
 def test_controller_safe_close(tc):
     channel = gtp_engine_fixtures.get_test_channel()
     controller = Gtp_controller(channel, 'player test')
@@ -754,6 +789,22 @@ def test_subprocess_channel_with_controller(tc):
     rusage = channel.resource_usage
     tc.assertTrue(hasattr(rusage, 'ru_utime'))
 
+def test_subprocess_channel_terminate(tc):
+    fx = gtp_engine_fixtures.State_reporter_fixture(tc)
+    channel = gtp_controller.Subprocess_gtp_channel(fx.cmd, stderr=fx.devnull)
+    controller = Gtp_controller(channel, 'subprocess test')
+    tc.assertIs(channel.terminate(), True)
+    with tc.assertRaises(GtpChannelClosed):
+        controller.do_command("tell")
+    controller.safe_close()
+    tc.assertTrue(os.WIFSIGNALED(channel.exit_status))
+    # Safe to call after the channel has been closed
+    tc.assertIs(channel.terminate(), True)
+
+def test_channel_terminate_unsupported(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    tc.assertIs(channel.terminate(), False)
+
 
 ### Game_controller
 
@@ -985,6 +1036,28 @@ def test_game_controller_cautious_mode_send_command(tc):
         "transport error sending 'list_commands' to player one:\n"
         "forced failure for send_command_line")
 
+def test_game_controller_start_command(tc):
+    channel1 = gtp_engine_fixtures.get_test_channel()
+    controller1 = Gtp_controller(channel1, 'player one')
+    channel2 = gtp_engine_fixtures.get_test_channel()
+    controller2 = Gtp_controller(channel2, 'player two')
+    gc = gtp_controller.Game_controller('one', 'two')
+    gc.set_player_controller('b', controller1)
+    gc.set_player_controller('w', controller2)
+    gc.start_command('b', 'test', 'ab')
+    gc.start_command('w', 'test')
+    tc.assertEqual(gc.finish_command('w'), "test response")
+    tc.assertEqual(gc.finish_command('b'), "args: ab")
+    gc.start_command('b', 'error')
+    with tc.assertRaises(BadGtpResponse) as ar:
+        gc.finish_command('b')
+    tc.assertEqual(ar.exception.gtp_error_message, "normal error")
+    gc.set_cautious_mode(True)
+    tc.assertRaisesRegexp(StandardError, "cautious mode",
+                          gc.start_command, 'b', 'test')
+    gc.close_players()
+    tc.assertIsNone(gc.describe_late_errors())
+
 def test_game_controller_leave_cautious_mode(tc):
     channel1 = gtp_engine_fixtures.get_test_channel()
     controller1 = Gtp_controller(channel1, 'player one')
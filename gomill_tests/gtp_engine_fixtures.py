@@ -108,7 +108,7 @@ class Test_player(object):
         self.boardsize = gtp_engine.interpret_int(args[0])
 
     def handle_clear_board(self, args):
-        pass
+        self.row_to_play = 0
 
     def handle_komi(self, args):
         pass
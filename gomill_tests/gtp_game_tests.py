@@ -3,6 +3,7 @@
 from __future__ import with_statement
 
 import cPickle as pickle
+import threading
 from textwrap import dedent
 
 from gomill import boards
@@ -252,6 +253,38 @@ def test_game(tc):
         ('known_command', ['gomill-cpu_time']),
         ])
 
+def test_game_run_stepwise(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    waited_for = list(fx.game.run_stepwise())
+    tc.assertEqual(len(waited_for), 20)
+    tc.assertIs(waited_for[0], fx.channel_b)
+    tc.assertIs(waited_for[1], fx.channel_w)
+    tc.assertEqual(fx.game.result.describe(), "one beat two B+18")
+    tc.assertEqual(len(fx.game.get_moves()), 20)
+    tc.assertEqual(
+        [command for command, args in fx.engine_b.commands_handled
+         if command == 'genmove'],
+        ['genmove'] * 10)
+
+def test_forfeit_genmove_fails_stepwise(tc):
+    moves = [
+        ('b', 'C5'), ('w', 'F5'),
+        ('b', 'fail'), # GTP failure response
+        ]
+    fx = Gtp_game_fixture(
+        tc, Programmed_player(moves), Programmed_player(moves))
+    fx.game.prepare()
+    for channel in fx.game.run_stepwise():
+        pass
+    tc.assertEqual(fx.game.result.sgf_result, "W+F")
+    tc.assertEqual(
+        fx.game.result.detail,
+        "forfeit by one: failure response from 'genmove b' to player one:\n"
+        "forced to fail")
+    fx.check_moves(moves[:-1])
+
 def test_unscored_game(tc):
     fx = Gtp_game_fixture(tc)
     tc.assertIs(fx.game_controller.get_controller('b'), fx.controller_b)
@@ -942,6 +975,36 @@ class Handicap_compensation_TestCase(
         fx.game.run()
         self.assertEqual(fx.game.result.sgf_result, self.result)
 
+def test_internal_scorer_dead_stones(tc):
+    moves = [
+        ('b', 'A7'), ('w', 'A9'),
+        ('b', 'B8'), ('w', 'G5'),
+        ('b', 'C9'),
+        ]
+    fx = Gtp_game_fixture(
+        tc, Programmed_player(moves), Programmed_player(moves), komi=0.5)
+    fx.game.use_internal_scorer(dead_stones='no')
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(fx.game.result.sgf_result, "B+0.5")
+    fx = Gtp_game_fixture(
+        tc, Programmed_player(moves), Programmed_player(moves), komi=0.5)
+    fx.game.use_internal_scorer(dead_stones='estimated')
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(fx.game.result.sgf_result, "B+4.5")
+    fx = Gtp_game_fixture(
+        tc, Programmed_player(moves), Programmed_player(moves), komi=0.5)
+    fx.game.use_internal_scorer(dead_stones='estimated', min_life_area=1)
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(fx.game.result.sgf_result, "B+0.5")
+
+def test_internal_scorer_bad_dead_stones(tc):
+    fx = Gtp_game_fixture(tc)
+    tc.assertRaisesRegexp(ValueError, "^bad dead_stones value: maybe$",
+                          fx.game.use_internal_scorer, dead_stones='maybe')
+
 def test_move_callback(tc):
     seen = []
     def see(colour, move, board):
@@ -992,6 +1055,299 @@ def test_game_result_cpu_time_pickle_compatibility(tc):
     result2 = pickle.loads(pickle.dumps(result))
     tc.assertEqual(result2.cpu_times, {'one' : 33.5, 'two' : None})
 
+def test_move_times(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    fx.game.run()
+    move_times = fx.game.result.move_times
+    tc.assertEqual(sorted(move_times), ['one', 'two'])
+    tc.assertIs(move_times['one'], fx.game.get_move_times()['b'])
+    for player_code in 'one', 'two':
+        tc.assertEqual(len(move_times[player_code].genmove_times), 10)
+        tc.assertEqual(len(move_times[player_code].play_times), 10)
+        tc.assertTrue(all(0 <= t < 5
+                          for t in move_times[player_code].genmove_times))
+    result2 = pickle.loads(pickle.dumps(fx.game.result, protocol=-1))
+    tc.assertEqual(result2, fx.game.result)
+    tc.assertEqual(list(result2.move_times['two'].genmove_times),
+                   list(move_times['two'].genmove_times))
+    result2.move_times = None
+    result3 = pickle.loads(pickle.dumps(result2, protocol=-1))
+    tc.assertIsNone(result3.move_times)
+
+def test_move_times_forfeit(tc):
+    moves = [
+        ('b', 'C5'), ('w', 'F5'),
+        ('b', 'fail'), # GTP failure response
+        ]
+    fx = Gtp_game_fixture(
+        tc, Programmed_player(moves), Programmed_player(moves))
+    fx.game.prepare()
+    for channel in fx.game.run_stepwise():
+        pass
+    move_times = fx.game.result.move_times
+    tc.assertEqual(len(move_times['one'].genmove_times), 2)
+    tc.assertEqual(len(move_times['one'].play_times), 1)
+    tc.assertEqual(len(move_times['two'].genmove_times), 1)
+    tc.assertEqual(len(move_times['two'].play_times), 1)
+
+def test_make_sgf_move_times(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertNotIn("MT[", fx.sgf_string())
+    sgf_game = fx.game.make_sgf(include_move_times=True)
+    nodes = sgf_game.get_main_sequence()
+    tc.assertFalse(nodes[0].has_property('MT'))
+    tc.assertEqual(len(nodes), 21)
+    for node in nodes[1:]:
+        tc.assertRegexpMatches(node.get('MT'), r"^[0-9]+\.[0-9]{3}$")
+
+def test_time_controls(tc):
+    tc1 = gtp_games.Time_controls(600)
+    tc.assertEqual(tc1.style, 'absolute')
+    tc.assertEqual(tc1.kill_margin, 10.0)
+    tc.assertIsNone(tc1.describe_overtime())
+    tc.assertEqual(tc1.describe(), "600s")
+    tc2 = gtp_games.Time_controls(600, 300, period_moves=25)
+    tc.assertEqual(tc2.style, 'canadian')
+    tc.assertEqual(tc2.describe(), "600s + 25/300 Canadian")
+    tc3 = gtp_games.Time_controls(0, 30.5, periods=5, kill_margin=None)
+    tc.assertEqual(tc3.style, 'byoyomi')
+    tc.assertIsNone(tc3.kill_margin)
+    tc.assertEqual(tc3.describe(), "0s + 5x30.5 byo-yomi")
+    tc.assertRaisesRegexp(ValueError, "^negative time$",
+                          gtp_games.Time_controls, -1)
+    tc.assertRaisesRegexp(ValueError, "^no time allowed$",
+                          gtp_games.Time_controls, 0)
+    tc.assertRaisesRegexp(
+        ValueError, "^both period_moves and periods specified$",
+        gtp_games.Time_controls, 60, 30, period_moves=5, periods=5)
+    tc.assertRaisesRegexp(
+        ValueError, "^period_time specified without period_moves or periods$",
+        gtp_games.Time_controls, 60, 30)
+    tc.assertRaisesRegexp(
+        ValueError, "^period_time must be positive for overtime$",
+        gtp_games.Time_controls, 60, periods=5)
+    tc.assertRaisesRegexp(
+        ValueError, "^periods must be at least 1$",
+        gtp_games.Time_controls, 60, 30, periods=0)
+    tc.assertRaisesRegexp(ValueError, "^negative kill_margin$",
+                          gtp_games.Time_controls, 60, kill_margin=-1)
+    tc2_2 = pickle.loads(pickle.dumps(tc2, protocol=-1))
+    tc.assertEqual(tc2_2.describe(), tc2.describe())
+
+def test_game_clock_absolute(tc):
+    clock = gtp_games.Game_clock(gtp_games.Time_controls(10))
+    tc.assertEqual(clock.get_time_left(), (10.0, 0))
+    tc.assertEqual(clock.get_move_allowance(), 10.0)
+    tc.assertIs(clock.record_move_time(4.0), True)
+    tc.assertEqual(clock.get_time_left(), (6.0, 0))
+    tc.assertIs(clock.record_move_time(6.0), True)
+    tc.assertIs(clock.is_out_of_time, False)
+    tc.assertIs(clock.record_move_time(0.5), False)
+    tc.assertIs(clock.is_out_of_time, True)
+
+def test_game_clock_canadian(tc):
+    clock = gtp_games.Game_clock(
+        gtp_games.Time_controls(10, 20, period_moves=2))
+    tc.assertEqual(clock.get_move_allowance(), 30.0)
+    tc.assertIs(clock.record_move_time(15.0), True)
+    tc.assertIs(clock.in_overtime, True)
+    tc.assertEqual(clock.get_time_left(), (15.0, 1))
+    tc.assertEqual(clock.get_move_allowance(), 15.0)
+    tc.assertIs(clock.record_move_time(14.0), True)
+    # new period
+    tc.assertEqual(clock.get_time_left(), (20.0, 2))
+    tc.assertIs(clock.record_move_time(10.0), True)
+    tc.assertIs(clock.record_move_time(10.5), False)
+    tc.assertIs(clock.is_out_of_time, True)
+
+def test_game_clock_byoyomi(tc):
+    clock = gtp_games.Game_clock(
+        gtp_games.Time_controls(10, 5, periods=3))
+    tc.assertEqual(clock.get_move_allowance(), 25.0)
+    tc.assertIs(clock.record_move_time(12.0), True)
+    tc.assertEqual(clock.get_time_left(), (5.0, 3))
+    tc.assertIs(clock.record_move_time(4.9), True)
+    tc.assertEqual(clock.get_time_left(), (5.0, 3))
+    tc.assertIs(clock.record_move_time(6.0), True)
+    tc.assertEqual(clock.get_time_left(), (5.0, 2))
+    tc.assertEqual(clock.get_move_allowance(), 10.0)
+    tc.assertIs(clock.record_move_time(10.0), False)
+    tc.assertIs(clock.is_out_of_time, True)
+
+def test_time_settings(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.set_time_controls(gtp_games.Time_controls(600, 30, periods=5))
+    def handle_ignore(args):
+        pass
+    for engine in fx.engine_b, fx.engine_w:
+        engine.add_command('time_settings', handle_ignore)
+        engine.add_command('time_left', handle_ignore)
+    fx.engine_w.add_command('kgs-time_settings', handle_ignore)
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(fx.game.result.sgf_result, "B+18")
+    def time_commands(engine):
+        return [(command, args) for (command, args) in engine.commands_handled
+                if 'time' in command][:3]
+    tc.assertEqual(time_commands(fx.engine_b), [
+        ('time_settings', ['600', '30', '1']),
+        ('time_left', ['b', '600', '0']),
+        ('time_left', ['b', '599', '0']),
+        ])
+    tc.assertEqual(time_commands(fx.engine_w), [
+        ('kgs-time_settings', ['byoyomi', '600', '30', '5']),
+        ('time_left', ['w', '600', '0']),
+        ('time_left', ['w', '599', '0']),
+        ])
+    sgf_game = fx.game.make_sgf()
+    tc.assertEqual(sgf_game.root.get('TM'), 600)
+    tc.assertEqual(sgf_game.root.get('OT'), "5x30 byo-yomi")
+
+def test_time_settings_fractional(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.set_time_controls(
+        gtp_games.Time_controls(600.5, 0.5, period_moves=3))
+    def handle_ignore(args):
+        pass
+    fx.engine_b.add_command('time_settings', handle_ignore)
+    fx.engine_b.add_command('time_left', handle_ignore)
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(fx.game.result.sgf_result, "B+18")
+    tc.assertEqual(
+        [(command, args) for (command, args) in fx.engine_b.commands_handled
+         if 'time' in command][:2], [
+        ('time_settings', ['601', '1', '3']),
+        ('time_left', ['b', '600', '0']),
+        ])
+
+def test_time_left_byoyomi(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.set_time_controls(gtp_games.Time_controls(2, 30, periods=5))
+    def handle_ignore(args):
+        pass
+    for engine in fx.engine_b, fx.engine_w:
+        engine.add_command('time_settings', handle_ignore)
+        engine.add_command('time_left', handle_ignore)
+    fx.engine_w.add_command('kgs-time_settings', handle_ignore)
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    real_time_module = gtp_games.time
+    gtp_games.time = Fake_time_module(1.0)
+    try:
+        fx.game.run()
+    finally:
+        gtp_games.time = real_time_module
+    def time_left_commands(engine):
+        return [args for (command, args) in engine.commands_handled
+                if command == 'time_left'][:5]
+    # Black was sent time_settings, so it's told it has one move in the
+    # period; White was sent kgs-time_settings, so it's told how many
+    # periods it has.
+    tc.assertEqual(time_left_commands(fx.engine_b), [
+        ['b', '2', '0'],
+        ['b', '1', '0'],
+        ['b', '0', '0'],
+        ['b', '30', '1'],
+        ['b', '30', '1'],
+        ])
+    tc.assertEqual(time_left_commands(fx.engine_w), [
+        ['w', '2', '0'],
+        ['w', '1', '0'],
+        ['w', '0', '0'],
+        ['w', '30', '5'],
+        ['w', '30', '5'],
+        ])
+
+def test_time_settings_unsupported(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.set_time_controls(gtp_games.Time_controls(600))
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(fx.game.result.sgf_result, "B+18")
+    tc.assertFalse(any('time' in command
+                       for (command, args) in fx.engine_b.commands_handled))
+
+class Fake_time_module(object):
+    """Replacement for the time module, whose clock advances on every call."""
+    def __init__(self, step):
+        self.now = 1000.0
+        self.step = step
+
+    def time(self):
+        self.now += self.step
+        return self.now
+
+def test_time_loss(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.set_time_controls(gtp_games.Time_controls(3, kill_margin=None))
+    fx.game.use_internal_scorer()
+    fx.game.prepare()
+    real_time_module = gtp_games.time
+    gtp_games.time = Fake_time_module(1.0)
+    try:
+        fx.game.run()
+    finally:
+        gtp_games.time = real_time_module
+    # Each genmove takes one second; black runs out on its fourth move
+    tc.assertEqual(fx.game.result.sgf_result, "W+T")
+    tc.assertEqual(fx.game.result.detail, "out of time")
+    tc.assertIs(fx.game.result.is_forfeit, False)
+    tc.assertEqual(fx.game.result.describe(), "two beat one W+T (out of time)")
+    tc.assertEqual(len(fx.game.get_moves()), 6)
+    tc.assertEqual(fx.game.make_sgf().root.get('TM'), 3)
+
+def test_time_loss_kills_engine(tc):
+    killed = threading.Event()
+    def handle_genmove(args):
+        killed.wait(10)
+        return "pass"
+    def terminate():
+        fx.channel_w.fail_next_response = True
+        killed.set()
+        return True
+    fx = Gtp_game_fixture(tc)
+    fx.engine_w.add_command('genmove', handle_genmove)
+    fx.channel_w.terminate = terminate
+    fx.game.set_time_controls(
+        gtp_games.Time_controls(0.05, kill_margin=0.05))
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertTrue(killed.isSet())
+    tc.assertEqual(fx.game.result.sgf_result, "B+T")
+    tc.assertRegexpMatches(
+        fx.game.result.detail,
+        r"^out of time: engine killed after [0-9.]+ seconds$")
+    fx.check_moves([('b', 'E1')])
+
+def test_time_loss_kills_engine_stepwise(tc):
+    killed = threading.Event()
+    def handle_genmove(args):
+        killed.wait(10)
+        return "pass"
+    def terminate():
+        fx.channel_b.fail_next_response = True
+        killed.set()
+        return True
+    fx = Gtp_game_fixture(tc)
+    fx.engine_b.add_command('genmove', handle_genmove)
+    fx.channel_b.terminate = terminate
+    fx.game.set_time_controls(
+        gtp_games.Time_controls(0.05, kill_margin=0.05))
+    fx.game.prepare()
+    for channel in fx.game.run_stepwise():
+        pass
+    tc.assertEqual(fx.game.result.sgf_result, "W+T")
+    fx.check_moves([])
+
 
 def test_cautious_mode_setting(tc):
     fx = Gtp_game_fixture(tc)
@@ -0,0 +1,95 @@
+"""Tests for gtp_multiplexing.py"""
+
+from __future__ import with_statement
+
+import os
+import select
+import sys
+
+from gomill import gtp_controller
+from gomill import gtp_multiplexing
+
+from gomill_tests import gomill_test_support
+from gomill_tests import gtp_engine_fixtures
+from gomill_tests.gtp_game_tests import Gtp_game_fixture
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def _make_reporter_channel(tc):
+    # Uses the running Python executable rather than 'python' on the PATH.
+    fx = gtp_engine_fixtures.State_reporter_fixture(tc)
+    cmd = [sys.executable] + fx.cmd[1:]
+    channel = gtp_multiplexing.Nonblocking_subprocess_gtp_channel(
+        cmd, stderr=fx.devnull, env={'GOMILL_TEST' : "multiplexing"})
+    tc.addCleanup(channel.close)
+    return channel
+
+def test_nonblocking_subprocess_channel(tc):
+    channel = _make_reporter_channel(tc)
+    channel.read_available()
+    tc.assertFalse(channel.response_is_ready())
+    channel.send_command("tell", [])
+    while not channel.response_is_ready():
+        select.select([channel.fileno()], [], [], 5)
+        channel.read_available()
+    tc.assertEqual(channel.get_response(),
+                   (False, "cwd: %s\nGOMILL_TEST:multiplexing" % os.getcwd()))
+
+def test_nonblocking_subprocess_channel_blocking_read(tc):
+    channel = _make_reporter_channel(tc)
+    controller = gtp_controller.Gtp_controller(channel, 'subprocess test')
+    tc.assertEqual(controller.do_command("tell"),
+                   "cwd: %s\nGOMILL_TEST:multiplexing" % os.getcwd())
+
+def test_response_is_ready(tc):
+    channel = _make_reporter_channel(tc)
+    def check(s, expected):
+        channel.buffer = s
+        tc.assertIs(channel.response_is_ready(), expected, repr(s))
+    check("", False)
+    check("=", False)
+    check("= foo\n", False)
+    check("= foo\n\n", True)
+    check("= foo\r\n\r\n", True)
+    check("\n\n", False)
+    check("\n  \n=\n", False)
+    check("\n  \n=\n\n", True)
+    check("\x01", True)
+    channel.is_first_response = False
+    check("\x01", False)
+    channel.seen_eof = True
+    check("", True)
+
+def test_run_tasks(tc):
+    log = []
+    def run_game(i, fx):
+        fx.game.prepare()
+        for channel in fx.game.run_stepwise():
+            log.append(i)
+            yield channel
+    fixtures = [Gtp_game_fixture(tc) for i in range(3)]
+    for fx in fixtures:
+        fx.game.use_internal_scorer()
+    gtp_multiplexing.run_tasks(
+        run_game(i, fx) for (i, fx) in enumerate(fixtures))
+    for fx in fixtures:
+        tc.assertEqual(fx.game.result.describe(), "one beat two B+18")
+    tc.assertEqual(log[:6], [0, 1, 2, 0, 1, 2])
+    tc.assertEqual(len(log), 60)
+
+def test_run_tasks_exception(tc):
+    closed = []
+    def failing_task():
+        yield None
+        raise ValueError("task failed")
+    def endless_task():
+        try:
+            while True:
+                yield None
+        finally:
+            closed.append(True)
+    with tc.assertRaises(ValueError):
+        gtp_multiplexing.run_tasks([failing_task(), endless_task()])
+    tc.assertEqual(closed, [True])
@@ -185,6 +185,49 @@ def test_play(tc):
     1  .  .  .  .  .  .  .  .  .
        A  B  C  D  E  F  G  H  J"""))
 
+def test_superko(tc):
+    # W A1 is a self-capture which recreates the position after B B1
+    fx = Gtp_state_fixture(tc)
+    fx.gtp_state.set_superko_rule('positional')
+    fx.check_command('play', ['B', "A2"], "")
+    fx.check_command('play', ['W', "E5"], "")
+    fx.check_command('play', ['B', "B1"], "")
+    fx.check_command('play', ['W', "A1"], "illegal move",
+                     expect_failure=True)
+    tc.assertEqual(len(fx.gtp_state.move_history), 3)
+    fx.player.set_next_move("A1")
+    fx.check_command('genmove', ['W'], "engine error: tried to play A1",
+                     expect_failure=True)
+    fx.check_command('showboard', [], dedent("""
+    9  .  .  .  .  .  .  .  .  .
+    8  .  .  .  .  .  .  .  .  .
+    7  .  .  .  .  .  .  .  .  .
+    6  .  .  .  .  .  .  .  .  .
+    5  .  .  .  .  o  .  .  .  .
+    4  .  .  .  .  .  .  .  .  .
+    3  .  .  .  .  .  .  .  .  .
+    2  #  .  .  .  .  .  .  .  .
+    1  .  #  .  .  .  .  .  .  .
+       A  B  C  D  E  F  G  H  J"""))
+    fx.check_command('undo', [], "")
+    fx.check_command('play', ['B', "pass"], "")
+    fx.check_command('play', ['W', "A1"], "")
+
+    fx = Gtp_state_fixture(tc)
+    fx.gtp_state.set_superko_rule('situational')
+    fx.check_command('play', ['B', "A2"], "")
+    fx.check_command('play', ['W', "E5"], "")
+    fx.check_command('play', ['B', "B1"], "")
+    fx.check_command('play', ['W', "A1"], "")
+    fx.check_command('play', ['B', "pass"], "")
+    fx.check_command('play', ['W', "A1"], "illegal move",
+                     expect_failure=True)
+    fx.check_command('undo', [], "")
+    fx.check_command('play', ['W', "A1"], "illegal move",
+                     expect_failure=True)
+    fx.gtp_state.set_superko_rule(None)
+    fx.check_command('play', ['W', "A1"], "")
+
 def test_komi(tc):
     fx = Gtp_state_fixture(tc)
     fx.check_command('genmove', ['B'], "pass")
@@ -277,6 +320,101 @@ def test_undo(tc):
     fx.check_command('gomill-explain_last_move', [], "")
     fx.check_command('undo', [], "cannot undo", expect_failure=True)
 
+def test_undo_capture_and_ko(tc):
+    fx = Gtp_state_fixture(tc)
+    gtp_state = fx.gtp_state
+    gtp_state.set_superko_rule('positional')
+    for colour, vertex in [('B', "A2"), ('W', "B2"), ('B', "B1"),
+                           ('W', "C1"), ('B', "pass")]:
+        fx.check_command('play', [colour, vertex], "")
+    board_before_capture = gtp_state.board.copy()
+    superko_before_capture = set(gtp_state.superko_history)
+    # W A1 captures B B1, leaving a ko
+    fx.check_command('play', ['W', "A1"], "")
+    tc.assertEqual(gtp_state.board.get(0, 1), None)
+    tc.assertEqual(gtp_state.simple_ko_point, (0, 1))
+    tc.assertEqual(gtp_state.simple_ko_player, 'b')
+    fx.check_command('play', ['B', "E5"], "")
+    tc.assertEqual(gtp_state.simple_ko_point, None)
+    fx.check_command('undo', [], "")
+    tc.assertEqual(gtp_state.simple_ko_point, (0, 1))
+    tc.assertEqual(gtp_state.simple_ko_player, 'b')
+    fx.check_command('undo', [], "")
+    tc.assertEqual(gtp_state.board.get(0, 1), 'b')
+    tc.assertEqual(gtp_state.simple_ko_point, None)
+    tc.assertEqual(gtp_state.board.list_occupied_points(),
+                   board_before_capture.list_occupied_points())
+    tc.assertEqual(gtp_state.board.zobrist_hash(),
+                   board_before_capture.zobrist_hash())
+    tc.assertEqual(gtp_state.superko_history, superko_before_capture)
+    fx.check_command('play', ['W', "A1"], "")
+    tc.assertEqual(gtp_state.board.get(0, 1), None)
+
+def test_undo_matches_replay(tc):
+    fx = Gtp_state_fixture(tc)
+    gtp_state = fx.gtp_state
+    gtp_state.set_superko_rule('situational')
+    # Includes a capture, a pass, and a recapture of the ko after a pass
+    moves = [('b', (1, 0)), ('w', (1, 1)), ('b', (0, 1)), ('w', (0, 2)),
+             ('b', None), ('w', (0, 0)), ('b', (4, 4)), ('w', None),
+             ('b', (0, 1)), ('w', (5, 5))]
+    for colour, move in moves:
+        gtp_state.handle_play([colour, format_vertex(move)])
+    def describe(state):
+        return (state.board.list_occupied_points(),
+                state.board.zobrist_hash(),
+                state.simple_ko_point, state.simple_ko_player,
+                state.superko_history,
+                [(m.colour, m.move) for m in state.move_history])
+    while gtp_state.move_history:
+        gtp_state.handle_undo([])
+        replayed = gtp_states.Gtp_state(None, acceptable_sizes=(9,))
+        replayed.set_superko_rule('situational')
+        replayed.reset_to_moves(list(gtp_state.move_history))
+        tc.assertEqual(describe(gtp_state), describe(replayed))
+    tc.assertTrue(gtp_state.board.is_empty())
+    tc.assertEqual(gtp_state.superko_history, set())
+
+def test_undo_with_short_undo_log(tc):
+    fx = Gtp_state_fixture(tc)
+    gtp_state = fx.gtp_state
+    for colour, vertex in [('B', "C3"), ('W', "D4"), ('B', "E5")]:
+        fx.check_command('play', [colour, vertex], "")
+    # The board's undo log no longer matches the move history, so undo has
+    # to replay the history.
+    gtp_state.board.undo()
+    tc.assertEqual(gtp_state.board.count_undoable_moves(), 2)
+    fx.check_command('undo', [], "")
+    tc.assertEqual(gtp_state.board.list_occupied_points(),
+                   [('b', (2, 2)), ('w', (3, 3))])
+    tc.assertEqual(gtp_state.board.count_undoable_moves(), 2)
+    fx.check_command('undo', [], "")
+    tc.assertEqual(gtp_state.board.list_occupied_points(),
+                   [('b', (2, 2))])
+
+def test_reset_to_moves_prefix(tc):
+    fx = Gtp_state_fixture(tc)
+    gtp_state = fx.gtp_state
+    for colour, vertex in [('B', "C3"), ('W', "D4"), ('B', "E5"),
+                           ('W', "pass"), ('B', "F6")]:
+        fx.check_command('play', [colour, vertex], "")
+    board = gtp_state.board
+    prefix = gtp_state.move_history[:2]
+    gtp_state.reset_to_moves(prefix)
+    # Prefix: the board is updated in place rather than replaced
+    tc.assertIs(gtp_state.board, board)
+    tc.assertIs(gtp_state.move_history, prefix)
+    tc.assertEqual(board.list_occupied_points(),
+                   [('b', (2, 2)), ('w', (3, 3))])
+    other = [gtp_states.History_move('b', (2, 2)),
+             gtp_states.History_move('w', (5, 5))]
+    gtp_state.reset_to_moves(other)
+    tc.assertEqual(gtp_state.board.list_occupied_points(),
+                   [('b', (2, 2)), ('w', (5, 5))])
+    fx.check_command('undo', [], "")
+    fx.check_command('undo', [], "")
+    fx.check_board_empty_9()
+
 def test_fixed_handicap(tc):
     fx = Gtp_state_fixture(tc)
     fx.check_command('fixed_handicap', ['3'], "C3 G7 C7")
@@ -0,0 +1,174 @@
+"""Tests for job_manager.py"""
+
+from __future__ import with_statement
+
+import threading
+
+from gomill import job_manager
+from gomill.job_manager import JobFailed, NoJobAvailable
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+AUTHKEY = "job_manager_tests"
+
+class Test_job(object):
+    """Job for the tests.
+
+    The response is a pair (job number, worker id).
+
+    """
+    def __init__(self, number, fail=False):
+        self.number = number
+        self.fail = fail
+
+    def run(self, worker_id):
+        if self.fail:
+            raise JobFailed("job %d failed" % self.number)
+        return self.number, worker_id
+
+class Test_job_source(object):
+    """Job source for the tests.
+
+    Public attributes:
+      jobs      -- list of jobs still to be issued
+      responses -- list of responses received
+      errors    -- list of pairs (job number, message)
+      lost      -- list of job numbers
+      batches   -- number of end_batch() calls
+
+    Jobs which are reported lost are reissued.
+
+    """
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+        self.responses = []
+        self.errors = []
+        self.lost = []
+        self.batches = 0
+
+    def get_job(self):
+        if not self.jobs:
+            return NoJobAvailable
+        return self.jobs.pop(0)
+
+    def process_response(self, response):
+        self.responses.append(response)
+
+    def process_error_response(self, job, message):
+        self.errors.append((job.number, message))
+
+    def process_lost_job(self, job):
+        self.lost.append(job.number)
+        self.jobs.append(job)
+
+    def end_batch(self):
+        self.batches += 1
+
+class Network_fixture(object):
+    """Fixture running a Network_job_manager on the loopback interface.
+
+    attributes:
+      manager -- Network_job_manager (with start_workers() already called)
+      address -- address the manager is listening on
+
+    """
+    def __init__(self, tc):
+        self.manager = job_manager.Network_job_manager(
+            ('127.0.0.1', 0), AUTHKEY)
+        self.manager.start_workers()
+        self.address = self.manager.address
+        self._threads = []
+        self.jobs_run = []
+
+    def start_worker(self, prepare_job=None):
+        """Run a network worker in a new thread."""
+        def run():
+            self.jobs_run.append(job_manager.run_network_worker(
+                self.address, AUTHKEY, prepare_job))
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def finish(self):
+        """Shut down the manager and wait for the workers to finish."""
+        self.manager.finish()
+        for thread in self._threads:
+            thread.join(10)
+
+
+def test_network_job_manager(tc):
+    fx = Network_fixture(tc)
+    for i in range(3):
+        fx.start_worker()
+    job_source = Test_job_source(
+        [Test_job(i, fail=(i == 4)) for i in range(10)])
+    fx.manager.run_jobs(job_source)
+    fx.finish()
+    tc.assertEqual(sorted(number for (number, _) in job_source.responses),
+                   [0, 1, 2, 3, 5, 6, 7, 8, 9])
+    tc.assertTrue(set(worker_id for (_, worker_id) in job_source.responses)
+                  <= set([0, 1, 2]))
+    tc.assertEqual(job_source.errors, [(4, "job 4 failed")])
+    tc.assertEqual(job_source.lost, [])
+    tc.assertEqual(sum(fx.jobs_run), 10)
+    tc.assertEqual(fx.manager.stats.responses, 10)
+    tc.assertTrue(job_source.batches >= fx.manager.stats.batches)
+
+def test_network_job_manager_prepare_job(tc):
+    fx = Network_fixture(tc)
+    def prepare_job(job):
+        job.number += 100
+    fx.start_worker(prepare_job)
+    job_source = Test_job_source([Test_job(1), Test_job(2)])
+    fx.manager.run_jobs(job_source)
+    fx.finish()
+    tc.assertEqual(job_source.responses, [(101, 0), (102, 0)])
+
+def test_network_job_manager_lost_job(tc):
+    from multiprocessing import connection
+    fx = Network_fixture(tc)
+    received = []
+    def run_disconnecting_worker():
+        # Takes a job, then disconnects without running it
+        conn = connection.Client(fx.address, authkey=AUTHKEY)
+        received.append(conn.recv())
+        received.append(conn.recv().number)
+        fx.start_worker()
+        conn.close()
+    thread = threading.Thread(target=run_disconnecting_worker)
+    thread.daemon = True
+    thread.start()
+    job_source = Test_job_source([Test_job(1), Test_job(2)])
+    fx.manager.run_jobs(job_source)
+    thread.join(10)
+    fx.finish()
+    tc.assertEqual(received, [0, 1])
+    tc.assertEqual(job_source.lost, [1])
+    tc.assertEqual(sorted(job_source.responses), [(1, 0), (2, 0)])
+    tc.assertEqual(fx.jobs_run, [2])
+
+def test_network_job_manager_bad_authkey(tc):
+    from multiprocessing import connection
+    fx = Network_fixture(tc)
+    with tc.assertRaises(connection.AuthenticationError):
+        job_manager.run_network_worker(fx.address, "wrong key")
+    fx.start_worker()
+    job_source = Test_job_source([Test_job(1)])
+    fx.manager.run_jobs(job_source)
+    fx.finish()
+    tc.assertEqual(job_source.responses, [(1, 0)])
+
+def test_network_job_manager_address_in_use(tc):
+    fx = Network_fixture(tc)
+    manager = job_manager.Network_job_manager(fx.address, AUTHKEY)
+    with tc.assertRaises(job_manager.JobManagerError) as ar:
+        manager.start_workers()
+    tc.assertTrue(str(ar.exception).startswith(
+        "can't listen on 127.0.0.1:%d:\n" % fx.address[1]))
+    fx.manager.run_jobs(Test_job_source([]))
+    fx.finish()
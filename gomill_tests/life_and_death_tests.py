@@ -0,0 +1,125 @@
+"""Tests for life_and_death.py"""
+
+from __future__ import with_statement
+
+from gomill.common import format_vertex
+from gomill import ascii_boards
+from gomill import boards
+from gomill import life_and_death
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def _vertices(points):
+    return sorted(format_vertex(point) for point in points)
+
+DIAGRAM_DEAD_STONES = """\
+9  .  #  .  #  o  .  o  .  .
+8  #  #  #  #  o  .  o  .  .
+7  .  .  .  #  o  .  o  #  .
+6  .  o  .  #  o  .  o  o  o
+5  #  #  #  #  o  o  o  .  .
+4  .  .  .  .  .  .  .  .  .
+3  .  .  .  .  .  .  .  .  .
+2  .  .  .  .  .  .  .  .  .
+1  .  .  .  .  .  .  .  .  .
+   A  B  C  D  E  F  G  H  J
+"""
+
+DIAGRAM_SEKI = """\
+9  #  .  o  #  .  .  .  .  .
+8  #  .  o  #  .  .  .  .  .
+7  #  o  o  #  .  .  .  .  .
+6  o  o  #  #  .  .  .  .  .
+5  #  #  #  .  .  .  .  .  .
+4  .  .  .  .  .  .  .  .  .
+3  .  .  .  .  .  .  o  .  .
+2  .  .  .  .  .  .  .  .  .
+1  .  .  .  .  .  .  .  .  .
+   A  B  C  D  E  F  G  H  J
+"""
+
+DIAGRAM_INVADER = """\
+9  .  .  .  .  .  #  .  .  .
+8  .  .  .  .  .  #  .  .  .
+7  .  .  o  .  .  #  .  .  .
+6  .  .  .  .  .  #  .  .  .
+5  #  #  #  #  #  #  .  .  .
+4  o  o  o  o  o  o  o  o  o
+3  .  .  .  .  .  .  .  .  .
+2  .  .  .  .  .  .  .  .  .
+1  .  .  .  .  .  .  .  .  .
+   A  B  C  D  E  F  G  H  J
+"""
+
+def test_unconditional_life(tc):
+    board = ascii_boards.interpret_diagram(DIAGRAM_DEAD_STONES, 9)
+    alive, territory = life_and_death.find_unconditional_life(board)
+    tc.assertEqual(_vertices(alive), [
+        'A5', 'A8', 'B5', 'B8', 'B9', 'C5', 'C8',
+        'D5', 'D6', 'D7', 'D8', 'D9'])
+    tc.assertEqual(_vertices(territory), [
+        'A6', 'A7', 'A9', 'B6', 'B7', 'C6', 'C7', 'C9'])
+    tc.assertEqual(set(territory.values()), set(['b']))
+
+def test_unconditional_life_empty_board(tc):
+    board = boards.Board(9)
+    tc.assertEqual(life_and_death.find_unconditional_life(board),
+                   (set(), {}))
+
+def test_find_dead_stones(tc):
+    board = ascii_boards.interpret_diagram(DIAGRAM_DEAD_STONES, 9)
+    tc.assertEqual(life_and_death.find_dead_stones(board, 'no'), set())
+    tc.assertEqual(
+        _vertices(life_and_death.find_dead_stones(board, 'unconditional')),
+        ['B6'])
+    tc.assertEqual(
+        _vertices(life_and_death.find_dead_stones(board, 'estimated')),
+        ['B6', 'H7'])
+    tc.assertRaisesRegexp(
+        ValueError, "^unknown dead stones method: maybe$",
+        life_and_death.find_dead_stones, board, 'maybe')
+
+def test_estimate_min_life_area(tc):
+    board = ascii_boards.interpret_diagram(DIAGRAM_DEAD_STONES, 9)
+    tc.assertEqual(
+        _vertices(life_and_death.estimate_dead_stones(board, min_life_area=1)),
+        ['B6'])
+
+def test_estimate_invader(tc):
+    # C7's area has 20 points, but only seven of them (including C7 itself)
+    # count as living space.
+    board = ascii_boards.interpret_diagram(DIAGRAM_INVADER, 9)
+    tc.assertEqual(life_and_death.find_dead_stones(board, 'unconditional'),
+                   set())
+    tc.assertEqual(
+        _vertices(life_and_death.find_dead_stones(board, 'estimated')),
+        ['C7'])
+    tc.assertEqual(
+        life_and_death.find_dead_stones(board, 'estimated', min_life_area=7),
+        set())
+    tc.assertEqual(
+        _vertices(life_and_death.find_dead_stones(
+            board, 'estimated', min_life_area=8)),
+        ['C7'])
+    tc.assertEqual(life_and_death.area_score(board, 'estimated'), -6)
+    tc.assertEqual(life_and_death.area_score(board, 'estimated', 7), -27)
+
+def test_estimate_seki(tc):
+    board = ascii_boards.interpret_diagram(DIAGRAM_SEKI, 9)
+    tc.assertEqual(life_and_death.find_dead_stones(board, 'unconditional'),
+                   set())
+    tc.assertEqual(life_and_death.find_dead_stones(board, 'estimated'),
+                   set())
+
+def test_area_score(tc):
+    board = ascii_boards.interpret_diagram(DIAGRAM_DEAD_STONES, 9)
+    tc.assertEqual(life_and_death.area_score(board, 'no'), -3)
+    tc.assertEqual(life_and_death.area_score(board, 'unconditional'), 4)
+    tc.assertEqual(life_and_death.area_score(board, 'estimated'), -3)
+    # The board passed in isn't changed
+    tc.assertEqual(board.get(5, 1), 'w')
+    tc.assertEqual(board.get(6, 7), 'b')
@@ -381,6 +381,8 @@ def test_play(tc):
     tc.assertEqual(job1.move_limit, 1000)
     tc.assertIs(job1.use_internal_scorer, False)
     tc.assertEqual(job1.internal_scorer_handicap_compensation, 'full')
+    tc.assertEqual(job1.internal_scorer_dead_stones, 'no')
+    tc.assertEqual(job1.internal_scorer_min_life_area, 12)
     tc.assertEqual(job1.game_data, 0)
     tc.assertEqual(job1.sgf_event, 'mctstest')
     tc.assertRegexpMatches(job1.sgf_note, '^Candidate parameters: rsn@ ')
@@ -481,3 +483,63 @@ def _disabled_test_tree_run(tc):
     tc.assertEqual(tree.retrieve_best_parameters(),
                    [0.609375, 0.68930041152263366])
 
+
+def test_virtual_loss(tc):
+    tree = mcts_tuners.Tree(
+        splits=[4],
+        max_depth=1,
+        exploration_coefficient=0.2,
+        initial_visits=10,
+        initial_wins=5,
+        parameter_formatter=str,
+        virtual_loss=3,
+        )
+    tree.new_root()
+    simulations = []
+    for i in range(4):
+        simulation = mcts_tuners.Simulation(tree)
+        simulation.run()
+        simulations.append(simulation)
+    # Each simulation in progress pushes the others away
+    tc.assertItemsEqual([sim.choice_path for sim in simulations],
+                        [[0], [1], [2], [3]])
+    tc.assertEqual(tree.root.virtual_visits, 12)
+    node = simulations[0].node_path[0]
+    tc.assertEqual(node.virtual_visits, 3)
+    tc.assertEqual(node.visits, 10)
+    tc.assertEqual(node.value, 5/13)
+    # Virtual visits don't go into the persistent state
+    node2 = pickle.loads(pickle.dumps(node))
+    tc.assertEqual(node2.virtual_visits, 0)
+    tc.assertEqual(node2.value, 0.5)
+
+    simulations[0].update_stats(candidate_won=True)
+    tc.assertEqual(node.virtual_visits, 0)
+    tc.assertEqual(node.visits, 11)
+    tc.assertEqual(node.value, 6/11)
+    for simulation in simulations[1:]:
+        simulation.abandon()
+    tc.assertEqual(tree.root.virtual_visits, 0)
+    tc.assertEqual(tree.root.visits, 11)
+    tc.assertEqual(sum(node.visits for node in tree.root.children), 41)
+    tc.assertEqual(sum(node.virtual_visits for node in tree.root.children), 0)
+
+def test_virtual_loss_config(tc):
+    comp = mcts_tuners.Mcts_tuner('mctstest')
+    config = default_config()
+    config['virtual_loss'] = 2
+    comp.initialise_from_control_file(config)
+    tc.assertEqual(comp.tree.virtual_loss, 2)
+    comp.set_clean_status()
+    job1 = comp.get_game()
+    job2 = comp.get_game()
+    tc.assertEqual(comp.tree.root.virtual_visits, 4)
+    comp.process_game_error(job1, 0)
+    tc.assertEqual(comp.tree.root.virtual_visits, 2)
+    tc.assertEqual(comp.tree.root.visits, 10)
+
+    comp2 = mcts_tuners.Mcts_tuner('mctstest')
+    config['virtual_loss'] = -1
+    with tc.assertRaises(ControlFileError) as ar:
+        comp2.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception), "'virtual_loss': must not be negative")
@@ -7,8 +7,9 @@ import cPickle as pickle
 
 from gomill import competitions
 from gomill import playoffs
+from gomill import tournaments
 from gomill.gtp_controller import Engine_description
-from gomill.gtp_games import Game_result
+from gomill.gtp_games import Game_result, Move_times
 from gomill.game_jobs import Game_job, Game_job_result
 from gomill.competitions import (
     Player_config, NoGameAvailable, CompetitionError, ControlFileError)
@@ -85,8 +86,10 @@ def test_basic_config(tc):
             Matchup_config(
                 't1',  't2', board_size=9, komi=0.5, alternating=True,
                 handicap=6, handicap_style='free',
-                move_limit=50,
+                move_limit=50, superko_rule='situational',
                 scorer="internal", internal_scorer_handicap_compensation='no',
+                internal_scorer_dead_stones='estimated',
+                internal_scorer_min_life_area=8,
                 number_of_games=20),
             Matchup_config('t2', 't1', id='m1'),
             Matchup_config('t1', 't2'),
@@ -111,8 +114,11 @@ def test_basic_config(tc):
     tc.assertEqual(m0.handicap, 6)
     tc.assertEqual(m0.handicap_style, 'free')
     tc.assertEqual(m0.move_limit, 50)
+    tc.assertEqual(m0.superko_rule, 'situational')
     tc.assertEqual(m0.scorer, 'internal')
     tc.assertEqual(m0.internal_scorer_handicap_compensation, 'no')
+    tc.assertEqual(m0.internal_scorer_dead_stones, 'estimated')
+    tc.assertEqual(m0.internal_scorer_min_life_area, 8)
     tc.assertEqual(m0.number_of_games, 20)
 
     tc.assertEqual(m1.player_1, 't2')
@@ -123,8 +129,11 @@ def test_basic_config(tc):
     tc.assertEqual(m1.handicap, None)
     tc.assertEqual(m1.handicap_style, 'fixed')
     tc.assertEqual(m1.move_limit, 1000)
+    tc.assertIsNone(m1.superko_rule)
     tc.assertEqual(m1.scorer, 'players')
     tc.assertEqual(m1.internal_scorer_handicap_compensation, 'full')
+    tc.assertEqual(m1.internal_scorer_dead_stones, 'no')
+    tc.assertEqual(m1.internal_scorer_min_life_area, 12)
     tc.assertEqual(m1.number_of_games, None)
 
 def test_nonsense_matchup_config(tc):
@@ -258,8 +267,11 @@ def test_play(tc):
     tc.assertEqual(job1.board_size, 13)
     tc.assertEqual(job1.komi, 7.5)
     tc.assertEqual(job1.move_limit, 1000)
+    tc.assertIsNone(job1.superko_rule)
     tc.assertIs(job1.use_internal_scorer, False)
     tc.assertEqual(job1.internal_scorer_handicap_compensation, 'full')
+    tc.assertEqual(job1.internal_scorer_dead_stones, 'no')
+    tc.assertEqual(job1.internal_scorer_min_life_area, 12)
     tc.assertEqual(job1.game_data, ('0', 0))
     tc.assertIsNone(job1.sgf_filename)
     tc.assertIsNone(job1.sgf_dirname)
@@ -301,7 +313,7 @@ def test_play(tc):
     fx.check_screen_report(expected_report)
     fx.check_short_report(expected_report, expected_players)
 
-    tc.assertListEqual(
+    tc.assertGameResultListEqual(
         fx.comp.get_tournament_results().get_matchup_results('0'), [result1])
 
 def test_play_many(tc):
@@ -347,6 +359,141 @@ def test_play_many(tc):
     tc.assertEqual(ms.wins_1, 2)
     tc.assertEqual(ms.wins_b, 2)
 
+def test_status_with_result_lists(tc):
+    # State files written before Matchup_results was introduced have lists
+    # of Game_results.
+    fx = Playoff_fixture(tc)
+    jobs = [fx.comp.get_game() for _ in range(3)]
+    for job, winner in zip(jobs, ['b', 'w', 'w']):
+        fx.comp.process_game_result(fake_response(job, winner))
+    results = fx.comp.get_tournament_results().get_matchup_results('0')
+    status = pickle.loads(pickle.dumps(fx.comp.get_status()))
+    status['results'] = {'0' : results, '1' : []}
+    comp2 = playoffs.Playoff('testcomp')
+    comp2.initialise_from_control_file(default_config())
+    comp2.set_status(status)
+    competition_test_support.check_screen_report(
+        tc, comp2, competition_test_support.get_screen_report(fx.comp))
+    tc.assertGameResultListEqual(
+        comp2.get_tournament_results().get_matchup_results('0'), results)
+
+def test_sprt(tc):
+    config = default_config()
+    config['matchups'] = [
+        Matchup_config('t1', 't2', number_of_games=50,
+                       sprt=playoffs.SPRT(elo0=0, elo1=200)),
+        ]
+    fx = Playoff_fixture(tc, config)
+    history = []
+    fx.comp.set_history_logger(history.append)
+    for i in range(7):
+        job = fx.comp.get_game()
+        fx.comp.process_game_result(fake_response(job, 'b'))
+    extra_job = fx.comp.get_game()
+    job = fx.comp.get_game()
+    fx.comp.process_game_result(fake_response(job, 'b'))
+    tc.assertEqual(history[-1], "matchup 0 stopped: SPRT accepted elo1")
+    tc.assertIs(fx.comp.get_game(), competitions.NoGameAvailable)
+    # A game which was already in progress is still accepted
+    fx.comp.process_game_result(fake_response(extra_job, 'w'))
+    fx.check_screen_report(dedent("""    t1 v t2 (9/50 games)
+    board size: 13   komi: 7.5
+         wins
+    t1      8 88.89%   (black)
+    t2      1 11.11%   (white)
+    SPRT (elo0 0, elo1 200, alpha 0.05, beta 0.05): LLR 2.61 (-2.94, 2.94)
+    stopped: SPRT accepted elo1
+    """))
+    ms = fx.comp.get_tournament_results().get_matchup_stats('0')
+    tc.assertIsNone(ms.sprt_decision)
+    tc.assertAlmostEqual(ms.sprt_llr, 2.6141, places=3)
+    tc.assertEqual(ms.stop_reason, "SPRT accepted elo1")
+    tc.assertIsNone(ms.probability_1_stronger)
+
+    comp2 = competition_test_support.check_round_trip(tc, fx.comp, config)
+    tc.assertEqual(comp2.stopped_matchups, {'0' : "SPRT accepted elo1"})
+    tc.assertIs(comp2.get_game(), competitions.NoGameAvailable)
+
+def test_stop_on_confidence(tc):
+    config = default_config()
+    config['matchups'] = [
+        Matchup_config('t1', 't2', stop_on_confidence=0.95),
+        Matchup_config('t1', 't2', id='x', number_of_games=0,
+                       stop_on_confidence=0.95),
+        ]
+    fx = Playoff_fixture(tc, config)
+    for i in range(4):
+        job = fx.comp.get_game()
+        fx.comp.process_game_result(fake_response(job, 'w'))
+    tc.assertIs(fx.comp.get_game(), competitions.NoGameAvailable)
+    fx.check_screen_report(dedent("""    t1 v t2 (4 games)
+    board size: 13   komi: 7.5
+         wins
+    t1      0   0.00%   (black)
+    t2      4 100.00%   (white)
+    probability t1 is stronger: 3.12%
+    stopped: t2 is stronger with 96.88% confidence
+    """))
+
+def test_time_controls(tc):
+    config = default_config()
+    config['matchups'].append(Matchup_config(
+        't2', 't1', time_controls=tournaments.Time_controls(
+            600, 30, periods=5)))
+    fx = Playoff_fixture(tc, config)
+    tc.assertIsNone(fx.comp.matchups['0'].time_controls)
+    matchup = fx.comp.matchups['1']
+    tc.assertEqual(matchup.time_controls.style, 'byoyomi')
+    tc.assertEqual(matchup.describe_details(),
+                   "board size: 13   komi: 7.5   time: 600s + 5x30 byo-yomi")
+    jobs = [fx.comp.get_game() for _ in range(2)]
+    tc.assertEqual([job.game_id for job in jobs], ['0_0', '1_0'])
+    tc.assertIsNone(jobs[0].time_controls)
+    tc.assertIs(jobs[1].time_controls, matchup.time_controls)
+    tc.assertIs(fx.comp.control_file_globals()['Time_controls'],
+                tournaments.Time_controls)
+
+def test_bad_time_controls(tc):
+    config = default_config()
+    config['matchups'][0] = Matchup_config(
+        't1', 't2', time_controls=tournaments.Time_controls(
+            600, 30, period_moves=0))
+    comp = playoffs.Playoff('testcomp')
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "matchup 0: 'time_controls': "
+                   "invalid parameters for Time_controls:\n"
+                   "period_moves must be at least 1")
+    config['matchups'][0] = Matchup_config('t1', 't2', time_controls=600)
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "matchup 0: 'time_controls': "
+                   "invalid time controls specification")
+
+def test_bad_stopping_rules(tc):
+    config = default_config()
+    config['matchups'][0] = Matchup_config(
+        't1', 't2', sprt=playoffs.SPRT(elo0=5, elo1=5))
+    comp = playoffs.Playoff('testcomp')
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "matchup 0: 'sprt': invalid parameters for SPRT:\n"
+                   "elo0 and elo1 are the same")
+    config['matchups'][0] = Matchup_config('t1', 't2', sprt=(0, 5))
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "matchup 0: 'sprt': invalid SPRT specification")
+    config['matchups'][0] = Matchup_config('t1', 't2', stop_on_confidence=0.5)
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "matchup 0: 'stop_on_confidence': "
+                   "must be between 0.5 and 1.0")
+
 def test_jigo_reporting(tc):
     fx = Playoff_fixture(tc)
 
@@ -381,6 +528,34 @@ def test_jigo_reporting(tc):
                            3.5 50.00%     3.5 50.00%
     """))
 
+def test_move_time_reporting(tc):
+    fx = Playoff_fixture(tc)
+    jobs = [fx.comp.get_game() for _ in range(2)]
+    for job, genmove_times in zip(jobs, [[0.5, 1.5], [4.0]]):
+        response = fake_response(job, 'b')
+        move_times = Move_times()
+        move_times.genmove_times.extend(genmove_times)
+        response.game_result.move_times = {'t1' : move_times}
+        fx.comp.process_game_result(response)
+    expected_report = dedent("""\
+    t1 v t2 (2 games)
+    board size: 13   komi: 7.5
+         wins              black         white
+    t1      1 50.00%       1 100.00%     0 0.00%
+    t2      1 50.00%       1 100.00%     0 0.00%
+                           2 100.00%     0 0.00%
+    """)
+    fx.check_screen_report(expected_report)
+    fx.check_short_report(
+        expected_report + dedent("""\
+
+        genmove times (seconds):
+        t1 v t2:
+             moves mean  p50   p95   max
+        t1      3  2.00  1.45  4.00  4.00
+        """),
+        expected_fake_players)
+
 def test_engine_with_no_name(tc):
     fx = Playoff_fixture(tc)
     job = fx.comp.get_game()
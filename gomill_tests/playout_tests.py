@@ -0,0 +1,101 @@
+"""Tests for playouts.py"""
+
+from __future__ import with_statement
+
+from gomill import boards
+from gomill import playouts
+from gomill import sgf
+from gomill import sgf_moves
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def _check_numpy(tc):
+    if not playouts.numpy_available():
+        tc.skipTest("numpy not available")
+
+def _is_own_eye(board, row, col, colour):
+    for (r, c) in ((row-1, col), (row+1, col), (row, col-1), (row, col+1)):
+        if 0 <= r < board.side and 0 <= c < board.side:
+            if board.get(r, c) != colour:
+                return False
+    return True
+
+def test_playouts_against_board(tc):
+    # Replay each game on a Board, checking that every move is legal, that
+    # players pass only when they have to, and that the final positions
+    # agree.
+    _check_numpy(tc)
+    for side in (2, 5, 9):
+        batch = playouts.Playout_batch(side, 20, seed=side)
+        batch.run()
+        tc.assertFalse(batch.step())
+        for i in xrange(batch.count):
+            tc.assertTrue(batch.is_finished(i))
+            board = boards.Board(side)
+            ko_point = None
+            moves = batch.get_moves(i)
+            tc.assertTrue(moves)
+            for colour, move, comment in moves:
+                tc.assertIsNone(comment)
+                candidates = [(row, col) for (row, col)
+                              in board.legal_moves(colour, ko_point)
+                              if not _is_own_eye(board, row, col, colour)]
+                if move is None:
+                    tc.assertEqual(candidates, [])
+                    ko_point = None
+                else:
+                    tc.assertIn(move, candidates)
+                    ko_point = board.play(move[0], move[1], colour)
+            final = batch.get_board(i)
+            tc.assertEqual(sorted(final.list_occupied_points()),
+                           sorted(board.list_occupied_points()))
+            tc.assertEqual(final.zobrist_hash(), board.zobrist_hash())
+
+def test_playouts_end(tc):
+    _check_numpy(tc)
+    batch = playouts.Playout_batch(5, 10, seed=1, max_moves=6)
+    batch.run()
+    tc.assertEqual(batch.move_number, 6)
+    for i in xrange(batch.count):
+        tc.assertEqual(len(batch.get_moves(i)), 6)
+    batch = playouts.Playout_batch(5, 10, seed=1)
+    batch.run()
+    for i in xrange(batch.count):
+        moves = batch.get_moves(i)
+        tc.assertEqual([move for (colour, move, comment) in moves[-2:]],
+                       [None, None])
+        tc.assertEqual([colour for (colour, move, comment) in moves[:2]],
+                       ['b', 'w'])
+
+def test_playouts_are_repeatable(tc):
+    _check_numpy(tc)
+    batch1 = playouts.Playout_batch(9, 3, seed=4)
+    batch1.run()
+    batch2 = playouts.Playout_batch(9, 3, seed=4)
+    batch2.run()
+    for i in xrange(3):
+        tc.assertEqual(batch1.get_moves(i), batch2.get_moves(i))
+
+def test_playout_results_and_sgf(tc):
+    _check_numpy(tc)
+    batch = playouts.Playout_batch(9, 4, seed=2)
+    batch.run()
+    for i in xrange(batch.count):
+        score = batch.get_board(i).area_score()
+        result = batch.get_result(i, komi=0.5)
+        if score > 0:
+            tc.assertEqual(result.winning_colour, 'b')
+        else:
+            tc.assertEqual(result.winning_colour, 'w')
+        tc.assertEqual(result.sgf_result[2:], str(abs(score - 0.5)))
+        sgf_game = sgf.Sgf_game.from_string(
+            batch.make_sgf(i, komi=0.5).serialise())
+        tc.assertEqual(sgf_game.get_komi(), 0.5)
+        tc.assertEqual(sgf_game.get_root().get('RE'), result.sgf_result)
+        board, plays = sgf_moves.get_setup_and_moves(sgf_game)
+        tc.assertEqual(plays, [(colour, move) for (colour, move, comment)
+                               in batch.get_moves(i)])
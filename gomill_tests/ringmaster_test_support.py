@@ -1,5 +1,6 @@
 """Test support code for testing Ringmasters."""
 
+import cPickle as pickle
 from collections import defaultdict
 from cStringIO import StringIO
 
@@ -43,6 +44,11 @@ class Testing_ringmaster(ringmasters.Ringmaster):
     (Currently, write_status is made to do nothing, so it's not usefully
     testable.)
 
+    The status journal is kept in memory, in _test_journal.
+
+    Game records written from responses' sgf_content are kept in
+    _written_sgfs, as a dict pathname -> string.
+
     Instantiate with the control file contents as an 8-bit string.
 
     It will act as if the control file had been loaded from
@@ -55,6 +61,8 @@ class Testing_ringmaster(ringmasters.Ringmaster):
         self._control_file_contents = control_file_contents
         self._test_status = None
         self._written_status = None
+        self._test_journal = None
+        self._written_sgfs = {}
         ringmasters.Ringmaster.__init__(self, '/nonexistent/ctl/test.ctl')
         self.set_stdout(StringIO())
 
@@ -84,13 +92,30 @@ class Testing_ringmaster(ringmasters.Ringmaster):
         self._test_status = test_status
 
     def _load_status(self):
-        return self._test_status
+        # Copy the value, as the real implementation effectively does.
+        return pickle.loads(pickle.dumps(self._test_status, protocol=-1))
 
     def status_file_exists(self):
         return (self._test_status is not None)
 
     def _write_status(self, value):
-        self._written_status = value
+        # Copy the value, as the real implementation effectively does.
+        self._written_status = pickle.loads(pickle.dumps(value, protocol=-1))
+
+    def _start_journal(self, snapshot_id):
+        self._test_journal = (snapshot_id, [])
+
+    def _append_to_journal(self, records):
+        self._test_journal[1].extend(records)
+
+    def _remove_journal(self):
+        self._test_journal = None
+
+    def _load_journal(self):
+        return self._test_journal
+
+    def _write_sgf(self, pathname, sgf_string):
+        self._written_sgfs[pathname] = sgf_string
 
     def retrieve_printed_output(self):
         return self.stdout.getvalue()
@@ -1,5 +1,7 @@
 """Tests for ringmaster.py."""
 
+from __future__ import with_statement
+
 import os
 import re
 from textwrap import dedent
@@ -211,6 +213,7 @@ def test_settings(tc):
         "handicap = 9",
         "handicap_style = 'free'",
         "record_games = True",
+        "sgf_move_times = True",
         "scorer = 'players'",
         ])
     fx.ringmaster.enable_gtp_logging()
@@ -225,6 +228,7 @@ def test_settings(tc):
     tc.assertEqual(job.sgf_filename, '0_000.sgf')
     tc.assertEqual(job.sgf_dirname, '/nonexistent/ctl/test.games')
     tc.assertEqual(job.void_sgf_dirname, '/nonexistent/ctl/test.void')
+    tc.assertIs(job.sgf_move_times, True)
     tc.assertEqual(fx.ringmaster.get_sgf_filename("0_000"), "0_000.sgf")
     tc.assertEqual(fx.ringmaster.get_sgf_pathname("0_000"),
                    "/nonexistent/ctl/test.games/0_000.sgf")
@@ -279,7 +283,7 @@ def test_process_response(tc):
     tc.assertListEqual(
         fx.messages('results'),
         ["game 0_000: p2 beat p1 W+1.5"])
-    tc.assertEqual(
+    tc.assertGameResultListEqual(
         fx.ringmaster.get_tournament_results().get_matchup_results('0'),
         [response.game_result])
     tc.assertEqual(fx.get_log(),
@@ -289,6 +293,31 @@ def test_process_response(tc):
                    "logtest\n")
     tc.assertEqual(fx.get_history(), "")
 
+def test_process_response_sgf_content(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    job = fx.get_job()
+    response = fake_response(job, 'b')
+    response.sgf_content = "(;FF[4]GM[1]SZ[9])\n"
+    fx.ringmaster.process_response(response)
+    tc.assertEqual(fx.ringmaster._written_sgfs,
+                   {'/nonexistent/ctl/test.games/0_000.sgf' :
+                    "(;FF[4]GM[1]SZ[9])\n"})
+
+def test_process_lost_job(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    job1 = fx.ringmaster.get_job()
+    job2 = fx.ringmaster.get_job()
+    fx.ringmaster.process_lost_job(job1)
+    tc.assertEqual(fx.ringmaster.games_in_progress, {'0_001': job2})
+    tc.assertEqual(fx.ringmaster.games_to_replay, {'0_000': job1})
+    tc.assertEqual(fx.ringmaster.void_game_count, 0)
+    tc.assertListEqual(
+        fx.messages('warnings'),
+        ["game 0_000 -- worker disconnected; game will be replayed"])
+    tc.assertIs(fx.ringmaster.get_job(), job1)
+    tc.assertEqual(fx.ringmaster.games_to_replay, {})
+
 
 def test_check_players(tc):
     fx = Ringmaster_fixture(tc, playoff_ctl)
@@ -327,6 +356,26 @@ def test_run(tc):
         "  0_001 p1 beat p2 B+10.5\n"
         "  0_002 p1 beat p2 B+10.5\n")
 
+def test_run_listen_failure(tc):
+    import socket
+    sock = socket.socket()
+    tc.addCleanup(sock.close)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1)
+    port = sock.getsockname()[1]
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    fx.ringmaster.set_listen_address(('127.0.0.1', port), "test")
+    with tc.assertRaises(RingmasterError) as ar:
+        fx.ringmaster.run(max_games=3)
+    tc.assertTrue(str(ar.exception).startswith(
+        "can't listen on 127.0.0.1:%d:\n" % port))
+    tc.assertTrue(fx.get_log().startswith(
+        "run started at *** with max_games 3\n"
+        "listening for workers on 127.0.0.1:%d\n"
+        "run finished with error at ***\n"
+        "can't listen on 127.0.0.1:%d:\n" % (port, port)))
+
 def test_run_allplayall(tc):
     fx = Ringmaster_fixture(tc, allplayall_ctl)
     fx.initialise_clean()
@@ -522,6 +571,206 @@ def test_status(tc):
         "incompatible status file",
         fx.ringmaster.load_status)
 
+def test_status_journal(tc):
+    fx1 = Ringmaster_fixture(tc, playoff_ctl, [
+        "status_snapshot_interval = 3",
+        ])
+    fx1.initialise_clean()
+    fx1.ringmaster.run(max_games=5)
+    tc.assertListEqual(fx1.messages('warnings'), [])
+    sfv, status = fx1.get_written_state()
+    tc.assertEqual(status['snapshot_id'], 2)
+    tc.assertEqual(len(status['comp']['results']['0']), 3)
+    snapshot_id, records = fx1.ringmaster._test_journal
+    tc.assertEqual(snapshot_id, 2)
+    tc.assertEqual([kind for kind, data in records], ['result', 'result'])
+    tc.assertEqual([data.game_id for kind, data in records],
+                   ['0_003', '0_004'])
+
+    fx2 = Ringmaster_fixture(tc, playoff_ctl, [
+        "status_snapshot_interval = 3",
+        ])
+    fx2.ringmaster._test_journal = fx1.ringmaster._test_journal
+    fx2.initialise_with_state((sfv, status))
+    tc.assertEqual(
+        len(fx2.ringmaster.get_tournament_results().get_matchup_results('0')),
+        5)
+    fx2.ringmaster.run(max_games=1)
+    tc.assertListEqual(fx2.messages('warnings'), [])
+    tc.assertEqual(fx2.get_history(), "  0_005 p1 beat p2 B+10.5\n")
+    tc.assertListEqual(
+        fx2.messages('screen_report'),
+        ["p1 v p2 (6/400 games)\n"
+         "board size: 9   komi: 7.5\n"
+         "     wins                   avg cpu\n"
+         "p1      6 100.00%   (black)  546.20\n"
+         "p2      0   0.00%   (white)  567.20"])
+
+def test_status_saved_per_batch(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl, [
+        "status_snapshot_interval = 4",
+        ])
+    fx.initialise_clean()
+    fx.ringmaster.write_status()
+    jobs = [fx.ringmaster.get_job() for i in range(5)]
+    fx.ringmaster.end_batch()
+    fx.ringmaster.process_response(fake_response(jobs[1], 'b'))
+    fx.ringmaster.process_response(fake_response(jobs[0], 'w'))
+    tc.assertEqual(fx.ringmaster._test_journal, (1, []))
+    fx.ringmaster.end_batch()
+    snapshot_id, records = fx.ringmaster._test_journal
+    tc.assertEqual(snapshot_id, 1)
+    tc.assertEqual([data.game_id for kind, data in records],
+                   ['0_001', '0_000'])
+    tc.assertEqual(fx.ringmaster.journal_length, 2)
+    tc.assertListEqual(
+        fx.messages('screen_report'),
+        ["p1 v p2 (2/400 games)\n"
+         "board size: 9   komi: 7.5\n"
+         "     wins\n"
+         "p1      1 50.00%   (black)\n"
+         "p2      1 50.00%   (white)"])
+    # A batch which reaches status_snapshot_interval writes a snapshot instead
+    fx.ringmaster.process_response(fake_response(jobs[2], 'b'))
+    fx.ringmaster.process_response(fake_response(jobs[3], 'b'))
+    fx.ringmaster.end_batch()
+    sfv, status = fx.get_written_state()
+    tc.assertEqual(status['snapshot_id'], 2)
+    tc.assertEqual(len(status['comp']['results']['0']), 4)
+    tc.assertEqual(fx.ringmaster._test_journal, (2, []))
+    tc.assertEqual(fx.ringmaster.journal_length, 0)
+
+def test_status_journal_records(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl, [
+        "status_snapshot_interval = 4",
+        ])
+    fx.initialise_clean()
+    fx.ringmaster.write_status()
+    job = fx.ringmaster.get_job()
+    response = fake_response(job, 'b')
+    response.warnings = ["warning"]
+    response.log_entries = ["log entry"]
+    response.sgf_content = "(;FF[4]GM[1]SZ[9])\n"
+    fx.ringmaster.process_response(response)
+    fx.ringmaster.end_batch()
+    snapshot_id, records = fx.ringmaster._test_journal
+    [(kind, data)] = records
+    tc.assertEqual(kind, 'result')
+    tc.assertEqual(data.game_id, '0_000')
+    tc.assertEqual(data.game_data, response.game_data)
+    tc.assertIs(data.game_result, response.game_result)
+    tc.assertIs(data.engine_descriptions, response.engine_descriptions)
+    tc.assertEqual(data.warnings, [])
+    tc.assertEqual(data.log_entries, [])
+    tc.assertIsNone(data.sgf_content)
+
+def test_status_saved_on_interrupt(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl, [
+        "status_snapshot_interval = 4",
+        ])
+    fx.initialise_clean()
+    competition = fx.ringmaster.competition
+    real_get_game = competition.get_game
+    def get_game():
+        if competition.get_tournament_results().get_matchup_results('0'):
+            raise KeyboardInterrupt
+        return real_get_game()
+    competition.get_game = get_game
+    tc.assertRaises(KeyboardInterrupt, fx.ringmaster.run)
+    # The game which finished before the interrupt was saved
+    snapshot_id, records = fx.ringmaster._test_journal
+    tc.assertEqual([data.game_id for kind, data in records], ['0_000'])
+    tc.assertEqual(fx.ringmaster.unsaved_status_changes, [])
+
+def test_job_queue_depth(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    tc.assertEqual(fx.ringmaster.job_queue_depth, 0)
+    fx = Ringmaster_fixture(tc, playoff_ctl, ["job_queue_depth = 8"])
+    tc.assertEqual(fx.ringmaster.job_queue_depth, 8)
+    with tc.assertRaises(RingmasterError) as ar:
+        Ringmaster_fixture(tc, playoff_ctl, ["job_queue_depth = -1"])
+    tc.assertEqual(str(ar.exception),
+                   "error in control file:\n"
+                   "'job_queue_depth': must not be negative")
+
+def test_status_journal_replay(tc):
+    fx1 = Ringmaster_fixture(tc, playoff_ctl)
+    fx1.initialise_clean()
+    fx1.ringmaster.write_status()
+    sfv, status = fx1.get_written_state()
+    jobs = [fx1.ringmaster.get_job() for i in range(3)]
+    records = [
+        ('result', fake_response(jobs[2], 'w')),
+        ('void', None),
+        ('result', fake_response(jobs[0], 'b')),
+        ]
+
+    fx2 = Ringmaster_fixture(tc, playoff_ctl)
+    fx2.ringmaster._test_journal = (status['snapshot_id'], records)
+    fx2.initialise_with_state((sfv, status))
+    tc.assertEqual(fx2.ringmaster.void_game_count, 1)
+    tc.assertEqual(fx2.ringmaster.journal_length, 3)
+    tc.assertEqual(
+        [result.sgf_result for result in
+         fx2.ringmaster.get_tournament_results().get_matchup_results('0')],
+        ['W+1.5', 'B+1.5'])
+    # The unfinished game is played next
+    tc.assertEqual(fx2.ringmaster.get_job().game_id, '0_001')
+    tc.assertEqual(fx2.ringmaster.get_job().game_id, '0_003')
+
+    # A journal from before the snapshot is ignored
+    fx3 = Ringmaster_fixture(tc, playoff_ctl)
+    fx3.ringmaster._test_journal = (status['snapshot_id'] - 1, records)
+    fx3.initialise_with_state((sfv, status))
+    tc.assertEqual(fx3.ringmaster.void_game_count, 0)
+    tc.assertEqual(
+        fx3.ringmaster.get_tournament_results().get_matchup_results('0'), [])
+
+    # A result can't be replayed twice
+    fx4 = Ringmaster_fixture(tc, playoff_ctl)
+    fx4.ringmaster._test_journal = (status['snapshot_id'],
+                                    records + records[:1])
+    fx4.ringmaster.set_test_status((sfv, status))
+    tc.assertRaisesRegexp(
+        RingmasterError,
+        "error loading competition state: game 0_002 is recorded twice",
+        fx4.ringmaster.load_status)
+
+def test_compact_status(tc):
+    fx1 = Ringmaster_fixture(tc, playoff_ctl, [
+        "status_snapshot_interval = 10",
+        ])
+    fx1.initialise_clean()
+    fx1.ringmaster.run(max_games=3)
+    sfv, status = fx1.get_written_state()
+    tc.assertEqual(len(status['comp']['results']['0']), 0)
+
+    fx2 = Ringmaster_fixture(tc, playoff_ctl, [
+        "status_snapshot_interval = 10",
+        ])
+    fx2.ringmaster._test_journal = fx1.ringmaster._test_journal
+    fx2.ringmaster.set_test_status((sfv, status))
+    tc.assertRaisesRegexp(RingmasterError, "^status is not loaded$",
+                          fx2.ringmaster.compact_status)
+    fx2.ringmaster.load_status()
+    fx2.ringmaster.compact_status()
+    sfv, status = fx2.get_written_state()
+    tc.assertEqual(len(status['comp']['results']['0']), 3)
+    tc.assertEqual(fx2.ringmaster._test_journal,
+                   (status['snapshot_id'], []))
+    tc.assertEqual(fx2.get_log(), "status compacted\n")
+
+def test_status_journal_not_supported(tc):
+    fx = Ringmaster_fixture(tc, mcts_ctl, [
+        "status_snapshot_interval = 10",
+        ])
+    fx.initialise_clean()
+    fx.ringmaster.write_status()
+    fx.ringmaster.write_status()
+    sfv, status = fx.get_written_state()
+    tc.assertEqual(status['snapshot_id'], 2)
+    tc.assertIsNone(fx.ringmaster._test_journal)
+
 def test_no_cpu_time(tc):
     fx = Ringmaster_fixture(tc, playoff_ctl)
     def register(channel):
@@ -8,6 +8,8 @@ test_modules = [
     'utils_tests',
     'common_tests',
     'board_tests',
+    'playout_tests',
+    'life_and_death_tests',
     'sgf_grammar_tests',
     'sgf_properties_tests',
     'sgf_tests',
@@ -18,11 +20,14 @@ test_modules = [
     'gtp_controller_tests',
     'gtp_proxy_tests',
     'gtp_game_tests',
+    'gtp_multiplexing_tests',
     'game_job_tests',
+    'job_manager_tests',
     'setting_tests',
     'competition_scheduler_tests',
     'competition_tests',
     'playoff_tests',
+    'tournament_results_tests',
     'allplayall_tests',
     'mcts_tuner_tests',
     'cem_tuner_tests',
@@ -2,6 +2,8 @@
 
 from __future__ import with_statement
 
+from cStringIO import StringIO
+
 from gomill_tests import gomill_test_support
 
 from gomill import sgf_grammar
@@ -158,6 +160,16 @@ def test_parser_structure(tc):
     tc.assertRaisesRegexp(ValueError, "property with no values",
                           parse_sgf_game, r"(;B W[ag])")
 
+    # Running out of data takes priority over errors in the preceding property
+    tc.assertRaisesRegexp(ValueError, "unexpected end of SGF data",
+                          parse_sgf_game, r"(;B x")
+    tc.assertRaisesRegexp(ValueError, "property value outside a node",
+                          parse_sgf_game, r"(;B[ag](B[ah])")
+    tc.assertRaisesRegexp(ValueError, "unexpected end of SGF data",
+                          parse_sgf_game, r"(;B[ag](B[ah]")
+    tc.assertRaisesRegexp(ValueError, "unexpected end of SGF data",
+                          parse_sgf_game, r"(;B[ag](B x")
+
 def test_parser_tree_structure(tc):
     parse_sgf_game = sgf_grammar.parse_sgf_game
 
@@ -265,6 +277,69 @@ def test_parse_sgf_collection(tc):
     tc.assertEqual(str(ar.exception),
                    "error parsing game 1: unexpected end of SGF data")
 
+def _tree_data(game_tree):
+    return (game_tree.sequence, [_tree_data(child)
+                                 for child in game_tree.children])
+
+def test_iter_sgf_collection(tc):
+    def iter_collection(s, chunk_size):
+        return list(sgf_grammar.iter_sgf_collection(
+            StringIO(s), chunk_size=chunk_size))
+
+    src = ("dummy (;X[1];X[2];X[3](;B[bc])) junk (\n;C[a\\\\b\\]c(]"
+           "(;Y[1];Y[2])(;Z[])) Nonsense (")
+    expected = sgf_grammar.parse_sgf_collection(src)
+    for chunk_size in range(1, len(src)+2):
+        games = iter_collection(src, chunk_size)
+        tc.assertEqual(len(games), 2)
+        tc.assertEqual([game.index for game in games], [0, 1])
+        tc.assertEqual([(game.offset, game.end) for game in games],
+                       [(6, 31), (37, 70)])
+        tc.assertEqual([game.error for game in games], [None, None])
+        tc.assertEqual([_tree_data(game.game_tree) for game in games],
+                       [_tree_data(game_tree) for game_tree in expected])
+        tc.assertEqual(src[games[0].offset:games[0].end],
+                       "(;X[1];X[2];X[3](;B[bc]))")
+
+    tc.assertEqual(iter_collection("", 10), [])
+    tc.assertEqual(iter_collection("() junk", 10), [])
+
+def test_iter_sgf_collection_errors(tc):
+    def iter_collection(s, chunk_size):
+        return list(sgf_grammar.iter_sgf_collection(
+            StringIO(s), chunk_size=chunk_size))
+
+    src = "(;X[1]) (;X[2]x;X[3]) (;Y[1];[2]) (;Z[1](;Z[2]))"
+    for chunk_size in (1, 3, 1000):
+        games = iter_collection(src, chunk_size)
+        tc.assertEqual(
+            [(game.index, game.offset, game.end, game.error)
+             for game in games],
+            [(0, 0, 7, None),
+             (1, 8, 21, "unexpected end of SGF data"),
+             (2, 22, 33, "unexpected value"),
+             (3, 34, 48, None)])
+        tc.assertIsNone(games[1].game_tree)
+        tc.assertEqual(games[3].game_tree.sequence, [{'Z': ['1']}])
+
+    src = "(;X[1]) (;Y[1];Y[2]\\"
+    for chunk_size in (1, 3, 1000):
+        games = iter_collection(src, chunk_size)
+        tc.assertEqual(
+            [(game.index, game.offset, game.end, game.error)
+             for game in games],
+            [(0, 0, 7, None),
+             (1, 8, 20, "unexpected end of SGF data")])
+
+    src = "(;X[1]) (;Y[1];Y[2\\"
+    for chunk_size in (1, 3, 1000):
+        games = iter_collection(src, chunk_size)
+        tc.assertEqual(
+            [(game.index, game.offset, game.end, game.error)
+             for game in games],
+            [(0, 0, 7, None),
+             (1, 8, 19, "unexpected end of SGF data")])
+
 
 def test_parse_compose(tc):
     pc = sgf_grammar.parse_compose
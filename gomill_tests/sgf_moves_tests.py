@@ -3,6 +3,7 @@ from gomill_tests import gomill_test_support
 from gomill import ascii_boards
 from gomill import boards
 from gomill import sgf
+from gomill import sgf_grammar
 from gomill import sgf_moves
 
 def make_tests(suite):
@@ -112,6 +113,43 @@ def test_get_setup_and_moves_board_provided(tc):
                           sgf_moves.get_setup_and_moves, g1, b2)
 
 
+def test_get_main_line(tc):
+    def main_line(s):
+        return sgf_moves.get_main_line(sgf_grammar.parse_sgf_game(s))
+
+    m1 = main_line(SAMPLE_SGF)
+    tc.assertEqual(m1.size, 9)
+    tc.assertEqual(m1.komi, 7.5)
+    tc.assertIsNone(m1.handicap)
+    tc.assertEqual(m1.setup, (set([(0, 0), (1, 1), (4, 4)]),
+                              set([(6, 5), (6, 6)]),
+                              set()))
+    tc.assertEqual(m1.moves,
+                   [('b', (2, 3)), ('w', (3, 4)), ('b', None), ('w', None)])
+
+    m2 = main_line("(;HA[2]AB[aa:bb];B[cc](;W[dd];B[ee])(;W[ff]))")
+    tc.assertEqual(m2.size, 19)
+    tc.assertEqual(m2.komi, 0.0)
+    tc.assertEqual(m2.handicap, 2)
+    tc.assertEqual(m2.setup[0], set([(18, 0), (18, 1), (17, 0), (17, 1)]))
+    tc.assertEqual(m2.moves, [('b', (16, 2)), ('w', (15, 3)), ('b', (14, 4))])
+
+    m3 = main_line("(;SZ[9]B[aa];W[bb])")
+    tc.assertEqual(m3.moves, [('b', (8, 0)), ('w', (7, 1))])
+
+    tc.assertRaisesRegexp(ValueError, "bad SZ property: a",
+                          main_line, "(;SZ[a])")
+    tc.assertRaisesRegexp(ValueError, "size out of range: 27",
+                          main_line, "(;SZ[27])")
+    tc.assertRaisesRegexp(ValueError, "multiple values",
+                          main_line, "(;KM[1][2])")
+    tc.assertRaises(ValueError, main_line, "(;HA[1])")
+    tc.assertRaisesRegexp(ValueError, "mixed setup and moves in root node",
+                          main_line, "(;B[aa]AW[bb];W[cc])")
+    tc.assertRaisesRegexp(ValueError, "setup properties after the root node",
+                          main_line, "(;SZ[9];B[ab];AW[bc])")
+    tc.assertRaises(ValueError, main_line, "(;SZ[9];B[jj])")
+
 def test_set_initial_position(tc):
     board = ascii_boards.interpret_diagram(DIAGRAM1, 9)
     sgf_game = sgf.Sgf_game(9)
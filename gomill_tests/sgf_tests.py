@@ -3,6 +3,7 @@
 
 from __future__ import with_statement
 
+from cStringIO import StringIO
 from textwrap import dedent
 
 from gomill_tests import gomill_test_support
@@ -64,6 +65,27 @@ def test_sgf_game_from_string(tc):
     tc.assertRaisesRegexp(ValueError, "unknown encoding: $",
                           sgf.Sgf_game.from_string, "(;CA[])")
 
+def test_iter_sgf_games(tc):
+    src = ("(;SZ[9];B[aa]) (;SZ[99]) (;SZ[9];B[ab]x) "
+           "(;SZ[9]CA[UTF-8];W[bb])")
+    results = list(sgf.iter_sgf_games(StringIO(src), chunk_size=4))
+    tc.assertEqual(
+        [(cg.index, cg.offset, cg.end, cg.error) for (cg, g) in results],
+        [(0, 0, 14, None),
+         (1, 15, 24, "size out of range: 99"),
+         (2, 25, 40, "unexpected end of SGF data"),
+         (3, 41, 64, None)])
+    tc.assertIsNone(results[1][1])
+    tc.assertIsNone(results[2][1])
+    g0 = results[0][1]
+    tc.assertEqual(g0.get_size(), 9)
+    tc.assertEqual(g0.get_root()[0].get_move(), ('b', (8, 0)))
+    tc.assertEqual(results[3][1].get_charset(), "UTF-8")
+
+    results = list(sgf.iter_sgf_games(
+        StringIO("(;CA[UTF-8])"), override_encoding="iso8859-1"))
+    tc.assertEqual(results[0][1].get_charset(), "ISO-8859-1")
+
 def test_node(tc):
     sgf_game = sgf.Sgf_game.from_string(
         r"(;KM[6.5]C[sample\: comment]AB[ai][bh][ee]AE[];B[dg])")
@@ -130,6 +152,57 @@ def test_node_get(tc):
     tc.assertEqual(root.get('AE'), set())
     tc.assertRaisesRegexp(ValueError, "multiple values", root.get, 'PW')
 
+def test_node_value_cache(tc):
+    sgf_game = sgf.Sgf_game.from_string(
+        "(;SZ[9]KM[6.5]AB[ai][bh]C[abc];B[dg])")
+    root = sgf_game.get_root()
+    presenter = root.get_presenter()
+    interpreted = []
+    def interpret(identifier, raw_values):
+        interpreted.append(identifier)
+        return sgf.sgf_properties.Presenter.interpret(
+            presenter, identifier, raw_values)
+    presenter.interpret = interpret
+
+    tc.assertEqual(root.get('KM'), 6.5)
+    tc.assertEqual(root.get('KM'), 6.5)
+    tc.assertEqual(interpreted, ['KM'])
+
+    stones = root.get('AB')
+    tc.assertEqual(stones, set([(0, 0), (1, 1)]))
+    stones.add((4, 4))
+    tc.assertEqual(root.get('AB'), set([(0, 0), (1, 1)]))
+    tc.assertEqual(root.get_setup_stones()[0], set([(0, 0), (1, 1)]))
+    tc.assertEqual(interpreted, ['KM', 'AB'])
+
+    root.set('KM', 7.5)
+    tc.assertEqual(root.get('KM'), 7.5)
+    root.set_raw('KM', "0.5")
+    tc.assertEqual(root.get('KM'), 0.5)
+    root.set_raw_list('AB', ["cc"])
+    tc.assertEqual(root.get('AB'), set([(6, 2)]))
+    root.add_comment_text("def")
+    tc.assertEqual(root.get('C'), "abc\n\ndef")
+    root.unset('KM')
+    tc.assertRaises(KeyError, root.get, 'KM')
+    root.set_setup_stones([], [(2, 2)])
+    tc.assertRaises(KeyError, root.get, 'AB')
+    tc.assertEqual(root.get('AW'), set([(2, 2)]))
+
+    node = sgf_game.get_last_node()
+    tc.assertEqual(node.get_move(), ('b', (2, 3)))
+    tc.assertEqual(node.get('B'), (2, 3))
+    node.set_move('w', (3, 3))
+    tc.assertEqual(node.get_move(), ('w', (3, 3)))
+    tc.assertEqual(node.get('W'), (3, 3))
+    tc.assertRaises(KeyError, node.get, 'B')
+
+    del interpreted[:]
+    node.cache_values = False
+    tc.assertEqual(node.get('W'), (3, 3))
+    tc.assertEqual(node.get('W'), (3, 3))
+    tc.assertEqual(interpreted, ['W', 'W'])
+
 def test_text_values(tc):
     def check(s):
         sgf_game = sgf.Sgf_game.from_string(s)
@@ -197,6 +270,15 @@ def test_node_get_move(tc):
     tc.assertEqual(nodes[3].get_move(), ('b', None))
     tc.assertEqual(nodes[4].get_move(), ('w', None))
 
+def test_node_get_move_multiple_values(tc):
+    # get_move() uses the first value, though get() rejects the property
+    sgf_game = sgf.Sgf_game.from_string("(;SZ[9];B[ai][bh];W[cg][dg][eg])")
+    nodes = list(sgf_game.main_sequence_iter())
+    tc.assertEqual(nodes[1].get_move(), ('b', (0, 0)))
+    tc.assertEqual(nodes[2].get_move(), ('w', (2, 2)))
+    tc.assertRaisesRegexp(ValueError, "multiple values", nodes[1].get, 'B')
+    tc.assertEqual(nodes[1].get_move(), ('b', (0, 0)))
+
 def test_node_get_setup_stones(tc):
     sgf_game = sgf.Sgf_game.from_string(
         r"(;KM[6.5]SZ[9]C[sample\: comment]AB[ai][bh][ee]AE[bb];B[dg])")
@@ -0,0 +1,290 @@
+"""Tests for tournament_results.py"""
+
+import cPickle as pickle
+
+from gomill import gtp_games
+from gomill.tournament_results import (
+    Matchup_results, Matchup_stats, Sprt, Time_histogram,
+    make_move_times_table, regularised_incomplete_beta)
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def make_result(player_b, player_w, winner, margin=1.5, detail=None,
+                cpu_times=None, game_id=None, forfeit=False):
+    """Make a Game_result.
+
+    winner -- colour, None for a jigo, or 'unknown'
+
+    """
+    if forfeit:
+        result = gtp_games.Game_result.from_score(winner, None, detail)
+        result.sgf_result += "F"
+        result.is_forfeit = True
+    elif winner == 'unknown':
+        result = gtp_games.Game_result.from_score(None, None, detail)
+    elif winner is None:
+        result = gtp_games.Game_result.from_score(None, 0, detail)
+    else:
+        result = gtp_games.Game_result.from_score(winner, margin, detail)
+    result.set_players({'b' : player_b, 'w' : player_w})
+    result.game_id = game_id
+    if cpu_times is not None:
+        result.soft_update_cpu_times(cpu_times)
+    return result
+
+def sample_results():
+    return [
+        make_result('p1', 'p2', 'b', game_id="0_0",
+                    cpu_times={'b' : 3.5, 'w' : 2.0}),
+        make_result('p2', 'p1', 'b', margin=10, game_id="0_1",
+                    cpu_times={'b' : 1.25}),
+        make_result('p1', 'p2', None, game_id="0_2"),
+        make_result('p2', 'p1', 'unknown', detail="no score reported",
+                    game_id="0_3"),
+        make_result('p1', 'p2', 'w', detail="bad move", forfeit=True,
+                    game_id="0_4", cpu_times={'b' : 0.5}),
+        make_result('p2', 'p1', 'w', game_id="0_5"),
+        ]
+
+def old_style_stats(results, player_1, player_2):
+    """Calculate Matchup_stats attributes directly from Game_results."""
+    d = {}
+    js = 0.5 * sum(r.is_jigo for r in results)
+    d['total'] = len(results)
+    d['unknown'] = sum(r.is_unknown for r in results)
+    d['wins_1'] = sum(r.winning_player == player_1 for r in results) + js
+    d['wins_2'] = sum(r.winning_player == player_2 for r in results) + js
+    d['forfeits_1'] = sum(r.winning_player == player_2 and r.is_forfeit
+                          for r in results)
+    d['forfeits_2'] = sum(r.winning_player == player_1 and r.is_forfeit
+                          for r in results)
+    d['played_1b'] = sum(r.player_b == player_1 for r in results)
+    d['played_1w'] = sum(r.player_w == player_1 for r in results)
+    d['played_2b'] = sum(r.player_b == player_2 for r in results)
+    d['played_y2'] = sum(r.player_w == player_2 for r in results)
+    d['wins_b'] = sum(r.winning_colour == 'b' for r in results) + js
+    d['wins_w'] = sum(r.winning_colour == 'w' for r in results) + js
+    d['wins_1b'] = sum(r.winning_player == player_1 and
+                       r.winning_colour == 'b' for r in results) + js
+    d['wins_1w'] = sum(r.winning_player == player_1 and
+                       r.winning_colour == 'w' for r in results) + js
+    d['wins_2b'] = sum(r.winning_player == player_2 and
+                       r.winning_colour == 'b' for r in results) + js
+    d['wins_2w'] = sum(r.winning_player == player_2 and
+                       r.winning_colour == 'w' for r in results) + js
+    for player, key in [(player_1, 'average_time_1'),
+                        (player_2, 'average_time_2')]:
+        times = [r.cpu_times[player] for r in results
+                 if r.cpu_times[player] is not None]
+        d[key] = (sum(times) / len(times)) if times else None
+    return d
+
+def get_stats_dict(ms):
+    ms.calculate_colour_breakdown()
+    ms.calculate_time_stats()
+    return dict((key, getattr(ms, key))
+                for key in old_style_stats([], 'p1', 'p2'))
+
+
+def test_matchup_results(tc):
+    results = sample_results()
+    mr = Matchup_results()
+    tc.assertEqual(len(mr), 0)
+    tc.assertFalse(mr)
+    tc.assertIsNone(mr.player_codes)
+    for result in results:
+        mr.append(result)
+    tc.assertEqual(len(mr), 6)
+    tc.assertTrue(mr)
+    tc.assertEqual(mr.player_codes, ('p1', 'p2'))
+    tc.assertGameResultListEqual(mr, results)
+    tc.assertEqual(mr[1], results[1])
+    tc.assertEqual(mr[-1], results[-1])
+    tc.assertEqual(mr[4].describe(),
+                   "p2 beat p1 W+F (forfeit by p1: bad move)")
+    tc.assertEqual(mr[0].cpu_times, {'p1' : 3.5, 'p2' : 2.0})
+    tc.assertEqual(mr[1].cpu_times, {'p1' : None, 'p2' : 1.25})
+    tc.assertIs(mr[2].is_jigo, True)
+    tc.assertIs(mr[3].is_unknown, True)
+    tc.assertRaises(IndexError, mr.__getitem__, 6)
+    tc.assertGameResultListEqual(Matchup_results(results), results)
+
+def test_matchup_results_wrong_players(tc):
+    mr = Matchup_results([make_result('p1', 'p2', 'b')])
+    mr.append(make_result('p2', 'p1', 'b'))
+    tc.assertRaisesRegexp(
+        ValueError, "result is for different players",
+        mr.append, make_result('p1', 'p3', 'b'))
+    tc.assertRaisesRegexp(
+        ValueError, "result is for different players",
+        mr.append, make_result('p3', 'p1', 'b'))
+    tc.assertEqual(len(mr), 2)
+
+def test_matchup_results_pickle(tc):
+    results = sample_results()
+    mr = Matchup_results(results)
+    mr2 = pickle.loads(pickle.dumps(mr, protocol=-1))
+    tc.assertGameResultListEqual(mr2, results)
+    tc.assertEqual(get_stats_dict(Matchup_stats(mr2, 'p1', 'p2')),
+                   get_stats_dict(Matchup_stats(mr, 'p1', 'p2')))
+    mr2.append(make_result('p1', 'p2', 'b'))
+    tc.assertEqual(Matchup_stats(mr2, 'p1', 'p2').wins_1, 3.5)
+
+def test_matchup_stats(tc):
+    results = sample_results()
+    mr = Matchup_results(results)
+    for player_1, player_2 in [('p1', 'p2'), ('p2', 'p1')]:
+        tc.assertEqual(get_stats_dict(Matchup_stats(mr, player_1, player_2)),
+                       old_style_stats(results, player_1, player_2))
+        tc.assertEqual(
+            get_stats_dict(Matchup_stats(results, player_1, player_2)),
+            old_style_stats(results, player_1, player_2))
+    ms = Matchup_stats(mr, 'p2', 'p1')
+    tc.assertEqual(ms.wins_1, 2.5)
+    tc.assertEqual(ms.forfeits_2, 1)
+    ms.calculate_time_stats()
+    tc.assertEqual(ms.average_time_1, (2.0 + 1.25) / 2)
+    tc.assertEqual(ms.average_time_2, (3.5 + 0.5) / 2)
+
+def test_matchup_stats_empty(tc):
+    ms = Matchup_stats(Matchup_results(), 'p1', 'p2')
+    tc.assertEqual(ms.total, 0)
+    tc.assertEqual(ms.wins_1, 0)
+    ms.calculate_colour_breakdown()
+    ms.calculate_time_stats()
+    tc.assertIs(ms.alternating, False)
+    tc.assertIsNone(ms.average_time_1)
+
+def test_matchup_stats_not_alternating(tc):
+    results = [make_result('p2', 'p1', 'b'), make_result('p2', 'p1', 'w')]
+    ms = Matchup_stats(Matchup_results(results), 'p1', 'p2')
+    ms.calculate_colour_breakdown()
+    tc.assertIs(ms.alternating, False)
+    tc.assertEqual(ms.colour_1, 'w')
+    tc.assertEqual(ms.colour_2, 'b')
+    tc.assertEqual(ms.played_2b, 2)
+
+def test_regularised_incomplete_beta(tc):
+    for x in [0.0, 0.1, 0.5, 0.75, 1.0]:
+        tc.assertAlmostEqual(regularised_incomplete_beta(x, 1, 1), x)
+    tc.assertAlmostEqual(regularised_incomplete_beta(0.5, 7, 7), 0.5)
+    tc.assertAlmostEqual(regularised_incomplete_beta(0.5, 3, 1), 0.125)
+    tc.assertAlmostEqual(regularised_incomplete_beta(0.5, 1, 3), 0.875)
+    tc.assertAlmostEqual(regularised_incomplete_beta(0.2, 2, 3),
+                         1 - 0.8**4 - 4 * 0.2 * 0.8**3)
+    tc.assertAlmostEqual(regularised_incomplete_beta(0.5, 40.5, 60.5) +
+                         regularised_incomplete_beta(0.5, 60.5, 40.5), 1.0)
+
+def test_sprt(tc):
+    sprt = Sprt(0, 200)
+    tc.assertEqual(sprt.describe(), "elo0 0, elo1 200, alpha 0.05, beta 0.05")
+    tc.assertAlmostEqual(sprt.lower_bound, -2.944, places=3)
+    tc.assertAlmostEqual(sprt.upper_bound, 2.944, places=3)
+    tc.assertEqual(sprt.get_llr(0, 0), 0.0)
+    tc.assertIsNone(sprt.get_decision(sprt.get_llr(3, 3)))
+    tc.assertEqual(sprt.get_decision(sprt.get_llr(8, 0)), 'elo1')
+    tc.assertEqual(sprt.get_decision(sprt.get_llr(2, 10)), 'elo0')
+    tc.assertAlmostEqual(sprt.get_llr(1.5, 0.5),
+                         sprt.get_llr(1, 0) + sprt.get_llr(0.5, 0.5))
+
+def test_sprt_bad_parameters(tc):
+    tc.assertRaisesRegexp(ValueError, "elo0 and elo1 are the same",
+                          Sprt, 10, 10)
+    tc.assertRaisesRegexp(ValueError, "alpha and beta must be between",
+                          Sprt, 0, 10, alpha=0)
+    tc.assertRaisesRegexp(ValueError, "alpha and beta must be between",
+                          Sprt, 0, 10, beta=1.5)
+    tc.assertRaisesRegexp(ValueError, "alpha \\+ beta must be less than 1.0",
+                          Sprt, 0, 10, alpha=0.5, beta=0.6)
+
+def test_stopping_stats(tc):
+    results = [make_result('p1', 'p2', 'w')] * 5
+    ms = Matchup_stats(Matchup_results(results), 'p1', 'p2')
+    ms.calculate_stopping_stats(None, None)
+    tc.assertIsNone(ms.sprt_llr)
+    tc.assertIsNone(ms.probability_1_stronger)
+    tc.assertIsNone(ms.stop_reason)
+    ms.calculate_stopping_stats(None, 0.95)
+    tc.assertAlmostEqual(ms.probability_1_stronger, 1/64.0)
+    tc.assertEqual(ms.stop_reason, "p2 is stronger with 98.44% confidence")
+    ms.calculate_stopping_stats(None, 0.99)
+    tc.assertIsNone(ms.stop_reason)
+
+def make_move_times(genmove_times, play_times=()):
+    move_times = gtp_games.Move_times()
+    move_times.genmove_times.extend(genmove_times)
+    move_times.play_times.extend(play_times)
+    return move_times
+
+def test_time_histogram(tc):
+    h = Time_histogram()
+    tc.assertEqual(h.count, 0)
+    tc.assertIsNone(h.get_mean())
+    tc.assertIsNone(h.get_percentile(50))
+    tc.assertIsNone(h.max)
+    h.add_times([0.5] * 90 + [2.0] * 9 + [10.0])
+    tc.assertEqual(h.count, 100)
+    tc.assertAlmostEqual(h.get_mean(), (45.0 + 18.0 + 10.0) / 100)
+    tc.assertEqual(h.max, 10.0)
+    tc.assertAlmostEqual(h.get_percentile(50), 0.5, delta=0.5 * 0.05)
+    tc.assertAlmostEqual(h.get_percentile(95), 2.0, delta=2.0 * 0.05)
+    tc.assertAlmostEqual(h.get_percentile(99), 2.0, delta=2.0 * 0.05)
+    tc.assertEqual(h.get_percentile(100), 10.0)
+    tc.assertAlmostEqual(h.get_percentile(0), 0.5, delta=0.5 * 0.05)
+    h2 = pickle.loads(pickle.dumps(h, protocol=-1))
+    tc.assertEqual(h2.count, 100)
+    tc.assertEqual(h2.get_percentile(95), h.get_percentile(95))
+
+def test_time_histogram_extremes(tc):
+    h = Time_histogram()
+    h.add(0.0)
+    tc.assertEqual(h.get_percentile(50), 0.0)
+    h.add(1e9)
+    tc.assertEqual(h.max, 1e9)
+    tc.assertEqual(h.get_percentile(100), 1e9)
+    # Times beyond the largest bucket are estimated at its size
+    tc.assertTrue(1e5 < h.get_percentile(99) < 1e6)
+
+def test_matchup_stats_move_times(tc):
+    result1 = make_result('p1', 'p2', 'b')
+    result1.move_times = {'p1' : make_move_times([1.0, 3.0], [0.25]),
+                          'p2' : make_move_times([0.5], [0.5, 0.5])}
+    result2 = make_result('p2', 'p1', 'w')
+    result2.move_times = {'p1' : make_move_times([2.0])}
+    result3 = make_result('p2', 'p1', 'w')
+    mr = Matchup_results([result1, result2, result3])
+    tc.assertIsNone(mr[0].move_times)
+    for ms in [Matchup_stats(mr, 'p1', 'p2'),
+               Matchup_stats(pickle.loads(pickle.dumps(mr, protocol=-1)),
+                             'p1', 'p2')]:
+        ms.calculate_time_stats()
+        tc.assertEqual(ms.genmove_times_1.count, 3)
+        tc.assertAlmostEqual(ms.genmove_times_1.get_mean(), 2.0)
+        tc.assertEqual(ms.genmove_times_1.max, 3.0)
+        tc.assertEqual(ms.genmove_times_2.count, 1)
+        tc.assertEqual(ms.play_times_1.count, 1)
+        tc.assertEqual(ms.play_times_2.count, 2)
+        tc.assertMultiLineEqual("\n".join(make_move_times_table(ms).render()),
+                                "     moves mean  p50   p95   max\n"
+                                "p1      3  2.00  1.92  3.00  3.00\n"
+                                "p2      1  0.50  0.50  0.50  0.50")
+    ms = Matchup_stats([result3], 'p1', 'p2')
+    ms.calculate_time_stats()
+    tc.assertIsNone(ms.genmove_times_1)
+    tc.assertIsNone(ms.play_times_2)
+    tc.assertIsNone(make_move_times_table(ms))
+
+def test_matchup_results_old_pickle(tc):
+    # Matchup_results pickled without move times
+    mr = Matchup_results(sample_results())
+    state = mr.__getstate__()[:9]
+    mr2 = Matchup_results.__new__(Matchup_results)
+    mr2.__setstate__(state)
+    tc.assertGameResultListEqual(mr2, sample_results())
+    ms = Matchup_stats(mr2, 'p1', 'p2')
+    ms.calculate_time_stats()
+    tc.assertIsNone(ms.genmove_times_1)